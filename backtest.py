@@ -4,16 +4,63 @@ import os
 
 import argparse
 import asyncio
+import json
 import pprint
 from time import time
 
 import numpy as np
 import pandas as pd
 
-from downloader import Downloader, load_hlc_cache
-from njit_funcs import backtest_static_grid, round_
-from njit_funcs_recursive_grid import backtest_recursive_grid
-from njit_funcs_neat_grid import backtest_neat_grid
+from downloader import Downloader, load_hlc_cache, compact_ticks, expand_ticks
+from njit_funcs import (
+    clear_stale_numba_cache,
+    N_STATE,
+    P_MAX_N_ENTRY_ORDERS,
+    ST_GRID_MEMO_HITS,
+    ST_GRID_MEMO_MISSES,
+    ST_K,
+    ST_MAX_SPAN_LONG,
+    ST_MAX_SPAN_SHORT,
+    ST_N_STATS,
+    ST_NEXT_STATS_UPDATE,
+    ST_DONE,
+    append_state_stats,
+    empty_fills,
+    empty_orders,
+    empty_stats,
+    init_backtest_state,
+    init_grid_memo,
+    orders_to_array,
+    n_ticks,
+    search_ticks,
+    tick_timestamp,
+    unpack_compact_ticks,
+    unpack_ticks,
+    backtest_static_grid,
+    backtest_static_grid_batch,
+    backtest_static_grid_resume,
+    backtest_static_grid_symbols,
+    backtest_static_grid_windows,
+    pack_market_settings,
+    pack_static_grid_params,
+    round_,
+)
+from njit_funcs_recursive_grid import (
+    backtest_recursive_grid,
+    backtest_recursive_grid_batch,
+    backtest_recursive_grid_resume,
+    backtest_recursive_grid_symbols,
+    backtest_recursive_grid_windows,
+    pack_recursive_grid_params,
+)
+from njit_funcs_neat_grid import (
+    backtest_neat_grid,
+    backtest_neat_grid_batch,
+    backtest_neat_grid_resume,
+    backtest_neat_grid_symbols,
+    backtest_neat_grid_windows,
+    pack_neat_grid_params,
+)
 from plotting import dump_plots
 from procedures import (
     prepare_backtest_config,
@@ -27,47 +74,382 @@ from pure_funcs import (
     denumpyize,
     ts_to_date,
     analyze_fills,
+    analyze_fills_fast,
     spotify_config,
     determine_passivbot_mode,
+    make_walk_forward_windows,
+    metrics_to_analysis,
 )
 
 
-def backtest(config: dict, data: np.ndarray, do_print=False) -> (list, bool):
+def make_ticks_view(data) -> tuple:
+    """
+    returns ticks view of data, a ticks array or compact ticks, as taken by the backtest kernels
+    compact ticks are not expanded; kernels compute each tick's timestamp and price as they go
+    """
+    if type(data) == dict:
+        return unpack_compact_ticks(
+            data["first_timestamp"], data["step_ms"], data["prices"], data["price_scale"]
+        )
+    return unpack_ticks(data)
+
+
+def pack_params(config: dict, xk: dict) -> np.ndarray:
+    """
+    packs xk, from create_xk(config), for the backtest kernels of config's passivbot mode
+    neat grids are built from template only if config has neat_grid_template set
+    """
+    passivbot_mode = determine_passivbot_mode(config)
+    if passivbot_mode == "recursive_grid":
+        return pack_recursive_grid_params(**xk)
+    elif passivbot_mode == "neat_grid":
+        return pack_neat_grid_params(**xk, grid_template=uses_neat_grid_template(config))
+    return pack_static_grid_params(**xk)
+
+
+def uses_neat_grid_template(config: dict) -> bool:
+    return "neat_grid_template" in config and bool(config["neat_grid_template"])
+
+
+def backtest(config: dict, data: np.ndarray, do_print=False, state_out=None) -> (list, bool):
+    """
+    data may be compact ticks
+    state_out: optional np.zeros(N_STATE), set to the final backtest state
+    """
+    ticks = make_ticks_view(data)
     passivbot_mode = determine_passivbot_mode(config)
     xk = create_xk(config)
     if passivbot_mode == "recursive_grid":
         return backtest_recursive_grid(
-            data,
+            ticks,
             config["starting_balance"],
             config["latency_simulation_ms"],
             config["maker_fee"],
             **xk,
+            state_out=state_out,
         )
     elif passivbot_mode == "neat_grid":
         return backtest_neat_grid(
-            data,
+            ticks,
             config["starting_balance"],
             config["latency_simulation_ms"],
             config["maker_fee"],
             **xk,
+            grid_template=uses_neat_grid_template(config),
+            state_out=state_out,
         )
     return backtest_static_grid(
-        data,
+        ticks,
         config["starting_balance"],
         config["latency_simulation_ms"],
         config["maker_fee"],
         **xk,
+        state_out=state_out,
     )
 
 
+def backtest_resumable(config: dict, data: np.ndarray, snapshot: dict = None) -> tuple:
+    """
+    backtests config on data, resuming from snapshot if given, instead of starting over
+    with a snapshot, only ticks after the snapshot's last tick are backtested; data may hold
+    all ticks or only the appended ones
+    fills and stats of consecutive runs concatenated equal those of one backtest over all ticks
+    returns (fills_long, fills_short, stats, snapshot of end state)
+    snapshot: {"state", "params", "last_tick", "trade_id_offset", "entries_long", "closes_long",
+               "entries_short", "closes_short"[, "grid_memo_long", "grid_memo_short"]}, all np.ndarray
+    """
+    if type(data) == dict:
+        data = expand_ticks(data)
+    passivbot_mode = determine_passivbot_mode(config)
+    xk = create_xk(config)
+    params = pack_params(config, xk)
+    if snapshot is None:
+        ticks = data
+        snapshot = {
+            "state": init_backtest_state(unpack_ticks(ticks), config["starting_balance"], params),
+            "params": params,
+            "trade_id_offset": np.zeros(1),
+        }
+        if passivbot_mode == "recursive_grid":
+            for key in ["entry_long", "entry_short"]:
+                snapshot[key] = orders_to_array([(0.0, 0.0, "")])
+        else:
+            for key in ["entries_long", "entries_short"]:
+                snapshot[key] = orders_to_array(empty_orders())
+            for pside, key in enumerate(["grid_memo_long", "grid_memo_short"]):
+                snapshot[key] = init_grid_memo(int(round(params[pside, P_MAX_N_ENTRY_ORDERS])))
+        for key in ["closes_long", "closes_short"]:
+            snapshot[key] = orders_to_array(empty_orders())
+    else:
+        if not np.array_equal(snapshot["params"], params):
+            raise Exception("snapshot was made with a different config")
+        if data.shape[1] != len(snapshot["last_tick"]):
+            raise Exception("snapshot was made with a different ticks format")
+        new_ticks = data[data[:, 0] > snapshot["last_tick"][0]]
+        if len(new_ticks) == 0 or snapshot["state"][ST_DONE]:
+            return empty_fills(0), empty_fills(0), empty_stats(0), snapshot
+        # last tick of previous run is the first tick here, already processed
+        ticks = np.concatenate([snapshot["last_tick"][None, :], new_ticks])
+        snapshot = {k: v.copy() for k, v in snapshot.items()}
+    state = snapshot["state"]
+    order_keys = (
+        ["entry_long", "closes_long", "entry_short", "closes_short"]
+        if passivbot_mode == "recursive_grid"
+        else ["entries_long", "closes_long", "entries_short", "closes_short"]
+    )
+    args = [unpack_ticks(ticks), params, state] + [snapshot[k] for k in order_keys]
+    if passivbot_mode == "recursive_grid":
+        backtest_resume = backtest_recursive_grid_resume
+    else:
+        backtest_resume = (
+            backtest_neat_grid_resume if passivbot_mode == "neat_grid" else backtest_static_grid_resume
+        )
+        args += [snapshot["grid_memo_long"], snapshot["grid_memo_short"]]
+    fills_long, fills_short, stats, *orders = backtest_resume(
+        *args,
+        config["starting_balance"],
+        config["latency_simulation_ms"],
+        config["maker_fee"],
+        **{k: xk[k] for k in ["inverse", "qty_step", "price_step", "min_qty", "min_cost", "c_mult"]},
+    )
+    # trade ids are tick indices; make them count from the first run's first tick
+    fills_long[:, 0] += snapshot["trade_id_offset"][0]
+    fills_short[:, 0] += snapshot["trade_id_offset"][0]
+    if passivbot_mode != "recursive_grid" and not state[ST_DONE]:
+        # final stats row, as in backtest(), is left out of the snapshot
+        final_state = state.copy()
+        final_state[ST_N_STATS] = 0
+        final_row = append_state_stats(
+            empty_stats(1), final_state, state[ST_NEXT_STATS_UPDATE], ticks[-1, -1]
+        )
+        stats = np.concatenate([stats, final_row])
+    snapshot.update(dict(zip(order_keys, orders)))
+    snapshot["last_tick"] = ticks[-1].copy()
+    snapshot["trade_id_offset"] += len(ticks) - 1
+    # in the next run, tick 0 is this run's last tick, and ema warmup counts from there
+    state[ST_K] = 1.0
+    for key in [ST_MAX_SPAN_LONG, ST_MAX_SPAN_SHORT]:
+        state[key] = max(0.0, state[key] - (len(ticks) - 1))
+    return fills_long, fills_short, stats, snapshot
+
+
+def backtest_batch(configs: [dict], data: np.ndarray) -> [tuple]:
+    """
+    backtests many configs in a single pass over data
+    configs must share passivbot mode, starting balance, latency, fees and market settings
+    data may be compact ticks
+    returns [(fills_long, fills_short, stats)], one tuple per config
+    """
+    passivbot_mode = determine_passivbot_mode(configs[0])
+    xks = [create_xk(config) for config in configs]
+    market_keys = ["inverse", "qty_step", "price_step", "min_qty", "min_cost", "c_mult"]
+    shared_keys = ["starting_balance", "latency_simulation_ms", "maker_fee"]
+    for config, xk in zip(configs[1:], xks[1:]):
+        if determine_passivbot_mode(config) != passivbot_mode:
+            raise Exception("all configs in a batch must have the same passivbot mode")
+        if any(xk[k] != xks[0][k] for k in market_keys) or any(
+            config[k] != configs[0][k] for k in shared_keys
+        ):
+            raise Exception("all configs in a batch must have the same market settings")
+    if passivbot_mode == "recursive_grid":
+        backtest_batch_ = backtest_recursive_grid_batch
+    elif passivbot_mode == "neat_grid":
+        backtest_batch_ = backtest_neat_grid_batch
+    else:
+        backtest_batch_ = backtest_static_grid_batch
+    params = np.array([pack_params(config, xk) for config, xk in zip(configs, xks)])
+    fills_longs, fills_shorts, statss = backtest_batch_(
+        make_ticks_view(data),
+        params,
+        configs[0]["starting_balance"],
+        configs[0]["latency_simulation_ms"],
+        configs[0]["maker_fee"],
+        **{k: xks[0][k] for k in market_keys},
+    )
+    return list(zip(fills_longs, fills_shorts, statss))
+
+
+def backtest_symbols(configs: [dict], ticks_list: list) -> [dict]:
+    """
+    backtests one config on many symbols in a single call, symbols spread over numba threads
+    configs: one per symbol, same passivbot mode and params, may differ in symbol and market settings
+    ticks_list: ticks per symbol, may be compact ticks
+    returns [analysis], one per symbol, as from analyze_fills_fast()
+    """
+    passivbot_mode = determine_passivbot_mode(configs[0])
+    if passivbot_mode == "recursive_grid":
+        backtest_symbols_ = backtest_recursive_grid_symbols
+    elif passivbot_mode == "neat_grid":
+        backtest_symbols_ = backtest_neat_grid_symbols
+    else:
+        backtest_symbols_ = backtest_static_grid_symbols
+    xks = [create_xk(config) for config in configs]
+    params = pack_params(configs[0], xks[0])
+    shared_keys = ["starting_balance", "latency_simulation_ms"]
+    for config, xk in zip(configs[1:], xks[1:]):
+        if determine_passivbot_mode(config) != passivbot_mode or not np.array_equal(
+            pack_params(config, xk), params
+        ):
+            raise Exception("all symbols must be backtested with the same config")
+        if any(config[k] != configs[0][k] for k in shared_keys):
+            raise Exception("all symbols must share starting balance and latency")
+    market_keys = ["inverse", "qty_step", "price_step", "min_qty", "min_cost", "c_mult"]
+    market_settings = np.array(
+        [
+            pack_market_settings(*[xk[k] for k in market_keys], config["maker_fee"])
+            for config, xk in zip(configs, xks)
+        ]
+    )
+    # all items of a numba typed list must share one type
+    if len(set(type(ticks) == dict for ticks in ticks_list)) > 1:
+        ticks_list = [expand_ticks(ticks) if type(ticks) == dict else ticks for ticks in ticks_list]
+    elif type(ticks_list[0]) == dict and len(set(t["prices"].dtype for t in ticks_list)) > 1:
+        ticks_list = [{**ticks, "prices": ticks["prices"].astype(float)} for ticks in ticks_list]
+    views = []
+    for ticks in ticks_list:
+        view = []
+        for item in make_ticks_view(ticks):
+            if type(item) == np.ndarray:
+                # shared memory ticks are read-only
+                item = item.view()
+                item.flags.writeable = False
+            view.append(item)
+        views.append(tuple(view))
+    if "NOJIT" in os.environ and os.environ["NOJIT"] == "true":
+        ticks_typed = views
+    else:
+        from numba.typed import List
+
+        ticks_typed = List(views)
+    metrics = backtest_symbols_(
+        ticks_typed,
+        params,
+        market_settings,
+        configs[0]["starting_balance"],
+        configs[0]["latency_simulation_ms"],
+    )
+    return [metrics_to_analysis(metrics[i], config) for i, config in enumerate(configs)]
+
+
+def backtest_windows(config: dict, data: np.ndarray, windows: [tuple]) -> [tuple]:
+    """
+    backtests config on each of windows in a single pass over data
+    windows: [(start_ts, end_ts)] in milliseconds, may overlap; each window is backtested from
+    scratch on ticks with start_ts <= timestamp < end_ts
+    data may be compact ticks
+    returns [(fills_long, fills_short, stats)], one tuple per window
+    """
+    ticks = make_ticks_view(data)
+    tick_windows = np.array(
+        [[search_ticks(ticks, 0, n_ticks(ticks), float(ts)) for ts in window] for window in windows],
+        dtype=np.int64,
+    )
+    for window, (k_start, k_end) in zip(windows, tick_windows):
+        if k_end - k_start < 2:
+            raise Exception(
+                f"too few ticks in window {ts_to_date(window[0])} - {ts_to_date(window[1])}"
+            )
+    passivbot_mode = determine_passivbot_mode(config)
+    xk = create_xk(config)
+    if passivbot_mode == "recursive_grid":
+        backtest_windows_ = backtest_recursive_grid_windows
+    elif passivbot_mode == "neat_grid":
+        backtest_windows_ = backtest_neat_grid_windows
+    else:
+        backtest_windows_ = backtest_static_grid_windows
+    fills_longs, fills_shorts, statss = backtest_windows_(
+        ticks,
+        tick_windows,
+        pack_params(config, xk),
+        config["starting_balance"],
+        config["latency_simulation_ms"],
+        config["maker_fee"],
+        **{k: xk[k] for k in ["inverse", "qty_step", "price_step", "min_qty", "min_cost", "c_mult"]},
+    )
+    return list(zip(fills_longs, fills_shorts, statss))
+
+
+def analyze_walk_forward(
+    config: dict, data: np.ndarray, window_days: float, step_days: float = None
+) -> (dict, [dict]):
+    """
+    backtests config on all of data and on walk forward windows in a single pass
+    returns (analysis of all data, [analysis of each window])
+    analysis of all data gets worst and mean window adg per exposure, as
+    adg_realized_per_exposure_wf_min_{side} and adg_realized_per_exposure_wf_mean_{side}
+    """
+    ticks = make_ticks_view(data)
+    first_ts, last_ts = tick_timestamp(ticks, 0), tick_timestamp(ticks, n_ticks(ticks) - 1)
+    windows = make_walk_forward_windows(first_ts, last_ts + 1, window_days, step_days)
+    if not windows:
+        raise Exception(f"backtest period shorter than walk forward window of {window_days} days")
+    results = backtest_windows(config, data, [(first_ts, last_ts + 1)] + windows)
+    analyses = [analyze_fills_fast(*result, config) for result in results]
+    analysis, window_analyses = analyses[0], analyses[1:]
+    for window, window_analysis in zip(windows, window_analyses):
+        window_analysis["start_date"] = ts_to_date(window[0])[:19]
+        window_analysis["end_date"] = ts_to_date(window[1])[:19]
+    for side in ["long", "short"]:
+        adgs = [a[f"adg_realized_per_exposure_{side}"] for a in window_analyses]
+        analysis[f"adg_realized_per_exposure_wf_min_{side}"] = min(adgs)
+        analysis[f"adg_realized_per_exposure_wf_mean_{side}"] = float(np.mean(adgs))
+    analysis["n_wf_windows"] = len(windows)
+    return analysis, window_analyses
+
+
+def warmup_backtest(
+    config: dict,
+    batch_size: int = 1,
+    walk_forward: bool = False,
+    symbols: bool = False,
+    compact: bool = False,
+) -> float:
+    """
+    runs config on a tiny synthetic read-only ticks array, so numba compiles or loads from disk
+    cache every kernel with the same argument types as real backtests on shared ticks
+    walk_forward: also warm up the walk forward kernels
+    symbols: also warm up the multi symbol kernels
+    compact: warm up on compact ticks with int32 prices instead
+    returns seconds elapsed
+    """
+    sts = time()
+    config = {**config}
+    for side in ["long", "short"]:
+        # ema spans in minutes; must fit in the synthetic ticks
+        config[side] = {**config[side], "ema_span_0": 1.0, "ema_span_1": 1.0}
+    n = 300
+    prices = np.round(100.0 + np.sin(np.arange(n) / 10.0), 2)
+    data = np.stack([1.6e12 + np.arange(n) * 1000.0, np.ones(n), prices], axis=1)
+    if compact:
+        data = compact_ticks(data, 0.01)
+        data["prices"].flags.writeable = False
+    else:
+        data.flags.writeable = False
+    fills_long, fills_short, stats = backtest(config, data)
+    analyze_fills_fast(fills_long, fills_short, stats, config)
+    if batch_size > 1:
+        backtest_batch([config, config], data)
+    if walk_forward:
+        backtest_windows(config, data, [(1.6e12, 1.6e12 + n * 1000.0)])
+    if symbols:
+        backtest_symbols([config, config], [data, data])
+    return time() - sts
+
+
 def plot_wrap(config, data):
     print("n_days", round_(config["n_days"], 0.1))
     print("starting_balance", config["starting_balance"])
     print("backtesting...")
     sts = time()
-    fills_long, fills_short, stats = backtest(config, data, do_print=True)
+    state = np.zeros(N_STATE)
+    fills_long, fills_short, stats = backtest(config, data, do_print=True, state_out=state)
     print(f"{time() - sts:.2f} seconds elapsed")
-    if not fills_long and not fills_short:
+    if state[ST_GRID_MEMO_HITS] + state[ST_GRID_MEMO_MISSES] > 0:
+        print(
+            f"entry grids reused {int(state[ST_GRID_MEMO_HITS])} times, "
+            + f"approximated {int(state[ST_GRID_MEMO_MISSES])} times"
+        )
+    if len(fills_long) == 0 and len(fills_short) == 0:
         print("no fills")
         return
     longs, shorts, sdf, result = analyze_fills(fills_long, fills_short, stats, config)
@@ -90,7 +472,46 @@ def plot_wrap(config, data):
         print(f"{time() - sts:.2f} seconds spent on dumping interactive plot")
 
 
+def walk_forward_wrap(config, data, window_days, step_days):
+    print("n_days", round_(config["n_days"], 0.1))
+    print(f"walk forward windows of {window_days} days every {step_days} days")
+    print("backtesting...")
+    sts = time()
+    analysis, window_analyses = analyze_walk_forward(config, data, window_days, step_days)
+    print(f"{len(window_analyses)} windows, {time() - sts:.2f} seconds elapsed")
+    print()
+    for a in window_analyses:
+        line = f"{a['start_date']} - {a['end_date']}"
+        for side in ["long", "short"]:
+            if config[side]["enabled"]:
+                line += (
+                    f"  {side} adg {a[f'adg_realized_{side}']:.6f} "
+                    + f"PAD mean {a[f'pa_distance_mean_{side}']:.6f} "
+                    + f"hrs stuck max {a[f'hrs_stuck_max_{side}']:.1f} "
+                    + f"closest bkr {a[f'closest_bkr_{side}']:.4f}"
+                )
+        print(line)
+    print()
+    for side in ["long", "short"]:
+        if config[side]["enabled"]:
+            print(
+                f"{side} adg per exposure all {analysis[f'adg_realized_per_exposure_{side}']:.6f} "
+                + f"windows mean {analysis[f'adg_realized_per_exposure_wf_mean_{side}']:.6f} "
+                + f"worst {analysis[f'adg_realized_per_exposure_wf_min_{side}']:.6f}"
+            )
+    dirpath = make_get_filepath(
+        os.path.join(config["plots_dirpath"], f"{ts_to_date(time())[:19].replace(':', '')}", "")
+    )
+    json.dump(
+        denumpyize({"analysis": analysis, "windows": window_analyses}),
+        open(dirpath + "walk_forward_result.json", "w"),
+        indent=4,
+    )
+    print(f"dumped walk forward result to {dirpath}walk_forward_result.json")
+
+
 async def main():
+    clear_stale_numba_cache()
     parser = argparse.ArgumentParser(prog="Backtest", description="Backtest given passivbot config.")
     parser.add_argument("live_config_path", type=str, help="path to live config to test")
     parser = add_argparse_args(parser)
@@ -150,6 +571,16 @@ async def main():
         help="use 1m ohlcv instead of 1s ticks",
         action="store_true",
     )
+    parser.add_argument(
+        "-wf",
+        "--walk_forward",
+        "--walk-forward",
+        type=str,
+        required=False,
+        dest="walk_forward",
+        default=None,
+        help="backtest windows of n days every m days in one pass, given as n or n,m; m defaults to n",
+    )
     args = parser.parse_args()
     if args.symbol is None:
         tmp_cfg = load_hjson_config(args.backtest_config_path)
@@ -219,7 +650,12 @@ async def main():
             data = await downloader.get_sampled_ticks()
         config["n_days"] = round_((data[-1][0] - data[0][0]) / (1000 * 60 * 60 * 24), 0.1)
         pprint.pprint(denumpyize(live_config))
-        plot_wrap(config, data)
+        if args.walk_forward is not None:
+            wf_days = [float(x) for x in args.walk_forward.split(",")]
+            window_days, step_days = wf_days[0], wf_days[-1]
+            walk_forward_wrap(config, data, window_days, step_days)
+        else:
+            plot_wrap(config, data)
 
 
 if __name__ == "__main__":
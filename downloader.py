@@ -2,10 +2,15 @@ import argparse
 import asyncio
 import datetime
 import gzip
+import http.client
+import json
 import os
 import sys
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from time import time
+from time import sleep, time
 from typing import Tuple
 from urllib.request import urlopen
 from zipfile import ZipFile
@@ -15,7 +20,7 @@ import pandas as pd
 from dateutil import parser
 from tqdm import tqdm
 
-from njit_funcs import calc_samples
+from njit_funcs import calc_samples_streaming
 from procedures import (
     prepare_backtest_config,
     make_get_filepath,
@@ -25,10 +30,216 @@ from procedures import (
     print_,
     add_argparse_args,
     utc_ms,
+    read_agg_trades_chunk,
+    write_agg_trades_chunk,
+    migrate_agg_trades_chunks,
+    AGG_TRADES_CHUNK_EXTENSIONS,
 )
 from pure_funcs import ts_to_date, ts_to_date_utc, date_to_ts, get_dummy_settings
 
 
+ROLLING_TICKS_CACHE_FNAME = "rolling_ticks_cache"
+
+
+def load_rolling_ticks_meta(caches_dirpath: str) -> dict:
+    """
+    returns {start_time, end_time, first_timestamp, n_rows} of the rolling ticks cache, {} if missing
+    """
+    try:
+        return json.load(open(os.path.join(caches_dirpath, ROLLING_TICKS_CACHE_FNAME + ".json")))
+    except FileNotFoundError:
+        return {}
+
+
+def write_rolling_ticks(
+    caches_dirpath: str, ticks: np.ndarray, offset: int, start_time: int, end_time: int
+):
+    """
+    writes 1s ticks to the rolling ticks cache, starting at row offset and dropping rows after them
+    offset 0 rewrites the cache; start_time and end_time are the range of trades it now covers
+    """
+    bin_filepath = os.path.join(make_get_filepath(caches_dirpath), ROLLING_TICKS_CACHE_FNAME + ".bin")
+    meta_filepath = os.path.join(caches_dirpath, ROLLING_TICKS_CACHE_FNAME + ".json")
+    meta = load_rolling_ticks_meta(caches_dirpath)
+    if offset == 0 or not meta:
+        offset = 0
+        if os.path.exists(meta_filepath):
+            os.remove(meta_filepath)
+    with open(bin_filepath, "r+b" if offset > 0 else "wb") as f:
+        f.seek(offset * 3 * 8)
+        np.ascontiguousarray(ticks, dtype=np.float64).tofile(f)
+        f.truncate()
+    n_rows = offset + len(ticks)
+    first_timestamp = meta["first_timestamp"] if offset > 0 else (ticks[0, 0] if n_rows else 0.0)
+    json.dump(
+        {
+            "start_time": int(start_time),
+            "end_time": int(end_time),
+            "first_timestamp": int(first_timestamp),
+            "n_rows": int(n_rows),
+        },
+        open(meta_filepath + ".tmp", "w"),
+    )
+    os.replace(meta_filepath + ".tmp", meta_filepath)
+
+
+def prepend_rolling_ticks(caches_dirpath: str, ticks: np.ndarray, start_time: int):
+    """
+    writes 1s ticks in front of the rolling ticks cache, whose rows are then copied after them
+    ticks must end right before the cache's first row; start_time is the new start of its range
+    """
+    bin_filepath = os.path.join(caches_dirpath, ROLLING_TICKS_CACHE_FNAME + ".bin")
+    meta_filepath = os.path.join(caches_dirpath, ROLLING_TICKS_CACHE_FNAME + ".json")
+    meta = load_rolling_ticks_meta(caches_dirpath)
+    cached = np.memmap(bin_filepath, dtype=np.float64, mode="r", shape=(meta["n_rows"], 3))
+    with open(bin_filepath + ".tmp", "wb") as f:
+        np.ascontiguousarray(ticks, dtype=np.float64).tofile(f)
+        for i in range(0, len(cached), 1000000):
+            np.asarray(cached[i : i + 1000000]).tofile(f)
+    del cached
+    os.replace(bin_filepath + ".tmp", bin_filepath)
+    json.dump(
+        {
+            "start_time": int(start_time),
+            "end_time": int(meta["end_time"]),
+            "first_timestamp": int(ticks[0, 0] if len(ticks) else meta["first_timestamp"]),
+            "n_rows": int(meta["n_rows"] + len(ticks)),
+        },
+        open(meta_filepath + ".tmp", "w"),
+    )
+    os.replace(meta_filepath + ".tmp", meta_filepath)
+
+
+def load_rolling_ticks(caches_dirpath: str, start_time: int, end_time: int) -> np.ndarray:
+    """
+    returns read only memory mapped 1s ticks from start_time to end_time out of the rolling ticks cache
+    returns None if the cache does not cover the time frame
+    """
+    meta = load_rolling_ticks_meta(caches_dirpath)
+    if (
+        not meta
+        or meta["n_rows"] == 0
+        or start_time < meta["start_time"]
+        or end_time > meta["end_time"]
+    ):
+        return None
+    ticks = np.memmap(
+        os.path.join(caches_dirpath, ROLLING_TICKS_CACHE_FNAME + ".bin"),
+        dtype=np.float64,
+        mode="r",
+        shape=(meta["n_rows"], 3),
+    )
+    # rows are contiguous 1s samples
+    i0 = max(0, -(-(start_time - meta["first_timestamp"]) // 1000))
+    i1 = min(meta["n_rows"], (end_time - meta["first_timestamp"]) // 1000 + 1)
+    return np.asarray(ticks[i0:i1])
+
+
+def compact_ticks(ticks: np.ndarray, price_step: float = 0.0, keep_qtys: bool = False) -> dict:
+    """
+    ticks: [[timestamp, qty, price]] on a regular timestamp grid
+    returns {first_timestamp, step_ms, price_step, price_scale, prices, qtys}
+    timestamps are implied by first_timestamp and step_ms. prices are int32 multiples of price_step if
+    that is lossless, price_scale being 1 / price_step; otherwise float32, price_scale being 0.0
+    qtys are float32 if keep_qtys, else None
+    """
+    step_ms = float(ticks[1, 0] - ticks[0, 0]) if len(ticks) > 1 else 1000.0
+    if len(ticks) > 1 and (np.diff(ticks[:, 0]) != step_ms).any():
+        raise Exception("ticks are not on a regular timestamp grid")
+    prices = ticks[:, 2]
+    price_scale = round(1 / price_step) if price_step > 0.0 else 0.0
+    if price_scale > 0.0 and abs(price_scale * price_step - 1) < 1e-9:
+        ints = np.round(prices * price_scale)
+        if ints.max(initial=0.0) < 2 ** 31 and (ints / price_scale == prices).all():
+            compact_prices = ints.astype(np.int32)
+        else:
+            price_scale = 0.0
+    else:
+        price_scale = 0.0
+    if price_scale == 0.0:
+        compact_prices = prices.astype(np.float32)
+    return {
+        "first_timestamp": float(ticks[0, 0]) if len(ticks) else 0.0,
+        "step_ms": step_ms,
+        "price_step": float(price_step),
+        "price_scale": float(price_scale),
+        "prices": compact_prices,
+        "qtys": ticks[:, 1].astype(np.float32) if keep_qtys else None,
+    }
+
+
+def expand_ticks(compact: dict) -> np.ndarray:
+    """
+    returns read only [[timestamp, qty, price]] from compact ticks; qtys are zero if not kept
+    """
+    n = len(compact["prices"])
+    ticks = np.empty((n, 3))
+    ticks[:, 0] = compact["first_timestamp"] + np.arange(n) * compact["step_ms"]
+    ticks[:, 1] = 0.0 if compact["qtys"] is None else compact["qtys"]
+    if compact["price_scale"] > 0.0:
+        ticks[:, 2] = compact["prices"] / compact["price_scale"]
+    else:
+        ticks[:, 2] = compact["prices"]
+    ticks.flags.writeable = False
+    return ticks
+
+
+def dump_compact_ticks(filepath: str, compact: dict):
+    """
+    filepath without extension; prices go to .npy, qtys to _qtys.npy and the rest to .json
+    """
+    np.save(filepath + ".npy", compact["prices"])
+    if compact["qtys"] is not None:
+        np.save(filepath + "_qtys.npy", compact["qtys"])
+    meta = {k: v for k, v in compact.items() if k not in ["prices", "qtys"]}
+    json.dump({**meta, "has_qtys": compact["qtys"] is not None}, open(filepath + ".json.tmp", "w"))
+    os.replace(filepath + ".json.tmp", filepath + ".json")
+
+
+def load_compact_ticks(filepath: str) -> dict:
+    """
+    returns memory mapped compact ticks dumped by dump_compact_ticks(), None if missing
+    """
+    try:
+        meta = json.load(open(filepath + ".json"))
+    except FileNotFoundError:
+        return None
+    has_qtys = meta.pop("has_qtys")
+    return {
+        **meta,
+        "prices": np.load(filepath + ".npy", mmap_mode="r"),
+        "qtys": np.load(filepath + "_qtys.npy", mmap_mode="r") if has_qtys else None,
+    }
+
+
+def load_ticks_cache(
+    caches_dirpath: str,
+    start_date: str,
+    end_date: str,
+    compact: bool = False,
+    price_step: float = 0.0,
+):
+    """
+    returns memory mapped 1s ticks from start_date to end_date, None if not cached
+    prefers a ticks cache dumped for the exact date range over the rolling ticks cache
+    if compact, returns compact ticks, made from the ticks cache and dumped on first load
+    """
+    if compact:
+        filepath = os.path.join(caches_dirpath, f"{start_date}_{end_date}_ticks_cache_compact")
+        compact_ticks_ = load_compact_ticks(filepath)
+        if compact_ticks_ is not None and compact_ticks_["price_step"] == price_step:
+            return compact_ticks_
+        ticks = load_ticks_cache(caches_dirpath, start_date, end_date)
+        if ticks is None:
+            return None
+        dump_compact_ticks(filepath, compact_ticks(ticks, price_step))
+        return load_compact_ticks(filepath)
+    filepath = os.path.join(caches_dirpath, f"{start_date}_{end_date}_ticks_cache.npy")
+    if os.path.exists(filepath):
+        return np.load(filepath, mmap_mode="r")
+    return load_rolling_ticks(caches_dirpath, date_to_ts(start_date), date_to_ts(end_date))
+
+
 class Downloader:
     """
     Downloader class for tick data. Fetches data from specified time until now or specified time.
@@ -151,34 +362,25 @@ class Downloader:
         @return: The read dataframe.
         """
         try:
-            df = pd.read_csv(
-                path,
-                dtype={
-                    "trade_id": np.int64,
-                    "price": np.float64,
-                    "qty": np.float64,
-                    "timestamp": np.int64,
-                    "is_buyer_maker": np.int8,
-                },
-            )
-        except ValueError as e:
+            df = read_agg_trades_chunk(path)
+        except (ValueError, OSError, KeyError) as e:
             df = pd.DataFrame()
             print_(["Error in reading dataframe", e])
         return df
 
     def save_dataframe(self, df: pd.DataFrame, filename: str, missing: bool, verified: bool) -> str:
         """
-        Saves a processed dataframe. Creates the name based on first and last trade id and first and last timestamp.
-        Deletes dataframes that are obsolete. For example, when gaps were filled.
+        Saves a processed dataframe as .npz chunk. Creates the name based on first and last trade id and first and last timestamp.
+        Deletes dataframes that are obsolete. For example, when gaps were filled, or legacy .csv chunks.
         @param df: The dataframe to save.
         @param filename: The current name of the dataframe.
         @param missing: If the dataframe had gaps.
         @return:
         """
         if verified:
-            new_name = f'{df["trade_id"].iloc[0]}_{df["trade_id"].iloc[-1]}_{df["timestamp"].iloc[0]}_{df["timestamp"].iloc[-1]}_verified.csv'
+            new_name = f'{df["trade_id"].iloc[0]}_{df["trade_id"].iloc[-1]}_{df["timestamp"].iloc[0]}_{df["timestamp"].iloc[-1]}_verified.npz'
         else:
-            new_name = f'{df["trade_id"].iloc[0]}_{df["trade_id"].iloc[-1]}_{df["timestamp"].iloc[0]}_{df["timestamp"].iloc[-1]}.csv'
+            new_name = f'{df["trade_id"].iloc[0]}_{df["trade_id"].iloc[-1]}_{df["timestamp"].iloc[0]}_{df["timestamp"].iloc[-1]}.npz'
         if new_name != filename:
             print_(
                 [
@@ -187,7 +389,7 @@ class Downloader:
                     ts_to_date(int(new_name.split("_")[2]) / 1000),
                 ]
             )
-            df.to_csv(os.path.join(self.filepath, new_name), index=False)
+            write_agg_trades_chunk(df, os.path.join(self.filepath, new_name))
             new_name = ""
             try:
                 os.remove(os.path.join(self.filepath, filename))
@@ -196,7 +398,7 @@ class Downloader:
                 pass
         elif missing:
             print_(["Replacing file", filename])
-            df.to_csv(os.path.join(self.filepath, filename), index=False)
+            write_agg_trades_chunk(df, os.path.join(self.filepath, filename))
         else:
             new_name = ""
         return new_name
@@ -225,7 +427,7 @@ class Downloader:
         @return: Sorted list of file names.
         """
         return sorted(
-            [f for f in os.listdir(self.filepath) if f.endswith(".csv")],
+            [f for f in os.listdir(self.filepath) if f.endswith(AGG_TRADES_CHUNK_EXTENSIONS)],
             key=lambda x: int(eval(x[: x.find("_")].replace(".cs", "").replace("v", ""))),
         )
 
@@ -503,7 +705,7 @@ class Downloader:
                     last_id = df["trade_id"].iloc[-1]
                     for i in filenames:
                         tmp_first_id = int(i.split("_")[0])
-                        tmp_last_id = int(i.split("_")[1].replace(".csv", ""))
+                        tmp_last_id = int(i.split(".")[0].split("_")[1])
                         if (
                             (first_id - first_id % 100000) == tmp_first_id
                             and (
@@ -757,104 +959,43 @@ class Downloader:
         except:
             pass
 
-    async def prepare_files(self):
+    def sample_ticks(self, start_time: int, end_time: int) -> np.ndarray:
         """
-        Takes downloaded data and prepares a numpy array for use in backtesting.
-        @return:
+        Samples downloaded trades between start_time and end_time into 1s ticks, chunk by chunk.
+        @return: numpy array [[timestamp, qty, price]].
         """
         filenames = [
             f
             for f in self.get_filenames()
-            if int(f.split("_")[3].split(".")[0]) >= self.start_time
-            and int(f.split("_")[2]) <= self.end_time
+            if int(f.split("_")[3].split(".")[0]) >= start_time
+            and int(f.split("_")[2]) <= end_time
         ]
-        left_overs = pd.DataFrame()
+        if not filenames:
+            return np.zeros((0, 3), dtype=np.float64)
         sample_size_ms = 1000
         current_index = 0
 
-        try:
-            first_frame = pd.read_csv(
-                os.path.join(self.filepath, filenames[0]),
-                dtype={
-                    "price": np.float64,
-                    "is_buyer_maker": np.float64,
-                    "timestamp": np.float64,
-                    "qty": np.float64,
-                },
-                usecols=["price", "is_buyer_maker", "timestamp", "qty"],
-            )
-            first_frame = first_frame[
-                (first_frame["timestamp"] >= self.start_time)
-                & (first_frame["timestamp"] <= self.end_time)
-            ]
-            earliest_time = first_frame.timestamp.iloc[0] // sample_size_ms * sample_size_ms
-        except Exception as e:
-            print_(["Error in determining earliest time", e])
-            earliest_time = self.start_time
-
-        try:
-            last_frame = pd.read_csv(
-                os.path.join(self.filepath, filenames[-1]),
-                dtype={
-                    "price": np.float64,
-                    "is_buyer_maker": np.float64,
-                    "timestamp": np.float64,
-                    "qty": np.float64,
-                },
-                usecols=["price", "is_buyer_maker", "timestamp", "qty"],
-            )
-            last_frame = last_frame[
-                (last_frame["timestamp"] >= self.start_time)
-                & (last_frame["timestamp"] <= self.end_time)
-            ]
-            latest_time = last_frame.timestamp.iloc[-1] // sample_size_ms * sample_size_ms
-        except Exception as e:
-            print_(["Error in determining latest time", e])
-            latest_time = self.end_time
-
+        # chunk file names hold their first and last trade times, bounding the sampled range
+        earliest_time = max(int(filenames[0].split("_")[2]), start_time)
+        latest_time = min(int(filenames[-1].split("_")[3].split(".")[0]), end_time)
         array = np.zeros(
-            (int((latest_time - earliest_time) / sample_size_ms + 1), 3),
+            (latest_time // sample_size_ms - earliest_time // sample_size_ms + 1, 3),
             dtype=np.float64,
         )
+        carry = np.array([-1.0, 0.0, 0.0])
 
         for f in filenames:
-            chunk = pd.read_csv(
+            chunk = read_agg_trades_chunk(
                 os.path.join(self.filepath, f),
-                dtype={
-                    "price": np.float64,
-                    "is_buyer_maker": np.float64,
-                    "timestamp": np.float64,
-                    "qty": np.float64,
-                },
-                usecols=["price", "is_buyer_maker", "timestamp", "qty"],
-            )
+                ["timestamp", "qty", "price"],
+            ).astype(np.float64)
+            chunk = chunk[(chunk["timestamp"] >= start_time) & (chunk["timestamp"] <= end_time)]
+            if not chunk["timestamp"].is_monotonic_increasing:
+                chunk = chunk.sort_values("timestamp", kind="stable")
 
-            chunk = pd.concat([left_overs, chunk])
-            chunk.sort_values("timestamp", inplace=True)
-            chunk = chunk[
-                (chunk["timestamp"] >= self.start_time) & (chunk["timestamp"] <= self.end_time)
-            ]
-
-            cut_off = (
-                chunk.timestamp.iloc[-1] // sample_size_ms * sample_size_ms - 1 - (1 * sample_size_ms)
+            sampled_ticks, carry = calc_samples_streaming(
+                chunk[["timestamp", "qty", "price"]].values, sample_size_ms, carry
             )
-
-            left_overs = chunk[chunk["timestamp"] > cut_off]
-            chunk = chunk[chunk["timestamp"] <= cut_off]
-
-            sampled_ticks = calc_samples(chunk[["timestamp", "qty", "price"]].values)
-            if current_index != 0 and array[current_index - 1, 0] + 1000 != sampled_ticks[0, 0]:
-                size = int((sampled_ticks[0, 0] - array[current_index - 1, 0]) / sample_size_ms) - 1
-                tmp = np.zeros((size, 3), dtype=np.float64)
-                tmp[:, 0] = np.arange(
-                    array[current_index - 1, 0] + sample_size_ms,
-                    sampled_ticks[0, 0],
-                    sample_size_ms,
-                    dtype=np.float64,
-                )
-                tmp[:, 2] = array[current_index - 1, 2]
-                array[current_index : current_index + len(tmp)] = tmp
-                current_index += len(tmp)
             array[current_index : current_index + len(sampled_ticks)] = sampled_ticks
             current_index += len(sampled_ticks)
 
@@ -866,69 +1007,201 @@ class Downloader:
             )
         print("\n")
 
-        # Fill in anything left over
-        if not left_overs.empty:
-            sampled_ticks = calc_samples(left_overs[["timestamp", "qty", "price"]].values)
-            if current_index != 0 and array[current_index - 1, 0] + 1000 != sampled_ticks[0, 0]:
-                size = int((sampled_ticks[0, 0] - array[current_index - 1, 0]) / sample_size_ms) - 1
-                tmp = np.zeros((size, 3), dtype=np.float64)
-                tmp[:, 0] = np.arange(
-                    array[current_index - 1, 0] + sample_size_ms,
-                    sampled_ticks[0, 0],
-                    sample_size_ms,
-                    dtype=np.float64,
-                )
-                tmp[:, 2] = array[current_index - 1, 2]
-                array[current_index : current_index + len(tmp)] = tmp
-                current_index += len(tmp)
-            array[current_index : current_index + len(sampled_ticks)] = sampled_ticks
-            current_index += len(sampled_ticks)
+        # the last sample is still open
+        if carry[0] >= 0.0:
+            array[current_index] = carry
+            current_index += 1
+        return array[:current_index]
 
-        # Fill the gap at the end with the latest price
-        # Should not be necessary anymore
-        if current_index + 1 < len(array):
-            size = len(array) - current_index
-            tmp = np.zeros((size, 3), dtype=np.float64)
-            tmp[:, 0] = np.arange(
-                array[current_index - 1, 0] + sample_size_ms,
-                array[current_index - 1, 0] + ((size + 1) * sample_size_ms),
-                sample_size_ms,
-                dtype=np.float64,
+    def bridge_rolling_ticks_cache(self):
+        """
+        Widens the time frame to reach the symbol's rolling ticks cache, so that the trades of any gap
+        between them are downloaded too and the cache stays one contiguous range.
+        """
+        meta = load_rolling_ticks_meta(self.config["caches_dirpath"])
+        if meta and meta["n_rows"] > 0:
+            self.start_time = min(self.start_time, meta["end_time"])
+            self.end_time = max(self.end_time, meta["start_time"])
+
+    async def prepare_files(self):
+        """
+        Takes downloaded data and adds it to the symbol's rolling ticks cache for use in backtesting.
+        If the cache overlaps the time frame, it is extended to the union of both: trades before its start
+        are sampled and prepended, trades after its end are sampled and appended.
+        @return:
+        """
+        caches_dirpath = self.config["caches_dirpath"]
+        meta = load_rolling_ticks_meta(caches_dirpath)
+        if (
+            meta
+            and meta["n_rows"] > 0
+            and self.start_time <= meta["end_time"]
+            and self.end_time >= meta["start_time"]
+        ):
+            if self.start_time < meta["start_time"]:
+                self.prepend_rolling_ticks(meta)
+                meta = load_rolling_ticks_meta(caches_dirpath)
+            if self.end_time <= meta["end_time"]:
+                return
+            # the cache's last second may hold only part of its trades; resample it
+            start_time = meta["end_time"] // 1000 * 1000
+            cache_start_time = meta["start_time"]
+            offset = min(
+                meta["n_rows"], max(0, int((start_time - meta["first_timestamp"]) // 1000))
             )
-            tmp[:, 2] = array[current_index - 1, 2]
-            array[current_index : current_index + len(tmp)] = tmp
-            current_index += len(tmp)
+        else:
+            start_time = cache_start_time = self.start_time
+            offset = 0
+        array = self.sample_ticks(start_time, self.end_time)
+        if offset > 0 and len(array) > 0:
+            prev = np.memmap(
+                os.path.join(caches_dirpath, ROLLING_TICKS_CACHE_FNAME + ".bin"),
+                dtype=np.float64,
+                mode="r",
+                offset=(offset - 1) * 3 * 8,
+                shape=(1, 3),
+            )[0].copy()
+            if prev[0] + 1000 < array[0, 0]:
+                # fill the gap with the latest price
+                tmp = np.zeros((int((array[0, 0] - prev[0]) / 1000) - 1, 3), dtype=np.float64)
+                tmp[:, 0] = np.arange(prev[0] + 1000, array[0, 0], 1000, dtype=np.float64)
+                tmp[:, 2] = prev[2]
+                array = np.concatenate([tmp, array])
+        print_(
+            [
+                "Adding",
+                len(array),
+                "ticks to",
+                os.path.join(caches_dirpath, ROLLING_TICKS_CACHE_FNAME + ".bin"),
+                "...",
+            ]
+        )
+        write_rolling_ticks(caches_dirpath, array, offset, cache_start_time, self.end_time)
+        print_(["Saved rolling ticks cache!"])
 
+    def prepend_rolling_ticks(self, meta: dict):
+        """
+        Samples trades from the start of the time frame up to the rolling ticks cache's first row and
+        writes them in front of it.
+        """
+        caches_dirpath = self.config["caches_dirpath"]
+        array = self.sample_ticks(self.start_time, meta["first_timestamp"] - 1)
+        if len(array) > 0 and array[-1, 0] + 1000 < meta["first_timestamp"]:
+            # fill the gap with the latest price
+            tmp = np.zeros(
+                (int((meta["first_timestamp"] - array[-1, 0]) / 1000) - 1, 3), dtype=np.float64
+            )
+            tmp[:, 0] = np.arange(
+                array[-1, 0] + 1000, meta["first_timestamp"], 1000, dtype=np.float64
+            )
+            tmp[:, 2] = array[-1, 2]
+            array = np.concatenate([array, tmp])
         print_(
             [
-                "Saving single file with",
+                "Prepending",
                 len(array),
-                " ticks to",
-                self.tick_filepath,
+                "ticks to",
+                os.path.join(caches_dirpath, ROLLING_TICKS_CACHE_FNAME + ".bin"),
                 "...",
             ]
         )
-        np.save(self.tick_filepath, array)
-        print_(["Saved single file!"])
+        prepend_rolling_ticks(caches_dirpath, array, self.start_time)
 
     async def get_sampled_ticks(self) -> np.ndarray:
         """
-        Function for direct use in the backtester. Checks if the numpy arrays exist and if so loads them.
-        If they do not exist or if their length doesn't match, download the missing data and create them.
+        Function for direct use in the backtester. Checks if the ticks cache covers the time frame and if
+        so loads it, memory mapped. Otherwise downloads the missing data and extends the cache.
         @return: numpy array.
         """
         if os.path.exists(self.tick_filepath):
             print_(["Loading cached tick data from", self.tick_filepath])
             tick_data = np.load(self.tick_filepath)
             return tick_data
+        tick_data = load_rolling_ticks(self.config["caches_dirpath"], self.start_time, self.end_time)
+        if tick_data is not None:
+            print_(["Loading cached tick data from", self.config["caches_dirpath"]])
+            return tick_data
+        start_time, end_time = self.start_time, self.end_time
+        self.bridge_rolling_ticks_cache()
         await self.download_ticks()
         await self.prepare_files()
-        tick_data = np.load(self.tick_filepath)
-        return tick_data
+        self.start_time, self.end_time = start_time, end_time
+        return load_rolling_ticks(self.config["caches_dirpath"], self.start_time, self.end_time)
+
+
+OHLCV_BASE_URL = "https://data.binance.vision/data/futures/um/"
+OHLCV_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+# per thread {(scheme, netloc): http.client.HTTPConnection}, reused between requests
+_http_conns = threading.local()
+
+
+def _get_http_conn(scheme: str, netloc: str) -> http.client.HTTPConnection:
+    if not hasattr(_http_conns, "conns"):
+        _http_conns.conns = {}
+    if (scheme, netloc) not in _http_conns.conns:
+        conn_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        _http_conns.conns[(scheme, netloc)] = conn_class(netloc, timeout=30)
+    return _http_conns.conns[(scheme, netloc)]
+
+
+def _close_http_conn(scheme: str, netloc: str):
+    conn = getattr(_http_conns, "conns", {}).pop((scheme, netloc), None)
+    if conn is not None:
+        conn.close()
+
+
+def fetch_file(url: str, filepath: str, n_tries: int = 5, backoff_seconds: float = 1.0) -> bool:
+    """
+    downloads url to filepath over a kept alive connection, retrying with exponential backoff
+    partial downloads are kept in filepath + ".part" and resumed with a range request
+    returns False if url does not exist
+    """
+    parsed = urllib.parse.urlsplit(url)
+    path = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+    part_filepath = filepath + ".part"
+    for k in range(n_tries):
+        try:
+            conn = _get_http_conn(parsed.scheme, parsed.netloc)
+            n_bytes = os.path.getsize(part_filepath) if os.path.exists(part_filepath) else 0
+            conn.request("GET", path, headers={"Range": f"bytes={n_bytes}-"} if n_bytes else {})
+            resp = conn.getresponse()
+            if resp.status == 404:
+                resp.read()
+                return False
+            if resp.status == 416:
+                # range not satisfiable, part file is complete
+                resp.read()
+            elif resp.status in (200, 206):
+                with open(part_filepath, "ab" if resp.status == 206 else "wb") as f:
+                    while chunk := resp.read(1024 * 1024):
+                        f.write(chunk)
+                if resp.length:
+                    raise Exception(f"incomplete download of {url}")
+            else:
+                resp.read()
+                raise Exception(f"http status {resp.status} fetching {url}")
+            os.replace(part_filepath, filepath)
+            return True
+        except Exception as e:
+            _close_http_conn(parsed.scheme, parsed.netloc)
+            if k == n_tries - 1:
+                raise
+            print(f"error fetching {url}: {e}, retrying in {backoff_seconds * 2 ** k:.1f}s")
+            sleep(backoff_seconds * 2 ** k)
+
+
+def read_ohlcv_zip(filepath_or_buffer) -> pd.DataFrame:
+    dfs = []
+    with ZipFile(filepath_or_buffer) as my_zip_file:
+        for contained_file in my_zip_file.namelist():
+            df = pd.read_csv(my_zip_file.open(contained_file))
+            df.columns = OHLCV_COLUMNS + [str(i) for i in range(len(df.columns) - len(OHLCV_COLUMNS))]
+            dfs.append(df[OHLCV_COLUMNS])
+    return pd.concat(dfs).sort_values("timestamp").reset_index()
 
 
 def get_zip(url: str):
-    col_names = ["timestamp", "open", "high", "low", "close", "volume"]
     try:
         resp = urlopen(url)
         file_tmp = BytesIO()
@@ -938,73 +1211,91 @@ def get_zip(url: str):
             for chunk in resp:
                 fout.write(chunk)
                 file_tmp.write(chunk)
-        dfs = []
-        with ZipFile(file_tmp) as my_zip_file:
-            for contained_file in my_zip_file.namelist():
-                df = pd.read_csv(my_zip_file.open(contained_file))
-                df.columns = col_names + [str(i) for i in range(len(df.columns) - len(col_names))]
-                dfs.append(df[col_names])
-        return pd.concat(dfs).sort_values("timestamp").reset_index()
+        return read_ohlcv_zip(file_tmp)
     except Exception as e:
         print(e)
 
 
-def download_ohlcvs(symbol, start_date, end_date, download_only=False) -> pd.DataFrame:
+def fetch_ohlcv_csv(url: str, csv_filepath: str) -> bool:
+    """
+    downloads a klines zip and dumps it as csv to csv_filepath
+    returns False if url does not exist or fetching failed
+    """
+    zip_filepath = csv_filepath[: -len(".csv")] + ".zip"
+    print("fetching", url)
+    try:
+        if not fetch_file(url, zip_filepath):
+            return False
+        read_ohlcv_zip(zip_filepath).to_csv(csv_filepath)
+        os.remove(zip_filepath)
+        return True
+    except Exception as e:
+        print(e)
+        return False
+
+
+def download_ohlcvs(
+    symbol,
+    start_date,
+    end_date,
+    download_only=False,
+    base_url=OHLCV_BASE_URL,
+    n_concurrent=8,
+) -> pd.DataFrame:
+    """
+    fetches missing monthly and daily 1m klines, n_concurrent at a time
+    months not yet published are fetched as days
+    """
     dirpath = make_get_filepath(f"historical_data/ohlcvs_futures/{symbol}/")
-    base_url = f"https://data.binance.vision/data/futures/um/"
-    col_names = ["timestamp", "open", "high", "low", "close", "volume"]
     start_ts = date_to_ts(start_date)
     end_ts = date_to_ts(end_date)
     days = [ts_to_date_utc(x)[:10] for x in list(range(start_ts, end_ts, 1000 * 60 * 60 * 24))]
     months = sorted(set([x[:7] for x in days]))
-    months_done = set()
-    dfs = []
-    for month in months:
-        month_filepath = dirpath + month + ".csv"
-        if os.path.exists(month_filepath):
-            months_done.add(month)
-            if not download_only:
-                dfs.append(pd.read_csv(month_filepath))
-            continue
-        try:
-            url = base_url + f"monthly/klines/{symbol}/1m/{symbol}-1m-{month}.zip"
-            print("fetching", url)
-            csv = get_zip(url)
-            csv.to_csv(month_filepath)
-            months_done.add(month)
-            if not download_only:
-                dfs.append(csv)
+    with ThreadPoolExecutor(max_workers=n_concurrent) as executor:
+        missing_months = [m for m in months if not os.path.exists(dirpath + m + ".csv")]
+        fetched = executor.map(
+            lambda month: fetch_ohlcv_csv(
+                base_url + f"monthly/klines/{symbol}/1m/{symbol}-1m-{month}.zip",
+                dirpath + month + ".csv",
+            ),
+            missing_months,
+        )
+        months_done = set(months)
+        for month, ok in zip(missing_months, fetched):
+            if not ok:
+                months_done.remove(month)
+                continue
             for f in os.listdir(dirpath):
                 if month in f and len(f) > 11:
                     print("deleting", dirpath + f)
                     os.remove(dirpath + f)
-        except Exception as e:
-            if month != months[-1]:
-                months_done.add(month)
-            print(e)
-    for day in days:
-        if day[:7] in months_done:
-            continue
-        day_filepath = dirpath + day + ".csv"
-        if os.path.exists(day_filepath):
-            if not download_only:
-                dfs.append(pd.read_csv(day_filepath))
-            continue
-        try:
-            print("fetching", day_filepath)
-            csv = get_zip(base_url + f"daily/klines/{symbol}/1m/{symbol}-1m-{day}.zip")
-            csv.to_csv(day_filepath)
-            if not download_only:
-                dfs.append(csv)
-        except Exception as e:
-            print(e)
-            break
+        missing_days = [
+            d for d in days if d[:7] not in months_done and not os.path.exists(dirpath + d + ".csv")
+        ]
+        fetched = executor.map(
+            lambda day: fetch_ohlcv_csv(
+                base_url + f"daily/klines/{symbol}/1m/{symbol}-1m-{day}.zip",
+                dirpath + day + ".csv",
+            ),
+            missing_days,
+        )
+        for day, ok in zip(missing_days, fetched):
+            if not ok:
+                print("no klines for", symbol, day)
     if not download_only:
-        df = pd.concat(dfs)[col_names].sort_values("timestamp")
+        filepaths = [dirpath + m + ".csv" for m in months if m in months_done] + [
+            dirpath + d + ".csv" for d in days if d[:7] not in months_done
+        ]
+        dfs = [pd.read_csv(fp) for fp in filepaths if os.path.exists(fp)]
+        df = pd.concat(dfs)[OHLCV_COLUMNS].sort_values("timestamp")
         df = df.drop_duplicates(subset=["timestamp"]).reset_index()
         nindex = np.arange(df.timestamp.iloc[0], df.timestamp.iloc[-1] + 60000, 60000)
         return (
-            df[col_names].set_index("timestamp").reindex(nindex).fillna(method="ffill").reset_index()
+            df[OHLCV_COLUMNS]
+            .set_index("timestamp")
+            .reindex(nindex)
+            .ffill()
+            .reset_index()
         )
 
 
@@ -1045,14 +1336,30 @@ async def main():
         help="use 1m ohlcv instead of 1s ticks",
         action="store_true",
     )
+    parser.add_argument(
+        "-m",
+        "--migrate",
+        type=str,
+        required=False,
+        dest="migrate",
+        nargs="?",
+        const="historical_data",
+        default=None,
+        help="convert .csv agg trades chunks in given dir (default historical_data) to .npz and exit",
+    )
     parser = add_argparse_args(parser)
 
     args = parser.parse_args()
+    if args.migrate:
+        n_converted = migrate_agg_trades_chunks(args.migrate)
+        print(f"converted {n_converted} agg trades chunks to .npz")
+        return
     config = await prepare_backtest_config(args)
     if args.ohlcv:
         data = load_hlc_cache(config["symbol"], config["start_date"], config["end_date"])
     else:
         downloader = Downloader(config)
+        downloader.bridge_rolling_ticks_cache()
         await downloader.download_ticks()
         if not args.download_only:
             await downloader.prepare_files()
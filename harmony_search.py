@@ -2,18 +2,28 @@ import os
 
 os.environ["NOJIT"] = "false"
 
-from downloader import Downloader, load_hlc_cache
+from downloader import Downloader, load_hlc_cache, load_ticks_cache
 import argparse
 import asyncio
+import bisect
+import heapq
 import json
+import numba
 import numpy as np
+import queue
 import traceback
 from copy import deepcopy
-from backtest import backtest
+from backtest import (
+    backtest,
+    backtest_batch,
+    backtest_symbols,
+    warmup_backtest,
+    analyze_walk_forward,
+)
 from multiprocessing import Pool, shared_memory
-from njit_funcs import round_dynamic
+from njit_funcs import round_dynamic, clear_stale_numba_cache, ANALYSIS_METRICS
 from pure_funcs import (
-    analyze_fills,
+    analyze_fills_fast,
     denumpyize,
     get_template_live_config,
     ts_to_date,
@@ -32,39 +42,163 @@ from procedures import (
     load_exchange_key_secret,
     prepare_backtest_config,
     dump_live_config,
+    calc_ticks_hash,
+    calc_result_cache_key,
+    load_cached_result,
+    dump_cached_result,
+    evict_result_cache,
 )
-from time import sleep, time
+from time import time
 import logging
 import logging.config
 
 logging.config.dictConfig({"version": 1, "disable_existing_loggers": True})
 
+# worker process globals, set by init_worker()
+# {ticks_cache_fname: np.ndarray}
+shared_ticks = {}
+_shared_ticks_shms = []
+# static part of every task, see HarmonySearch.make_worker_context()
+worker_context = {}
+
+
+def init_worker(
+    ticks_specs: dict,
+    warmup_configs: [dict],
+    batch_size: int,
+    walk_forward: bool,
+    n_threads: int,
+    context: dict,
+):
+    """
+    pool initializer; attaches tick caches read-only, stores the worker context and warms up
+    backtest kernels
+    ticks_specs: {ticks_cache_fname: ("shm", shm_name, shape, dtype, compact_meta)
+                  or ("mmap", ticks_cache_fname)
+                  or ("cache", caches_dirpath, start_date, end_date, compact, price_step)}
+    compact_meta is None, or compact ticks without arrays if the shared array is compact prices
+    warmup_configs: backtested on synthetic ticks before real work starts
+    walk_forward: whether to also warm up the walk forward kernels
+    n_threads: numba threads for multi symbol backtests; 0 disables multi symbol backtests
+    context: everything tasks share, so that tasks carry only notes, symbol indices, config_no
+             and fidelity rung
+    """
+    # main() clears before workers start; this covers pools started from elsewhere
+    clear_stale_numba_cache()
+    if n_threads > 0:
+        numba.set_num_threads(n_threads)
+    worker_context.update(context)
+    for key, spec in ticks_specs.items():
+        if spec[0] == "shm":
+            shm = shared_memory.SharedMemory(name=spec[1])
+            _shared_ticks_shms.append(shm)
+            ticks = np.ndarray(spec[2], dtype=spec[3], buffer=shm.buf)
+            ticks.flags.writeable = False
+            if spec[4] is not None:
+                ticks = {**spec[4], "prices": ticks, "qtys": None}
+        elif spec[0] == "cache":
+            ticks = load_ticks_cache(*spec[1:])
+        else:
+            ticks = np.load(spec[1], mmap_mode="r")
+        shared_ticks[key] = ticks
+    compact = any(type(ticks) == dict for ticks in shared_ticks.values())
+    for config in warmup_configs:
+        warmup_backtest(config, batch_size, walk_forward, n_threads > 0, compact)
+
+
+def load_ticks(ticks_cache_fname: str) -> np.ndarray:
+    if ticks_cache_fname in shared_ticks:
+        return shared_ticks[ticks_cache_fname]
+    return np.load(ticks_cache_fname)
+
 
-def backtest_wrap(config_: dict, ticks_caches: dict):
+def load_ticks_window(symbol_i: int, rung: int):
     """
-    loads historical data from disk, runs backtest and returns relevant metrics
+    most recent fidelity fraction of a symbol's ticks as a view, preceded by enough ticks to warm up
+    the longest ema span within bounds; all ticks at the last rung
     """
-    config = {
-        **{"long": deepcopy(config_["long"]), "short": deepcopy(config_["short"])},
+    ticks = load_ticks(worker_context["ticks_cache_fnames"][symbol_i])
+    fidelity = worker_context["fidelities"][rung]
+    if fidelity >= 1.0:
+        return ticks
+    compact = type(ticks) == dict
+    n = len(ticks["prices"]) if compact else len(ticks)
+    step_ms = ticks["step_ms"] if compact else ticks[1, 0] - ticks[0, 0]
+    n_warmup = int(worker_context["max_span_minutes"] * 60 * 1000 / step_ms) + 1
+    start = max(0, n - int(round(n * fidelity)) - n_warmup)
+    if compact:
+        return {
+            **ticks,
+            "first_timestamp": ticks["first_timestamp"] + start * step_ms,
+            "prices": ticks["prices"][start:],
+            "qtys": None if ticks["qtys"] is None else ticks["qtys"][start:],
+        }
+    return ticks[start:]
+
+
+def calc_task_cache_key(config: dict, symbol_i: int, rung: int) -> str:
+    # backtests on fidelity windows are cached apart from those on all ticks
+    ticks_hash = worker_context["ticks_hashes"][symbol_i]
+    fidelity = worker_context["fidelities"][rung]
+    if fidelity < 1.0:
+        ticks_hash = f"{ticks_hash}_{fidelity}_{worker_context['max_span_minutes']}"
+    return calc_result_cache_key(config, ticks_hash)
+
+
+def make_backtest_config(notes: np.ndarray, symbol_i: int, config_no: int) -> dict:
+    # notes shape (2, n_keys) are long and short bound values; the rest comes from worker context
+    return {
         **{
-            k: config_[k]
-            for k in [
-                "starting_balance",
-                "latency_simulation_ms",
-                "symbol",
-                "market_type",
-                "config_no",
-            ]
+            side: {
+                **worker_context["base_configs"][i],
+                **dict(zip(worker_context["keys"], notes[i].tolist())),
+            }
+            for i, side in enumerate(["long", "short"])
         },
-        **{k: v for k, v in config_["market_specific_settings"].items()},
+        **worker_context["symbol_configs"][symbol_i],
+        "config_no": config_no,
     }
-    if config["symbol"] in ticks_caches:
-        ticks = ticks_caches[config["symbol"]]
-    else:
-        ticks = np.load(config_["ticks_cache_fname"])
+
+
+def analysis_to_result(analysis: dict) -> np.ndarray:
+    # fixed width result sent back to the coordinator; metrics missing from analysis are 0.0
+    return np.array(
+        [analysis[k] if k in analysis else 0.0 for k in worker_context["result_keys"]],
+        dtype=np.float64,
+    )
+
+
+def analyze_wrap(config: dict, ticks) -> dict:
+    # backtests with walk forward windows in the same pass over the ticks, if enabled
+    if "walk_forward_window_days" in config:
+        analysis, _ = analyze_walk_forward(
+            config, ticks, config["walk_forward_window_days"], config["walk_forward_step_days"]
+        )
+        return analysis
+    fills_long, fills_short, stats = backtest(config, ticks)
+    return analyze_fills_fast(fills_long, fills_short, stats, config)
+
+
+def backtest_wrap(notes: np.ndarray, symbol_i: int, config_no: int, rung: int) -> np.ndarray:
+    """
+    loads historical data from shared memory or disk, runs backtest and returns relevant metrics
+    results are looked up in and added to the result cache, if enabled
+    below the last fidelity rung, only the most recent part of the ticks is backtested
+    returns metrics shape (n_result_keys,)
+    """
+    config = make_backtest_config(notes, symbol_i, config_no)
+    cache_dirpath = worker_context["result_cache_dirpath"]
+    if cache_dirpath is not None:
+        cache_key = calc_task_cache_key(config, symbol_i, rung)
+        analysis = load_cached_result(cache_dirpath, cache_key)
+        if analysis is not None:
+            logging.debug(f"result cache hit {config['symbol']}")
+            return analysis_to_result(analysis)
+    ticks = load_ticks_window(symbol_i, rung)
     try:
-        fills_long, fills_short, stats = backtest(config, ticks)
-        longs, shorts, sdf, analysis = analyze_fills(fills_long, fills_short, stats, config)
+        analysis = analyze_wrap(config, ticks)
+        if cache_dirpath is not None:
+            dump_cached_result(cache_dirpath, cache_key, analysis)
         """
         with open("logs/debug_harmonysearch.txt", "a") as f:
             f.write(json.dumps({"config": denumpyize(config), "analysis": analysis}) + "\n")
@@ -82,11 +216,228 @@ def backtest_wrap(config_: dict, ticks_caches: dict):
         traceback.print_exc()
         with open(make_get_filepath("tmp/harmony_search_errors.txt"), "a") as f:
             f.write(json.dumps([time(), "error", str(e), denumpyize(config)]) + "\n")
-    return analysis
+    return analysis_to_result(analysis)
+
+
+def backtest_batch_wrap(
+    notes: np.ndarray, symbol_i: int, config_nos: [int], rung: int
+) -> np.ndarray:
+    """
+    loads historical data from shared memory or disk, backtests all configs in a single pass
+    over the data and returns relevant metrics for each.  all configs are for the same symbol
+    notes shape (n_configs, 2, n_keys)
+    only configs missing from the result cache, if enabled, are backtested
+    with walk forward windows, configs are backtested one by one, each in a single pass over its windows
+    returns metrics shape (n_configs, n_result_keys)
+    """
+    configs = [make_backtest_config(x, symbol_i, n) for x, n in zip(notes, config_nos)]
+    analyses = [None for _ in configs]
+    cache_dirpath = worker_context["result_cache_dirpath"]
+    if cache_dirpath is not None:
+        cache_keys = [calc_task_cache_key(config, symbol_i, rung) for config in configs]
+        analyses = [load_cached_result(cache_dirpath, key) for key in cache_keys]
+    misses = [i for i in range(len(configs)) if analyses[i] is None]
+    if not misses:
+        logging.debug(f"result cache hit batch of {len(configs)} {configs[0]['symbol']}")
+        return np.array([analysis_to_result(analysis) for analysis in analyses])
+    ticks = load_ticks_window(symbol_i, rung)
+    try:
+        if "walk_forward_window_days" in configs[0]:
+            for i in misses:
+                analyses[i] = analyze_wrap(configs[i], ticks)
+        else:
+            for i, (fills_long, fills_short, stats) in zip(
+                misses, backtest_batch([configs[i] for i in misses], ticks)
+            ):
+                analyses[i] = analyze_fills_fast(fills_long, fills_short, stats, configs[i])
+        if cache_dirpath is not None:
+            for i in misses:
+                dump_cached_result(cache_dirpath, cache_keys[i], analyses[i])
+        logging.debug(f"backtested batch of {len(misses)} {configs[0]['symbol']}")
+    except Exception as e:
+        analyses = [get_empty_analysis() for _ in configs]
+        logging.error(f'error with batch {configs[0]["symbol"]} {e}')
+        traceback.print_exc()
+        with open(make_get_filepath("tmp/harmony_search_errors.txt"), "a") as f:
+            f.write(json.dumps([time(), "error", str(e), denumpyize(configs)]) + "\n")
+    return np.array([analysis_to_result(analysis) for analysis in analyses])
+
+
+def backtest_symbols_wrap(
+    notes: np.ndarray, symbol_is: [int], config_no: int, rung: int
+) -> np.ndarray:
+    """
+    loads historical data from shared memory or disk, backtests config on all symbols in symbol_is
+    in a single call, symbols spread over numba threads, and returns relevant metrics per symbol
+    notes shape (2, n_keys)
+    only symbols missing from the result cache, if enabled, are backtested
+    with walk forward windows, symbols are backtested one by one
+    returns metrics shape (len(symbol_is), n_result_keys)
+    """
+    configs = {i: make_backtest_config(notes, i, config_no) for i in symbol_is}
+    analyses = {}
+    cache_dirpath = worker_context["result_cache_dirpath"]
+    if cache_dirpath is not None:
+        cache_keys = {i: calc_task_cache_key(configs[i], i, rung) for i in configs}
+        for i in configs:
+            analysis = load_cached_result(cache_dirpath, cache_keys[i])
+            if analysis is not None:
+                analyses[i] = analysis
+    misses = [i for i in symbol_is if i not in analyses]
+    if not misses:
+        logging.debug(f"result cache hit all {len(analyses)} symbols")
+        return np.array([analysis_to_result(analyses[i]) for i in symbol_is])
+    try:
+        if "walk_forward_window_days" in configs[misses[0]]:
+            for i in misses:
+                analyses[i] = analyze_wrap(configs[i], load_ticks_window(i, rung))
+        else:
+            ticks_list = [load_ticks_window(i, rung) for i in misses]
+            for i, analysis in zip(
+                misses, backtest_symbols([configs[i] for i in misses], ticks_list)
+            ):
+                analyses[i] = analysis
+        if cache_dirpath is not None:
+            for i in misses:
+                dump_cached_result(cache_dirpath, cache_keys[i], analyses[i])
+        logging.debug(f"backtested {config_no} on {len(misses)} symbols")
+    except Exception as e:
+        analyses = {i: get_empty_analysis() for i in symbol_is}
+        logging.error(f"error with multi symbol backtest {e}")
+        traceback.print_exc()
+        with open(make_get_filepath("tmp/harmony_search_errors.txt"), "a") as f:
+            f.write(
+                json.dumps([time(), "error", str(e), denumpyize(list(configs.values()))]) + "\n"
+            )
+    return np.array([analysis_to_result(analyses[i]) for i in symbol_is])
+
+
+def timed_task(func, args: tuple) -> tuple:
+    # runs func(*args) in a worker; returns (result, seconds spent), for worker utilization
+    sts = time()
+    return func(*args), time() - sts
+
+
+class HarmonyMemory:
+    """
+    harmony memory backed by arrays; notes[side, row] holds the bound values of one side's config,
+    side 0 long and 1 short, one column per key
+    scores are lower is better; rows not yet evaluated have score nan and are neither best nor worst
+    best and worst rows per side are kept in heaps with stale entries skipped, O(log n) per update
+    rows get their initial evals in order; rows from n_started on are not started
+    """
+
+    def __init__(self, keys: [str], n_harmonies: int, base_configs: [dict]):
+        self.keys = list(keys)
+        self.n_harmonies = n_harmonies
+        # [long, short] config keys other than notes, shared by all rows
+        self.base_configs = [
+            {k: v for k, v in base_config.items() if k not in self.keys} for base_config in base_configs
+        ]
+        self.notes = np.zeros((2, n_harmonies, len(self.keys)))
+        self.scores = np.full((2, n_harmonies), np.nan)
+        self.n_started = 0
+        # heap entries are (score, row, version) and (-score, -row, version); ties go to the
+        # first row for best and the last row for worst
+        self.versions = np.zeros((2, n_harmonies), dtype=np.int64)
+        self.best_heaps = [[], []]
+        self.worst_heaps = [[], []]
+
+    def config(self, side: int, row: int) -> dict:
+        return self.notes_config(side, self.notes[side, row])
+
+    def notes_config(self, side: int, notes: np.ndarray) -> dict:
+        return {**deepcopy(self.base_configs[side]), **dict(zip(self.keys, notes.tolist()))}
+
+    def set_notes(self, side: int, row: int, notes: np.ndarray):
+        self.notes[side, row] = notes
+
+    def set_score(self, side: int, row: int, score: float):
+        # a nan score leaves the row unscored; its heap entries turn stale
+        self.scores[side, row] = score
+        self.versions[side, row] += 1
+        version = self.versions[side, row]
+        if np.isnan(score):
+            return
+        if max(len(self.best_heaps[side]), len(self.worst_heaps[side])) > 4 * self.n_harmonies:
+            self.rebuild_heaps(side)
+        else:
+            heapq.heappush(self.best_heaps[side], (score, row, version))
+            heapq.heappush(self.worst_heaps[side], (-score, -row, version))
+
+    def rebuild_heaps(self, side: int):
+        rows = np.flatnonzero(~np.isnan(self.scores[side]))
+        scores, versions = self.scores[side, rows], self.versions[side, rows]
+        self.best_heaps[side] = list(zip(scores.tolist(), rows.tolist(), versions.tolist()))
+        self.worst_heaps[side] = list(zip((-scores).tolist(), (-rows).tolist(), versions.tolist()))
+        heapq.heapify(self.best_heaps[side])
+        heapq.heapify(self.worst_heaps[side])
+
+    def top(self, heap: list, side: int, sign: int):
+        # row on top of heap after dropping stale entries; None if no row is scored
+        while heap and heap[0][2] != self.versions[side, sign * heap[0][1]]:
+            heapq.heappop(heap)
+        return sign * heap[0][1] if heap else None
+
+    def best(self, side: int):
+        return self.top(self.best_heaps[side], side, 1)
+
+    def worst(self, side: int):
+        return self.top(self.worst_heaps[side], side, -1)
+
+    def n_scored(self, side: int) -> int:
+        return int(np.count_nonzero(~np.isnan(self.scores[side])))
+
+    def contains(self, side: int, notes: np.ndarray) -> bool:
+        return bool((self.notes[side] == notes).all(axis=1).any())
+
+    def sample(
+        self, bounds: np.ndarray, considering_rate: float, pitch_adjusting_rate: float, bandwidth: float
+    ) -> np.ndarray:
+        """
+        bounds shape (2, n_keys, 2), [side, key] = (low, high)
+        each note is taken from a random row with considering_rate, and then tweaked by up to
+        bandwidth / 2 of the bounds range with pitch_adjusting_rate; otherwise drawn uniformly
+        both sides share the per note draws of whether to consider and adjust
+        returns new notes, shape (2, n_keys)
+        """
+        n_keys = len(self.keys)
+        lows, highs = bounds[:, :, 0], bounds[:, :, 1]
+        considered = np.random.random(n_keys) < considering_rate
+        adjusted = considered & (np.random.random(n_keys) < pitch_adjusting_rate)
+        rows = np.random.randint(0, self.n_harmonies, size=(2, n_keys))
+        notes = self.notes[np.arange(2)[:, None], rows, np.arange(n_keys)[None, :]]
+        tweaks = bandwidth * (np.random.random((2, n_keys)) - 0.5) * np.abs(lows - highs)
+        notes = np.where(adjusted, notes + tweaks, notes)
+        notes = np.clip(notes, lows, highs)
+        return np.where(considered, notes, np.random.uniform(lows, highs))
+
+    def to_dict(self) -> dict:
+        # {row: {"long": {"score", "config"}, "short": ...}}, for json dumps
+        return {
+            f"{row:06}": {
+                side_name: {
+                    "score": (
+                        float(self.scores[side, row])
+                        if not np.isnan(self.scores[side, row])
+                        else "not_started"
+                        if row >= self.n_started
+                        else "in_progress"
+                    ),
+                    "config": self.config(side, row),
+                }
+                for side, side_name in enumerate(["long", "short"])
+            }
+            for row in range(self.n_harmonies)
+        }
 
 
 class HarmonySearch:
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, resume_dirpath: str = None):
+        """
+        resume_dirpath: results dir of an earlier run to continue from its checkpoint;
+        config must be the one stored in the checkpoint
+        """
         self.config = config
         self.do_long = config["long"]["enabled"]
         self.do_short = config["short"]["enabled"]
@@ -97,7 +448,48 @@ class HarmonySearch:
         self.pitch_adjusting_rate = config["pitch_adjusting_rate"]
         self.iters = config["iters"]
         self.n_cpus = config["n_cpus"]
-        self.pool = Pool(processes=config["n_cpus"])
+        self.batch_size = max(1, config["batch_size"]) if "batch_size" in config else 1
+        self.pool = None  # started in run_() once tick caches are loaded
+        # each job backtests one config on all symbols, spread over numba threads within the worker
+        self.parallel_symbols = (
+            config["parallel_symbols"] if "parallel_symbols" in config else False
+        )
+        if self.parallel_symbols:
+            self.batch_size = 1
+        self.n_threads = max(1, os.cpu_count() // self.n_cpus) if self.parallel_symbols else 0
+        # each backtest also runs walk forward windows of window_days every step_days, in the same pass
+        self.walk_forward_window_days = (
+            config["walk_forward_window_days"] if "walk_forward_window_days" in config else 0.0
+        )
+        self.walk_forward_step_days = (
+            config["walk_forward_step_days"]
+            if "walk_forward_step_days" in config and config["walk_forward_step_days"] > 0.0
+            else self.walk_forward_window_days
+        )
+        if config["score_formula"] == "adg_realized_wf_min" and self.walk_forward_window_days <= 0.0:
+            raise Exception("score formula adg_realized_wf_min requires walk_forward_window_days > 0")
+        # multi-fidelity screening; new harmonies are backtested on the most recent fraction of
+        # the data of each rung in turn, and only those scoring in the top promotion fraction of
+        # a rung go on to the next. the last fidelity is 1.0, all data, scored as without screening
+        rungs = config["fidelity_rungs"] if "fidelity_rungs" in config else []
+        self.fidelities = sorted(set(f for f in rungs if 0.0 < f < 1.0)) + [1.0]
+        self.promotion_fraction = (
+            config["fidelity_promotion_fraction"]
+            if "fidelity_promotion_fraction" in config
+            else 0.33
+        )
+        if self.walk_forward_window_days > 0.0:
+            n_days = (date_to_ts(config["end_date"]) - date_to_ts(config["start_date"])) / (
+                1000 * 60 * 60 * 24
+            )
+            if self.fidelities[0] * n_days < self.walk_forward_window_days:
+                raise Exception(
+                    f"fidelity rung {self.fidelities[0]} of {n_days:.1f} days is shorter than "
+                    + f"walk forward window of {self.walk_forward_window_days} days"
+                )
+        # [rung][side] sorted scores of evals finished at each rung below the last
+        self.rung_scores = [[[], []] for _ in self.fidelities[:-1]]
+        self.n_screened_out = 0
         self.long_bounds = sort_dict_keys(config[f"bounds_{self.config['passivbot_mode']}"]["long"])
         self.short_bounds = sort_dict_keys(config[f"bounds_{self.config['passivbot_mode']}"]["short"])
         self.symbols = config["symbols"]
@@ -105,8 +497,18 @@ class HarmonySearch:
             f"{len(self.symbols)}_symbols" if len(self.symbols) > 1 else self.symbols[0]
         )
         self.now_date = ts_to_date(time())[:19].replace(":", "-")
-        self.results_fpath = make_get_filepath(
-            f"results_harmony_search_{self.config['passivbot_mode']}/{self.now_date}_{self.identifying_name}/"
+        self.resume_dirpath = resume_dirpath
+        if resume_dirpath is None:
+            self.results_fpath = make_get_filepath(
+                f"results_harmony_search_{self.config['passivbot_mode']}/{self.now_date}_{self.identifying_name}/"
+            )
+        else:
+            self.results_fpath = os.path.join(resume_dirpath, "")
+        # optimizer state is dumped to {results_fpath}checkpoint.json this often; 0 disables
+        self.checkpoint_interval_seconds = 60 * (
+            config["checkpoint_interval_minutes"]
+            if "checkpoint_interval_minutes" in config
+            else 10.0
         )
         self.exchange_name = config["exchange"] + ("_spot" if config["market_type"] == "spot" else "")
         self.market_specific_settings = {
@@ -128,255 +530,205 @@ class HarmonySearch:
         self.ticks_cache_fname = (
             f"caches/{self.date_range}{'_ohlcv_cache.npy' if config['ohlcv'] else '_ticks_cache.npy'}"
         )
-        """
-        self.ticks_caches = (
-            {s: np.load(f"{self.bt_dir}/{s}/{self.ticks_cache_fname}") for s in self.symbols}
-            if self.n_harmonies > len(self.symbols)
-            else {}
-        )
-        """
-        self.ticks_caches = {}
         self.shms = {}  # shared memories
         self.current_best_config = None
 
-        # [{'config': dict, 'task': process, 'id_key': tuple}]
-        self.workers = [None for _ in range(self.n_cpus)]
+        # each worker gets its next task queued while busy, so it never waits on the coordinator
+        self.task_prefetch = max(0, config["task_prefetch"]) if "task_prefetch" in config else 1
+        # task slots; [{'id_keys': [int], 'symbols': [str], 'rung': int}], one entry per backtest
+        self.workers = [None for _ in range(self.n_cpus * (1 + self.task_prefetch))]
+        # (slot index, result, seconds) put by pool callbacks as tasks finish
+        self.finished_tasks = queue.Queue()
+        self.task_seconds = 0.0  # sum of time workers spent on tasks
 
-        # hm = {hm_key: str: {'long': {'score': float, 'config': dict}, 'short': {...}}}
-        self.hm = {}
+        # rows of bound values per side, same keys on both sides; initialized in run_()
+        template = get_template_live_config(self.config["passivbot_mode"])
+        self.hm = HarmonyMemory(
+            list(self.long_bounds),
+            self.n_harmonies,
+            [
+                {
+                    **template[side],
+                    "enabled": getattr(self, f"do_{side}"),
+                    "backwards_tp": self.config[f"backwards_tp_{side}"],
+                }
+                for side in ["long", "short"]
+            ],
+        )
+        # shape (2, n_keys, 2), [side, key] = (low, high)
+        self.bounds = np.array(
+            [[getattr(self, f"{side}_bounds")[k] for k in self.hm.keys] for side in ["long", "short"]]
+        )
 
-        # {identifier: {'config': dict,
-        #               'single_results': {symbol_finished: single_backtest_result},
-        #               'in_progress': set({symbol_in_progress}))}
+        # {config_no: {'notes': np.ndarray shape (2, n_keys),
+        #              'initial_eval_key': harmony memory row, or None for new harmonies,
+        #              'rung': index into self.fidelities,
+        #              'single_results': {symbol_finished: single_backtest_result},
+        #              'in_progress': set({symbol_in_progress}))}
         self.unfinished_evals = {}
 
         self.iter_counter = 0
 
-    def post_process(self, wi: int):
-        # a worker has finished a job; process it
-        cfg = deepcopy(self.workers[wi]["config"])
-        id_key = self.workers[wi]["id_key"]
-        symbol = cfg["symbol"]
-        self.unfinished_evals[id_key]["single_results"][symbol] = self.workers[wi]["task"].get()
-        self.unfinished_evals[id_key]["in_progress"].remove(symbol)
-        results = deepcopy(self.unfinished_evals[id_key]["single_results"])
-        if set(results) == set(self.symbols):
-            # completed multisymbol iter
-            adgs_long = [v["adg_long"] for v in results.values()]
-            adg_mean_long = np.mean(adgs_long)
-            pa_distance_std_long_raw = np.mean([v["pa_distance_std_long"] for v in results.values()])
-            pa_distance_std_long = np.mean(
-                [
-                    max(self.config["maximum_pa_distance_std_long"], v["pa_distance_std_long"])
-                    for v in results.values()
-                ]
-            )
-            PAD_mean_long_raw = np.mean([v["pa_distance_mean_long"] for v in results.values()])
-            PAD_mean_long = np.mean(
-                [
-                    max(self.config["maximum_pa_distance_mean_long"], v["pa_distance_mean_long"])
-                    for v in results.values()
-                ]
-            )
-            adg_DGstd_ratios_long = [v["adg_DGstd_ratio_long"] for v in results.values()]
-            adg_DGstd_ratios_long_mean = np.mean(adg_DGstd_ratios_long)
-            adgs_short = [v["adg_short"] for v in results.values()]
-            adg_mean_short = np.mean(adgs_short)
-            pa_distance_std_short_raw = np.mean(
-                [v["pa_distance_std_short"] for v in results.values()]
-            )
+        # backtest results are cached on disk, shared between workers and optimize sessions
+        if "result_cache" in config and config["result_cache"]:
+            self.result_cache_dirpath = os.path.join(config["base_dir"], "result_cache", "")
+        else:
+            self.result_cache_dirpath = None
+        self.result_cache_max_bytes = (
+            config["result_cache_max_mb"] if "result_cache_max_mb" in config else 1000
+        ) * 1024 ** 2
+        self.ticks_hashes = {}  # {symbol: str}, set in load_ticks_caches()
+        # metrics workers send back per backtest, as fixed width float arrays in this order
+        self.result_keys = (
+            list(ANALYSIS_METRICS)
+            + [
+                f"{k}_{side}"
+                for k in ["adg_per_exposure", "adg_realized_per_exposure"]
+                + (
+                    ["adg_realized_per_exposure_wf_min", "adg_realized_per_exposure_wf_mean"]
+                    if self.walk_forward_window_days > 0.0
+                    else []
+                )
+                for side in ["long", "short"]
+            ]
+            + (["n_wf_windows"] if self.walk_forward_window_days > 0.0 else [])
+        )
+        # ticks kept as compact prices without timestamps, read in place by the backtest kernels
+        self.compact_ticks = (
+            config["compact_ticks"] if "compact_ticks" in config and not config["ohlcv"] else False
+        )
 
-            pa_distance_std_short = np.mean(
-                [
-                    max(self.config["maximum_pa_distance_std_short"], v["pa_distance_std_short"])
-                    for v in results.values()
-                ]
-            )
-            PAD_mean_short_raw = np.mean([v["pa_distance_mean_short"] for v in results.values()])
+        # pruning abandons multisymbol evals which cannot beat the worst harmony
+        self.pruning = config["pruning"] if "pruning" in config else False
+        self.n_pruned = 0
+        self.symbol_prunes = {s: 0 for s in self.symbols}
+        self.n_ticks = {s: 1 for s in self.symbols}  # set in load_ticks_caches()
+        # {symbol: {metric: best value seen}}
+        self.best_single_results = {}
+        self.higher_is_better = [
+            f"{k}_{side}"
+            for k in ["adg", "adg_DGstd_ratio", "adg_realized_per_exposure"]
+            + (["adg_realized_per_exposure_wf_min"] if self.walk_forward_window_days > 0.0 else [])
+            for side in ["long", "short"]
+        ]
+        self.lower_is_better = [
+            f"{k}_{side}"
+            for k in [
+                "pa_distance_mean",
+                "pa_distance_std",
+                "loss_profit_ratio",
+                "equity_balance_ratio_std",
+            ]
+            for side in ["long", "short"]
+        ]
 
-            PAD_mean_short = np.mean(
-                [
-                    max(self.config["maximum_pa_distance_mean_short"], v["pa_distance_mean_short"])
-                    for v in results.values()
-                ]
-            )
-            adg_DGstd_ratios_short = [v["adg_DGstd_ratio_short"] for v in results.values()]
-            adg_DGstd_ratios_short_mean = np.mean(adg_DGstd_ratios_short)
-            eqbal_ratios_std_long = [v["equity_balance_ratio_std_long"] for v in results.values()]
-            eqbal_ratios_std_short = [v["equity_balance_ratio_std_short"] for v in results.values()]
-            eqbal_ratio_std_long_mean = np.mean(eqbal_ratios_std_long)
-            eqbal_ratio_std_short_mean = np.mean(eqbal_ratios_std_short)
-            adgs_realized_long = [v["adg_realized_per_exposure_long"] for v in results.values()]
-            adgs_realized_short = [v["adg_realized_per_exposure_short"] for v in results.values()]
-            adg_realized_long_mean = np.mean(adgs_realized_long)
-            adg_realized_short_mean = np.mean(adgs_realized_short)
-            loss_profit_ratio_long_mean = np.mean(
-                [
-                    max(self.config["maximum_loss_profit_ratio_long"], v["loss_profit_ratio_long"])
-                    for v in results.values()
-                ]
-            )
-            loss_profit_ratio_short_mean = np.mean(
-                [
-                    max(self.config["maximum_loss_profit_ratio_short"], v["loss_profit_ratio_short"])
-                    for v in results.values()
-                ]
-            )
+    def post_process(self, wi: int, results: np.ndarray):
+        # a worker has finished a task; results shape (n_backtests, n_result_keys), or 1d for one
+        task = self.workers[wi]
+        self.workers[wi] = None
+        for id_key, symbol, result in zip(task["id_keys"], task["symbols"], np.atleast_2d(results)):
+            analysis = self.result_to_analysis(symbol, result)
+            self.process_result(id_key, symbol, task["rung"], analysis)
 
-            if self.config["score_formula"] == "adg_PAD_mean":
-                score_long = -adg_mean_long * min(
-                    1.0, self.config["maximum_pa_distance_mean_long"] / PAD_mean_long
-                )
-                score_short = -adg_mean_short * min(
-                    1.0, self.config["maximum_pa_distance_mean_short"] / PAD_mean_short
-                )
-            elif self.config["score_formula"] == "adg_realized_PAD_mean":
-                score_long = -adg_realized_long_mean / max(
-                    self.config["maximum_pa_distance_mean_long"], PAD_mean_long
-                )
-                score_short = -adg_realized_short_mean / max(
-                    self.config["maximum_pa_distance_mean_short"], PAD_mean_short
-                )
-            elif self.config["score_formula"] == "adg_realized_PAD_std":
-                score_long = -adg_realized_long_mean / max(
-                    self.config["maximum_pa_distance_std_long"], pa_distance_std_long
-                )
-                score_short = -adg_realized_short_mean / max(
-                    self.config["maximum_pa_distance_std_short"], pa_distance_std_short
-                )
+    def result_to_analysis(self, symbol: str, result: np.ndarray) -> dict:
+        market_settings = self.market_specific_settings[symbol]
+        analysis = dict(zip(self.result_keys, result.tolist()))
+        analysis["exchange"] = (
+            market_settings["exchange"] if "exchange" in market_settings else "unknown"
+        )
+        analysis["symbol"] = market_settings["symbol"] if "symbol" in market_settings else symbol
+        return sort_dict_keys(analysis)
 
-            elif self.config["score_formula"] == "adg_PAD_std":
-                score_long = -adg_mean_long / max(
-                    self.config["maximum_pa_distance_std_long"], pa_distance_std_long
-                )
-                score_short = -adg_mean_short / max(
-                    self.config["maximum_pa_distance_std_short"], pa_distance_std_short
+    def process_result(self, id_key: int, symbol: str, rung: int, result: dict):
+        is_last_rung = rung == len(self.fidelities) - 1
+        if is_last_rung:
+            self.update_best_single_results(symbol, result)
+        if id_key not in self.unfinished_evals:
+            # eval was pruned while this job was running
+            return
+        eval_ = self.unfinished_evals[id_key]
+        eval_["single_results"][symbol] = result
+        eval_["in_progress"].remove(symbol)
+        results = dict(eval_["single_results"])
+        if set(results) != set(self.symbols):
+            if (
+                self.pruning
+                and is_last_rung
+                and eval_["initial_eval_key"] is None
+                and self.is_hopeless(results)
+            ):
+                logging.debug(
+                    f"pruned harmony {id_key} after {len(results)} of "
+                    + f"{len(self.symbols)} symbols, last {symbol}"
                 )
-            elif self.config["score_formula"] == "adg_DGstd_ratio":
-                score_long = -adg_DGstd_ratios_long_mean
-                score_short = -adg_DGstd_ratios_short_mean
-            elif self.config["score_formula"] == "adg_mean":
-                score_long = -adg_mean_long
-                score_short = -adg_mean_short
-            elif self.config["score_formula"] == "adg_min":
-                score_long = -min(adgs_long)
-                score_short = -min(adgs_short)
-            elif self.config["score_formula"] == "adg_PAD_std_min":
-                # best worst score
-                scores_long = [
-                    v["adg_long"]
-                    / max(v["pa_distance_std_long"], self.config["maximum_pa_distance_std_long"])
-                    for v in results.values()
-                ]
-                score_long = -min(scores_long)
-                scores_short = [
-                    v["adg_short"]
-                    / max(v["pa_distance_std_short"], self.config["maximum_pa_distance_std_short"])
-                    for v in results.values()
-                ]
-                score_short = -min(scores_short)
-            else:
-                raise Exception(f"unknown score formula {self.config['score_formula']}")
-
-            score_long *= self.config["maximum_loss_profit_ratio_long"] / max(
-                loss_profit_ratio_long_mean, self.config["maximum_loss_profit_ratio_long"]
-            )
-            score_short *= self.config["maximum_loss_profit_ratio_short"] / max(
-                loss_profit_ratio_short_mean, self.config["maximum_loss_profit_ratio_short"]
-            )
-
+                self.n_pruned += 1
+                self.symbol_prunes[symbol] += 1
+                del self.unfinished_evals[id_key]
+        elif not is_last_rung:
+            self.screen(id_key, results)
+        else:
+            # completed multisymbol iter
+            cfg = {
+                "long": self.hm.notes_config(0, eval_["notes"][0]),
+                "short": self.hm.notes_config(1, eval_["notes"][1]),
+                "config_no": id_key,
+            }
+            scores = self.calc_scores(results)
+            score_long, score_short = scores["score_long"], scores["score_short"]
             line = f"completed multisymbol iter {cfg['config_no']} "
             if self.do_long:
-                line += f"- adg long {adg_mean_long:.6f} PAD long {PAD_mean_long:.6f} std long "
-                line += f"{pa_distance_std_long:.5f} score long {score_long:.7f} "
+                line += f"- adg long {scores['adg_mean_long']:.6f} "
+                line += f"PAD long {scores['PAD_mean_long']:.6f} std long "
+                line += f"{scores['pa_distance_std_long']:.5f} score long {score_long:.7f} "
             if self.do_short:
-                line += f"- adg short {adg_mean_short:.6f} PAD short {PAD_mean_short:.6f} std short "
-                line += f"{pa_distance_std_short:.5f} score short {score_short:.7f}"
+                line += f"- adg short {scores['adg_mean_short']:.6f} "
+                line += f"PAD short {scores['PAD_mean_short']:.6f} std short "
+                line += f"{scores['pa_distance_std_short']:.5f} score short {score_short:.7f}"
             logging.debug(line)
             # check whether initial eval or new harmony
-            if "initial_eval_key" in cfg:
-                self.hm[cfg["initial_eval_key"]]["long"]["score"] = score_long
-                self.hm[cfg["initial_eval_key"]]["short"]["score"] = score_short
+            if eval_["initial_eval_key"] is not None:
+                self.hm.set_score(0, eval_["initial_eval_key"], score_long)
+                self.hm.set_score(1, eval_["initial_eval_key"], score_short)
             else:
                 # check if better than worst in harmony memory
-                worst_key_long = sorted(
-                    self.hm,
-                    key=lambda x: self.hm[x]["long"]["score"]
-                    if type(self.hm[x]["long"]["score"]) != str
-                    else -np.inf,
-                )[-1]
-                if self.do_long and score_long < self.hm[worst_key_long]["long"]["score"]:
-                    logging.debug(
-                        f"improved long harmony, prev score "
-                        + f"{self.hm[worst_key_long]['long']['score']:.7f} new score {score_long:.7f} - "
-                        + " ".join([str(round_dynamic(e[1], 3)) for e in sorted(cfg["long"].items())])
-                    )
-                    self.hm[worst_key_long]["long"] = {
-                        "config": deepcopy(cfg["long"]),
-                        "score": score_long,
-                    }
-                    json.dump(
-                        self.hm,
-                        open(f"{self.results_fpath}hm_{cfg['config_no']:06}.json", "w"),
-                        indent=4,
-                        sort_keys=True,
-                    )
-                worst_key_short = sorted(
-                    self.hm,
-                    key=lambda x: self.hm[x]["short"]["score"]
-                    if type(self.hm[x]["short"]["score"]) != str
-                    else -np.inf,
-                )[-1]
-                if self.do_short and score_short < self.hm[worst_key_short]["short"]["score"]:
+                for side, side_name, score in [(0, "long", score_long), (1, "short", score_short)]:
+                    worst_row = self.hm.worst(side)
+                    if (
+                        not getattr(self, f"do_{side_name}")
+                        or worst_row is None
+                        or not np.isfinite(score)
+                        or score >= self.hm.scores[side, worst_row]
+                    ):
+                        continue
                     logging.debug(
-                        f"improved short harmony, prev score "
-                        + f"{self.hm[worst_key_short]['short']['score']:.7f} new score {score_short:.7f} - "
-                        + " ".join(
-                            [str(round_dynamic(e[1], 3)) for e in sorted(cfg["short"].items())]
-                        ),
+                        f"improved {side_name} harmony, prev score "
+                        + f"{self.hm.scores[side, worst_row]:.7f} new score {score:.7f} - "
+                        + " ".join([str(round_dynamic(e[1], 3)) for e in sorted(cfg[side_name].items())])
                     )
-                    self.hm[worst_key_short]["short"] = {
-                        "config": deepcopy(cfg["short"]),
-                        "score": score_short,
-                    }
+                    self.hm.set_notes(side, worst_row, eval_["notes"][side])
+                    self.hm.set_score(side, worst_row, score)
                     json.dump(
-                        self.hm,
+                        self.hm.to_dict(),
                         open(f"{self.results_fpath}hm_{cfg['config_no']:06}.json", "w"),
                         indent=4,
                         sort_keys=True,
                     )
-            best_key_long = sorted(
-                self.hm,
-                key=lambda x: self.hm[x]["long"]["score"]
-                if type(self.hm[x]["long"]["score"]) != str
-                else np.inf,
-            )[0]
-            best_key_short = sorted(
-                self.hm,
-                key=lambda x: self.hm[x]["short"]["score"]
-                if type(self.hm[x]["short"]["score"]) != str
-                else np.inf,
-            )[0]
-            best_config = {
-                "long": deepcopy(self.hm[best_key_long]["long"]["config"]),
-                "short": deepcopy(self.hm[best_key_short]["short"]["config"]),
-            }
-            best_config["result"] = {
-                "symbol": f"{len(self.symbols)}_symbols",
-                "exchange": self.config["exchange"],
-                "start_date": self.config["start_date"],
-                "end_date": self.config["end_date"],
-            }
+            # None while no harmony has been scored yet
+            best_row_long, best_row_short = self.hm.best(0), self.hm.best(1)
             tmp_fname = f"{self.results_fpath}{cfg['config_no']:06}_best_config"
             is_better = False
-            if self.do_long and score_long <= self.hm[best_key_long]["long"]["score"]:
+            if (
+                self.do_long
+                and best_row_long is not None
+                and score_long <= self.hm.scores[0, best_row_long]
+            ):
                 is_better = True
                 logging.info(
                     f"i{cfg['config_no']} - new best config long, score {score_long:.7f} "
-                    + f"adg {adg_realized_long_mean:.6f} "
-                    + f"PAD mean {PAD_mean_long_raw:.6f} "
-                    + f"PAD std {pa_distance_std_long_raw:.5f} "
-                    + f"eqbal ratio std {eqbal_ratio_std_long_mean:.6f}"
+                    + f"adg {scores['adg_realized_long_mean']:.6f} "
+                    + f"PAD mean {scores['PAD_mean_long_raw']:.6f} "
+                    + f"PAD std {scores['pa_distance_std_long_raw']:.5f} "
+                    + f"eqbal ratio std {scores['eqbal_ratio_std_long_mean']:.6f}"
                 )
                 tmp_fname += "_long"
                 json.dump(
@@ -385,14 +737,18 @@ class HarmonySearch:
                     indent=4,
                     sort_keys=True,
                 )
-            if self.do_short and score_short <= self.hm[best_key_short]["short"]["score"]:
+            if (
+                self.do_short
+                and best_row_short is not None
+                and score_short <= self.hm.scores[1, best_row_short]
+            ):
                 is_better = True
                 logging.info(
                     f"i{cfg['config_no']} - new best config short, score {score_short:.7f} "
-                    + f"adg {adg_realized_short_mean:.6f} "
-                    + f"PAD mean {PAD_mean_short_raw:.6f} "
-                    + f"PAD std {pa_distance_std_short_raw:.5f} "
-                    + f"eqbal ratio std {eqbal_ratio_std_short_mean:.6f}"
+                    + f"adg {scores['adg_realized_short_mean']:.6f} "
+                    + f"PAD mean {scores['PAD_mean_short_raw']:.6f} "
+                    + f"PAD std {scores['pa_distance_std_short_raw']:.5f} "
+                    + f"eqbal ratio std {scores['eqbal_ratio_std_short_mean']:.6f}"
                 )
                 tmp_fname += "_short"
                 json.dump(
@@ -402,9 +758,27 @@ class HarmonySearch:
                     sort_keys=True,
                 )
             if is_better:
+                best_config = {
+                    "long": self.hm.config(0, best_row_long),
+                    "short": self.hm.config(1, best_row_short),
+                }
+                best_config["result"] = {
+                    "symbol": f"{len(self.symbols)}_symbols",
+                    "exchange": self.config["exchange"],
+                    "start_date": self.config["start_date"],
+                    "end_date": self.config["end_date"],
+                }
                 dump_live_config(best_config, tmp_fname + ".json")
             elif cfg["config_no"] % 25 == 0:
-                logging.info(f"i{cfg['config_no']}")
+                logging.info(
+                    f"i{cfg['config_no']}"
+                    + (f" - n pruned {self.n_pruned}" if self.pruning else "")
+                    + (
+                        f" - n screened out {self.n_screened_out}"
+                        if len(self.fidelities) > 1
+                        else ""
+                    )
+                )
             results["config_no"] = cfg["config_no"]
             with open(self.results_fpath + "all_results.txt", "a") as f:
                 f.write(
@@ -414,234 +788,670 @@ class HarmonySearch:
                     + "\n"
                 )
             del self.unfinished_evals[id_key]
-        self.workers[wi] = None
 
-    def start_new_harmony(self, wi: int):
-        self.iter_counter += 1  # up iter counter on each new config started
-        template = get_template_live_config(self.config["passivbot_mode"])
-        new_harmony = {
-            **{
-                "long": deepcopy(template["long"]),
-                "short": deepcopy(template["short"]),
-            },
-            **{
-                k: self.config[k]
-                for k in ["starting_balance", "latency_simulation_ms", "market_type"]
-            },
-            **{"symbol": self.symbols[0], "config_no": self.iter_counter},
+    def screen(self, id_key: int, results: dict):
+        """
+        eval has finished all symbols at a rung below the last; promotes it to the next rung if,
+        for any enabled side, its score is in the top promotion fraction of all scores at the rung,
+        itself included. otherwise it is dropped
+        """
+        eval_ = self.unfinished_evals[id_key]
+        rung = eval_["rung"]
+        scores = self.calc_scores(results)
+        promoted = False
+        for side, side_name in enumerate(["long", "short"]):
+            score = scores[f"score_{side_name}"]
+            # non-finite scores would break the order of rung scores
+            if not getattr(self, f"do_{side_name}") or not np.isfinite(score):
+                continue
+            rung_scores = self.rung_scores[rung][side]
+            rank = bisect.bisect_left(rung_scores, score)
+            rung_scores.insert(rank, score)
+            if rank < np.ceil(self.promotion_fraction * len(rung_scores)):
+                promoted = True
+        if promoted:
+            logging.debug(
+                f"promoted harmony {id_key} to fidelity {self.fidelities[rung + 1]} - score long "
+                + f"{scores['score_long']:.7f} score short {scores['score_short']:.7f}"
+            )
+            eval_["rung"] += 1
+            eval_["single_results"] = {}
+        else:
+            logging.debug(f"screened out harmony {id_key} at fidelity {self.fidelities[rung]}")
+            self.n_screened_out += 1
+            del self.unfinished_evals[id_key]
+
+    def calc_scores(self, results: dict) -> dict:
+        # results: {symbol: analysis}
+        adgs_long = [v["adg_long"] for v in results.values()]
+        adg_mean_long = np.mean(adgs_long)
+        pa_distance_std_long_raw = np.mean([v["pa_distance_std_long"] for v in results.values()])
+        pa_distance_std_long = np.mean(
+            [
+                max(self.config["maximum_pa_distance_std_long"], v["pa_distance_std_long"])
+                for v in results.values()
+            ]
+        )
+        PAD_mean_long_raw = np.mean([v["pa_distance_mean_long"] for v in results.values()])
+        PAD_mean_long = np.mean(
+            [
+                max(self.config["maximum_pa_distance_mean_long"], v["pa_distance_mean_long"])
+                for v in results.values()
+            ]
+        )
+        adg_DGstd_ratios_long = [v["adg_DGstd_ratio_long"] for v in results.values()]
+        adg_DGstd_ratios_long_mean = np.mean(adg_DGstd_ratios_long)
+        adgs_short = [v["adg_short"] for v in results.values()]
+        adg_mean_short = np.mean(adgs_short)
+        pa_distance_std_short_raw = np.mean([v["pa_distance_std_short"] for v in results.values()])
+
+        pa_distance_std_short = np.mean(
+            [
+                max(self.config["maximum_pa_distance_std_short"], v["pa_distance_std_short"])
+                for v in results.values()
+            ]
+        )
+        PAD_mean_short_raw = np.mean([v["pa_distance_mean_short"] for v in results.values()])
+
+        PAD_mean_short = np.mean(
+            [
+                max(self.config["maximum_pa_distance_mean_short"], v["pa_distance_mean_short"])
+                for v in results.values()
+            ]
+        )
+        adg_DGstd_ratios_short = [v["adg_DGstd_ratio_short"] for v in results.values()]
+        adg_DGstd_ratios_short_mean = np.mean(adg_DGstd_ratios_short)
+        eqbal_ratios_std_long = [v["equity_balance_ratio_std_long"] for v in results.values()]
+        eqbal_ratios_std_short = [v["equity_balance_ratio_std_short"] for v in results.values()]
+        eqbal_ratio_std_long_mean = np.mean(eqbal_ratios_std_long)
+        eqbal_ratio_std_short_mean = np.mean(eqbal_ratios_std_short)
+        adgs_realized_long = [v["adg_realized_per_exposure_long"] for v in results.values()]
+        adgs_realized_short = [v["adg_realized_per_exposure_short"] for v in results.values()]
+        adg_realized_long_mean = np.mean(adgs_realized_long)
+        adg_realized_short_mean = np.mean(adgs_realized_short)
+        loss_profit_ratio_long_mean = np.mean(
+            [
+                max(self.config["maximum_loss_profit_ratio_long"], v["loss_profit_ratio_long"])
+                for v in results.values()
+            ]
+        )
+        loss_profit_ratio_short_mean = np.mean(
+            [
+                max(self.config["maximum_loss_profit_ratio_short"], v["loss_profit_ratio_short"])
+                for v in results.values()
+            ]
+        )
+
+        if self.config["score_formula"] == "adg_PAD_mean":
+            score_long = -adg_mean_long * min(
+                1.0, self.config["maximum_pa_distance_mean_long"] / PAD_mean_long
+            )
+            score_short = -adg_mean_short * min(
+                1.0, self.config["maximum_pa_distance_mean_short"] / PAD_mean_short
+            )
+        elif self.config["score_formula"] == "adg_realized_PAD_mean":
+            score_long = -adg_realized_long_mean / max(
+                self.config["maximum_pa_distance_mean_long"], PAD_mean_long
+            )
+            score_short = -adg_realized_short_mean / max(
+                self.config["maximum_pa_distance_mean_short"], PAD_mean_short
+            )
+        elif self.config["score_formula"] == "adg_realized_PAD_std":
+            score_long = -adg_realized_long_mean / max(
+                self.config["maximum_pa_distance_std_long"], pa_distance_std_long
+            )
+            score_short = -adg_realized_short_mean / max(
+                self.config["maximum_pa_distance_std_short"], pa_distance_std_short
+            )
+
+        elif self.config["score_formula"] == "adg_PAD_std":
+            score_long = -adg_mean_long / max(
+                self.config["maximum_pa_distance_std_long"], pa_distance_std_long
+            )
+            score_short = -adg_mean_short / max(
+                self.config["maximum_pa_distance_std_short"], pa_distance_std_short
+            )
+        elif self.config["score_formula"] == "adg_DGstd_ratio":
+            score_long = -adg_DGstd_ratios_long_mean
+            score_short = -adg_DGstd_ratios_short_mean
+        elif self.config["score_formula"] == "adg_mean":
+            score_long = -adg_mean_long
+            score_short = -adg_mean_short
+        elif self.config["score_formula"] == "adg_min":
+            score_long = -min(adgs_long)
+            score_short = -min(adgs_short)
+        elif self.config["score_formula"] == "adg_realized_wf_min":
+            # worst walk forward window per symbol
+            score_long = -np.mean(
+                [v["adg_realized_per_exposure_wf_min_long"] for v in results.values()]
+            )
+            score_short = -np.mean(
+                [v["adg_realized_per_exposure_wf_min_short"] for v in results.values()]
+            )
+        elif self.config["score_formula"] == "adg_PAD_std_min":
+            # best worst score
+            scores_long = [
+                v["adg_long"]
+                / max(v["pa_distance_std_long"], self.config["maximum_pa_distance_std_long"])
+                for v in results.values()
+            ]
+            score_long = -min(scores_long)
+            scores_short = [
+                v["adg_short"]
+                / max(v["pa_distance_std_short"], self.config["maximum_pa_distance_std_short"])
+                for v in results.values()
+            ]
+            score_short = -min(scores_short)
+        else:
+            raise Exception(f"unknown score formula {self.config['score_formula']}")
+
+        score_long *= self.config["maximum_loss_profit_ratio_long"] / max(
+            loss_profit_ratio_long_mean, self.config["maximum_loss_profit_ratio_long"]
+        )
+        score_short *= self.config["maximum_loss_profit_ratio_short"] / max(
+            loss_profit_ratio_short_mean, self.config["maximum_loss_profit_ratio_short"]
+        )
+
+        return {
+            "score_long": score_long,
+            "score_short": score_short,
+            "adg_mean_long": adg_mean_long,
+            "adg_mean_short": adg_mean_short,
+            "adg_realized_long_mean": adg_realized_long_mean,
+            "adg_realized_short_mean": adg_realized_short_mean,
+            "PAD_mean_long": PAD_mean_long,
+            "PAD_mean_short": PAD_mean_short,
+            "PAD_mean_long_raw": PAD_mean_long_raw,
+            "PAD_mean_short_raw": PAD_mean_short_raw,
+            "pa_distance_std_long": pa_distance_std_long,
+            "pa_distance_std_short": pa_distance_std_short,
+            "pa_distance_std_long_raw": pa_distance_std_long_raw,
+            "pa_distance_std_short_raw": pa_distance_std_short_raw,
+            "eqbal_ratio_std_long_mean": eqbal_ratio_std_long_mean,
+            "eqbal_ratio_std_short_mean": eqbal_ratio_std_short_mean,
         }
-        for side in ["long", "short"]:
-            new_harmony[side]["enabled"] = getattr(self, f"do_{side}")
-            new_harmony[side]["backwards_tp"] = self.config[f"backwards_tp_{side}"]
-        for key in self.long_bounds:
-            if np.random.random() < self.hm_considering_rate:
-                # take note randomly from harmony memory
-                new_note_long = self.hm[np.random.choice(list(self.hm))]["long"]["config"][key]
-                new_note_short = self.hm[np.random.choice(list(self.hm))]["short"]["config"][key]
-                if np.random.random() < self.pitch_adjusting_rate:
-                    # tweak note
-                    new_note_long = new_note_long + self.bandwidth * (np.random.random() - 0.5) * abs(
-                        self.long_bounds[key][0] - self.long_bounds[key][1]
-                    )
-                    new_note_short = new_note_short + self.bandwidth * (
-                        np.random.random() - 0.5
-                    ) * abs(self.short_bounds[key][0] - self.short_bounds[key][1])
-                # ensure note is within bounds
-                new_note_long = max(
-                    self.long_bounds[key][0], min(self.long_bounds[key][1], new_note_long)
-                )
-                new_note_short = max(
-                    self.short_bounds[key][0], min(self.short_bounds[key][1], new_note_short)
-                )
-            else:
-                # new random note
-                new_note_long = np.random.uniform(self.long_bounds[key][0], self.long_bounds[key][1])
-                new_note_short = np.random.uniform(
-                    self.short_bounds[key][0], self.short_bounds[key][1]
-                )
-            new_harmony["long"][key] = new_note_long
-            new_harmony["short"][key] = new_note_short
+
+    def update_best_single_results(self, symbol: str, result: dict):
+        # most optimistic value seen so far for each scoring metric, per symbol
+        if symbol not in self.best_single_results:
+            self.best_single_results[symbol] = {k: result[k] for k in self.higher_is_better}
+            self.best_single_results[symbol].update({k: result[k] for k in self.lower_is_better})
+            return
+        best = self.best_single_results[symbol]
+        for k in self.higher_is_better:
+            best[k] = max(best[k], result[k])
+        for k in self.lower_is_better:
+            best[k] = min(best[k], result[k])
+
+    def is_hopeless(self, results: dict) -> bool:
+        """
+        results: {symbol: analysis} for the symbols finished so far
+        scores the eval as if the remaining symbols reached the best values seen for them so far.
+        hopeless if even that score cannot replace the worst harmony for any enabled side
+        scores are an adg like numerator, negated, times positive factors falling with PAD and
+        loss profit ratio. the best values only bound the score while it is negative; with a
+        numerator <= 0, higher PAD and loss profit ratio would score better, so no pruning then
+        lossy heuristic: adg has no upper bound, so an eval setting a new best on a remaining symbol
+        may be pruned although it would have replaced the worst harmony
+        see scripts/pruning_check.py
+        """
+        sides = [side for side in ["long", "short"] if getattr(self, f"do_{side}")]
+        if not sides or any(s not in self.best_single_results for s in self.symbols):
+            return False
+        optimistic_results = {
+            s: results[s] if s in results else self.best_single_results[s] for s in self.symbols
+        }
+        scores = self.calc_scores(optimistic_results)
+        for side in sides:
+            side_i = ["long", "short"].index(side)
+            if self.hm.n_scored(side_i) < self.n_harmonies:
+                return False
+            if not scores[f"score_{side}"] < 0.0:
+                return False
+            if scores[f"score_{side}"] < self.hm.scores[side_i, self.hm.worst(side_i)]:
+                return False
+        return True
+
+    def next_symbol(self, symbols) -> str:
+        # with pruning, symbols that often prune evals and are cheap to backtest go first
+        if not self.pruning:
+            return sorted(symbols)[0]
+        return sorted(
+            symbols, key=lambda s: (-(self.symbol_prunes[s] + 1) / self.n_ticks[s], s)
+        )[0]
+
+    def start_jobs(self, wi: int, jobs: [tuple]):
+        # jobs: [(id_key, symbol, rung)], all for the same symbol and rung
+        id_keys = [id_key for id_key, _, _ in jobs]
+        notes = np.array([self.unfinished_evals[id_key]["notes"] for id_key in id_keys])
+        symbols = [symbol for _, symbol, _ in jobs]
+        rung = jobs[0][2]
+        if self.parallel_symbols:
+            # one job covers all symbols the eval has left
+            id_key = id_keys[0]
+            symbols = sorted(set(self.symbols) - set(self.unfinished_evals[id_key]["single_results"]))
+            self.unfinished_evals[id_key]["in_progress"].update(symbols)
+            id_keys = [id_key for _ in symbols]
+            func = backtest_symbols_wrap
+            args = (notes[0], [self.symbols.index(s) for s in symbols], id_key, rung)
+        elif len(jobs) == 1:
+            func = backtest_wrap
+            args = (notes[0], self.symbols.index(symbols[0]), id_keys[0], rung)
+        else:
+            func, args = backtest_batch_wrap, (notes, self.symbols.index(symbols[0]), id_keys, rung)
+        self.workers[wi] = {"id_keys": id_keys, "symbols": symbols, "rung": rung}
+        # callbacks run in the pool's result thread; the main loop picks results up from the queue
+        self.pool.apply_async(
+            timed_task,
+            args=(func, args),
+            callback=lambda result, wi=wi: self.finished_tasks.put((wi, *result)),
+            error_callback=lambda e, wi=wi: self.finished_tasks.put((wi, e, 0.0)),
+        )
+
+    def start_new_harmony(self) -> tuple:
+        self.iter_counter += 1  # up iter counter on each new config started
+        notes = self.hm.sample(
+            self.bounds, self.hm_considering_rate, self.pitch_adjusting_rate, self.bandwidth
+        )
+        long_config = self.hm.notes_config(0, notes[0])
+        short_config = self.hm.notes_config(1, notes[1])
         logging.debug(
-            f"starting new harmony {new_harmony['config_no']} - long "
-            + " ".join([str(round_dynamic(e[1], 3)) for e in sorted(new_harmony["long"].items())])
+            f"starting new harmony {self.iter_counter} - long "
+            + " ".join([str(round_dynamic(e[1], 3)) for e in sorted(long_config.items())])
             + " - short: "
-            + " ".join([str(round_dynamic(e[1], 3)) for e in sorted(new_harmony["short"].items())])
+            + " ".join([str(round_dynamic(e[1], 3)) for e in sorted(short_config.items())])
         )
-
-        new_harmony["market_specific_settings"] = self.market_specific_settings[new_harmony["symbol"]]
-        new_harmony[
-            "ticks_cache_fname"
-        ] = f"{self.bt_dir}/{new_harmony['symbol']}/{self.ticks_cache_fname}"
-        new_harmony["passivbot_mode"] = self.config["passivbot_mode"]
-        self.workers[wi] = {
-            "config": deepcopy(new_harmony),
-            "task": self.pool.apply_async(
-                backtest_wrap, args=(deepcopy(new_harmony), self.ticks_caches)
-            ),
-            "id_key": new_harmony["config_no"],
-        }
-        self.unfinished_evals[new_harmony["config_no"]] = {
-            "config": deepcopy(new_harmony),
+        symbol = self.next_symbol(self.symbols)
+        self.unfinished_evals[self.iter_counter] = {
+            "notes": notes,
+            "initial_eval_key": None,
+            "rung": 0,
             "single_results": {},
-            "in_progress": set([self.symbols[0]]),
+            "in_progress": set([symbol]),
         }
+        return self.iter_counter, symbol, 0
 
-    def start_new_initial_eval(self, wi: int, hm_key: str):
+    def start_new_initial_eval(self) -> tuple:
+        # evaluates the next row of harmony memory not yet started
         self.iter_counter += 1  # up iter counter on each new config started
-        config = {
-            **{
-                "long": deepcopy(self.hm[hm_key]["long"]["config"]),
-                "short": deepcopy(self.hm[hm_key]["short"]["config"]),
-            },
-            **{
-                k: self.config[k]
-                for k in ["starting_balance", "latency_simulation_ms", "market_type"]
-            },
-            **{"symbol": self.symbols[0], "initial_eval_key": hm_key, "config_no": self.iter_counter},
-        }
-        line = f"starting new initial eval {config['config_no']} of {self.n_harmonies} "
+        row = self.hm.n_started
+        self.hm.n_started += 1
+        line = f"starting new initial eval {self.iter_counter} of {self.n_harmonies} "
         if self.do_long:
             line += " - long: " + " ".join(
                 [
                     f"{e[0][:2]}{e[0][-2:]}" + str(round_dynamic(e[1], 3))
-                    for e in sorted(self.hm[hm_key]["long"]["config"].items())
+                    for e in sorted(self.hm.config(0, row).items())
                 ]
             )
         if self.do_short:
             line += " - short: " + " ".join(
                 [
                     f"{e[0][:2]}{e[0][-2:]}" + str(round_dynamic(e[1], 3))
-                    for e in sorted(self.hm[hm_key]["short"]["config"].items())
+                    for e in sorted(self.hm.config(1, row).items())
                 ]
             )
         logging.info(line)
-
-        config["market_specific_settings"] = self.market_specific_settings[config["symbol"]]
-        config["ticks_cache_fname"] = f"{self.bt_dir}/{config['symbol']}/{self.ticks_cache_fname}"
-        config["passivbot_mode"] = self.config["passivbot_mode"]
-
-        self.workers[wi] = {
-            "config": deepcopy(config),
-            "task": self.pool.apply_async(backtest_wrap, args=(deepcopy(config), self.ticks_caches)),
-            "id_key": config["config_no"],
-        }
-        self.unfinished_evals[config["config_no"]] = {
-            "config": deepcopy(config),
+        symbol = self.next_symbol(self.symbols)
+        # harmony memory needs scores on all data, so initial evals are not screened
+        rung = len(self.fidelities) - 1
+        self.unfinished_evals[self.iter_counter] = {
+            "notes": self.hm.notes[:, row].copy(),
+            "initial_eval_key": row,
+            "rung": rung,
             "single_results": {},
-            "in_progress": set([self.symbols[0]]),
+            "in_progress": set([symbol]),
         }
-        self.hm[hm_key]["long"]["score"] = "in_progress"
-        self.hm[hm_key]["short"]["score"] = "in_progress"
+        return self.iter_counter, symbol, rung
 
     def run(self):
         try:
             self.run_()
         finally:
+            if self.pool is not None:
+                self.pool.terminate()
+                self.pool.join()
             for s in self.shms:
                 self.shms[s].close()
                 self.shms[s].unlink()
+            self.shms = {}
+            if self.result_cache_dirpath is not None:
+                n_evicted = evict_result_cache(self.result_cache_dirpath, self.result_cache_max_bytes)
+                if n_evicted:
+                    logging.info(f"evicted {n_evicted} results from result cache")
 
-    def run_(self):
-
-        # initialize ticks cache
+    def load_ticks_caches(self) -> dict:
         """
-        if self.n_cpus >= len(self.symbols) or (
-            "cache_ticks" in self.config and self.config["cache_ticks"]
-        ):
+        copies each symbol's ticks cache into shared memory once, to be attached by all workers.
+        if shared memory is too small, workers memory map the cache file instead.
+        returns {ticks_cache_fname: spec} for init_worker()
         """
-        if False:
-            for s in self.symbols:
-                ticks = np.load(f"{self.bt_dir}/{s}/{self.ticks_cache_fname}")
+        ticks_specs = {}
+        for s in self.symbols:
+            fname = f"{self.bt_dir}/{s}/{self.ticks_cache_fname}"
+            if self.config["ohlcv"]:
+                ticks = np.load(fname, mmap_mode="r")
+                mmap_spec = ("mmap", fname)
+            else:
+                caches_dirpath = f"{self.bt_dir}/{s}/caches/"
+                start_date, end_date = self.config["start_date"], self.config["end_date"]
+                price_step = self.market_specific_settings[s]["price_step"]
+                ticks = load_ticks_cache(
+                    caches_dirpath, start_date, end_date, self.compact_ticks, price_step
+                )
+                mmap_spec = (
+                    "cache", caches_dirpath, start_date, end_date, self.compact_ticks, price_step
+                )
+            self.ticks_hashes[s] = calc_ticks_hash(ticks)
+            compact_meta = None
+            if type(ticks) == dict:
+                if ticks["price_scale"] == 0.0:
+                    logging.info(f"{s} prices are not multiples of price step, compacted to float32")
+                compact_meta = {k: v for k, v in ticks.items() if k not in ["prices", "qtys"]}
+                ticks = ticks["prices"]
+            self.n_ticks[s] = len(ticks)
+            if os.path.isdir("/dev/shm"):
+                stat = os.statvfs("/dev/shm")
+                shm_room = stat.f_bavail * stat.f_frsize
+            else:
+                shm_room = np.inf
+            if ticks.nbytes < shm_room:
                 self.shms[s] = shared_memory.SharedMemory(create=True, size=ticks.nbytes)
-                self.ticks_caches[s] = np.ndarray(
-                    ticks.shape, dtype=ticks.dtype, buffer=self.shms[s].buf
+                shared = np.ndarray(ticks.shape, dtype=ticks.dtype, buffer=self.shms[s].buf)
+                shared[:] = ticks[:]
+                del shared
+                ticks_specs[fname] = (
+                    "shm", self.shms[s].name, ticks.shape, ticks.dtype.str, compact_meta
                 )
-                self.ticks_caches[s][:] = ticks[:]
-                del ticks
                 logging.info(f"loaded {s} ticks into shared memory")
+            else:
+                ticks_specs[fname] = mmap_spec
+                logging.info(f"too little shared memory for {s} ticks, memory mapping {fname}")
+            del ticks
+        return ticks_specs
 
-        # initialize harmony memory
-        for _ in range(self.n_harmonies):
-            cfg_long = deepcopy(self.config["long"])
-            cfg_short = deepcopy(self.config["short"])
-            for k in self.long_bounds:
-                cfg_long[k] = np.random.uniform(self.long_bounds[k][0], self.long_bounds[k][1])
-                cfg_short[k] = np.random.uniform(self.short_bounds[k][0], self.short_bounds[k][1])
-            hm_key = str(time()) + str(np.random.random())
-            self.hm[hm_key] = {
-                "long": {"score": "not_started", "config": cfg_long},
-                "short": {"score": "not_started", "config": cfg_short},
+    def make_warmup_configs(self) -> [dict]:
+        # one config per symbol, typed like those made in start_new_harmony()
+        template = get_template_live_config(self.config["passivbot_mode"])
+        warmup_configs = []
+        for symbol in self.symbols:
+            config = {
+                **{"long": deepcopy(template["long"]), "short": deepcopy(template["short"])},
+                **{
+                    k: self.config[k]
+                    for k in ["starting_balance", "latency_simulation_ms", "market_type"]
+                },
+                **{"symbol": symbol, "config_no": 0},
             }
+            for side in ["long", "short"]:
+                config[side]["enabled"] = getattr(self, f"do_{side}")
+                config[side]["backwards_tp"] = self.config[f"backwards_tp_{side}"]
+                bounds = getattr(self, f"{side}_bounds")
+                for key in bounds:
+                    config[side][key] = float(np.mean(bounds[key]))
+            config.update(self.market_specific_settings[symbol])
+            config["passivbot_mode"] = self.config["passivbot_mode"]
+            warmup_configs.append(config)
+        return warmup_configs
 
-        # add starting configs
-        for side in ["long", "short"]:
-            hm_keys = list(self.hm)
-            bounds = getattr(self, f"{side}_bounds")
-            for cfg in self.starting_configs:
-                cfg = {k: max(bounds[k][0], min(bounds[k][1], cfg[side][k])) for k in bounds}
-                cfg["enabled"] = getattr(self, f"do_{side}")
-                cfg["backwards_tp"] = self.config[f"backwards_tp_{side}"]
-                if cfg not in [self.hm[k][side]["config"] for k in self.hm]:
-                    self.hm[hm_keys.pop()][side]["config"] = deepcopy(cfg)
-
-        # start main loop
+    def make_worker_context(self) -> dict:
+        """
+        static part of every task, sent to each worker once at pool start
+        tasks then carry only notes, symbol indices into self.symbols and config_no
+        """
+        symbol_configs = []
+        for symbol in self.symbols:
+            config = {
+                **{
+                    k: self.config[k]
+                    for k in ["starting_balance", "latency_simulation_ms", "market_type"]
+                },
+                "symbol": symbol,
+            }
+            if self.walk_forward_window_days > 0.0:
+                config["walk_forward_window_days"] = self.walk_forward_window_days
+                config["walk_forward_step_days"] = self.walk_forward_step_days
+            if "neat_grid_template" in self.config and self.config["neat_grid_template"]:
+                config["neat_grid_template"] = True
+            config.update(self.market_specific_settings[symbol])
+            symbol_configs.append(config)
+        return {
+            "keys": self.hm.keys,
+            "base_configs": self.hm.base_configs,
+            "symbol_configs": symbol_configs,
+            "ticks_cache_fnames": [
+                f"{self.bt_dir}/{s}/{self.ticks_cache_fname}" for s in self.symbols
+            ],
+            "ticks_hashes": [self.ticks_hashes[s] for s in self.symbols],
+            "result_cache_dirpath": self.result_cache_dirpath,
+            "result_keys": self.result_keys,
+            "fidelities": self.fidelities,
+            # ticks before fidelity windows, to warm up emas
+            "max_span_minutes": max(
+                bounds[k][1]
+                for bounds in [self.long_bounds, self.short_bounds]
+                for k in ["ema_span_0", "ema_span_1"]
+            ),
+        }
+
+    def run_(self):
+
+        # load ticks caches once and start workers attached to them
+        ticks_specs = self.load_ticks_caches()
+
+        # compile kernels before forking, so workers inherit them instead of each jitting anew
+        warmup_configs = self.make_warmup_configs()
+        walk_forward = self.walk_forward_window_days > 0.0
+        elapsed = sum(
+            warmup_backtest(
+                config, self.batch_size, walk_forward, self.parallel_symbols, self.compact_ticks
+            )
+            for config in warmup_configs
+        )
+        logging.info(f"warmed up backtest kernels in {elapsed:.2f} seconds")
+        if self.parallel_symbols:
+            logging.info(f"backtesting all symbols per job, {self.n_threads} threads per worker")
+        self.pool = Pool(
+            processes=self.n_cpus,
+            initializer=init_worker,
+            initargs=(
+                ticks_specs,
+                warmup_configs,
+                self.batch_size,
+                walk_forward,
+                self.n_threads,
+                self.make_worker_context(),
+            ),
+        )
+
+        if self.resume_dirpath is not None:
+            self.load_checkpoint()
+        else:
+            # initialize harmony memory
+            self.hm.notes[:] = np.random.uniform(
+                self.bounds[:, None, :, 0],
+                self.bounds[:, None, :, 1],
+                size=self.hm.notes.shape,
+            )
+
+            # add starting configs, last rows first
+            for side, side_name in enumerate(["long", "short"]):
+                row = self.n_harmonies
+                bounds = getattr(self, f"{side_name}_bounds")
+                for cfg in self.starting_configs:
+                    notes = np.array(
+                        [
+                            max(bounds[k][0], min(bounds[k][1], cfg[side_name][k]))
+                            for k in self.hm.keys
+                        ]
+                    )
+                    if not self.hm.contains(side, notes):
+                        row -= 1
+                        self.hm.set_notes(side, row, notes)
+
+        # start main loop; dispatch to every free task slot, then wait for the next finished task
+        sts = time()
+        n_tasks_done = 0
+        last_report_ts = time()
+        last_checkpoint_ts = time()
         while True:
-            # first check for finished jobs
             for wi in range(len(self.workers)):
-                if self.workers[wi] is not None and self.workers[wi]["task"].ready():
-                    self.post_process(wi)
-            if self.iter_counter >= self.iters + self.n_harmonies:
-                if all(worker is None for worker in self.workers):
-                    # break when all work is finished
+                if self.workers[wi] is None and not self.start_next_jobs(wi):
+                    # nothing to start until a running eval finishes
                     break
-            else:
-                # check for idle workers
-                for wi in range(len(self.workers)):
-                    if self.workers[wi] is not None:
-                        continue
-                    # a worker is idle; give it a job
-                    for id_key in self.unfinished_evals:
-                        # check if unfinished evals
-                        missing_symbols = set(self.symbols) - (
-                            set(self.unfinished_evals[id_key]["single_results"])
-                            | self.unfinished_evals[id_key]["in_progress"]
-                        )
-                        if missing_symbols:
-                            # start eval for missing symbol
-                            symbol = sorted(missing_symbols)[0]
-                            config = deepcopy(self.unfinished_evals[id_key]["config"])
-                            config["symbol"] = symbol
-                            config["market_specific_settings"] = self.market_specific_settings[
-                                config["symbol"]
-                            ]
-                            config[
-                                "ticks_cache_fname"
-                            ] = f"{self.bt_dir}/{config['symbol']}/{self.ticks_cache_fname}"
-                            config["passivbot_mode"] = self.config["passivbot_mode"]
-                            self.workers[wi] = {
-                                "config": config,
-                                "task": self.pool.apply_async(
-                                    backtest_wrap, args=(config, self.ticks_caches)
-                                ),
-                                "id_key": id_key,
-                            }
-                            self.unfinished_evals[id_key]["in_progress"].add(symbol)
-                            break
-                    else:
-                        # means all symbols are accounted for in all unfinished evals; start new eval
-                        for hm_key in self.hm:
-                            if self.hm[hm_key]["long"]["score"] == "not_started":
-                                # means initial evals not yet done
-                                self.start_new_initial_eval(wi, hm_key)
-                                break
-                        else:
-                            # means initial evals are done; start new harmony
-                            self.start_new_harmony(wi)
-                        sleep(0.25)
+            if all(worker is None for worker in self.workers):
+                # break when all work is finished
+                break
+            wi, results, seconds = self.finished_tasks.get()
+            if isinstance(results, Exception):
+                raise results
+            self.task_seconds += seconds
+            n_tasks_done += 1
+            self.post_process(wi, results)
+            if time() - last_report_ts > 60.0:
+                self.log_utilization(time() - sts, n_tasks_done)
+                last_report_ts = time()
+            if (
+                self.checkpoint_interval_seconds > 0.0
+                and time() - last_checkpoint_ts > self.checkpoint_interval_seconds
+            ):
+                self.dump_checkpoint()
+                last_checkpoint_ts = time()
+        self.log_utilization(time() - sts, n_tasks_done)
+        if self.checkpoint_interval_seconds > 0.0:
+            self.dump_checkpoint()
 
+    def start_next_jobs(self, wi: int) -> bool:
+        """
+        gives free task slot wi its next job; returns False if there is nothing to start
+        up to batch_size configs for the same symbol and rung are backtested together
+        """
+        jobs = []
+        for id_key in self.unfinished_evals:
+            # check if unfinished evals
+            missing_symbols = set(self.symbols) - (
+                set(self.unfinished_evals[id_key]["single_results"])
+                | self.unfinished_evals[id_key]["in_progress"]
+            )
+            if missing_symbols:
+                # start eval for missing symbol
+                symbol = self.next_symbol(missing_symbols)
+                rung = self.unfinished_evals[id_key]["rung"]
+                if jobs and jobs[0][1:] != (symbol, rung):
+                    continue
+                jobs.append((id_key, symbol, rung))
+                self.unfinished_evals[id_key]["in_progress"].add(symbol)
+                if len(jobs) >= self.batch_size:
+                    break
+        if not jobs:
+            # means all symbols are accounted for in all unfinished evals; start new evals
+            while len(jobs) < self.batch_size and self.iter_counter < self.iters + self.n_harmonies:
+                if self.hm.n_started < self.n_harmonies:
+                    # means initial evals not yet done
+                    jobs.append(self.start_new_initial_eval())
+                else:
+                    # means initial evals are done; start new harmony
+                    jobs.append(self.start_new_harmony())
+        if not jobs:
+            return False
+        self.start_jobs(wi, jobs)
+        return True
+
+    def dump_checkpoint(self):
+        """
+        atomically writes all optimizer state to {results_fpath}checkpoint.json
+        called between finished tasks, so state is consistent; tasks in progress are not saved,
+        their evals keep the symbols already finished and the rest are backtested again on resume
+        """
+        rng_state = np.random.get_state()
+        all_results_fpath = self.results_fpath + "all_results.txt"
+        checkpoint = {
+            "config": self.config,
+            "iter_counter": self.iter_counter,
+            "hm_notes": self.hm.notes.tolist(),
+            "hm_scores": self.hm.scores.tolist(),
+            "hm_n_started": self.hm.n_started,
+            "rng_state": [rng_state[0], rng_state[1].tolist(), *rng_state[2:]],
+            "unfinished_evals": {
+                str(id_key): {
+                    "notes": eval_["notes"].tolist(),
+                    "initial_eval_key": eval_["initial_eval_key"],
+                    "rung": eval_["rung"],
+                    "single_results": eval_["single_results"],
+                }
+                for id_key, eval_ in self.unfinished_evals.items()
+            },
+            "rung_scores": self.rung_scores,
+            "n_screened_out": self.n_screened_out,
+            "n_pruned": self.n_pruned,
+            "symbol_prunes": self.symbol_prunes,
+            "best_single_results": self.best_single_results,
+            "ticks_hashes": self.ticks_hashes,
+            # results logged after the checkpoint are cut on resume, their evals are redone
+            "all_results_size": (
+                os.path.getsize(all_results_fpath) if os.path.exists(all_results_fpath) else 0
+            ),
+        }
+        fpath = self.results_fpath + "checkpoint.json"
+        with open(fpath + ".tmp", "w") as f:
+            json.dump(denumpyize(checkpoint), f)
+        os.replace(fpath + ".tmp", fpath)
+        logging.debug(f"dumped checkpoint at iter {self.iter_counter}")
+
+    def load_checkpoint(self):
+        # restores state dumped by dump_checkpoint(); ticks caches must be loaded first
+        checkpoint = json.load(open(self.results_fpath + "checkpoint.json"))
+        if checkpoint["ticks_hashes"] != self.ticks_hashes:
+            raise Exception("ticks caches differ from those of the checkpointed run, cannot resume")
+        self.iter_counter = checkpoint["iter_counter"]
+        self.hm.notes[:] = checkpoint["hm_notes"]
+        self.hm.scores[:] = checkpoint["hm_scores"]
+        self.hm.n_started = checkpoint["hm_n_started"]
+        for side in [0, 1]:
+            self.hm.rebuild_heaps(side)
+        rng_state = checkpoint["rng_state"]
+        np.random.set_state((rng_state[0], np.array(rng_state[1], dtype=np.uint32), *rng_state[2:]))
+        self.unfinished_evals = {
+            int(id_key): {
+                "notes": np.array(eval_["notes"]),
+                "initial_eval_key": eval_["initial_eval_key"],
+                "rung": eval_["rung"],
+                "single_results": eval_["single_results"],
+                "in_progress": set(),
+            }
+            for id_key, eval_ in checkpoint["unfinished_evals"].items()
+        }
+        self.n_pruned = checkpoint["n_pruned"]
+        self.symbol_prunes = checkpoint["symbol_prunes"]
+        self.best_single_results = checkpoint["best_single_results"]
+        self.rung_scores = checkpoint["rung_scores"]
+        self.n_screened_out = checkpoint["n_screened_out"]
+        all_results_fpath = self.results_fpath + "all_results.txt"
+        if os.path.exists(all_results_fpath):
+            with open(all_results_fpath, "r+") as f:
+                f.truncate(checkpoint["all_results_size"])
+        logging.info(
+            f"resumed from {self.results_fpath}checkpoint.json at iter {self.iter_counter}, "
+            + f"{len(self.unfinished_evals)} unfinished evals"
+        )
+
+    def log_utilization(self, elapsed: float, n_tasks_done: int):
+        # share of worker time spent in tasks rather than waiting on the coordinator
+        if elapsed <= 0.0 or n_tasks_done == 0:
+            return
+        logging.info(
+            f"worker utilization {self.task_seconds / (elapsed * self.n_cpus):.1%}, "
+            + f"{n_tasks_done / elapsed:.2f} tasks per second, {n_tasks_done} tasks done"
+        )
 
 async def main():
     logging.basicConfig(format="", level=os.environ.get("LOGLEVEL", "INFO"))
+    clear_stale_numba_cache()
+    if "NUMBA_THREADING_LAYER" not in os.environ:
+        # multi symbol kernels run in the coordinator for warmup, before workers are forked. tbb and
+        # omp thread pools do not survive fork; workqueue does, and each process runs one kernel at
+        # a time. set here, not on import, so other importers keep numba's default layer
+        numba.config.THREADING_LAYER = "workqueue"
 
     parser = argparse.ArgumentParser(
         prog="Optimize multi symbol", description="Optimize passivbot config multi symbol"
@@ -706,7 +1516,7 @@ async def main():
         required=False,
         dest="score_formula",
         default=None,
-        help="passivbot score formula options: [adg_PAD_mean, adg_PAD_std, adg_DGstd_ratio, adg_mean, adg_min, adg_PAD_std_min]",
+        help="passivbot score formula options: [adg_PAD_mean, adg_PAD_std, adg_DGstd_ratio, adg_mean, adg_min, adg_PAD_std_min, adg_realized_wf_min]",
     )
     parser.add_argument(
         "-oh",
@@ -714,8 +1524,28 @@ async def main():
         help="use 1m ohlcv instead of 1s ticks",
         action="store_true",
     )
+    parser.add_argument(
+        "--resume",
+        type=str,
+        required=False,
+        dest="resume",
+        default=None,
+        help="continue the run in given results dir from its checkpoint.  -i and -c may be changed",
+    )
     parser = add_argparse_args(parser)
     args = parser.parse_args()
+    if args.resume is not None:
+        checkpoint_fpath = os.path.join(args.resume, "checkpoint.json")
+        if not os.path.exists(checkpoint_fpath):
+            raise Exception(f"no checkpoint found in {args.resume}")
+        config = json.load(open(checkpoint_fpath))["config"]
+        if args.iters is not None:
+            config["iters"] = args.iters
+        if args.n_cpus is not None:
+            config["n_cpus"] = args.n_cpus
+        harmony_search = HarmonySearch(config, resume_dirpath=args.resume)
+        harmony_search.run()
+        return
     args.symbol = "BTCUSDT"  # dummy symbol
     config = await prepare_optimize_config(args)
     if args.score_formula is not None:
@@ -728,6 +1558,7 @@ async def main():
             "adg_PAD_std_min",
             "adg_realized_PAD_mean",
             "adg_realized_PAD_std",
+            "adg_realized_wf_min",
         ]:
             logging.error(f"unknown score formula {args.score_formula}")
             logging.error(f"using score formula {config['score_formula']}")
@@ -784,16 +1615,19 @@ async def main():
         logging.info(f"{line[0]: <{max([len(x[0]) for x in lines]) + 2}} {line[1]}")
     print()
 
-    # download ticks .npy file if missing
-    if config["ohlcv"]:
-        cache_fname = f"{config['start_date']}_{config['end_date']}_ohlcv_cache.npy"
-    else:
-        cache_fname = f"{config['start_date']}_{config['end_date']}_ticks_cache.npy"
+    # download ticks if missing from caches
+    cache_fname = f"{config['start_date']}_{config['end_date']}_ohlcv_cache.npy"
     exchange_name = config["exchange"] + ("_spot" if config["market_type"] == "spot" else "")
     config["symbols"] = sorted(config["symbols"])
     for symbol in config["symbols"]:
         cache_dirpath = os.path.join(config["base_dir"], exchange_name, symbol, "caches", "")
-        if not os.path.exists(cache_dirpath + cache_fname) or not os.path.exists(
+        if config["ohlcv"]:
+            cached = os.path.exists(cache_dirpath + cache_fname)
+        else:
+            cached = (
+                load_ticks_cache(cache_dirpath, config["start_date"], config["end_date"]) is not None
+            )
+        if not cached or not os.path.exists(
             cache_dirpath + "market_specific_settings.json"
         ):
             logging.info(f"fetching data {symbol}")
@@ -1,24 +1,58 @@
 from __future__ import annotations
 
+import glob
 import os
 
 import numpy as np
 
-if "NOJIT" in os.environ and os.environ["NOJIT"] == "true":
-    print("not using numba")
-
-    def njit(pyfunc=None, **kwargs):
-        def wrap(func):
-            return func
-
-        if pyfunc is not None:
-            return wrap(pyfunc)
-        else:
-            return wrap
-
-else:
-    print("using numba")
-    from numba import njit
+from njit_funcs_solvers import (
+    solve_linear_fractional,
+    solve_quadratic_positive_root,
+    init_bracket,
+    bracket_next_guess,
+    update_bracket,
+    bracket_width,
+    BR_N_EVALS,
+    BR_X_BEST,
+)
+from njit_funcs_jit import njit, prange
+
+
+def clear_stale_numba_cache():
+    """
+    numba checks only the source file of each cached function, while kernels inline functions from
+    other njit_funcs modules; so clears all their cache files in a directory if any of them is older
+    than the newest of those sources
+    cache files are searched in NUMBA_CACHE_DIR if set, else in __pycache__
+    called once at startup by entry points, before any kernel is compiled; not on import
+    """
+    if "NOJIT" in os.environ and os.environ["NOJIT"] == "true":
+        return
+    dirpath = os.path.dirname(os.path.abspath(__file__))
+    sources_mtime = max(
+        os.path.getmtime(fpath) for fpath in glob.glob(os.path.join(dirpath, "njit_funcs*.py"))
+    )
+    if os.environ.get("NUMBA_CACHE_DIR"):
+        cache_fpaths = glob.glob(
+            os.path.join(os.environ["NUMBA_CACHE_DIR"], "**", "njit_funcs*.nb[ic]"), recursive=True
+        )
+    else:
+        cache_fpaths = glob.glob(os.path.join(dirpath, "__pycache__", "njit_funcs*.nb[ic]"))
+    cache_dirpaths = {}
+    for fpath in cache_fpaths:
+        cache_dirpaths.setdefault(os.path.dirname(fpath), []).append(fpath)
+    for fpaths in cache_dirpaths.values():
+        try:
+            if min(os.path.getmtime(fpath) for fpath in fpaths) >= sources_mtime:
+                continue
+        except FileNotFoundError:
+            # being cleared by a concurrent process
+            pass
+        for fpath in fpaths:
+            try:
+                os.remove(fpath)
+            except FileNotFoundError:
+                pass
 
 
 @njit
@@ -77,33 +111,54 @@ def calc_ema(alpha, alpha_, prev_ema, new_val) -> float:
     return prev_ema * alpha_ + new_val * alpha
 
 
+@njit
+def calc_samples_streaming(
+    ticks: np.ndarray, sample_size_ms: int, carry: np.ndarray
+) -> (np.ndarray, np.ndarray):
+    """
+    samples ticks [[timestamp, qty, price]], sorted by timestamp, chunk by chunk
+    carry is the last, still open sample [timestamp, qty, price] of the previous chunk
+    carry timestamp < 0 if there is no previous chunk
+    returns (closed samples, new carry); samples without ticks get zero qty and the previous price
+    ticks older than the open sample are added to it
+    """
+    if len(ticks) == 0:
+        return np.zeros((0, 3)), carry.copy()
+    if carry[0] >= 0.0:
+        first_ts = int(carry[0])
+    else:
+        first_ts = int(ticks[0][0]) // sample_size_ms * sample_size_ms
+    last_ts = max(first_ts, int(ticks[-1][0]) // sample_size_ms * sample_size_ms)
+    n = (last_ts - first_ts) // sample_size_ms + 1
+    samples = np.zeros((n, 3))
+    for k in range(n):
+        samples[k][0] = first_ts + k * sample_size_ms
+    k_prev = -1
+    if carry[0] >= 0.0:
+        samples[0][1] = carry[1]
+        samples[0][2] = carry[2]
+        k_prev = 0
+    for i in range(len(ticks)):
+        k = min(n - 1, (int(ticks[i][0]) - first_ts) // sample_size_ms)
+        if k < k_prev:
+            k = k_prev
+        elif k > k_prev + 1 and k_prev >= 0:
+            for j in range(k_prev + 1, k):
+                samples[j][2] = samples[k_prev][2]
+        samples[k][1] += ticks[i][1]
+        samples[k][2] = ticks[i][2]
+        k_prev = k
+    return samples[:-1], samples[-1].copy()
+
+
 @njit
 def calc_samples(ticks: np.ndarray, sample_size_ms: int = 1000) -> np.ndarray:
     # ticks [[timestamp, qty, price]]
-    sampled_timestamps = np.arange(
-        ticks[0][0] // sample_size_ms * sample_size_ms,
-        ticks[-1][0] // sample_size_ms * sample_size_ms + sample_size_ms,
-        sample_size_ms,
-    )
-    samples = np.zeros((len(sampled_timestamps), 3))
-    samples[:, 0] = sampled_timestamps
-    ts = sampled_timestamps[0]
-    i = 0
-    k = 0
-    while True:
-        if ts == samples[k][0]:
-            samples[k][1] += ticks[i][1]
-            samples[k][2] = ticks[i][2]
-            i += 1
-            if i >= len(ticks):
-                break
-            ts = ticks[i][0] // sample_size_ms * sample_size_ms
-        else:
-            k += 1
-            if k >= len(samples):
-                break
-            samples[k][2] = samples[k - 1][2]
-    return samples
+    samples, carry = calc_samples_streaming(ticks, sample_size_ms, np.array([-1.0, 0.0, 0.0]))
+    out = np.zeros((len(samples) + 1, 3))
+    out[:-1] = samples
+    out[-1] = carry
+    return out
 
 
 @njit
@@ -176,6 +231,14 @@ def calc_wallet_exposure_if_filled(balance, psize, pprice, qty, price, inverse,
     return qty_to_cost(new_psize, new_pprice, inverse, c_mult) / balance
 
 
+@njit
+def sort_orders_by_price(orders, reverse=False):
+    # stable, like sorted(orders, key=lambda x: x[1]); closures would keep numba from caching
+    prices = np.array([order[1] for order in orders])
+    idxs = np.argsort(-prices if reverse else prices, kind="mergesort")
+    return [orders[i] for i in idxs]
+
+
 @njit
 def calc_close_grid_long(
     backwards_tp,
@@ -394,7 +457,7 @@ def calc_close_grid_backwards_long(
             break
     if psize_ > 0.0 and closes:
         closes[-1] = (round_(closes[-1][0] - psize_, qty_step), closes[-1][1], closes[-1][2])
-    return sorted(closes, key=lambda x: x[1])
+    return sort_orders_by_price(closes)
 
 
 @njit
@@ -570,7 +633,7 @@ def calc_close_grid_backwards_short(
             break
     if psize_ > 0.0 and closes:
         closes[-1] = (round_(closes[-1][0] + psize_, qty_step), closes[-1][1], closes[-1][2])
-    return sorted(closes, key=lambda x: x[1], reverse=True)
+    return sort_orders_by_price(closes, reverse=True)
 
 
 @njit
@@ -806,91 +869,31 @@ def find_close_qty_long_bringing_wallet_exposure_to_target(
     if wallet_exposure <= wallet_exposure_target * 1.001:
         # wallet_exposure within 0.1% of target: return zero
         return 0.0
-    guesses = []
-    vals = []
-    evals = []
-    guesses.append(
-        min(
-            psize,
-            max(0.0, round_(psize * (1 - wallet_exposure_target / wallet_exposure), qty_step)),
-        )
+    # cost of remaining position and pnl are both linear in close qty
+    guess = solve_linear_fractional(
+        qty_to_cost(psize, pprice, inverse, c_mult),
+        -qty_to_cost(1.0, pprice, inverse, c_mult),
+        balance,
+        calc_pnl_long(pprice, close_price, 1.0, inverse, c_mult),
+        wallet_exposure_target,
     )
-    vals.append(eval_(guesses[-1]))
-    evals.append(abs(vals[-1] - wallet_exposure_target) / wallet_exposure_target)
-    guesses.append(
-        min(psize, max(0.0, round_(max(guesses[-1] * 1.2, guesses[-1] + qty_step), qty_step)))
+    if np.isfinite(guess):
+        return min(psize, max(0.0, round_(guess, qty_step)))
+    # degenerate case; wallet exposure doesn't depend on close qty
+    bracket = init_bracket(
+        0.0,
+        wallet_exposure - wallet_exposure_target,
+        psize,
+        eval_(psize) - wallet_exposure_target,
     )
-    if guesses[-1] == guesses[-2]:
-        guesses[-1] = min(
-            psize, max(0.0, round_(min(guesses[-1] * 0.8, guesses[-1] - qty_step), qty_step))
-        )
-    vals.append(eval_(guesses[-1]))
-    evals.append(abs(vals[-1] - wallet_exposure_target) / wallet_exposure_target)
-    for _ in range(15):
-        egv = sorted([(e, g, v) for e, g, v in zip(evals, guesses, vals)])
-        try:
-            new_guess = interpolate(
-                wallet_exposure_target,
-                np.array([egv[0][2], egv[1][2]]),
-                np.array([egv[0][1], egv[1][1]]),
-            )
-        except:
-            """
-            print("debug zero div error find_close_qty_long_bringing_wallet_exposure_to_target")
-            print(
-                "balance, psize, pprice, wallet_exposure_target, close_price, inverse, qty_step, c_mult,"
-            )
-            print(
-                balance,
-                psize,
-                pprice,
-                wallet_exposure_target,
-                close_price,
-                inverse,
-                qty_step,
-                c_mult,
-            )
-            print("guesses, vals", guesses, vals)
-            """
-            new_guess = (egv[0][1] + egv[1][1]) / 2
-        new_guess = min(psize, max(0.0, round_(new_guess, qty_step)))
-        if new_guess in guesses:
-            new_guess = min(psize, max(0.0, round_(new_guess - qty_step, qty_step)))
-            if new_guess in guesses:
-                new_guess = min(psize, max(0.0, round_(new_guess + 2 * qty_step, qty_step)))
-                if new_guess in guesses:
-                    break
-        guesses.append(new_guess)
-        vals.append(eval_(guesses[-1]))
-        evals.append(abs(vals[-1] - wallet_exposure_target) / wallet_exposure_target)
-        if evals[-1] < 0.01:
+    while bracket[BR_N_EVALS] < 17 and bracket_width(bracket) > qty_step:
+        guess = min(psize, max(0.0, round_(bracket_next_guess(bracket), qty_step)))
+        val = eval_(guess)
+        update_bracket(bracket, guess, val - wallet_exposure_target)
+        if abs(val - wallet_exposure_target) / wallet_exposure_target < 0.01:
             # close enough
             break
-    evals_guesses = sorted([(e, g) for e, g in zip(evals, guesses)])
-    if False:  # evals_guesses[0][0] > 0.15:
-        print("debug find_close_qty_long_bringing_wallet_exposure_to_target")
-        print(
-            "balance, psize, pprice, wallet_exposure_target, close_price, inverse, qty_step, c_mult,"
-        )
-        print(
-            balance,
-            psize,
-            pprice,
-            wallet_exposure_target,
-            close_price,
-            inverse,
-            qty_step,
-            c_mult,
-        )
-        print("wallet_exposure", wallet_exposure)
-        print("wallet_exposure_target", wallet_exposure_target)
-        print(
-            "guess, val, target diff",
-            [(g, round_dynamic(v, 4), round_dynamic(e, 4)) for g, v, e in zip(guesses, vals, evals)],
-        )
-        print("n tries", len(guesses))
-        print()
-    return evals_guesses[0][1]
+    return bracket[BR_X_BEST]
 
 
 @njit
@@ -915,92 +918,32 @@ def find_close_qty_short_bringing_wallet_exposure_to_target(
     if wallet_exposure <= wallet_exposure_target * 1.001:
         # wallet_exposure within 0.1% of target: return zero
         return 0.0
-    guesses = []
-    vals = []
-    evals = []
     abs_psize = abs(psize)
-    guesses.append(
-        min(
-            abs_psize,
-            max(0.0, round_(abs_psize * (1 - wallet_exposure_target / wallet_exposure), qty_step)),
-        )
+    # cost of remaining position and pnl are both linear in close qty
+    guess = solve_linear_fractional(
+        qty_to_cost(abs_psize, pprice, inverse, c_mult),
+        -qty_to_cost(1.0, pprice, inverse, c_mult),
+        balance,
+        calc_pnl_short(pprice, close_price, 1.0, inverse, c_mult),
+        wallet_exposure_target,
     )
-    vals.append(eval_(guesses[-1]))
-    evals.append(abs(vals[-1] - wallet_exposure_target) / wallet_exposure_target)
-    guesses.append(
-        min(abs_psize, max(0.0, round_(max(guesses[-1] * 1.2, guesses[-1] + qty_step), qty_step)))
+    if np.isfinite(guess):
+        return min(abs_psize, max(0.0, round_(guess, qty_step)))
+    # degenerate case; wallet exposure doesn't depend on close qty
+    bracket = init_bracket(
+        0.0,
+        wallet_exposure - wallet_exposure_target,
+        abs_psize,
+        eval_(abs_psize) - wallet_exposure_target,
     )
-    if guesses[-1] == guesses[-2]:
-        guesses[-1] = min(
-            abs_psize, max(0.0, round_(min(guesses[-1] * 0.8, guesses[-1] - qty_step), qty_step))
-        )
-    vals.append(eval_(guesses[-1]))
-    evals.append(abs(vals[-1] - wallet_exposure_target) / wallet_exposure_target)
-    for _ in range(15):
-        egv = sorted([(e, g, v) for e, g, v in zip(evals, guesses, vals)])
-        try:
-            new_guess = interpolate(
-                wallet_exposure_target,
-                np.array([egv[0][2], egv[1][2]]),
-                np.array([egv[0][1], egv[1][1]]),
-            )
-        except:
-            """
-            print("debug zero div error find_close_qty_short_bringing_wallet_exposure_to_target")
-            print(
-                "balance, psize, pprice, wallet_exposure_target, close_price, inverse, qty_step, c_mult,"
-            )
-            print(
-                balance,
-                psize,
-                pprice,
-                wallet_exposure_target,
-                close_price,
-                inverse,
-                qty_step,
-                c_mult,
-            )
-            print("guesses, vals", guesses, vals)
-            """
-            new_guess = (egv[0][1] + egv[1][1]) / 2
-        new_guess = min(abs_psize, max(0.0, round_(new_guess, qty_step)))
-        if new_guess in guesses:
-            new_guess = min(abs_psize, max(0.0, round_(new_guess - qty_step, qty_step)))
-            if new_guess in guesses:
-                new_guess = min(abs_psize, max(0.0, round_(new_guess + 2 * qty_step, qty_step)))
-                if new_guess in guesses:
-                    break
-        guesses.append(new_guess)
-        vals.append(eval_(guesses[-1]))
-        evals.append(abs(vals[-1] - wallet_exposure_target) / wallet_exposure_target)
-        if evals[-1] < 0.01:
+    while bracket[BR_N_EVALS] < 17 and bracket_width(bracket) > qty_step:
+        guess = min(abs_psize, max(0.0, round_(bracket_next_guess(bracket), qty_step)))
+        val = eval_(guess)
+        update_bracket(bracket, guess, val - wallet_exposure_target)
+        if abs(val - wallet_exposure_target) / wallet_exposure_target < 0.01:
             # close enough
             break
-    evals_guesses = sorted([(e, g) for e, g in zip(evals, guesses)])
-    if False:  # evals_guesses[0][0] > 0.15:
-        print("debug find_close_qty_short_bringing_wallet_exposure_to_target")
-        print(
-            "balance, psize, pprice, wallet_exposure_target, close_price, inverse, qty_step, c_mult,"
-        )
-        print(
-            balance,
-            psize,
-            pprice,
-            wallet_exposure_target,
-            close_price,
-            inverse,
-            qty_step,
-            c_mult,
-        )
-        print("wallet_exposure", wallet_exposure)
-        print("wallet_exposure_target", wallet_exposure_target)
-        print(
-            "guess, val, target diff",
-            [(g, round_dynamic(v, 4), round_dynamic(e, 4)) for g, v, e in zip(guesses, vals, evals)],
-        )
-        print("n tries", len(guesses))
-        print()
-    return evals_guesses[0][1]
+    return bracket[BR_X_BEST]
 
 
 @njit
@@ -1014,77 +957,58 @@ def find_entry_qty_bringing_wallet_exposure_to_target(
     qty_step,
     c_mult,
 ) -> float:
+    def eval_(guess_):
+        return calc_wallet_exposure_if_filled(
+            balance, psize, pprice, guess_, entry_price, inverse, c_mult, qty_step
+        )
+
     if wallet_exposure_target == 0.0:
         return 0.0
     wallet_exposure = qty_to_cost(psize, pprice, inverse, c_mult) / balance
     if wallet_exposure >= wallet_exposure_target * 0.99:
         # return zero if wallet_exposure already is within 1% of target
         return 0.0
-    guesses = []
-    vals = []
-    evals = []
-    guesses.append(round_(abs(psize) * wallet_exposure_target / wallet_exposure, qty_step))
-    vals.append(
-        calc_wallet_exposure_if_filled(
-            balance, psize, pprice, guesses[-1], entry_price, inverse, c_mult, qty_step
+    abs_psize = abs(psize)
+    if inverse:
+        # cost after fill is c_mult * (psize + qty)**2 / (psize * pprice + qty * entry_price)
+        guess = solve_quadratic_positive_root(
+            c_mult,
+            2.0 * c_mult * abs_psize - wallet_exposure_target * balance * entry_price,
+            c_mult * abs_psize**2 - wallet_exposure_target * balance * abs_psize * pprice,
         )
-    )
-    evals.append(abs(vals[-1] - wallet_exposure_target) / wallet_exposure_target)
-    guesses.append(max(0.0, round_(max(guesses[-1] * 1.2, guesses[-1] + qty_step), qty_step)))
-    vals.append(
-        calc_wallet_exposure_if_filled(
-            balance, psize, pprice, guesses[-1], entry_price, inverse, c_mult, qty_step
+    else:
+        # cost after fill is psize * pprice + qty * entry_price
+        guess = solve_linear_fractional(
+            qty_to_cost(abs_psize, pprice, inverse, c_mult),
+            qty_to_cost(1.0, entry_price, inverse, c_mult),
+            balance,
+            0.0,
+            wallet_exposure_target,
         )
+    if np.isfinite(guess):
+        return max(0.0, round_(guess, qty_step))
+    # no solution from closed form; bracket between zero and a qty which surely exceeds target
+    max_qty = round_up(
+        max(
+            cost_to_qty(balance * wallet_exposure_target, pprice, inverse, c_mult),
+            cost_to_qty(balance * wallet_exposure_target, entry_price, inverse, c_mult),
+        ),
+        qty_step,
     )
-    evals.append(abs(vals[-1] - wallet_exposure_target) / wallet_exposure_target)
-    for _ in range(15):
-        if guesses[-1] == guesses[-2]:
-            guesses[-1] = abs(round_(max(guesses[-2] * 1.1, guesses[-2] + qty_step), qty_step))
-            vals[-1] = calc_wallet_exposure_if_filled(
-                balance, psize, pprice, guesses[-1], entry_price, inverse, c_mult, qty_step
-            )
-        guesses.append(
-            max(
-                0.0,
-                round_(
-                    interpolate(wallet_exposure_target, np.array(vals[-2:]), np.array(guesses[-2:])),
-                    qty_step,
-                ),
-            )
-        )
-        vals.append(
-            calc_wallet_exposure_if_filled(
-                balance, psize, pprice, guesses[-1], entry_price, inverse, c_mult, qty_step
-            )
-        )
-        evals.append(abs(vals[-1] - wallet_exposure_target) / wallet_exposure_target)
-        if evals[-1] < 0.01:
+    bracket = init_bracket(
+        0.0,
+        wallet_exposure - wallet_exposure_target,
+        max_qty,
+        eval_(max_qty) - wallet_exposure_target,
+    )
+    while bracket[BR_N_EVALS] < 17 and bracket_width(bracket) > qty_step:
+        guess = max(0.0, round_(bracket_next_guess(bracket), qty_step))
+        val = eval_(guess)
+        update_bracket(bracket, guess, val - wallet_exposure_target)
+        if abs(val - wallet_exposure_target) / wallet_exposure_target < 0.01:
             # close enough
             break
-    evals_guesses = sorted([(e, g) for e, g in zip(evals, guesses)])
-    if False:  # evals_guesses[0][0] > 0.15:
-        print("debug find_entry_qty_bringing_wallet_exposure_to_target")
-        print(
-            "balance, psize, pprice, wallet_exposure_target, entry_price, inverse, qty_step, c_mult,"
-        )
-        print(
-            balance,
-            psize,
-            pprice,
-            wallet_exposure_target,
-            entry_price,
-            inverse,
-            qty_step,
-            c_mult,
-        )
-        print("wallet_exposure", wallet_exposure)
-        print("wallet_exposure_target", wallet_exposure_target)
-        print(
-            "guess, val, target diff",
-            [(g, round_dynamic(v, 4), round_dynamic(e, 4)) for g, v, e in zip(guesses, vals, evals)],
-        )
-        print()
-    return evals_guesses[0][1]
+    return bracket[BR_X_BEST]
 
 
 @njit
@@ -1561,7 +1485,10 @@ def calc_entry_grid_long(
     eprice_exp_base,
     auto_unstuck_wallet_exposure_threshold,
     auto_unstuck_ema_dist,
+    grid_memo=None,
 ) -> [(float, float, str)]:
+    # grid_memo: from init_grid_memo() or None; approximated grid is reused while balance, psize and
+    # pprice are unchanged
     if wallet_exposure_limit == 0.0:
         return [(0.0, 0.0, "")]
     min_entry_qty = calc_min_entry_qty(highest_bid, inverse, qty_step, min_qty, min_cost)
@@ -1614,7 +1541,8 @@ def calc_entry_grid_long(
                             "long_unstuck_entry",
                         )
                     ]
-            grid = approximate_long_grid(
+            grid = approximate_long_grid_memoized(
+                grid_memo,
                 balance,
                 psize,
                 pprice,
@@ -1631,7 +1559,7 @@ def calc_entry_grid_long(
                 eprice_pprice_diff,
                 secondary_allocation,
                 secondary_pprice_diff,
-                eprice_exp_base=eprice_exp_base,
+                eprice_exp_base,
             )
             if len(grid) == 0:
                 return [(0.0, 0.0, "")]
@@ -1732,7 +1660,10 @@ def calc_entry_grid_short(
     eprice_exp_base,
     auto_unstuck_wallet_exposure_threshold,
     auto_unstuck_ema_dist,
+    grid_memo=None,
 ) -> [(float, float, str)]:
+    # grid_memo: from init_grid_memo() or None; approximated grid is reused while balance, psize and
+    # pprice are unchanged
     if wallet_exposure_limit == 0.0:
         return [(0.0, 0.0, "")]
     min_entry_qty = calc_min_entry_qty(lowest_ask, inverse, qty_step, min_qty, min_cost)
@@ -1787,7 +1718,8 @@ def calc_entry_grid_short(
                             "short_unstuck_entry",
                         )
                     ]
-            grid = approximate_short_grid(
+            grid = approximate_short_grid_memoized(
+                grid_memo,
                 balance,
                 psize,
                 pprice,
@@ -1804,7 +1736,7 @@ def calc_entry_grid_short(
                 eprice_pprice_diff,
                 secondary_allocation,
                 secondary_pprice_diff,
-                eprice_exp_base=eprice_exp_base,
+                eprice_exp_base,
             )
             if len(grid) == 0:
                 return [(0.0, 0.0, "")]
@@ -2100,37 +2032,274 @@ def approximate_short_grid(
 
 
 @njit
-def backtest_static_grid(
-    ticks,
-    starting_balance,
-    latency_simulation_ms,
-    maker_fee,
+def init_grid_memo(max_n_entry_orders):
+    # memo of the last approximated entry grid, which depends only on balance, psize and pprice
+    # row 0: [balance, psize, pprice, n_rows, valid]
+    # row 1: [hits, misses, grid_template, grid_template_set, grid_template_fallbacks]; rows 2+: grid
+    # grid template columns are used by neat grid backtests only, see calc_neat_grid_long()
+    return np.zeros((max_n_entry_orders + 2, 5))
+
+
+@njit
+def grid_memo_hit(grid_memo, balance, psize, pprice) -> bool:
+    if (
+        grid_memo[0, 4] != 0.0
+        and grid_memo[0, 0] == balance
+        and grid_memo[0, 1] == psize
+        and grid_memo[0, 2] == pprice
+    ):
+        grid_memo[1, 0] += 1
+        return True
+    grid_memo[1, 1] += 1
+    return False
+
+
+@njit
+def read_grid_memo(grid_memo):
+    return grid_memo[2 : 2 + int(grid_memo[0, 3])].copy()
+
+
+@njit
+def write_grid_memo(grid_memo, balance, psize, pprice, grid):
+    if len(grid) > len(grid_memo) - 2:
+        grid_memo[0, 4] = 0.0
+        return
+    grid_memo[0, 0], grid_memo[0, 1], grid_memo[0, 2] = balance, psize, pprice
+    grid_memo[0, 3], grid_memo[0, 4] = len(grid), 1.0
+    grid_memo[2 : 2 + len(grid)] = grid
+
+
+@njit
+def approximate_long_grid_memoized(
+    grid_memo,
+    balance,
+    psize,
+    pprice,
     inverse,
-    do_long,
-    do_short,
-    backwards_tp,
     qty_step,
     price_step,
     min_qty,
     min_cost,
     c_mult,
-    ema_span_0,
-    ema_span_1,
-    eprice_exp_base,
-    eprice_pprice_diff,
     grid_span,
-    initial_eprice_ema_dist,
-    initial_qty_pct,
-    markup_range,
+    wallet_exposure_limit,
     max_n_entry_orders,
-    min_markup,
-    n_close_orders,
+    initial_qty_pct,
+    eprice_pprice_diff,
+    secondary_allocation,
+    secondary_pprice_diff,
+    eprice_exp_base,
+):
+    # grid_memo may be None
+    if grid_memo is not None:
+        if grid_memo_hit(grid_memo, balance, psize, pprice):
+            return read_grid_memo(grid_memo)
+    grid = approximate_long_grid(
+        balance,
+        psize,
+        pprice,
+        inverse,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+        grid_span,
+        wallet_exposure_limit,
+        max_n_entry_orders,
+        initial_qty_pct,
+        eprice_pprice_diff,
+        secondary_allocation,
+        secondary_pprice_diff,
+        eprice_exp_base=eprice_exp_base,
+    )
+    if grid_memo is not None:
+        write_grid_memo(grid_memo, balance, psize, pprice, grid)
+    return grid
+
+
+@njit
+def approximate_short_grid_memoized(
+    grid_memo,
+    balance,
+    psize,
+    pprice,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    grid_span,
     wallet_exposure_limit,
+    max_n_entry_orders,
+    initial_qty_pct,
+    eprice_pprice_diff,
     secondary_allocation,
     secondary_pprice_diff,
-    auto_unstuck_ema_dist,
-    auto_unstuck_wallet_exposure_threshold,
+    eprice_exp_base,
 ):
+    # grid_memo may be None
+    if grid_memo is not None:
+        if grid_memo_hit(grid_memo, balance, psize, pprice):
+            return read_grid_memo(grid_memo)
+    grid = approximate_short_grid(
+        balance,
+        psize,
+        pprice,
+        inverse,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+        grid_span,
+        wallet_exposure_limit,
+        max_n_entry_orders,
+        initial_qty_pct,
+        eprice_pprice_diff,
+        secondary_allocation,
+        secondary_pprice_diff,
+        eprice_exp_base=eprice_exp_base,
+    )
+    if grid_memo is not None:
+        write_grid_memo(grid_memo, balance, psize, pprice, grid)
+    return grid
+
+
+# backtest state vector layout
+ST_BALANCE_LONG = 0
+ST_BALANCE_SHORT = 1
+ST_EQUITY_LONG = 2
+ST_EQUITY_SHORT = 3
+ST_PSIZE_LONG = 4
+ST_PPRICE_LONG = 5
+ST_PSIZE_SHORT = 6
+ST_PPRICE_SHORT = 7
+ST_BKR_PRICE_LONG = 8
+ST_BKR_PRICE_SHORT = 9
+ST_CLOSEST_BKR_LONG = 10
+ST_CLOSEST_BKR_SHORT = 11
+ST_WALLET_EXPOSURE_LONG = 12
+ST_WALLET_EXPOSURE_SHORT = 13
+ST_NEXT_ENTRY_UPDATE_TS_LONG = 14
+ST_NEXT_ENTRY_UPDATE_TS_SHORT = 15
+ST_NEXT_CLOSE_UPDATE_TS_LONG = 16
+ST_NEXT_CLOSE_UPDATE_TS_SHORT = 17
+ST_NEXT_STATS_UPDATE = 18
+ST_DO_LONG = 19
+ST_DO_SHORT = 20
+ST_DONE = 21
+ST_K = 22  # next tick to process
+ST_MAX_SPAN_LONG = 23
+ST_MAX_SPAN_SHORT = 24
+ST_EMAS_LONG = 25  # 3 slots
+ST_EMAS_SHORT = 28  # 3 slots
+ST_ALPHAS_LONG = 31  # 3 slots
+ST_ALPHAS_SHORT = 34  # 3 slots
+ST_N_FILLS_LONG = 37  # filled rows of fills_long buffer
+ST_N_FILLS_SHORT = 38
+ST_N_STATS = 39
+ST_GRID_MEMO_HITS = 40  # entry grids reused from grid memos, both sides
+ST_GRID_MEMO_MISSES = 41
+N_STATE = 42
+
+# backtest fills and stats are preallocated float arrays, grown by doubling when full
+FILL_COLUMNS = (
+    "trade_id",
+    "timestamp",
+    "pnl",
+    "fee_paid",
+    "balance",
+    "equity",
+    "qty",
+    "price",
+    "psize",
+    "pprice",
+    "type",
+)
+STATS_COLUMNS = (
+    "timestamp",
+    "bkr_price_long",
+    "bkr_price_short",
+    "psize_long",
+    "pprice_long",
+    "psize_short",
+    "pprice_short",
+    "price",
+    "closest_bkr_long",
+    "closest_bkr_short",
+    "balance_long",
+    "balance_short",
+    "equity_long",
+    "equity_short",
+)
+N_FILL_COLS = 11
+N_STATS_COLS = 14
+# fills "type" column holds index into FILL_TYPES; -1 if unknown
+FILL_TYPES = (
+    "long_ientry",
+    "long_ientry_normal",
+    "long_ientry_partial",
+    "long_rentry",
+    "long_primary_rentry",
+    "long_secondary_rentry",
+    "long_unstuck_entry",
+    "long_nclose",
+    "long_unstuck_close",
+    "long_bankruptcy",
+    "short_ientry",
+    "short_ientry_normal",
+    "short_ientry_partial",
+    "short_rentry",
+    "short_primary_rentry",
+    "short_secondary_rentry",
+    "short_unstuck_entry",
+    "short_nclose",
+    "short_unstuck_close",
+    "short_bankruptcy",
+)
+
+# backtest params layout, shape (2, n_params), params[0] is long and params[1] is short
+# indices 0-11 are shared by all passivbot modes
+P_ENABLED = 0
+P_BACKWARDS_TP = 1
+P_WALLET_EXPOSURE_LIMIT = 2
+P_EMA_SPAN_0 = 3
+P_EMA_SPAN_1 = 4
+P_INITIAL_QTY_PCT = 5
+P_INITIAL_EPRICE_EMA_DIST = 6
+P_MIN_MARKUP = 7
+P_MARKUP_RANGE = 8
+P_N_CLOSE_ORDERS = 9
+P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD = 10
+P_AUTO_UNSTUCK_EMA_DIST = 11
+# static grid and neat grid
+P_GRID_SPAN = 12
+P_MAX_N_ENTRY_ORDERS = 13
+P_EPRICE_EXP_BASE = 14
+# static grid
+P_EPRICE_PPRICE_DIFF = 15
+P_SECONDARY_ALLOCATION = 16
+P_SECONDARY_PPRICE_DIFF = 17
+N_STATIC_GRID_PARAMS = 18
+
+# market settings layout, shape (n_symbols, N_MARKET_SETTINGS), for multi symbol backtests
+MS_INVERSE = 0
+MS_QTY_STEP = 1
+MS_PRICE_STEP = 2
+MS_MIN_QTY = 3
+MS_MIN_COST = 4
+MS_C_MULT = 5
+MS_MAKER_FEE = 6
+N_MARKET_SETTINGS = 7
+
+
+@njit
+def unpack_ticks(ticks):
+    # returns ticks view (timestamps, highs, lows, closes, first_timestamp, step_ms, price_scale)
+    # of ticks array [[timestamp, qty, price]] or [[timestamp, high, low, close]], as taken by the
+    # backtest kernels; ticks are read through tick_timestamp(), tick_close() etc.
     if len(ticks[0]) == 3:
         timestamps = ticks[:, 0]
         closes = ticks[:, 2]
@@ -2141,114 +2310,1039 @@ def backtest_static_grid(
         highs = ticks[:, 1]
         lows = ticks[:, 2]
         closes = ticks[:, 3]
+    return timestamps, highs, lows, closes, 0.0, 0.0, 0.0
 
-    balance_long = balance_short = equity_long = equity_short = starting_balance
-    psize_long, pprice_long, psize_short, pprice_short = 0.0, 0.0, 0.0, 0.0
 
-    fills_long, fills_short, stats = [], [], []
+@njit
+def unpack_compact_ticks(first_timestamp, step_ms, prices, price_scale):
+    # returns ticks view of compact ticks, see downloader.compact_ticks(), without expanding them
+    # timestamps array is empty; timestamps are first_timestamp + k * step_ms
+    # prices are int32 multiples of 1 / price_scale, or float32 if price_scale is 0.0
+    return (
+        np.empty(0),
+        prices,
+        prices,
+        prices,
+        float(first_timestamp),
+        float(step_ms),
+        float(price_scale),
+    )
 
-    entries_long = closes_long = [(0.0, 0.0, "")]
-    entries_short = closes_short = [(0.0, 0.0, "")]
-    bkr_price_long = bkr_price_short = 0.0
 
-    next_entry_grid_update_ts_long = 0
-    next_entry_grid_update_ts_short = 0
-    next_close_grid_update_ts_long = 0
-    next_close_grid_update_ts_short = 0
-    next_stats_update = 0
+@njit
+def scale_price(ticks, price):
+    return price / ticks[6] if ticks[6] > 0.0 else float(price)
 
-    closest_bkr_long = closest_bkr_short = 1.0
 
-    spans_multiplier = 60 / ((timestamps[1] - timestamps[0]) / 1000)
+@njit
+def tick_timestamp(ticks, k):
+    return ticks[0][k] if len(ticks[0]) > 0 else ticks[4] + k * ticks[5]
 
-    spans_long = [ema_span_0[0], (ema_span_0[0] * ema_span_1[0]) ** 0.5, ema_span_1[0]]
-    spans_long = np.array(sorted(spans_long)) * spans_multiplier if do_long else np.ones(3)
-    spans_short = [ema_span_0[1], (ema_span_0[1] * ema_span_1[1]) ** 0.5, ema_span_1[1]]
-    spans_short = np.array(sorted(spans_short)) * spans_multiplier if do_short else np.ones(3)
-    assert max(spans_long) < len(closes), "max ema_span long larger than len(closes)"
-    assert max(spans_short) < len(closes), "max ema_span short larger than len(closes)"
-    spans_long = np.where(spans_long < 1.0, 1.0, spans_long)
-    spans_short = np.where(spans_short < 1.0, 1.0, spans_short)
-    max_span_long = int(round(max(spans_long)))
-    max_span_short = int(round(max(spans_short)))
-    emas_long, emas_short = np.repeat(closes[0], 3), np.repeat(closes[0], 3)
-    alphas_long = 2.0 / (spans_long + 1.0)
-    alphas__long = 1.0 - alphas_long
-    alphas_short = 2.0 / (spans_short + 1.0)
-    alphas__short = 1.0 - alphas_short
 
-    long_wallet_exposure = 0.0
-    short_wallet_exposure = 0.0
-    long_wallet_exposure_auto_unstuck_threshold = (
-        (wallet_exposure_limit[0] * (1 - auto_unstuck_wallet_exposure_threshold[0]))
-        if auto_unstuck_wallet_exposure_threshold[0] != 0.0
-        else wallet_exposure_limit[0] * 10
-    )
-    short_wallet_exposure_auto_unstuck_threshold = (
-        (wallet_exposure_limit[1] * (1 - auto_unstuck_wallet_exposure_threshold[1]))
-        if auto_unstuck_wallet_exposure_threshold[1] != 0.0
-        else wallet_exposure_limit[1] * 10
+@njit
+def tick_high(ticks, k):
+    return scale_price(ticks, ticks[1][k])
+
+
+@njit
+def tick_low(ticks, k):
+    return scale_price(ticks, ticks[2][k])
+
+
+@njit
+def tick_close(ticks, k):
+    return scale_price(ticks, ticks[3][k])
+
+
+@njit
+def n_ticks(ticks):
+    return len(ticks[3])
+
+
+@njit
+def last_close(ticks):
+    return tick_close(ticks, len(ticks[3]) - 1)
+
+
+@njit
+def slice_ticks(ticks, k_start, k_end):
+    # returns ticks view of ticks [k_start, k_end), sharing memory with ticks
+    return (
+        ticks[0][k_start:k_end],
+        ticks[1][k_start:k_end],
+        ticks[2][k_start:k_end],
+        ticks[3][k_start:k_end],
+        ticks[4] + k_start * ticks[5],
+        ticks[5],
+        ticks[6],
     )
 
-    for k in range(1, len(closes)):
-        if do_long:
-            emas_long = calc_ema(alphas_long, alphas__long, emas_long, closes[k - 1])
-            if k >= max_span_long:
-                # check bankruptcy
-                bkr_diff_long = calc_diff(bkr_price_long, closes[k])
-                closest_bkr_long = min(closest_bkr_long, bkr_diff_long)
-                if closest_bkr_long < 0.06:
-                    # consider bankruptcy within 6% as liquidation
-                    if psize_long != 0.0:
-                        fee_paid = -qty_to_cost(psize_long, pprice_long, inverse, c_mult) * maker_fee
-                        pnl = calc_pnl_long(pprice_long, closes[k], -psize_long, inverse, c_mult)
-                        balance_long = starting_balance * 1e-6
-                        equity_long = 0.0
-                        psize_long, pprice_long = 0.0, 0.0
-                        fills_long.append(
-                            (
-                                k,
-                                timestamps[k],
-                                pnl,
-                                fee_paid,
-                                balance_long,
-                                equity_long,
-                                -psize_long,
-                                closes[k],
-                                0.0,
-                                0.0,
-                                "long_bankruptcy",
-                            )
-                        )
-                    do_long = False
-                    if not do_short:
-                        stats.append(
-                            (
-                                next_stats_update,
-                                bkr_price_long,
-                                bkr_price_short,
-                                psize_long,
-                                pprice_long,
-                                psize_short,
-                                pprice_short,
-                                closes[k],
-                                closest_bkr_long,
-                                closest_bkr_short,
-                                balance_long,
-                                balance_short,
-                                equity_long,
-                                equity_short,
-                            )
-                        )
-                        return fills_long, fills_short, stats
 
-                # check if long entry grid should be updated
-                if timestamps[k] >= next_entry_grid_update_ts_long:
-                    entries_long = calc_entry_grid_long(
-                        balance_long,
+@njit
+def search_ticks(ticks, k, k_end, timestamp):
+    # returns first tick in [k, k_end) with timestamp >= timestamp, k_end if none
+    if len(ticks[0]) > 0:
+        return k + np.searchsorted(ticks[0][k:k_end], timestamp)
+    k_ = min(max(k, int(np.ceil((timestamp - ticks[4]) / ticks[5]))), k_end)
+    # guard against rounding of the division
+    while k_ > k and tick_timestamp(ticks, k_ - 1) >= timestamp:
+        k_ -= 1
+    while k_ < k_end and tick_timestamp(ticks, k_) < timestamp:
+        k_ += 1
+    return k_
+
+
+@njit
+def empty_fills(n=1024):
+    # rows: (trade_id, timestamp, pnl, fee_paid, balance, equity, qty, price, psize, pprice, type)
+    return np.zeros((n, N_FILL_COLS))
+
+
+@njit
+def empty_stats(n=1024):
+    return np.zeros((n, N_STATS_COLS))
+
+
+@njit
+def grow_buffer(buffer):
+    new_buffer = np.zeros((len(buffer) * 2, buffer.shape[1]))
+    new_buffer[: len(buffer)] = buffer
+    return new_buffer
+
+
+@njit
+def fill_type_code(fill_type):
+    for i in range(len(FILL_TYPES)):
+        if FILL_TYPES[i] == fill_type:
+            return i
+    return -1
+
+
+@njit
+def append_fill(
+    fills, n_fills, trade_id, timestamp, pnl, fee_paid, balance, equity, qty, price, psize, pprice, type_
+):
+    # writes row n_fills, growing buffer if full; returns (fills, n_fills + 1)
+    if n_fills >= len(fills):
+        fills = grow_buffer(fills)
+    fills[n_fills, 0] = trade_id
+    fills[n_fills, 1] = timestamp
+    fills[n_fills, 2] = pnl
+    fills[n_fills, 3] = fee_paid
+    fills[n_fills, 4] = balance
+    fills[n_fills, 5] = equity
+    fills[n_fills, 6] = qty
+    fills[n_fills, 7] = price
+    fills[n_fills, 8] = psize
+    fills[n_fills, 9] = pprice
+    fills[n_fills, 10] = fill_type_code(type_)
+    return fills, n_fills + 1
+
+
+@njit
+def append_stats(
+    stats,
+    n_stats,
+    timestamp,
+    bkr_price_long,
+    bkr_price_short,
+    psize_long,
+    pprice_long,
+    psize_short,
+    pprice_short,
+    price,
+    closest_bkr_long,
+    closest_bkr_short,
+    balance_long,
+    balance_short,
+    equity_long,
+    equity_short,
+):
+    # writes row n_stats, growing buffer if full; returns (stats, n_stats + 1)
+    if n_stats >= len(stats):
+        stats = grow_buffer(stats)
+    stats[n_stats, 0] = timestamp
+    stats[n_stats, 1] = bkr_price_long
+    stats[n_stats, 2] = bkr_price_short
+    stats[n_stats, 3] = psize_long
+    stats[n_stats, 4] = pprice_long
+    stats[n_stats, 5] = psize_short
+    stats[n_stats, 6] = pprice_short
+    stats[n_stats, 7] = price
+    stats[n_stats, 8] = closest_bkr_long
+    stats[n_stats, 9] = closest_bkr_short
+    stats[n_stats, 10] = balance_long
+    stats[n_stats, 11] = balance_short
+    stats[n_stats, 12] = equity_long
+    stats[n_stats, 13] = equity_short
+    return stats, n_stats + 1
+
+
+# ticks per block of the extrema index used to skip ticks which cannot trigger any event
+SKIP_BLOCK_SIZE = 64
+
+
+@njit
+def calc_ticks_extrema_index(ticks):
+    # returns (block_highs, block_lows), max high and min low of each whole block of ticks
+    n_blocks = n_ticks(ticks) // SKIP_BLOCK_SIZE
+    block_highs = np.empty(n_blocks)
+    block_lows = np.empty(n_blocks)
+    for b in range(n_blocks):
+        # scaling is monotonic, so extrema of scaled prices are scaled extrema
+        k_start, k_end = b * SKIP_BLOCK_SIZE, (b + 1) * SKIP_BLOCK_SIZE
+        block_highs[b] = scale_price(ticks, ticks[1][k_start:k_end].max())
+        block_lows[b] = scale_price(ticks, ticks[2][k_start:k_end].min())
+    return block_highs, block_lows
+
+
+@njit
+def find_price_event(ticks, block_highs, block_lows, k, k_end, lower, upper):
+    # returns first tick in [k, k_end) with low <= lower or high >= upper, k_end if none
+    # whole blocks whose extrema stay within (lower, upper) are jumped over
+    while k < k_end:
+        b = k // SKIP_BLOCK_SIZE
+        if k % SKIP_BLOCK_SIZE == 0 and b < len(block_highs) and k + SKIP_BLOCK_SIZE <= k_end:
+            if block_lows[b] > lower and block_highs[b] < upper:
+                k += SKIP_BLOCK_SIZE
+                continue
+        if tick_low(ticks, k) <= lower or tick_high(ticks, k) >= upper:
+            return k
+        k += 1
+    return k_end
+
+
+@njit
+def calc_skip_bounds(
+    k,
+    timestamp,
+    close,
+    latency_simulation_ms,
+    is_long,
+    max_span,
+    psize,
+    pprice,
+    bkr_price,
+    wallet_exposure,
+    wallet_exposure_auto_unstuck_threshold,
+    next_entry_update_ts,
+    next_close_update_ts,
+    entry_price,
+    close_price,
+    close_update_above_pprice,
+):
+    # returns (can_skip, k_limit, ts_limit, lower, upper) for one enabled side at tick k
+    # the side's ticks are no-ops before tick k_limit, timestamp ts_limit and the first tick with
+    # low <= lower or high >= upper; these cover order fills, bankruptcy and order update triggers
+    # close_update_above_pprice: whether the kernel updates closes once close price > pprice
+    lower, upper = -np.inf, np.inf
+    if k < max_span:
+        # emas warming up
+        return True, max_span, np.inf, lower, upper
+    if psize == 0.0:
+        if next_entry_update_ts > timestamp + latency_simulation_ms:
+            return False, k, -np.inf, lower, upper
+    else:
+        if next_close_update_ts > timestamp + latency_simulation_ms + 2500:
+            if close_update_above_pprice:
+                upper = min(upper, pprice)
+            else:
+                lower = max(lower, pprice)
+        if wallet_exposure >= wallet_exposure_auto_unstuck_threshold and (
+            next_close_update_ts > timestamp + latency_simulation_ms + 15000
+            or next_entry_update_ts > timestamp + latency_simulation_ms + 15000
+        ):
+            # unstuck updates are scheduled whenever closes are not
+            if close_update_above_pprice:
+                lower = max(lower, pprice)
+            else:
+                upper = min(upper, pprice)
+    if is_long:
+        lower = max(lower, entry_price)
+        upper = min(upper, close_price)
+    else:
+        upper = min(upper, entry_price)
+        lower = max(lower, close_price)
+    if bkr_price > 0.0:
+        # bankruptcy is within 6% of close price, with margin for rounding
+        bkr_band_upper = bkr_price / 0.94 * (1.0 + 1e-9)
+        bkr_band_lower = bkr_price / 1.06 * (1.0 - 1e-9)
+        if close > bkr_band_upper:
+            lower = max(lower, bkr_band_upper)
+        elif close < bkr_band_lower:
+            upper = min(upper, bkr_band_lower)
+        else:
+            return False, k, -np.inf, lower, upper
+    return True, np.iinfo(np.int64).max, min(next_entry_update_ts, next_close_update_ts), lower, upper
+
+
+@njit
+def find_skip_target(
+    k,
+    k_end,
+    ticks,
+    block_highs,
+    block_lows,
+    latency_simulation_ms,
+    do_long,
+    max_span_long,
+    psize_long,
+    pprice_long,
+    bkr_price_long,
+    long_wallet_exposure,
+    long_wallet_exposure_auto_unstuck_threshold,
+    next_entry_update_ts_long,
+    next_close_update_ts_long,
+    entry_price_long,
+    close_price_long,
+    do_short,
+    max_span_short,
+    psize_short,
+    pprice_short,
+    bkr_price_short,
+    short_wallet_exposure,
+    short_wallet_exposure_auto_unstuck_threshold,
+    next_entry_update_ts_short,
+    next_close_update_ts_short,
+    entry_price_short,
+    close_price_short,
+    short_close_update_above_pprice,
+):
+    # returns first tick in [k, k_end) at which the tick loop body may do more than update emas,
+    # closest bankruptcy distances and stats
+    # entry_price and close_price are those of the next order to fill, +-inf if there is none
+    timestamp, close = tick_timestamp(ticks, k), tick_close(ticks, k)
+    k_limit, ts_limit, lower, upper = k_end, np.inf, -np.inf, np.inf
+    if do_long:
+        can_skip, k_limit_, ts_limit_, lower_, upper_ = calc_skip_bounds(
+            k,
+            timestamp,
+            close,
+            latency_simulation_ms,
+            True,
+            max_span_long,
+            psize_long,
+            pprice_long,
+            bkr_price_long,
+            long_wallet_exposure,
+            long_wallet_exposure_auto_unstuck_threshold,
+            next_entry_update_ts_long,
+            next_close_update_ts_long,
+            entry_price_long,
+            close_price_long,
+            True,
+        )
+        if not can_skip:
+            return k
+        k_limit, ts_limit = min(k_limit, k_limit_), min(ts_limit, ts_limit_)
+        lower, upper = max(lower, lower_), min(upper, upper_)
+    if do_short:
+        can_skip, k_limit_, ts_limit_, lower_, upper_ = calc_skip_bounds(
+            k,
+            timestamp,
+            close,
+            latency_simulation_ms,
+            False,
+            max_span_short,
+            psize_short,
+            pprice_short,
+            bkr_price_short,
+            short_wallet_exposure,
+            short_wallet_exposure_auto_unstuck_threshold,
+            next_entry_update_ts_short,
+            next_close_update_ts_short,
+            entry_price_short,
+            close_price_short,
+            short_close_update_above_pprice,
+        )
+        if not can_skip:
+            return k
+        k_limit, ts_limit = min(k_limit, k_limit_), min(ts_limit, ts_limit_)
+        lower, upper = max(lower, lower_), min(upper, upper_)
+    if ts_limit <= timestamp:
+        return k
+    if ts_limit < np.inf:
+        k_limit = search_ticks(ticks, k, k_limit, ts_limit)
+    return find_price_event(ticks, block_highs, block_lows, k, k_limit, lower, upper)
+
+
+@njit
+def skip_ticks(
+    k_start,
+    k_end,
+    ticks,
+    do_long,
+    do_short,
+    max_span_long,
+    max_span_short,
+    emas_long,
+    emas_short,
+    alphas_long,
+    alphas__long,
+    alphas_short,
+    alphas__short,
+    bkr_price_long,
+    bkr_price_short,
+    closest_bkr_long,
+    closest_bkr_short,
+    balance_long,
+    balance_short,
+    equity_long,
+    equity_short,
+    psize_long,
+    pprice_long,
+    psize_short,
+    pprice_short,
+    stats,
+    n_stats,
+    next_stats_update,
+    inverse,
+    c_mult,
+):
+    # advances ticks [k_start, k_end) found by find_skip_target(), doing only what the tick loop
+    # body would: update emas, closest bankruptcy distances and stats
+    # returns (emas_long, emas_short, closest_bkr_long, closest_bkr_short, equity_long, equity_short,
+    #          stats, n_stats, next_stats_update)
+    emas_long, emas_short = emas_long.copy(), emas_short.copy()
+    for k in range(k_start, k_end):
+        close, prev_close = tick_close(ticks, k), tick_close(ticks, k - 1)
+        if do_long:
+            for i in range(3):
+                emas_long[i] = emas_long[i] * alphas__long[i] + prev_close * alphas_long[i]
+            if k >= max_span_long:
+                closest_bkr_long = min(closest_bkr_long, calc_diff(bkr_price_long, close))
+        if do_short:
+            for i in range(3):
+                emas_short[i] = emas_short[i] * alphas__short[i] + prev_close * alphas_short[i]
+            if k >= max_span_short:
+                closest_bkr_short = min(closest_bkr_short, calc_diff(bkr_price_short, close))
+        timestamp = tick_timestamp(ticks, k)
+        if timestamp >= next_stats_update:
+            equity_long = balance_long + calc_pnl_long(
+                pprice_long, close, psize_long, inverse, c_mult
+            )
+            equity_short = balance_short + calc_pnl_short(
+                pprice_short, close, psize_short, inverse, c_mult
+            )
+            stats, n_stats = append_stats(
+                stats,
+                n_stats,
+                timestamp,
+                bkr_price_long,
+                bkr_price_short,
+                psize_long,
+                pprice_long,
+                psize_short,
+                pprice_short,
+                close,
+                closest_bkr_long,
+                closest_bkr_short,
+                balance_long,
+                balance_short,
+                equity_long,
+                equity_short,
+            )
+            next_stats_update = round(timestamp + 60 * 1000)
+    return (
+        emas_long,
+        emas_short,
+        closest_bkr_long,
+        closest_bkr_short,
+        equity_long,
+        equity_short,
+        stats,
+        n_stats,
+        next_stats_update,
+    )
+
+
+@njit
+def init_backtest_buffers(ticks):
+    # stats are appended at most once per minute, plus final row
+    n_minutes = (tick_timestamp(ticks, n_ticks(ticks) - 1) - tick_timestamp(ticks, 0)) // 60000
+    n_stats = int(n_minutes) + 3
+    return empty_fills(), empty_fills(), empty_stats(n_stats)
+
+
+@njit
+def empty_orders():
+    return [(0.0, 0.0, "")]
+
+
+@njit
+def orders_to_array(orders):
+    # rows (qty, price, FILL_TYPES index), index -1 for orders without type; for backtest snapshots
+    arr = np.zeros((len(orders), 3))
+    for i in range(len(orders)):
+        arr[i, 0] = orders[i][0]
+        arr[i, 1] = orders[i][1]
+        arr[i, 2] = fill_type_code(orders[i][2])
+    return arr
+
+
+@njit
+def array_to_orders(arr):
+    # inverse of orders_to_array()
+    return [
+        (arr[i, 0], arr[i, 1], FILL_TYPES[int(arr[i, 2])] if arr[i, 2] >= 0.0 else "")
+        for i in range(len(arr))
+    ]
+
+
+@njit
+def init_backtest_state(ticks, starting_balance, params):
+    state = np.zeros(N_STATE)
+    state[ST_BALANCE_LONG] = starting_balance
+    state[ST_BALANCE_SHORT] = starting_balance
+    state[ST_EQUITY_LONG] = starting_balance
+    state[ST_EQUITY_SHORT] = starting_balance
+    state[ST_CLOSEST_BKR_LONG] = 1.0
+    state[ST_CLOSEST_BKR_SHORT] = 1.0
+    state[ST_DO_LONG] = params[0, P_ENABLED]
+    state[ST_DO_SHORT] = params[1, P_ENABLED]
+    state[ST_K] = 1.0
+
+    do_long, do_short = params[0, P_ENABLED] != 0.0, params[1, P_ENABLED] != 0.0
+    ema_span_0 = (params[0, P_EMA_SPAN_0], params[1, P_EMA_SPAN_0])
+    ema_span_1 = (params[0, P_EMA_SPAN_1], params[1, P_EMA_SPAN_1])
+
+    spans_multiplier = 60 / ((tick_timestamp(ticks, 1) - tick_timestamp(ticks, 0)) / 1000)
+
+    spans_long = [ema_span_0[0], (ema_span_0[0] * ema_span_1[0]) ** 0.5, ema_span_1[0]]
+    spans_long = np.array(sorted(spans_long)) * spans_multiplier if do_long else np.ones(3)
+    spans_short = [ema_span_0[1], (ema_span_0[1] * ema_span_1[1]) ** 0.5, ema_span_1[1]]
+    spans_short = np.array(sorted(spans_short)) * spans_multiplier if do_short else np.ones(3)
+    assert max(spans_long) < n_ticks(ticks), "max ema_span long larger than n ticks"
+    assert max(spans_short) < n_ticks(ticks), "max ema_span short larger than n ticks"
+    spans_long = np.where(spans_long < 1.0, 1.0, spans_long)
+    spans_short = np.where(spans_short < 1.0, 1.0, spans_short)
+    state[ST_MAX_SPAN_LONG] = int(round(max(spans_long)))
+    state[ST_MAX_SPAN_SHORT] = int(round(max(spans_short)))
+    state[ST_EMAS_LONG : ST_EMAS_LONG + 3] = tick_close(ticks, 0)
+    state[ST_EMAS_SHORT : ST_EMAS_SHORT + 3] = tick_close(ticks, 0)
+    state[ST_ALPHAS_LONG : ST_ALPHAS_LONG + 3] = 2.0 / (spans_long + 1.0)
+    state[ST_ALPHAS_SHORT : ST_ALPHAS_SHORT + 3] = 2.0 / (spans_short + 1.0)
+    return state
+
+
+@njit
+def append_state_stats(stats, state, timestamp, price):
+    # appends stats row from state, updating state's row count
+    stats, n_stats = append_stats(
+        stats,
+        int(state[ST_N_STATS]),
+        timestamp,
+        state[ST_BKR_PRICE_LONG],
+        state[ST_BKR_PRICE_SHORT],
+        state[ST_PSIZE_LONG],
+        state[ST_PPRICE_LONG],
+        state[ST_PSIZE_SHORT],
+        state[ST_PPRICE_SHORT],
+        price,
+        state[ST_CLOSEST_BKR_LONG],
+        state[ST_CLOSEST_BKR_SHORT],
+        state[ST_BALANCE_LONG],
+        state[ST_BALANCE_SHORT],
+        state[ST_EQUITY_LONG],
+        state[ST_EQUITY_SHORT],
+    )
+    state[ST_N_STATS] = n_stats
+    return stats
+
+
+@njit
+def trim_backtest_buffers(fills_long, fills_short, stats, state):
+    # returns filled rows only
+    return (
+        fills_long[: int(state[ST_N_FILLS_LONG])],
+        fills_short[: int(state[ST_N_FILLS_SHORT])],
+        stats[: int(state[ST_N_STATS])],
+    )
+
+
+@njit
+def pack_common_params(
+    params,
+    do_long,
+    do_short,
+    backwards_tp,
+    wallet_exposure_limit,
+    ema_span_0,
+    ema_span_1,
+    initial_qty_pct,
+    initial_eprice_ema_dist,
+    min_markup,
+    markup_range,
+    n_close_orders,
+    auto_unstuck_wallet_exposure_threshold,
+    auto_unstuck_ema_dist,
+):
+    params[0, P_ENABLED], params[1, P_ENABLED] = do_long, do_short
+    params[0, P_BACKWARDS_TP], params[1, P_BACKWARDS_TP] = backwards_tp
+    params[0, P_WALLET_EXPOSURE_LIMIT], params[1, P_WALLET_EXPOSURE_LIMIT] = wallet_exposure_limit
+    params[0, P_EMA_SPAN_0], params[1, P_EMA_SPAN_0] = ema_span_0
+    params[0, P_EMA_SPAN_1], params[1, P_EMA_SPAN_1] = ema_span_1
+    params[0, P_INITIAL_QTY_PCT], params[1, P_INITIAL_QTY_PCT] = initial_qty_pct
+    params[0, P_INITIAL_EPRICE_EMA_DIST], params[1, P_INITIAL_EPRICE_EMA_DIST] = initial_eprice_ema_dist
+    params[0, P_MIN_MARKUP], params[1, P_MIN_MARKUP] = min_markup
+    params[0, P_MARKUP_RANGE], params[1, P_MARKUP_RANGE] = markup_range
+    params[0, P_N_CLOSE_ORDERS], params[1, P_N_CLOSE_ORDERS] = n_close_orders
+    (
+        params[0, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+        params[1, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+    ) = auto_unstuck_wallet_exposure_threshold
+    params[0, P_AUTO_UNSTUCK_EMA_DIST], params[1, P_AUTO_UNSTUCK_EMA_DIST] = auto_unstuck_ema_dist
+
+
+@njit
+def pack_static_grid_params(
+    inverse,
+    do_long,
+    do_short,
+    backwards_tp,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    grid_span,
+    wallet_exposure_limit,
+    max_n_entry_orders,
+    initial_qty_pct,
+    eprice_pprice_diff,
+    secondary_allocation,
+    secondary_pprice_diff,
+    eprice_exp_base,
+    min_markup,
+    markup_range,
+    n_close_orders,
+    ema_span_0,
+    ema_span_1,
+    initial_eprice_ema_dist,
+    auto_unstuck_wallet_exposure_threshold,
+    auto_unstuck_ema_dist,
+):
+    # takes same args as create_xk() output; market specific settings are ignored
+    params = np.zeros((2, N_STATIC_GRID_PARAMS))
+    pack_common_params(
+        params,
+        do_long,
+        do_short,
+        backwards_tp,
+        wallet_exposure_limit,
+        ema_span_0,
+        ema_span_1,
+        initial_qty_pct,
+        initial_eprice_ema_dist,
+        min_markup,
+        markup_range,
+        n_close_orders,
+        auto_unstuck_wallet_exposure_threshold,
+        auto_unstuck_ema_dist,
+    )
+    params[0, P_GRID_SPAN], params[1, P_GRID_SPAN] = grid_span
+    params[0, P_MAX_N_ENTRY_ORDERS], params[1, P_MAX_N_ENTRY_ORDERS] = max_n_entry_orders
+    params[0, P_EPRICE_EXP_BASE], params[1, P_EPRICE_EXP_BASE] = eprice_exp_base
+    params[0, P_EPRICE_PPRICE_DIFF], params[1, P_EPRICE_PPRICE_DIFF] = eprice_pprice_diff
+    params[0, P_SECONDARY_ALLOCATION], params[1, P_SECONDARY_ALLOCATION] = secondary_allocation
+    params[0, P_SECONDARY_PPRICE_DIFF], params[1, P_SECONDARY_PPRICE_DIFF] = secondary_pprice_diff
+    return params
+
+
+@njit
+def pack_market_settings(inverse, qty_step, price_step, min_qty, min_cost, c_mult, maker_fee=0.0):
+    # market settings row, shape (N_MARKET_SETTINGS,), see MS_* indices
+    market = np.zeros(N_MARKET_SETTINGS)
+    market[MS_INVERSE] = 1.0 if inverse else 0.0
+    market[MS_QTY_STEP] = qty_step
+    market[MS_PRICE_STEP] = price_step
+    market[MS_MIN_QTY] = min_qty
+    market[MS_MIN_COST] = min_cost
+    market[MS_C_MULT] = c_mult
+    market[MS_MAKER_FEE] = maker_fee
+    return market
+
+
+@njit
+def calc_close_grid_long_packed(balance, psize, pprice, lowest_ask, ema_band_upper, market, params):
+    # calc_close_grid_long() with market settings from pack_market_settings() and params packed by
+    # any pack_*_grid_params()
+    return calc_close_grid_long(
+        params[0, P_BACKWARDS_TP] != 0.0,
+        balance,
+        psize,
+        pprice,
+        lowest_ask,
+        ema_band_upper,
+        market[MS_INVERSE] != 0.0,
+        market[MS_QTY_STEP],
+        market[MS_PRICE_STEP],
+        market[MS_MIN_QTY],
+        market[MS_MIN_COST],
+        market[MS_C_MULT],
+        params[0, P_WALLET_EXPOSURE_LIMIT],
+        params[0, P_MIN_MARKUP],
+        params[0, P_MARKUP_RANGE],
+        int(round(params[0, P_N_CLOSE_ORDERS])),
+        params[0, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+        params[0, P_AUTO_UNSTUCK_EMA_DIST],
+    )
+
+
+@njit
+def calc_close_grid_short_packed(balance, psize, pprice, highest_bid, ema_band_lower, market, params):
+    # calc_close_grid_short() with market settings from pack_market_settings() and params packed by
+    # any pack_*_grid_params()
+    return calc_close_grid_short(
+        params[1, P_BACKWARDS_TP] != 0.0,
+        balance,
+        psize,
+        pprice,
+        highest_bid,
+        ema_band_lower,
+        market[MS_INVERSE] != 0.0,
+        market[MS_QTY_STEP],
+        market[MS_PRICE_STEP],
+        market[MS_MIN_QTY],
+        market[MS_MIN_COST],
+        market[MS_C_MULT],
+        params[1, P_WALLET_EXPOSURE_LIMIT],
+        params[1, P_MIN_MARKUP],
+        params[1, P_MARKUP_RANGE],
+        int(round(params[1, P_N_CLOSE_ORDERS])),
+        params[1, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+        params[1, P_AUTO_UNSTUCK_EMA_DIST],
+    )
+
+
+@njit
+def calc_entry_grid_long_packed(
+    balance, psize, pprice, highest_bid, ema_band_lower, do_long, market, params, grid_memo=None
+):
+    # calc_entry_grid_long() with market settings from pack_market_settings() and params packed by
+    # pack_static_grid_params()
+    return calc_entry_grid_long(
+        balance,
+        psize,
+        pprice,
+        highest_bid,
+        ema_band_lower,
+        market[MS_INVERSE] != 0.0,
+        do_long,
+        market[MS_QTY_STEP],
+        market[MS_PRICE_STEP],
+        market[MS_MIN_QTY],
+        market[MS_MIN_COST],
+        market[MS_C_MULT],
+        params[0, P_GRID_SPAN],
+        params[0, P_WALLET_EXPOSURE_LIMIT],
+        int(round(params[0, P_MAX_N_ENTRY_ORDERS])),
+        params[0, P_INITIAL_QTY_PCT],
+        params[0, P_INITIAL_EPRICE_EMA_DIST],
+        params[0, P_EPRICE_PPRICE_DIFF],
+        params[0, P_SECONDARY_ALLOCATION],
+        params[0, P_SECONDARY_PPRICE_DIFF],
+        params[0, P_EPRICE_EXP_BASE],
+        params[0, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+        params[0, P_AUTO_UNSTUCK_EMA_DIST],
+        grid_memo,
+    )
+
+
+@njit
+def calc_entry_grid_short_packed(
+    balance, psize, pprice, lowest_ask, ema_band_upper, do_short, market, params, grid_memo=None
+):
+    # calc_entry_grid_short() with market settings from pack_market_settings() and params packed by
+    # pack_static_grid_params()
+    return calc_entry_grid_short(
+        balance,
+        psize,
+        pprice,
+        lowest_ask,
+        ema_band_upper,
+        market[MS_INVERSE] != 0.0,
+        do_short,
+        market[MS_QTY_STEP],
+        market[MS_PRICE_STEP],
+        market[MS_MIN_QTY],
+        market[MS_MIN_COST],
+        market[MS_C_MULT],
+        params[1, P_GRID_SPAN],
+        params[1, P_WALLET_EXPOSURE_LIMIT],
+        int(round(params[1, P_MAX_N_ENTRY_ORDERS])),
+        params[1, P_INITIAL_QTY_PCT],
+        params[1, P_INITIAL_EPRICE_EMA_DIST],
+        params[1, P_EPRICE_PPRICE_DIFF],
+        params[1, P_SECONDARY_ALLOCATION],
+        params[1, P_SECONDARY_PPRICE_DIFF],
+        params[1, P_EPRICE_EXP_BASE],
+        params[1, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+        params[1, P_AUTO_UNSTUCK_EMA_DIST],
+        grid_memo,
+    )
+
+
+@njit
+def backtest_static_grid_range(
+    ticks,
+    block_highs,
+    block_lows,
+    k_start,
+    k_end,
+    state,
+    params,
+    entries_long,
+    closes_long,
+    entries_short,
+    closes_short,
+    grid_memo_long,
+    grid_memo_short,
+    fills_long,
+    fills_short,
+    stats,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+):
+    # runs ticks [k_start, k_end), resuming from state and updating it in place
+    # ticks: ticks view from unpack_ticks() or unpack_compact_ticks()
+    # fills and stats are appended to given lists; returns open orders
+    # grid memos, from init_grid_memo(), are updated in place
+    backwards_tp = (params[0, P_BACKWARDS_TP] != 0.0, params[1, P_BACKWARDS_TP] != 0.0)
+    grid_span = (params[0, P_GRID_SPAN], params[1, P_GRID_SPAN])
+    wallet_exposure_limit = (params[0, P_WALLET_EXPOSURE_LIMIT], params[1, P_WALLET_EXPOSURE_LIMIT])
+    max_n_entry_orders = (
+        int(round(params[0, P_MAX_N_ENTRY_ORDERS])),
+        int(round(params[1, P_MAX_N_ENTRY_ORDERS])),
+    )
+    initial_qty_pct = (params[0, P_INITIAL_QTY_PCT], params[1, P_INITIAL_QTY_PCT])
+    initial_eprice_ema_dist = (
+        params[0, P_INITIAL_EPRICE_EMA_DIST],
+        params[1, P_INITIAL_EPRICE_EMA_DIST],
+    )
+    eprice_pprice_diff = (params[0, P_EPRICE_PPRICE_DIFF], params[1, P_EPRICE_PPRICE_DIFF])
+    secondary_allocation = (params[0, P_SECONDARY_ALLOCATION], params[1, P_SECONDARY_ALLOCATION])
+    secondary_pprice_diff = (params[0, P_SECONDARY_PPRICE_DIFF], params[1, P_SECONDARY_PPRICE_DIFF])
+    eprice_exp_base = (params[0, P_EPRICE_EXP_BASE], params[1, P_EPRICE_EXP_BASE])
+    min_markup = (params[0, P_MIN_MARKUP], params[1, P_MIN_MARKUP])
+    markup_range = (params[0, P_MARKUP_RANGE], params[1, P_MARKUP_RANGE])
+    n_close_orders = (
+        int(round(params[0, P_N_CLOSE_ORDERS])),
+        int(round(params[1, P_N_CLOSE_ORDERS])),
+    )
+    auto_unstuck_wallet_exposure_threshold = (
+        params[0, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+        params[1, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+    )
+    auto_unstuck_ema_dist = (params[0, P_AUTO_UNSTUCK_EMA_DIST], params[1, P_AUTO_UNSTUCK_EMA_DIST])
+
+    do_long, do_short = state[ST_DO_LONG] != 0.0, state[ST_DO_SHORT] != 0.0
+    balance_long, balance_short = state[ST_BALANCE_LONG], state[ST_BALANCE_SHORT]
+    equity_long, equity_short = state[ST_EQUITY_LONG], state[ST_EQUITY_SHORT]
+    psize_long, pprice_long = state[ST_PSIZE_LONG], state[ST_PPRICE_LONG]
+    psize_short, pprice_short = state[ST_PSIZE_SHORT], state[ST_PPRICE_SHORT]
+    bkr_price_long, bkr_price_short = state[ST_BKR_PRICE_LONG], state[ST_BKR_PRICE_SHORT]
+    closest_bkr_long, closest_bkr_short = state[ST_CLOSEST_BKR_LONG], state[ST_CLOSEST_BKR_SHORT]
+
+    next_entry_grid_update_ts_long = state[ST_NEXT_ENTRY_UPDATE_TS_LONG]
+    next_entry_grid_update_ts_short = state[ST_NEXT_ENTRY_UPDATE_TS_SHORT]
+    next_close_grid_update_ts_long = state[ST_NEXT_CLOSE_UPDATE_TS_LONG]
+    next_close_grid_update_ts_short = state[ST_NEXT_CLOSE_UPDATE_TS_SHORT]
+    next_stats_update = state[ST_NEXT_STATS_UPDATE]
+
+    max_span_long = int(state[ST_MAX_SPAN_LONG])
+    max_span_short = int(state[ST_MAX_SPAN_SHORT])
+    emas_long = state[ST_EMAS_LONG : ST_EMAS_LONG + 3].copy()
+    emas_short = state[ST_EMAS_SHORT : ST_EMAS_SHORT + 3].copy()
+    alphas_long = state[ST_ALPHAS_LONG : ST_ALPHAS_LONG + 3].copy()
+    alphas__long = 1.0 - alphas_long
+    alphas_short = state[ST_ALPHAS_SHORT : ST_ALPHAS_SHORT + 3].copy()
+    alphas__short = 1.0 - alphas_short
+
+    long_wallet_exposure = state[ST_WALLET_EXPOSURE_LONG]
+    short_wallet_exposure = state[ST_WALLET_EXPOSURE_SHORT]
+    long_wallet_exposure_auto_unstuck_threshold = (
+        (wallet_exposure_limit[0] * (1 - auto_unstuck_wallet_exposure_threshold[0]))
+        if auto_unstuck_wallet_exposure_threshold[0] != 0.0
+        else wallet_exposure_limit[0] * 10
+    )
+    short_wallet_exposure_auto_unstuck_threshold = (
+        (wallet_exposure_limit[1] * (1 - auto_unstuck_wallet_exposure_threshold[1]))
+        if auto_unstuck_wallet_exposure_threshold[1] != 0.0
+        else wallet_exposure_limit[1] * 10
+    )
+
+    n_fills_long = int(state[ST_N_FILLS_LONG])
+    n_fills_short = int(state[ST_N_FILLS_SHORT])
+    n_stats = int(state[ST_N_STATS])
+    done, k_next = False, k_end
+
+    k_skip = k_start
+    for k in range(k_start, k_end):
+        if k < k_skip:
+            continue
+        if len(block_highs) > 0:
+            # jump over ticks which can only update emas, closest bankruptcy distances and stats
+            entry_price_long = (
+                entries_long[0][1] if entries_long and entries_long[0][0] > 0.0 else -np.inf
+            )
+            close_price_long = (
+                closes_long[0][1]
+                if psize_long > 0.0 and closes_long and closes_long[0][0] < 0.0
+                else np.inf
+            )
+            entry_price_short = (
+                entries_short[0][1] if entries_short and entries_short[0][0] < 0.0 else np.inf
+            )
+            close_price_short = (
+                closes_short[0][1]
+                if psize_short < 0.0 and closes_short and closes_short[0][0] > 0.0
+                else -np.inf
+            )
+            k_skip = find_skip_target(
+                k,
+                k_end,
+                ticks,
+                block_highs,
+                block_lows,
+                latency_simulation_ms,
+                do_long,
+                max_span_long,
+                psize_long,
+                pprice_long,
+                bkr_price_long,
+                long_wallet_exposure,
+                long_wallet_exposure_auto_unstuck_threshold,
+                next_entry_grid_update_ts_long,
+                next_close_grid_update_ts_long,
+                entry_price_long,
+                close_price_long,
+                do_short,
+                max_span_short,
+                psize_short,
+                pprice_short,
+                bkr_price_short,
+                short_wallet_exposure,
+                short_wallet_exposure_auto_unstuck_threshold,
+                next_entry_grid_update_ts_short,
+                next_close_grid_update_ts_short,
+                entry_price_short,
+                close_price_short,
+                False,
+            )
+            if k_skip > k:
+                (
+                    emas_long,
+                    emas_short,
+                    closest_bkr_long,
+                    closest_bkr_short,
+                    equity_long,
+                    equity_short,
+                    stats,
+                    n_stats,
+                    next_stats_update,
+                ) = skip_ticks(
+                    k,
+                    k_skip,
+                    ticks,
+                    do_long,
+                    do_short,
+                    max_span_long,
+                    max_span_short,
+                    emas_long,
+                    emas_short,
+                    alphas_long,
+                    alphas__long,
+                    alphas_short,
+                    alphas__short,
+                    bkr_price_long,
+                    bkr_price_short,
+                    closest_bkr_long,
+                    closest_bkr_short,
+                    balance_long,
+                    balance_short,
+                    equity_long,
+                    equity_short,
+                    psize_long,
+                    pprice_long,
+                    psize_short,
+                    pprice_short,
+                    stats,
+                    n_stats,
+                    next_stats_update,
+                    inverse,
+                    c_mult,
+                )
+                continue
+        timestamp = tick_timestamp(ticks, k)
+        close, prev_close = tick_close(ticks, k), tick_close(ticks, k - 1)
+        high, low = tick_high(ticks, k), tick_low(ticks, k)
+        if do_long:
+            emas_long = calc_ema(alphas_long, alphas__long, emas_long, prev_close)
+            if k >= max_span_long:
+                # check bankruptcy
+                bkr_diff_long = calc_diff(bkr_price_long, close)
+                closest_bkr_long = min(closest_bkr_long, bkr_diff_long)
+                if closest_bkr_long < 0.06:
+                    # consider bankruptcy within 6% as liquidation
+                    if psize_long != 0.0:
+                        fee_paid = -qty_to_cost(psize_long, pprice_long, inverse, c_mult) * maker_fee
+                        pnl = calc_pnl_long(pprice_long, close, -psize_long, inverse, c_mult)
+                        balance_long = starting_balance * 1e-6
+                        equity_long = 0.0
+                        psize_long, pprice_long = 0.0, 0.0
+                        fills_long, n_fills_long = append_fill(
+                            fills_long,
+                            n_fills_long,
+                            k,
+                            timestamp,
+                            pnl,
+                            fee_paid,
+                            balance_long,
+                            equity_long,
+                            -psize_long,
+                            close,
+                            0.0,
+                            0.0,
+                            "long_bankruptcy",
+                        )
+                    do_long = False
+                    if not do_short:
+                        stats, n_stats = append_stats(
+                            stats,
+                            n_stats,
+                            next_stats_update,
+                            bkr_price_long,
+                            bkr_price_short,
+                            psize_long,
+                            pprice_long,
+                            psize_short,
+                            pprice_short,
+                            close,
+                            closest_bkr_long,
+                            closest_bkr_short,
+                            balance_long,
+                            balance_short,
+                            equity_long,
+                            equity_short,
+                        )
+                        done, k_next = True, k + 1
+                        break
+
+                # check if long entry grid should be updated
+                if timestamp >= next_entry_grid_update_ts_long:
+                    entries_long = calc_entry_grid_long(
+                        balance_long,
                         psize_long,
                         pprice_long,
-                        closes[k - 1],
+                        prev_close,
                         min(emas_long),
                         inverse,
                         do_long,
@@ -2268,16 +3362,17 @@ def backtest_static_grid(
                         eprice_exp_base[0],
                         auto_unstuck_wallet_exposure_threshold[0],
                         auto_unstuck_ema_dist[0],
+                        grid_memo_long,
                     )
-                    next_entry_grid_update_ts_long = timestamps[k] + 1000 * 60 * 5
+                    next_entry_grid_update_ts_long = timestamp + 1000 * 60 * 5
                 # check if close grid should be updated
-                if timestamps[k] >= next_close_grid_update_ts_long:
+                if timestamp >= next_close_grid_update_ts_long:
                     closes_long = calc_close_grid_long(
                         backwards_tp[0],
                         balance_long,
                         psize_long,
                         pprice_long,
-                        closes[k - 1],
+                        prev_close,
                         max(emas_long),
                         inverse,
                         qty_step,
@@ -2292,15 +3387,15 @@ def backtest_static_grid(
                         auto_unstuck_wallet_exposure_threshold[0],
                         auto_unstuck_ema_dist[0],
                     )
-                    next_close_grid_update_ts_long = timestamps[k] + 1000 * 60 * 5
+                    next_close_grid_update_ts_long = timestamp + 1000 * 60 * 5
 
                 # check for long entry fills
-                while entries_long and entries_long[0][0] > 0.0 and lows[k] < entries_long[0][1]:
+                while entries_long and entries_long[0][0] > 0.0 and low < entries_long[0][1]:
                     next_entry_grid_update_ts_long = min(
-                        next_entry_grid_update_ts_long, timestamps[k] + latency_simulation_ms
+                        next_entry_grid_update_ts_long, timestamp + latency_simulation_ms
                     )
                     next_close_grid_update_ts_long = min(
-                        next_close_grid_update_ts_long, timestamps[k] + latency_simulation_ms
+                        next_close_grid_update_ts_long, timestamp + latency_simulation_ms
                     )
                     psize_long, pprice_long = calc_new_psize_pprice(
                         psize_long,
@@ -2316,22 +3411,22 @@ def backtest_static_grid(
                     balance_long = max(starting_balance * 1e-6, balance_long + fee_paid)
 
                     equity_long = balance_long + calc_pnl_long(
-                        pprice_long, closes[k], psize_long, inverse, c_mult
+                        pprice_long, close, psize_long, inverse, c_mult
                     )
-                    fills_long.append(
-                        (
-                            k,
-                            timestamps[k],
-                            0.0,
-                            fee_paid,
-                            balance_long,
-                            equity_long,
-                            entries_long[0][0],
-                            entries_long[0][1],
-                            psize_long,
-                            pprice_long,
-                            entries_long[0][2],
-                        )
+                    fills_long, n_fills_long = append_fill(
+                        fills_long,
+                        n_fills_long,
+                        k,
+                        timestamp,
+                        0.0,
+                        fee_paid,
+                        balance_long,
+                        equity_long,
+                        entries_long[0][0],
+                        entries_long[0][1],
+                        psize_long,
+                        pprice_long,
+                        entries_long[0][2],
                     )
                     entries_long = entries_long[1:]
                     bkr_price_long = calc_bankruptcy_price(
@@ -2352,13 +3447,13 @@ def backtest_static_grid(
                     psize_long > 0.0
                     and closes_long
                     and closes_long[0][0] < 0.0
-                    and highs[k] > closes_long[0][1]
+                    and high > closes_long[0][1]
                 ):
                     next_entry_grid_update_ts_long = min(
-                        next_entry_grid_update_ts_long, timestamps[k] + latency_simulation_ms
+                        next_entry_grid_update_ts_long, timestamp + latency_simulation_ms
                     )
                     next_close_grid_update_ts_long = min(
-                        next_close_grid_update_ts_long, timestamps[k] + latency_simulation_ms
+                        next_close_grid_update_ts_long, timestamp + latency_simulation_ms
                     )
                     close_qty_long = closes_long[0][0]
                     new_psize_long = round_(psize_long + close_qty_long, qty_step)
@@ -2379,22 +3474,22 @@ def backtest_static_grid(
                     balance_long = max(starting_balance * 1e-6, balance_long + fee_paid + pnl)
 
                     equity_long = balance_long + calc_pnl_long(
-                        pprice_long, closes[k], psize_long, inverse, c_mult
+                        pprice_long, close, psize_long, inverse, c_mult
                     )
-                    fills_long.append(
-                        (
-                            k,
-                            timestamps[k],
-                            pnl,
-                            fee_paid,
-                            balance_long,
-                            equity_long,
-                            close_qty_long,
-                            closes_long[0][1],
-                            psize_long,
-                            pprice_long,
-                            closes_long[0][2],
-                        )
+                    fills_long, n_fills_long = append_fill(
+                        fills_long,
+                        n_fills_long,
+                        k,
+                        timestamp,
+                        pnl,
+                        fee_paid,
+                        balance_long,
+                        equity_long,
+                        close_qty_long,
+                        closes_long[0][1],
+                        psize_long,
+                        pprice_long,
+                        closes_long[0][2],
                     )
                     closes_long = closes_long[1:]
                     bkr_price_long = calc_bankruptcy_price(
@@ -2413,31 +3508,31 @@ def backtest_static_grid(
                     # update entry order
                     next_entry_grid_update_ts_long = min(
                         next_entry_grid_update_ts_long,
-                        timestamps[k] + latency_simulation_ms,
+                        timestamp + latency_simulation_ms,
                     )
                 else:
-                    if closes[k] > pprice_long:
+                    if close > pprice_long:
                         # update closes after 2.5 sec
                         next_close_grid_update_ts_long = min(
                             next_close_grid_update_ts_long,
-                            timestamps[k] + latency_simulation_ms + 2500,
+                            timestamp + latency_simulation_ms + 2500,
                         )
                     elif long_wallet_exposure >= long_wallet_exposure_auto_unstuck_threshold:
                         # update both entry grid and closes after 15 secs
                         next_close_grid_update_ts_long = min(
                             next_close_grid_update_ts_long,
-                            timestamps[k] + latency_simulation_ms + 15000,
+                            timestamp + latency_simulation_ms + 15000,
                         )
                         next_entry_grid_update_ts_long = min(
                             next_entry_grid_update_ts_long,
-                            timestamps[k] + latency_simulation_ms + 15000,
+                            timestamp + latency_simulation_ms + 15000,
                         )
 
         if do_short:
-            emas_short = calc_ema(alphas_short, alphas__short, emas_short, closes[k - 1])
+            emas_short = calc_ema(alphas_short, alphas__short, emas_short, prev_close)
             if k >= max_span_short:
                 # check bankruptcy
-                bkr_diff_short = calc_diff(bkr_price_short, closes[k])
+                bkr_diff_short = calc_diff(bkr_price_short, close)
                 closest_bkr_short = min(closest_bkr_short, bkr_diff_short)
 
                 if closest_bkr_short < 0.06:
@@ -2446,54 +3541,55 @@ def backtest_static_grid(
                         fee_paid = (
                             -qty_to_cost(psize_short, pprice_short, inverse, c_mult) * maker_fee
                         )
-                        pnl = calc_pnl_short(pprice_short, closes[k], -psize_short, inverse, c_mult)
+                        pnl = calc_pnl_short(pprice_short, close, -psize_short, inverse, c_mult)
                         balance_short = starting_balance * 1e-6
                         equity_short = 0.0
                         psize_short, pprice_short = 0.0, 0.0
-                        fills_short.append(
-                            (
-                                k,
-                                timestamps[k],
-                                pnl,
-                                fee_paid,
-                                balance_short,
-                                equity_short,
-                                -psize_short,
-                                closes[k],
-                                0.0,
-                                0.0,
-                                "short_bankruptcy",
-                            )
+                        fills_short, n_fills_short = append_fill(
+                            fills_short,
+                            n_fills_short,
+                            k,
+                            timestamp,
+                            pnl,
+                            fee_paid,
+                            balance_short,
+                            equity_short,
+                            -psize_short,
+                            close,
+                            0.0,
+                            0.0,
+                            "short_bankruptcy",
                         )
                     do_short = False
                     if not do_long:
-                        stats.append(
-                            (
-                                next_stats_update,
-                                bkr_price_long,
-                                bkr_price_short,
-                                psize_long,
-                                pprice_long,
-                                psize_short,
-                                pprice_short,
-                                closes[k],
-                                closest_bkr_long,
-                                closest_bkr_short,
-                                balance_long,
-                                balance_short,
-                                equity_long,
-                                equity_short,
-                            )
+                        stats, n_stats = append_stats(
+                            stats,
+                            n_stats,
+                            next_stats_update,
+                            bkr_price_long,
+                            bkr_price_short,
+                            psize_long,
+                            pprice_long,
+                            psize_short,
+                            pprice_short,
+                            close,
+                            closest_bkr_long,
+                            closest_bkr_short,
+                            balance_long,
+                            balance_short,
+                            equity_long,
+                            equity_short,
                         )
-                        return fills_long, fills_short, stats
+                        done, k_next = True, k + 1
+                        break
 
                 # check if entry grid should be updated
-                if timestamps[k] >= next_entry_grid_update_ts_short:
+                if timestamp >= next_entry_grid_update_ts_short:
                     entries_short = calc_entry_grid_short(
                         balance_short,
                         psize_short,
                         pprice_short,
-                        closes[k - 1],
+                        prev_close,
                         max(emas_short),
                         inverse,
                         do_short,
@@ -2513,17 +3609,18 @@ def backtest_static_grid(
                         eprice_exp_base[1],
                         auto_unstuck_wallet_exposure_threshold[1],
                         auto_unstuck_ema_dist[1],
+                        grid_memo_short,
                     )
-                    next_entry_grid_update_ts_short = timestamps[k] + 1000 * 60 * 5
+                    next_entry_grid_update_ts_short = timestamp + 1000 * 60 * 5
 
                 # check if close grid should be updated
-                if timestamps[k] >= next_close_grid_update_ts_short:
+                if timestamp >= next_close_grid_update_ts_short:
                     closes_short = calc_close_grid_short(
                         backwards_tp[1],
                         balance_short,
                         psize_short,
                         pprice_short,
-                        closes[k - 1],
+                        prev_close,
                         min(emas_short),
                         inverse,
                         qty_step,
@@ -2538,14 +3635,14 @@ def backtest_static_grid(
                         auto_unstuck_wallet_exposure_threshold[1],
                         auto_unstuck_ema_dist[1],
                     )
-                    next_close_grid_update_ts_short = timestamps[k] + 1000 * 60 * 5  # five mins delay
+                    next_close_grid_update_ts_short = timestamp + 1000 * 60 * 5  # five mins delay
 
-                while entries_short and entries_short[0][0] < 0.0 and highs[k] > entries_short[0][1]:
+                while entries_short and entries_short[0][0] < 0.0 and high > entries_short[0][1]:
                     next_entry_grid_update_ts_short = min(
-                        next_entry_grid_update_ts_short, timestamps[k] + latency_simulation_ms
+                        next_entry_grid_update_ts_short, timestamp + latency_simulation_ms
                     )
                     next_close_grid_update_ts_short = min(
-                        next_close_grid_update_ts_short, timestamps[k] + latency_simulation_ms
+                        next_close_grid_update_ts_short, timestamp + latency_simulation_ms
                     )
                     psize_short, pprice_short = calc_new_psize_pprice(
                         psize_short,
@@ -2560,22 +3657,22 @@ def backtest_static_grid(
                     )
                     balance_short = max(starting_balance * 1e-6, balance_short + fee_paid)
                     equity_short = balance_short + calc_pnl_short(
-                        pprice_short, closes[k], psize_short, inverse, c_mult
+                        pprice_short, close, psize_short, inverse, c_mult
                     )
-                    fills_short.append(
-                        (
-                            k,
-                            timestamps[k],
-                            0.0,
-                            fee_paid,
-                            balance_short,
-                            equity_short,
-                            entries_short[0][0],
-                            entries_short[0][1],
-                            psize_short,
-                            pprice_short,
-                            entries_short[0][2],
-                        )
+                    fills_short, n_fills_short = append_fill(
+                        fills_short,
+                        n_fills_short,
+                        k,
+                        timestamp,
+                        0.0,
+                        fee_paid,
+                        balance_short,
+                        equity_short,
+                        entries_short[0][0],
+                        entries_short[0][1],
+                        psize_short,
+                        pprice_short,
+                        entries_short[0][2],
                     )
                     entries_short = entries_short[1:]
                     bkr_price_short = calc_bankruptcy_price(
@@ -2596,13 +3693,13 @@ def backtest_static_grid(
                     psize_short < 0.0
                     and closes_short
                     and closes_short[0][0] > 0.0
-                    and lows[k] < closes_short[0][1]
+                    and low < closes_short[0][1]
                 ):
                     next_entry_grid_update_ts_short = min(
-                        next_entry_grid_update_ts_short, timestamps[k] + latency_simulation_ms
+                        next_entry_grid_update_ts_short, timestamp + latency_simulation_ms
                     )
                     next_close_grid_update_ts_short = min(
-                        next_close_grid_update_ts_short, timestamps[k] + latency_simulation_ms
+                        next_close_grid_update_ts_short, timestamp + latency_simulation_ms
                     )
                     close_qty_short = closes_short[0][0]
                     new_psize_short = round_(psize_short + close_qty_short, qty_step)
@@ -2622,22 +3719,22 @@ def backtest_static_grid(
                     )
                     balance_short = max(starting_balance * 1e-6, balance_short + fee_paid + pnl)
                     equity_short = balance_short + calc_pnl_short(
-                        pprice_short, closes[k], psize_short, inverse, c_mult
+                        pprice_short, close, psize_short, inverse, c_mult
                     )
-                    fills_short.append(
-                        (
-                            k,
-                            timestamps[k],
-                            pnl,
-                            fee_paid,
-                            balance_short,
-                            equity_short,
-                            close_qty_short,
-                            closes_short[0][1],
-                            psize_short,
-                            pprice_short,
-                            closes_short[0][2],
-                        )
+                    fills_short, n_fills_short = append_fill(
+                        fills_short,
+                        n_fills_short,
+                        k,
+                        timestamp,
+                        pnl,
+                        fee_paid,
+                        balance_short,
+                        equity_short,
+                        close_qty_short,
+                        closes_short[0][1],
+                        psize_short,
+                        pprice_short,
+                        closes_short[0][2],
                     )
                     closes_short = closes_short[1:]
                     bkr_price_short = calc_bankruptcy_price(
@@ -2655,68 +3752,833 @@ def backtest_static_grid(
                 if psize_short == 0.0:
                     next_entry_grid_update_ts_short = min(
                         next_entry_grid_update_ts_short,
-                        timestamps[k] + latency_simulation_ms,
+                        timestamp + latency_simulation_ms,
                     )
                 else:
-                    if closes[k] < pprice_short:
+                    if close < pprice_short:
                         next_close_grid_update_ts_short = min(
                             next_close_grid_update_ts_short,
-                            timestamps[k] + latency_simulation_ms + 2500,
+                            timestamp + latency_simulation_ms + 2500,
                         )
                     elif short_wallet_exposure >= short_wallet_exposure_auto_unstuck_threshold:
                         next_close_grid_update_ts_short = min(
                             next_close_grid_update_ts_short,
-                            timestamps[k] + latency_simulation_ms + 15000,
+                            timestamp + latency_simulation_ms + 15000,
                         )
                         next_entry_grid_update_ts_short = min(
                             next_entry_grid_update_ts_short,
-                            timestamps[k] + latency_simulation_ms + 15000,
+                            timestamp + latency_simulation_ms + 15000,
                         )
 
         # process stats
-        if timestamps[k] >= next_stats_update:
+        if timestamp >= next_stats_update:
             equity_long = balance_long + calc_pnl_long(
-                pprice_long, closes[k], psize_long, inverse, c_mult
+                pprice_long, close, psize_long, inverse, c_mult
             )
             equity_short = balance_short + calc_pnl_short(
-                pprice_short, closes[k], psize_short, inverse, c_mult
+                pprice_short, close, psize_short, inverse, c_mult
             )
-            stats.append(
-                (
-                    timestamps[k],
-                    bkr_price_long,
-                    bkr_price_short,
-                    psize_long,
-                    pprice_long,
-                    psize_short,
-                    pprice_short,
-                    closes[k],
-                    closest_bkr_long,
-                    closest_bkr_short,
-                    balance_long,
-                    balance_short,
-                    equity_long,
-                    equity_short,
-                )
+            stats, n_stats = append_stats(
+                stats,
+                n_stats,
+                timestamp,
+                bkr_price_long,
+                bkr_price_short,
+                psize_long,
+                pprice_long,
+                psize_short,
+                pprice_short,
+                close,
+                closest_bkr_long,
+                closest_bkr_short,
+                balance_long,
+                balance_short,
+                equity_long,
+                equity_short,
             )
-            next_stats_update = round(timestamps[k] + 60 * 1000)
+            next_stats_update = round(timestamp + 60 * 1000)
+
+    state[ST_DO_LONG], state[ST_DO_SHORT] = do_long, do_short
+    state[ST_BALANCE_LONG], state[ST_BALANCE_SHORT] = balance_long, balance_short
+    state[ST_EQUITY_LONG], state[ST_EQUITY_SHORT] = equity_long, equity_short
+    state[ST_PSIZE_LONG], state[ST_PPRICE_LONG] = psize_long, pprice_long
+    state[ST_PSIZE_SHORT], state[ST_PPRICE_SHORT] = psize_short, pprice_short
+    state[ST_BKR_PRICE_LONG], state[ST_BKR_PRICE_SHORT] = bkr_price_long, bkr_price_short
+    state[ST_CLOSEST_BKR_LONG], state[ST_CLOSEST_BKR_SHORT] = closest_bkr_long, closest_bkr_short
+    state[ST_WALLET_EXPOSURE_LONG] = long_wallet_exposure
+    state[ST_WALLET_EXPOSURE_SHORT] = short_wallet_exposure
+    state[ST_NEXT_ENTRY_UPDATE_TS_LONG] = next_entry_grid_update_ts_long
+    state[ST_NEXT_ENTRY_UPDATE_TS_SHORT] = next_entry_grid_update_ts_short
+    state[ST_NEXT_CLOSE_UPDATE_TS_LONG] = next_close_grid_update_ts_long
+    state[ST_NEXT_CLOSE_UPDATE_TS_SHORT] = next_close_grid_update_ts_short
+    state[ST_NEXT_STATS_UPDATE] = next_stats_update
+    state[ST_EMAS_LONG : ST_EMAS_LONG + 3] = emas_long
+    state[ST_EMAS_SHORT : ST_EMAS_SHORT + 3] = emas_short
+    state[ST_DONE] = done
+    state[ST_N_FILLS_LONG] = n_fills_long
+    state[ST_N_FILLS_SHORT] = n_fills_short
+    state[ST_N_STATS] = n_stats
+    state[ST_K] = k_next
+    state[ST_GRID_MEMO_HITS] = grid_memo_long[1, 0] + grid_memo_short[1, 0]
+    state[ST_GRID_MEMO_MISSES] = grid_memo_long[1, 1] + grid_memo_short[1, 1]
+    return entries_long, closes_long, entries_short, closes_short, fills_long, fills_short, stats
 
-    stats.append(
-        (
-            next_stats_update,
-            bkr_price_long,
-            bkr_price_short,
-            psize_long,
-            pprice_long,
-            psize_short,
-            pprice_short,
-            closes[k],
-            closest_bkr_long,
-            closest_bkr_short,
-            balance_long,
-            balance_short,
-            equity_long,
-            equity_short,
+
+@njit
+def backtest_static_grid_packed(
+    ticks,
+    params,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    state_out=None,
+):
+    # same as backtest_static_grid(), with config parameters packed by pack_static_grid_params()
+    # state_out: optional N_STATE array, set to the final backtest state
+    block_highs, block_lows = calc_ticks_extrema_index(ticks)
+    state = init_backtest_state(ticks, starting_balance, params)
+    fills_long, fills_short, stats = init_backtest_buffers(ticks)
+    _, _, _, _, fills_long, fills_short, stats = backtest_static_grid_range(
+        ticks,
+        block_highs,
+        block_lows,
+        1,
+        n_ticks(ticks),
+        state,
+        params,
+        empty_orders(),
+        empty_orders(),
+        empty_orders(),
+        empty_orders(),
+        init_grid_memo(int(round(params[0, P_MAX_N_ENTRY_ORDERS]))),
+        init_grid_memo(int(round(params[1, P_MAX_N_ENTRY_ORDERS]))),
+        fills_long,
+        fills_short,
+        stats,
+        starting_balance,
+        latency_simulation_ms,
+        maker_fee,
+        inverse,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+    )
+    if not state[ST_DONE]:
+        stats = append_state_stats(stats, state, state[ST_NEXT_STATS_UPDATE], last_close(ticks))
+    if state_out is not None:
+        state_out[:] = state
+    return trim_backtest_buffers(fills_long, fills_short, stats, state)
+
+
+@njit
+def backtest_static_grid(
+    ticks,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    do_long,
+    do_short,
+    backwards_tp,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    ema_span_0,
+    ema_span_1,
+    eprice_exp_base,
+    eprice_pprice_diff,
+    grid_span,
+    initial_eprice_ema_dist,
+    initial_qty_pct,
+    markup_range,
+    max_n_entry_orders,
+    min_markup,
+    n_close_orders,
+    wallet_exposure_limit,
+    secondary_allocation,
+    secondary_pprice_diff,
+    auto_unstuck_ema_dist,
+    auto_unstuck_wallet_exposure_threshold,
+    state_out=None,
+):
+    # ticks: ticks view, see unpack_ticks()
+    # state_out: optional N_STATE array, set to the final backtest state
+    params = pack_static_grid_params(
+        inverse,
+        do_long,
+        do_short,
+        backwards_tp,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+        grid_span,
+        wallet_exposure_limit,
+        max_n_entry_orders,
+        initial_qty_pct,
+        eprice_pprice_diff,
+        secondary_allocation,
+        secondary_pprice_diff,
+        eprice_exp_base,
+        min_markup,
+        markup_range,
+        n_close_orders,
+        ema_span_0,
+        ema_span_1,
+        initial_eprice_ema_dist,
+        auto_unstuck_wallet_exposure_threshold,
+        auto_unstuck_ema_dist,
+    )
+    return backtest_static_grid_packed(
+        ticks,
+        params,
+        starting_balance,
+        latency_simulation_ms,
+        maker_fee,
+        inverse,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+        state_out,
+    )
+
+
+@njit
+def backtest_static_grid_resume(
+    ticks,
+    params,
+    state,
+    entries_long,
+    closes_long,
+    entries_short,
+    closes_short,
+    grid_memo_long,
+    grid_memo_short,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+):
+    # runs ticks [state[ST_K], n_ticks(ticks)) from an explicit state, e.g. one saved by an earlier run
+    # open orders are given and returned as orders_to_array() arrays
+    # state and grid memos are updated in place; fills and stats counts restart at zero
+    # returns (fills_long, fills_short, stats, entries_long, closes_long, entries_short, closes_short)
+    # without the final stats row, so results of consecutive runs can be concatenated
+    block_highs, block_lows = calc_ticks_extrema_index(ticks)
+    state[ST_N_FILLS_LONG] = state[ST_N_FILLS_SHORT] = state[ST_N_STATS] = 0.0
+    fills_long, fills_short, stats = init_backtest_buffers(ticks)
+    (
+        entries_long_,
+        closes_long_,
+        entries_short_,
+        closes_short_,
+        fills_long,
+        fills_short,
+        stats,
+    ) = backtest_static_grid_range(
+        ticks,
+        block_highs,
+        block_lows,
+        int(state[ST_K]),
+        n_ticks(ticks),
+        state,
+        params,
+        array_to_orders(entries_long),
+        array_to_orders(closes_long),
+        array_to_orders(entries_short),
+        array_to_orders(closes_short),
+        grid_memo_long,
+        grid_memo_short,
+        fills_long,
+        fills_short,
+        stats,
+        starting_balance,
+        latency_simulation_ms,
+        maker_fee,
+        inverse,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+    )
+    fills_long, fills_short, stats = trim_backtest_buffers(fills_long, fills_short, stats, state)
+    return (
+        fills_long,
+        fills_short,
+        stats,
+        orders_to_array(entries_long_),
+        orders_to_array(closes_long_),
+        orders_to_array(entries_short_),
+        orders_to_array(closes_short_),
+    )
+
+
+@njit(parallel=True)
+def backtest_static_grid_symbols(
+    ticks_list, params, market_settings, starting_balance, latency_simulation_ms
+):
+    # backtests one config on many symbols in parallel threads, one symbol per thread at a time
+    # ticks_list: numba.typed.List of ticks views, one per symbol, may differ in length
+    # params shape (2, N_STATIC_GRID_PARAMS), see pack_static_grid_params()
+    # market_settings shape (n_symbols, N_MARKET_SETTINGS), see MS_* indices
+    # returns analysis metrics shape (n_symbols, N_ANALYSIS_METRICS), see calc_analysis_metrics()
+    metrics = np.zeros((len(ticks_list), N_ANALYSIS_METRICS))
+    for i in prange(len(ticks_list)):
+        inverse = market_settings[i, MS_INVERSE] != 0.0
+        fills_long, fills_short, stats = backtest_static_grid_packed(
+            ticks_list[np.int64(i)],
+            params,
+            starting_balance,
+            latency_simulation_ms,
+            market_settings[i, MS_MAKER_FEE],
+            inverse,
+            market_settings[i, MS_QTY_STEP],
+            market_settings[i, MS_PRICE_STEP],
+            market_settings[i, MS_MIN_QTY],
+            market_settings[i, MS_MIN_COST],
+            market_settings[i, MS_C_MULT],
+        )
+        metrics[i] = calc_analysis_metrics(
+            fills_long, fills_short, stats, inverse, market_settings[i, MS_C_MULT]
         )
+    return metrics
+
+
+@njit
+def backtest_static_grid_batch(
+    ticks,
+    params,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    block_size=16384,
+):
+    # params shape (n_configs, 2, N_STATIC_GRID_PARAMS), see pack_static_grid_params()
+    # ticks are walked once in blocks; every config is advanced through a block before the next
+    # block is touched, so tick data is streamed from memory once per batch instead of per config
+    # returns ([fills_long], [fills_short], [stats]), one item per config
+    block_highs, block_lows = calc_ticks_extrema_index(ticks)
+    n_configs = len(params)
+    states = np.zeros((n_configs, N_STATE))
+    for i in range(n_configs):
+        states[i] = init_backtest_state(ticks, starting_balance, params[i])
+    entries_longs = [empty_orders() for _ in range(n_configs)]
+    closes_longs = [empty_orders() for _ in range(n_configs)]
+    entries_shorts = [empty_orders() for _ in range(n_configs)]
+    closes_shorts = [empty_orders() for _ in range(n_configs)]
+    grid_memos_long = [
+        init_grid_memo(int(round(params[i, 0, P_MAX_N_ENTRY_ORDERS]))) for i in range(n_configs)
+    ]
+    grid_memos_short = [
+        init_grid_memo(int(round(params[i, 1, P_MAX_N_ENTRY_ORDERS]))) for i in range(n_configs)
+    ]
+    buffers = [init_backtest_buffers(ticks) for _ in range(n_configs)]
+    fills_longs = [buffer[0] for buffer in buffers]
+    fills_shorts = [buffer[1] for buffer in buffers]
+    statss = [buffer[2] for buffer in buffers]
+    for k_start in range(1, n_ticks(ticks), block_size):
+        k_end = min(k_start + block_size, n_ticks(ticks))
+        for i in range(n_configs):
+            if states[i, ST_DONE]:
+                continue
+            (
+                entries_longs[i],
+                closes_longs[i],
+                entries_shorts[i],
+                closes_shorts[i],
+                fills_longs[i],
+                fills_shorts[i],
+                statss[i],
+            ) = backtest_static_grid_range(
+                ticks,
+                block_highs,
+                block_lows,
+                k_start,
+                k_end,
+                states[i],
+                params[i],
+                entries_longs[i],
+                closes_longs[i],
+                entries_shorts[i],
+                closes_shorts[i],
+                grid_memos_long[i],
+                grid_memos_short[i],
+                fills_longs[i],
+                fills_shorts[i],
+                statss[i],
+                starting_balance,
+                latency_simulation_ms,
+                maker_fee,
+                inverse,
+                qty_step,
+                price_step,
+                min_qty,
+                min_cost,
+                c_mult,
+            )
+    for i in range(n_configs):
+        if not states[i, ST_DONE]:
+            statss[i] = append_state_stats(
+                statss[i], states[i], states[i, ST_NEXT_STATS_UPDATE], last_close(ticks)
+            )
+        fills_longs[i], fills_shorts[i], statss[i] = trim_backtest_buffers(
+            fills_longs[i], fills_shorts[i], statss[i], states[i]
+        )
+    return fills_longs, fills_shorts, statss
+
+
+@njit
+def backtest_static_grid_windows(
+    ticks,
+    windows,
+    params,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    block_size=16384,
+):
+    # windows shape (n_windows, 2), [start, end) tick indices; windows may overlap
+    # each window is backtested from scratch as if its ticks were the whole data, starting at its
+    # first tick.  ticks are walked once in blocks; every window covering a block is advanced
+    # through it before the next block is touched
+    # params shape (2, N_STATIC_GRID_PARAMS), see pack_static_grid_params()
+    # returns ([fills_long], [fills_short], [stats]), one item per window
+    n_windows = len(windows)
+    tickss = [slice_ticks(ticks, windows[i, 0], windows[i, 1]) for i in range(n_windows)]
+    indices = [calc_ticks_extrema_index(tickss[i]) for i in range(n_windows)]
+    states = np.zeros((n_windows, N_STATE))
+    for i in range(n_windows):
+        states[i] = init_backtest_state(tickss[i], starting_balance, params)
+    entries_longs = [empty_orders() for _ in range(n_windows)]
+    closes_longs = [empty_orders() for _ in range(n_windows)]
+    entries_shorts = [empty_orders() for _ in range(n_windows)]
+    closes_shorts = [empty_orders() for _ in range(n_windows)]
+    max_n_entry_orders = (
+        int(round(params[0, P_MAX_N_ENTRY_ORDERS])),
+        int(round(params[1, P_MAX_N_ENTRY_ORDERS])),
+    )
+    grid_memos_long = [init_grid_memo(max_n_entry_orders[0]) for _ in range(n_windows)]
+    grid_memos_short = [init_grid_memo(max_n_entry_orders[1]) for _ in range(n_windows)]
+    buffers = [init_backtest_buffers(tickss[i]) for i in range(n_windows)]
+    fills_longs = [buffer[0] for buffer in buffers]
+    fills_shorts = [buffer[1] for buffer in buffers]
+    statss = [buffer[2] for buffer in buffers]
+    for k_start in range(windows[:, 0].min() + 1, windows[:, 1].max(), block_size):
+        k_end = min(k_start + block_size, windows[:, 1].max())
+        for i in range(n_windows):
+            # block bounds in window's own tick indices; window's first tick only seeds its state
+            w_start = max(k_start, windows[i, 0] + 1) - windows[i, 0]
+            w_end = min(k_end, windows[i, 1]) - windows[i, 0]
+            if w_start >= w_end or states[i, ST_DONE]:
+                continue
+            (
+                entries_longs[i],
+                closes_longs[i],
+                entries_shorts[i],
+                closes_shorts[i],
+                fills_longs[i],
+                fills_shorts[i],
+                statss[i],
+            ) = backtest_static_grid_range(
+                tickss[i],
+                indices[i][0],
+                indices[i][1],
+                w_start,
+                w_end,
+                states[i],
+                params,
+                entries_longs[i],
+                closes_longs[i],
+                entries_shorts[i],
+                closes_shorts[i],
+                grid_memos_long[i],
+                grid_memos_short[i],
+                fills_longs[i],
+                fills_shorts[i],
+                statss[i],
+                starting_balance,
+                latency_simulation_ms,
+                maker_fee,
+                inverse,
+                qty_step,
+                price_step,
+                min_qty,
+                min_cost,
+                c_mult,
+            )
+    for i in range(n_windows):
+        if not states[i, ST_DONE]:
+            statss[i] = append_state_stats(
+                statss[i], states[i], states[i, ST_NEXT_STATS_UPDATE], last_close(tickss[i])
+            )
+        fills_longs[i], fills_shorts[i], statss[i] = trim_backtest_buffers(
+            fills_longs[i], fills_shorts[i], statss[i], states[i]
+        )
+    return fills_longs, fills_shorts, statss
+
+
+# backtest analysis metrics, in order of calc_analysis_metrics() output
+# config dependent metrics (exchange, symbol, per exposure adgs) are added by pure_funcs.analyze_fills_fast()
+ANALYSIS_METRICS = (
+    "starting_balance",
+    "pa_distance_mean_long",
+    "pa_distance_max_long",
+    "pa_distance_std_long",
+    "pa_distance_mean_short",
+    "pa_distance_max_short",
+    "pa_distance_std_short",
+    "equity_balance_ratio_mean_long",
+    "equity_balance_ratio_std_long",
+    "equity_balance_ratio_mean_short",
+    "equity_balance_ratio_std_short",
+    "gain_long",
+    "adg_long",
+    "gain_short",
+    "adg_short",
+    "adg_DGstd_ratio_long",
+    "adg_DGstd_ratio_short",
+    "adg_realized_long",
+    "adg_realized_short",
+    "DGstd_long",
+    "DGstd_short",
+    "n_days",
+    "n_fills_long",
+    "n_fills_short",
+    "n_closes_long",
+    "n_closes_short",
+    "n_normal_closes_long",
+    "n_normal_closes_short",
+    "n_entries_long",
+    "n_entries_short",
+    "n_ientries_long",
+    "n_ientries_short",
+    "n_rentries_long",
+    "n_rentries_short",
+    "n_unstuck_closes_long",
+    "n_unstuck_closes_short",
+    "n_unstuck_entries_long",
+    "n_unstuck_entries_short",
+    "avg_fills_per_day_long",
+    "avg_fills_per_day_short",
+    "hrs_stuck_max_long",
+    "hrs_stuck_avg_long",
+    "hrs_stuck_max_short",
+    "hrs_stuck_avg_short",
+    "hrs_stuck_max",
+    "hrs_stuck_avg",
+    "loss_sum_long",
+    "loss_sum_short",
+    "profit_sum_long",
+    "profit_sum_short",
+    "pnl_sum_long",
+    "pnl_sum_short",
+    "loss_profit_ratio_long",
+    "loss_profit_ratio_short",
+    "fee_sum_long",
+    "fee_sum_short",
+    "net_pnl_plus_fees_long",
+    "net_pnl_plus_fees_short",
+    "final_equity_long",
+    "final_balance_long",
+    "final_equity_short",
+    "final_balance_short",
+    "closest_bkr_long",
+    "closest_bkr_short",
+    "eqbal_ratio_min_long",
+    "eqbal_ratio_mean_long",
+    "eqbal_ratio_min_short",
+    "eqbal_ratio_mean_short",
+    "biggest_psize_long",
+    "biggest_psize_short",
+    "biggest_psize_quote_long",
+    "biggest_psize_quote_short",
+    "volume_quote_long",
+    "volume_quote_short",
+)
+N_ANALYSIS_METRICS = 74
+
+# 1.0 where fill type name contains substring, for counting fills by kind
+FILL_TYPES_CLOSE = np.array([float("close" in t) for t in FILL_TYPES])
+FILL_TYPES_NCLOSE = np.array([float("nclose" in t) for t in FILL_TYPES])
+FILL_TYPES_ENTRY = np.array([float("entry" in t) for t in FILL_TYPES])
+FILL_TYPES_IENTRY = np.array([float("ientry" in t) for t in FILL_TYPES])
+FILL_TYPES_RENTRY = np.array([float("rentry" in t) for t in FILL_TYPES])
+FILL_TYPES_UNSTUCK_CLOSE = np.array([float("unstuck_close" in t) for t in FILL_TYPES])
+FILL_TYPES_UNSTUCK_ENTRY = np.array([float("unstuck_entry" in t) for t in FILL_TYPES])
+FILL_TYPES_BANKRUPTCY = np.array([float("bankruptcy" in t) for t in FILL_TYPES])
+
+
+@njit
+def calc_sample_std(xs):
+    # same as pandas Series.std(); nan if fewer than 2 values
+    if len(xs) < 2:
+        return np.nan
+    mean = xs.sum() / len(xs)
+    return np.sqrt(((xs - mean) ** 2).sum() / (len(xs) - 1))
+
+
+@njit
+def calc_mean(xs):
+    return xs.sum() / len(xs) if len(xs) > 0 else np.nan
+
+
+@njit
+def count_fill_types(fills):
+    counts = np.zeros(len(FILL_TYPES))
+    for i in range(len(fills)):
+        if fills[i, 10] >= 0.0:
+            counts[int(fills[i, 10])] += 1.0
+    return counts
+
+
+@njit(error_model="numpy")
+def calc_hrs_stuck(timestamps, psizes):
+    # returns max and mean hours between position size changes, last one lasting until end
+    n_changes = 1
+    for i in range(1, len(psizes)):
+        if psizes[i] != psizes[i - 1]:
+            n_changes += 1
+    change_timestamps = np.empty(n_changes + 1)
+    change_timestamps[0] = timestamps[0]
+    j = 1
+    for i in range(1, len(psizes)):
+        if psizes[i] != psizes[i - 1]:
+            change_timestamps[j] = timestamps[i]
+            j += 1
+    change_timestamps[j] = timestamps[-1]
+    ms_diffs = np.diff(change_timestamps)
+    return ms_diffs.max() / (1000 * 60 * 60), calc_mean(ms_diffs) / (1000 * 60 * 60)
+
+
+@njit(error_model="numpy")
+def calc_daily_gains(timestamps, equities):
+    # last equity of each utc day, as fractional change from previous day
+    ms2d = 1000 * 60 * 60 * 24
+    days = timestamps // ms2d
+    n_days = 1
+    for i in range(1, len(days)):
+        if days[i] != days[i - 1]:
+            n_days += 1
+    daily_equities = np.empty(n_days)
+    j = 0
+    for i in range(len(days)):
+        if i == len(days) - 1 or days[i + 1] != days[i]:
+            daily_equities[j] = equities[i]
+            j += 1
+    return daily_equities[1:] / daily_equities[:-1] - 1
+
+
+@njit(error_model="numpy")
+def calc_pa_distances(stats, psize_col, pprice_col):
+    price_col = 7
+    n = 0
+    for i in range(len(stats)):
+        if stats[i, psize_col] != 0.0:
+            n += 1
+    if n == 0:
+        return np.array([100.0])
+    pa_distances = np.empty(n)
+    j = 0
+    for i in range(len(stats)):
+        if stats[i, psize_col] != 0.0:
+            pa_distances[j] = abs(stats[i, pprice_col] - stats[i, price_col]) / stats[i, price_col]
+            j += 1
+    return pa_distances
+
+
+@njit(error_model="numpy")
+def calc_side_metrics(fills, stats, side, n_days, inverse, c_mult):
+    # side 0 is long, 1 is short
+    # stats columns: psize, pprice, closest_bkr, balance, equity
+    psize_col, pprice_col = (3, 4) if side == 0 else (5, 6)
+    closest_bkr_col, balance_col, equity_col = (8, 10, 12) if side == 0 else (9, 11, 13)
+    timestamps, balances, equities = stats[:, 0], stats[:, balance_col], stats[:, equity_col]
+
+    hrs_stuck_max, hrs_stuck_avg = calc_hrs_stuck(timestamps, stats[:, psize_col])
+    pa_distances = calc_pa_distances(stats, psize_col, pprice_col)
+    pa_distance_mean = calc_mean(pa_distances)
+    pa_distance_std = calc_sample_std(pa_distances)
+
+    pnls = fills[:, 2]
+    counts = count_fill_types(fills)
+    if len(fills) > 0:
+        daily_gains = calc_daily_gains(timestamps, equities)
+        adg = calc_mean(daily_gains)
+        DGstd = calc_sample_std(daily_gains)
+        adg_DGstd_ratio = adg / DGstd if DGstd != 0.0 else 0.0
+        if (counts * FILL_TYPES_BANKRUPTCY).sum() > 0.0:
+            adg = 0.01 ** (1 / n_days) - 1  # reward bankrupt runs lasting longer
+        adg_realized = (balances[-1] / balances[0]) ** (1 / n_days) - 1
+        pos_costs = np.empty(len(fills))
+        volume_quote = 0.0
+        for i in range(len(fills)):
+            pos_costs[i] = qty_to_cost(fills[i, 8], fills[i, 9], inverse, c_mult)
+            volume_quote += qty_to_cost(fills[i, 6], fills[i, 7], inverse, c_mult)
+        biggest_pos_cost = pos_costs.max()
+        biggest_psize = np.abs(fills[:, 8]).max()
+    else:
+        adg = adg_DGstd_ratio = adg_realized = 0.0
+        DGstd = 100.0
+        biggest_pos_cost = volume_quote = 0.0
+        biggest_psize = np.nan
+    loss_sum = pnls[pnls < 0.0].sum()
+    profit_sum = pnls[pnls > 0.0].sum()
+    pnl_sum = pnls.sum()
+    fee_sum = fills[:, 3].sum()
+    eqbal_ratios = equities / balances
+    return np.array(
+        [
+            pa_distance_mean if pa_distance_mean == pa_distance_mean else 1.0,
+            pa_distances.max(),
+            pa_distance_std if pa_distance_std == pa_distance_std else 1.0,
+            calc_mean(eqbal_ratios),
+            calc_sample_std(eqbal_ratios),
+            pnl_sum / balances[0],
+            adg if adg == adg else -1.0,
+            adg_DGstd_ratio,
+            adg_realized,
+            DGstd,
+            float(len(fills)),
+            (counts * FILL_TYPES_CLOSE).sum(),
+            (counts * FILL_TYPES_NCLOSE).sum(),
+            (counts * FILL_TYPES_ENTRY).sum(),
+            (counts * FILL_TYPES_IENTRY).sum(),
+            (counts * FILL_TYPES_RENTRY).sum(),
+            (counts * FILL_TYPES_UNSTUCK_CLOSE).sum(),
+            (counts * FILL_TYPES_UNSTUCK_ENTRY).sum(),
+            len(fills) / n_days,
+            hrs_stuck_max,
+            hrs_stuck_avg,
+            loss_sum,
+            profit_sum,
+            pnl_sum,
+            abs(loss_sum) / profit_sum if profit_sum else 1.0,
+            fee_sum,
+            pnl_sum + fee_sum,
+            equities[-1],
+            balances[-1],
+            stats[:, closest_bkr_col].min(),
+            eqbal_ratios.min(),
+            biggest_psize,
+            biggest_pos_cost,
+            volume_quote,
+        ]
+    )
+
+
+@njit(error_model="numpy")
+def calc_analysis_metrics(fills_long, fills_short, stats, inverse, c_mult):
+    # DataFrame free version of pure_funcs.analyze_fills()
+    # returns float array of len N_ANALYSIS_METRICS, ordered as ANALYSIS_METRICS
+    n_days = (stats[-1, 0] - stats[0, 0]) / (1000 * 60 * 60 * 24)
+    lm = calc_side_metrics(fills_long, stats, 0, n_days, inverse, c_mult)
+    sm = calc_side_metrics(fills_short, stats, 1, n_days, inverse, c_mult)
+    return np.array(
+        [
+            stats[0, 10],
+            lm[0],
+            lm[1],
+            lm[2],
+            sm[0],
+            sm[1],
+            sm[2],
+            lm[3],
+            lm[4],
+            sm[3],
+            sm[4],
+            lm[5],
+            lm[6],
+            sm[5],
+            sm[6],
+            lm[7],
+            sm[7],
+            lm[8],
+            sm[8],
+            lm[9],
+            sm[9],
+            n_days,
+            lm[10],
+            sm[10],
+            lm[11],
+            sm[11],
+            lm[12],
+            sm[12],
+            lm[13],
+            sm[13],
+            lm[14],
+            sm[14],
+            lm[15],
+            sm[15],
+            lm[16],
+            sm[16],
+            lm[17],
+            sm[17],
+            lm[18],
+            sm[18],
+            lm[19],
+            lm[20],
+            sm[19],
+            sm[20],
+            max(lm[19], sm[19]),
+            max(lm[20], sm[20]),
+            lm[21],
+            sm[21],
+            lm[22],
+            sm[22],
+            lm[23],
+            sm[23],
+            lm[24],
+            sm[24],
+            lm[25],
+            sm[25],
+            lm[26],
+            sm[26],
+            lm[27],
+            lm[28],
+            sm[27],
+            sm[28],
+            lm[29],
+            sm[29],
+            lm[30],
+            lm[3],
+            sm[30],
+            sm[3],
+            lm[31],
+            sm[31],
+            lm[32],
+            sm[32],
+            lm[33],
+            sm[33],
+        ]
     )
-    return fills_long, fills_short, stats
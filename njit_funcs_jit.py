@@ -0,0 +1,25 @@
+import os
+
+if "NOJIT" in os.environ and os.environ["NOJIT"] == "true":
+    print("not using numba")
+
+    def njit(pyfunc=None, **kwargs):
+        def wrap(func):
+            return func
+
+        if pyfunc is not None:
+            return wrap(pyfunc)
+        else:
+            return wrap
+
+    prange = range
+
+else:
+    print("using numba")
+    from numba import njit as numba_njit, prange
+
+    def njit(pyfunc=None, **kwargs):
+        # compiled machine code is cached on disk, sparing later processes the jit; see
+        # njit_funcs.clear_stale_numba_cache()
+        kwargs.setdefault("cache", True)
+        return numba_njit(pyfunc, **kwargs)
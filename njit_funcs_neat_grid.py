@@ -1,5 +1,4 @@
 import numpy as np
-import os
 
 from njit_funcs import (
     calc_min_entry_qty,
@@ -18,26 +17,90 @@ from njit_funcs import (
     calc_pnl_long,
     calc_pnl_short,
     calc_diff,
+    calc_ticks_extrema_index,
+    find_skip_target,
+    skip_ticks,
     calc_bankruptcy_price,
     find_entry_qty_bringing_wallet_exposure_to_target,
+    init_grid_memo,
+    grid_memo_hit,
+    read_grid_memo,
+    write_grid_memo,
+    pack_common_params,
+    P_GRID_SPAN,
+    P_MAX_N_ENTRY_ORDERS,
+    P_EPRICE_EXP_BASE,
+    P_BACKWARDS_TP,
+    P_WALLET_EXPOSURE_LIMIT,
+    P_INITIAL_QTY_PCT,
+    P_INITIAL_EPRICE_EMA_DIST,
+    P_MIN_MARKUP,
+    P_MARKUP_RANGE,
+    P_N_CLOSE_ORDERS,
+    P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD,
+    P_AUTO_UNSTUCK_EMA_DIST,
+    ST_DO_LONG,
+    ST_DO_SHORT,
+    ST_BALANCE_LONG,
+    ST_BALANCE_SHORT,
+    ST_EQUITY_LONG,
+    ST_EQUITY_SHORT,
+    ST_PSIZE_LONG,
+    ST_PPRICE_LONG,
+    ST_PSIZE_SHORT,
+    ST_PPRICE_SHORT,
+    ST_BKR_PRICE_LONG,
+    ST_BKR_PRICE_SHORT,
+    ST_CLOSEST_BKR_LONG,
+    ST_CLOSEST_BKR_SHORT,
+    ST_NEXT_ENTRY_UPDATE_TS_LONG,
+    ST_NEXT_ENTRY_UPDATE_TS_SHORT,
+    ST_NEXT_CLOSE_UPDATE_TS_LONG,
+    ST_NEXT_CLOSE_UPDATE_TS_SHORT,
+    ST_NEXT_STATS_UPDATE,
+    ST_MAX_SPAN_LONG,
+    ST_MAX_SPAN_SHORT,
+    ST_EMAS_LONG,
+    ST_EMAS_SHORT,
+    ST_ALPHAS_LONG,
+    ST_ALPHAS_SHORT,
+    ST_WALLET_EXPOSURE_LONG,
+    ST_WALLET_EXPOSURE_SHORT,
+    ST_DONE,
+    ST_K,
+    ST_N_FILLS_LONG,
+    ST_N_FILLS_SHORT,
+    ST_N_STATS,
+    ST_GRID_MEMO_HITS,
+    ST_GRID_MEMO_MISSES,
+    tick_timestamp,
+    tick_high,
+    tick_low,
+    tick_close,
+    n_ticks,
+    last_close,
+    slice_ticks,
+    init_backtest_state,
+    init_backtest_buffers,
+    append_fill,
+    append_stats,
+    append_state_stats,
+    trim_backtest_buffers,
+    empty_orders,
+    orders_to_array,
+    array_to_orders,
+    calc_analysis_metrics,
+    MS_INVERSE,
+    MS_QTY_STEP,
+    MS_PRICE_STEP,
+    MS_MIN_QTY,
+    MS_MIN_COST,
+    MS_C_MULT,
+    MS_MAKER_FEE,
+    N_ANALYSIS_METRICS,
+    N_STATE,
 )
-
-
-if "NOJIT" in os.environ and os.environ["NOJIT"] == "true":
-    print("not using numba")
-
-    def njit(pyfunc=None, **kwargs):
-        def wrap(func):
-            return func
-
-        if pyfunc is not None:
-            return wrap(pyfunc)
-        else:
-            return wrap
-
-else:
-    print("using numba")
-    from numba import njit
+from njit_funcs_jit import njit, prange
 
 
 @njit
@@ -63,7 +126,13 @@ def calc_neat_grid_long(
     eprice_exp_base,
     auto_unstuck_wallet_exposure_threshold,
     auto_unstuck_ema_dist,
+    grid_memo=None,
+    grid_template=False,
 ) -> [(float, float, str)]:
+    # grid_memo: from init_grid_memo() or None; approximated grid is reused while balance, psize and
+    # pprice are unchanged
+    # grid_template: if True, grids are built from the template in grid_memo where it applies, see
+    # eval_neat_entry_grid_from_template(); backtests only, live orders always come from the solver
     if wallet_exposure_limit == 0.0:
         return [(0.0, 0.0, "")]
     if not do_long and psize == 0.0:
@@ -118,7 +187,9 @@ def calc_neat_grid_long(
                     "long_unstuck_entry",
                 )
             ]
-    grid = approximate_neat_grid_long(
+    grid = approximate_neat_grid_long_memoized(
+        grid_memo,
+        grid_template,
         balance,
         psize,
         pprice,
@@ -176,7 +247,13 @@ def calc_neat_grid_short(
     eprice_exp_base,
     auto_unstuck_wallet_exposure_threshold,
     auto_unstuck_ema_dist,
+    grid_memo=None,
+    grid_template=False,
 ) -> [(float, float, str)]:
+    # grid_memo: from init_grid_memo() or None; approximated grid is reused while balance, psize and
+    # pprice are unchanged
+    # grid_template: if True, grids are built from the template in grid_memo where it applies, see
+    # eval_neat_entry_grid_from_template(); backtests only, live orders always come from the solver
     if wallet_exposure_limit == 0.0:
         return [(0.0, 0.0, "")]
     if not do_short and psize == 0.0:
@@ -232,7 +309,9 @@ def calc_neat_grid_short(
                     "short_unstuck_entry",
                 )
             ]
-    grid = approximate_neat_grid_short(
+    grid = approximate_neat_grid_short_memoized(
+        grid_memo,
+        grid_template,
         balance,
         psize,
         pprice,
@@ -285,7 +364,9 @@ def approximate_neat_grid_long(
     eqty_exp_base,
     eprice_exp_base,
     crop: bool = True,
+    grid_memo=None,
 ):
+    # grid_memo: from init_grid_memo() or None; holds the grid template
     def eval_(ientry_price_guess, psize_):
         ientry_price_guess = round_(ientry_price_guess, price_step)
         grid = calc_whole_neat_entry_grid_long(
@@ -303,6 +384,7 @@ def approximate_neat_grid_long(
             initial_qty_pct,
             eqty_exp_base,
             eprice_exp_base,
+            grid_memo=grid_memo,
         )
         # find node whose psize is closest to psize
         diff, i = sorted([(abs(grid[i][2] - psize_) / psize_, i) for i in range(len(grid))])[0]
@@ -369,7 +451,9 @@ def approximate_neat_grid_short(
     eqty_exp_base,
     eprice_exp_base,
     crop: bool = True,
+    grid_memo=None,
 ):
+    # grid_memo: from init_grid_memo() or None; holds the grid template
     def eval_(ientry_price_guess, psize_):
         ientry_price_guess = round_(ientry_price_guess, price_step)
         grid = calc_whole_neat_entry_grid_short(
@@ -387,6 +471,7 @@ def approximate_neat_grid_short(
             initial_qty_pct,
             eqty_exp_base,
             eprice_exp_base,
+            grid_memo=grid_memo,
         )
         # find node whose psize is closest to psize
         abs_psize_ = abs(psize_)
@@ -439,6 +524,138 @@ def approximate_neat_grid_short(
     return grid[k:] if crop else grid
 
 
+@njit
+def approximate_neat_grid_long_memoized(
+    grid_memo,
+    grid_template,
+    balance,
+    psize,
+    pprice,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    grid_span,
+    wallet_exposure_limit,
+    max_n_entry_orders,
+    initial_qty_pct,
+    eqty_exp_base,
+    eprice_exp_base,
+):
+    # grid_memo may be None; its grid template is used only if grid_template
+    if grid_memo is not None:
+        if grid_memo_hit(grid_memo, balance, psize, pprice):
+            return read_grid_memo(grid_memo)
+    if grid_template:
+        grid = approximate_neat_grid_long(
+            balance,
+            psize,
+            pprice,
+            inverse,
+            qty_step,
+            price_step,
+            min_qty,
+            min_cost,
+            c_mult,
+            grid_span,
+            wallet_exposure_limit,
+            max_n_entry_orders,
+            initial_qty_pct,
+            eqty_exp_base,
+            eprice_exp_base,
+            grid_memo=grid_memo,
+        )
+    else:
+        grid = approximate_neat_grid_long(
+            balance,
+            psize,
+            pprice,
+            inverse,
+            qty_step,
+            price_step,
+            min_qty,
+            min_cost,
+            c_mult,
+            grid_span,
+            wallet_exposure_limit,
+            max_n_entry_orders,
+            initial_qty_pct,
+            eqty_exp_base,
+            eprice_exp_base,
+        )
+    if grid_memo is not None:
+        write_grid_memo(grid_memo, balance, psize, pprice, grid)
+    return grid
+
+
+@njit
+def approximate_neat_grid_short_memoized(
+    grid_memo,
+    grid_template,
+    balance,
+    psize,
+    pprice,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    grid_span,
+    wallet_exposure_limit,
+    max_n_entry_orders,
+    initial_qty_pct,
+    eqty_exp_base,
+    eprice_exp_base,
+):
+    # grid_memo may be None; its grid template is used only if grid_template
+    if grid_memo is not None:
+        if grid_memo_hit(grid_memo, balance, psize, pprice):
+            return read_grid_memo(grid_memo)
+    if grid_template:
+        grid = approximate_neat_grid_short(
+            balance,
+            psize,
+            pprice,
+            inverse,
+            qty_step,
+            price_step,
+            min_qty,
+            min_cost,
+            c_mult,
+            grid_span,
+            wallet_exposure_limit,
+            max_n_entry_orders,
+            initial_qty_pct,
+            eqty_exp_base,
+            eprice_exp_base,
+            grid_memo=grid_memo,
+        )
+    else:
+        grid = approximate_neat_grid_short(
+            balance,
+            psize,
+            pprice,
+            inverse,
+            qty_step,
+            price_step,
+            min_qty,
+            min_cost,
+            c_mult,
+            grid_span,
+            wallet_exposure_limit,
+            max_n_entry_orders,
+            initial_qty_pct,
+            eqty_exp_base,
+            eprice_exp_base,
+        )
+    if grid_memo is not None:
+        write_grid_memo(grid_memo, balance, psize, pprice, grid)
+    return grid
+
+
 @njit
 def eval_neat_entry_grid_long(
     balance,
@@ -739,6 +956,176 @@ def find_last_entry_qty_short(
     )
 
 
+# rounding to qty_step and price_step moves a grid built from template off the solver's grid by
+# a step here and there; templates are used only where every entry is at least this many qty steps
+GRID_TEMPLATE_MIN_QTY_STEPS = 1000.0
+
+
+@njit
+def grid_template_applies(
+    grid_memo,
+    balance,
+    initial_entry_price,
+    inverse,
+    qty_step,
+    c_mult,
+    wallet_exposure_limit,
+    initial_qty_pct,
+) -> bool:
+    # initial entry is the smallest; skips evaluating a template grid bound to be rejected
+    if (
+        cost_to_qty(
+            balance * wallet_exposure_limit * initial_qty_pct, initial_entry_price, inverse, c_mult
+        )
+        >= GRID_TEMPLATE_MIN_QTY_STEPS * qty_step
+    ):
+        return True
+    grid_memo[1, 4] += 1
+    return False
+
+
+@njit
+def grid_template_fits(grid_memo, grid, wallet_exposure_limit, qty_step) -> bool:
+    # rounded grid built from template must end within 1% of wallet_exposure_limit, the tolerance of
+    # the solvers it replaces, with no entry under GRID_TEMPLATE_MIN_QTY_STEPS; otherwise min qty,
+    # min cost or rounding binds and caller falls back
+    if (
+        abs(grid[-1][4] - wallet_exposure_limit) / wallet_exposure_limit < 0.01
+        and np.abs(grid[:, 0]).min() >= GRID_TEMPLATE_MIN_QTY_STEPS * qty_step
+    ):
+        return True
+    grid_memo[1, 4] += 1
+    return False
+
+
+@njit
+def eval_neat_entry_grid_from_template(
+    grid_memo,
+    is_long: bool,
+    balance,
+    initial_entry_price,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    grid_span,
+    wallet_exposure_limit,
+    max_n_entry_orders,
+    initial_qty_pct,
+    eqty_exp_base,
+    eprice_exp_base,
+):
+    # grid template is the cost of last entry as fraction of balance, solved once for a grid
+    # normalized to balance=1 and initial_entry_price=1, without rounding and min qty; the fraction
+    # doesn't depend on balance or price, so each grid takes one rescaled and rounded evaluation
+    # returns empty grid if template doesn't apply or doesn't fit
+    if not grid_template_applies(
+        grid_memo,
+        balance,
+        initial_entry_price,
+        inverse,
+        qty_step,
+        c_mult,
+        wallet_exposure_limit,
+        initial_qty_pct,
+    ):
+        return np.empty((0, 5))
+    if grid_memo[1, 3] == 0.0:
+
+        def eval_(last_entry_qty_):
+            if is_long:
+                return eval_neat_entry_grid_long(
+                    1.0,
+                    1.0,
+                    inverse,
+                    1e-10,
+                    1e-10,
+                    0.0,
+                    0.0,
+                    c_mult,
+                    grid_span,
+                    wallet_exposure_limit,
+                    max_n_entry_orders,
+                    initial_qty_pct,
+                    eqty_exp_base,
+                    eprice_exp_base,
+                    last_entry_qty_,
+                )[-1][-1]
+            return eval_neat_entry_grid_short(
+                1.0,
+                1.0,
+                inverse,
+                1e-10,
+                1e-10,
+                0.0,
+                0.0,
+                c_mult,
+                grid_span,
+                wallet_exposure_limit,
+                max_n_entry_orders,
+                initial_qty_pct,
+                eqty_exp_base,
+                eprice_exp_base,
+                last_entry_qty_,
+            )[-1][-1]
+
+        # same secant step as find_last_entry_qty_long/short
+        guess0 = cost_to_qty(wallet_exposure_limit * 0.5, 1.0, inverse, c_mult)
+        val0 = eval_(guess0)
+        guess1 = guess0 * (1.2 if val0 < wallet_exposure_limit else 0.8)
+        val1 = eval_(guess1)
+        if val0 == val1:
+            guess1 = guess0 * 10
+            val1 = eval_(guess1)
+        guess = interpolate(wallet_exposure_limit, np.array([val0, val1]), np.array([guess0, guess1]))
+        grid_memo[1, 2] = qty_to_cost(guess, 1.0, inverse, c_mult)
+        grid_memo[1, 3] = 1.0
+    last_entry_qty = round_(
+        cost_to_qty(balance * grid_memo[1, 2], initial_entry_price, inverse, c_mult), qty_step
+    )
+    if is_long:
+        grid = eval_neat_entry_grid_long(
+            balance,
+            initial_entry_price,
+            inverse,
+            qty_step,
+            price_step,
+            min_qty,
+            min_cost,
+            c_mult,
+            grid_span,
+            wallet_exposure_limit,
+            max_n_entry_orders,
+            initial_qty_pct,
+            eqty_exp_base,
+            eprice_exp_base,
+            last_entry_qty,
+        )
+    else:
+        grid = eval_neat_entry_grid_short(
+            balance,
+            initial_entry_price,
+            inverse,
+            qty_step,
+            price_step,
+            min_qty,
+            min_cost,
+            c_mult,
+            grid_span,
+            wallet_exposure_limit,
+            max_n_entry_orders,
+            initial_qty_pct,
+            eqty_exp_base,
+            eprice_exp_base,
+            last_entry_qty,
+        )
+    if grid_template_fits(grid_memo, grid, wallet_exposure_limit, qty_step):
+        return grid
+    return np.empty((0, 5))
+
+
 @njit
 def calc_whole_neat_entry_grid_long(
     balance,
@@ -755,9 +1142,32 @@ def calc_whole_neat_entry_grid_long(
     initial_qty_pct,
     eqty_exp_base,
     eprice_exp_base,
+    grid_memo=None,
 ):
 
     # [qty, price, psize, pprice, wallet_exposure]
+    # grid_memo: from init_grid_memo() or None; holds the grid template
+    if grid_memo is not None:
+        grid = eval_neat_entry_grid_from_template(
+            grid_memo,
+            True,
+            balance,
+            initial_entry_price,
+            inverse,
+            qty_step,
+            price_step,
+            min_qty,
+            min_cost,
+            c_mult,
+            grid_span,
+            wallet_exposure_limit,
+            max_n_entry_orders,
+            initial_qty_pct,
+            eqty_exp_base,
+            eprice_exp_base,
+        )
+        if len(grid) > 0:
+            return grid
     last_entry_qty = find_last_entry_qty_long(
         balance,
         initial_entry_price,
@@ -809,9 +1219,32 @@ def calc_whole_neat_entry_grid_short(
     initial_qty_pct,
     eqty_exp_base,
     eprice_exp_base,
+    grid_memo=None,
 ):
 
     # [qty, price, psize, pprice, wallet_exposure]
+    # grid_memo: from init_grid_memo() or None; holds the grid template
+    if grid_memo is not None:
+        grid = eval_neat_entry_grid_from_template(
+            grid_memo,
+            False,
+            balance,
+            initial_entry_price,
+            inverse,
+            qty_step,
+            price_step,
+            min_qty,
+            min_cost,
+            c_mult,
+            grid_span,
+            wallet_exposure_limit,
+            max_n_entry_orders,
+            initial_qty_pct,
+            eqty_exp_base,
+            eprice_exp_base,
+        )
+        if len(grid) > 0:
+            return grid
     last_entry_qty = find_last_entry_qty_short(
         balance,
         initial_entry_price,
@@ -847,12 +1280,14 @@ def calc_whole_neat_entry_grid_short(
     )
 
 
+# neat grid params layout, shared indices are defined in njit_funcs
+P_EQTY_EXP_BASE = 15
+P_GRID_TEMPLATE = 16
+N_NEAT_GRID_PARAMS = 17
+
+
 @njit
-def backtest_neat_grid(
-    ticks,
-    starting_balance,
-    latency_simulation_ms,
-    maker_fee,
+def pack_neat_grid_params(
     inverse,
     do_long,
     do_short,
@@ -862,73 +1297,203 @@ def backtest_neat_grid(
     min_qty,
     min_cost,
     c_mult,
-    ema_span_0,
-    ema_span_1,
-    eqty_exp_base,
-    eprice_exp_base,
     grid_span,
-    initial_eprice_ema_dist,
-    initial_qty_pct,
-    markup_range,
+    wallet_exposure_limit,
     max_n_entry_orders,
+    initial_qty_pct,
+    eqty_exp_base,
+    eprice_exp_base,
     min_markup,
+    markup_range,
     n_close_orders,
-    wallet_exposure_limit,
-    auto_unstuck_ema_dist,
+    ema_span_0,
+    ema_span_1,
+    initial_eprice_ema_dist,
     auto_unstuck_wallet_exposure_threshold,
+    auto_unstuck_ema_dist,
+    grid_template=False,
 ):
-    if len(ticks[0]) == 3:
-        timestamps = ticks[:, 0]
-        closes = ticks[:, 2]
-        lows = closes
-        highs = closes
-    else:
-        timestamps = ticks[:, 0]
-        highs = ticks[:, 1]
-        lows = ticks[:, 2]
-        closes = ticks[:, 3]
-
-    balance_long = balance_short = equity_long = equity_short = starting_balance
-    psize_long, pprice_long, psize_short, pprice_short = 0.0, 0.0, 0.0, 0.0
-
-    fills_long, fills_short, stats = [], [], []
-
-    entries_long = closes_long = [(0.0, 0.0, "")]
-    entries_short = closes_short = [(0.0, 0.0, "")]
-    bkr_price_long = bkr_price_short = 0.0
-
-    next_entry_grid_update_ts_long = 0
-    next_entry_grid_update_ts_short = 0
-    next_close_grid_update_ts_long = 0
-    next_close_grid_update_ts_short = 0
-    next_stats_update = 0
-
-    closest_bkr_long = closest_bkr_short = 1.0
-
-    spans_multiplier = 60 / ((timestamps[1] - timestamps[0]) / 1000)
-
-    spans_long = [ema_span_0[0], (ema_span_0[0] * ema_span_1[0]) ** 0.5, ema_span_1[0]]
-    spans_long = np.array(sorted(spans_long)) * spans_multiplier if do_long else np.ones(3)
-    spans_short = [ema_span_0[1], (ema_span_0[1] * ema_span_1[1]) ** 0.5, ema_span_1[1]]
-    spans_short = np.array(sorted(spans_short)) * spans_multiplier if do_short else np.ones(3)
-    assert max(spans_long) < len(closes), "max ema_span long larger than len(closes)"
-    assert max(spans_short) < len(closes), "max ema_span short larger than len(closes)"
-    spans_long = np.where(spans_long < 1.0, 1.0, spans_long)
-    spans_short = np.where(spans_short < 1.0, 1.0, spans_short)
-    max_span_long = int(round(max(spans_long)))
-    max_span_short = int(round(max(spans_short)))
-    emas_long, emas_short = np.repeat(closes[0], 3), np.repeat(closes[0], 3)
-    alphas_long = 2.0 / (spans_long + 1.0)
-    alphas__long = 1.0 - alphas_long
-    alphas_short = 2.0 / (spans_short + 1.0)
-    alphas__short = 1.0 - alphas_short
-
-    long_wallet_exposure = 0.0
-    short_wallet_exposure = 0.0
-    long_wallet_exposure_auto_unstuck_threshold = (
-        (wallet_exposure_limit[0] * (1 - auto_unstuck_wallet_exposure_threshold[0]))
-        if auto_unstuck_wallet_exposure_threshold[0] != 0.0
-        else wallet_exposure_limit[0] * 10
+    # takes same args as create_xk() output; market specific settings are ignored
+    # grid_template: opt in to entry grids built from template, see calc_neat_grid_long()
+    params = np.zeros((2, N_NEAT_GRID_PARAMS))
+    pack_common_params(
+        params,
+        do_long,
+        do_short,
+        backwards_tp,
+        wallet_exposure_limit,
+        ema_span_0,
+        ema_span_1,
+        initial_qty_pct,
+        initial_eprice_ema_dist,
+        min_markup,
+        markup_range,
+        n_close_orders,
+        auto_unstuck_wallet_exposure_threshold,
+        auto_unstuck_ema_dist,
+    )
+    params[0, P_GRID_SPAN], params[1, P_GRID_SPAN] = grid_span
+    params[0, P_MAX_N_ENTRY_ORDERS], params[1, P_MAX_N_ENTRY_ORDERS] = max_n_entry_orders
+    params[0, P_EPRICE_EXP_BASE], params[1, P_EPRICE_EXP_BASE] = eprice_exp_base
+    params[0, P_EQTY_EXP_BASE], params[1, P_EQTY_EXP_BASE] = eqty_exp_base
+    params[:, P_GRID_TEMPLATE] = 1.0 if grid_template else 0.0
+    return params
+
+
+@njit
+def calc_neat_grid_long_packed(
+    balance, psize, pprice, highest_bid, ema_band_lower, do_long, market, params, grid_memo=None
+):
+    # calc_neat_grid_long() with market settings from pack_market_settings() and params packed by
+    # pack_neat_grid_params()
+    return calc_neat_grid_long(
+        balance,
+        psize,
+        pprice,
+        highest_bid,
+        ema_band_lower,
+        market[MS_INVERSE] != 0.0,
+        do_long,
+        market[MS_QTY_STEP],
+        market[MS_PRICE_STEP],
+        market[MS_MIN_QTY],
+        market[MS_MIN_COST],
+        market[MS_C_MULT],
+        params[0, P_GRID_SPAN],
+        params[0, P_WALLET_EXPOSURE_LIMIT],
+        int(round(params[0, P_MAX_N_ENTRY_ORDERS])),
+        params[0, P_INITIAL_QTY_PCT],
+        params[0, P_INITIAL_EPRICE_EMA_DIST],
+        params[0, P_EQTY_EXP_BASE],
+        params[0, P_EPRICE_EXP_BASE],
+        params[0, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+        params[0, P_AUTO_UNSTUCK_EMA_DIST],
+        grid_memo,
+        params[0, P_GRID_TEMPLATE] != 0.0,
+    )
+
+
+@njit
+def calc_neat_grid_short_packed(
+    balance, psize, pprice, lowest_ask, ema_band_upper, do_short, market, params, grid_memo=None
+):
+    # calc_neat_grid_short() with market settings from pack_market_settings() and params packed by
+    # pack_neat_grid_params()
+    return calc_neat_grid_short(
+        balance,
+        psize,
+        pprice,
+        lowest_ask,
+        ema_band_upper,
+        market[MS_INVERSE] != 0.0,
+        do_short,
+        market[MS_QTY_STEP],
+        market[MS_PRICE_STEP],
+        market[MS_MIN_QTY],
+        market[MS_MIN_COST],
+        market[MS_C_MULT],
+        params[1, P_GRID_SPAN],
+        params[1, P_WALLET_EXPOSURE_LIMIT],
+        int(round(params[1, P_MAX_N_ENTRY_ORDERS])),
+        params[1, P_INITIAL_QTY_PCT],
+        params[1, P_INITIAL_EPRICE_EMA_DIST],
+        params[1, P_EQTY_EXP_BASE],
+        params[1, P_EPRICE_EXP_BASE],
+        params[1, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+        params[1, P_AUTO_UNSTUCK_EMA_DIST],
+        grid_memo,
+        params[1, P_GRID_TEMPLATE] != 0.0,
+    )
+
+
+@njit
+def backtest_neat_grid_range(
+    ticks,
+    block_highs,
+    block_lows,
+    k_start,
+    k_end,
+    state,
+    params,
+    entries_long,
+    closes_long,
+    entries_short,
+    closes_short,
+    grid_memo_long,
+    grid_memo_short,
+    fills_long,
+    fills_short,
+    stats,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+):
+    # runs ticks [k_start, k_end), resuming from state and updating it in place
+    # ticks: ticks view from unpack_ticks() or unpack_compact_ticks()
+    # fills and stats are appended to given lists; returns open orders
+    # grid memos, from init_grid_memo(), are updated in place
+    backwards_tp = (params[0, P_BACKWARDS_TP] != 0.0, params[1, P_BACKWARDS_TP] != 0.0)
+    grid_span = (params[0, P_GRID_SPAN], params[1, P_GRID_SPAN])
+    wallet_exposure_limit = (params[0, P_WALLET_EXPOSURE_LIMIT], params[1, P_WALLET_EXPOSURE_LIMIT])
+    max_n_entry_orders = (
+        int(round(params[0, P_MAX_N_ENTRY_ORDERS])),
+        int(round(params[1, P_MAX_N_ENTRY_ORDERS])),
+    )
+    initial_qty_pct = (params[0, P_INITIAL_QTY_PCT], params[1, P_INITIAL_QTY_PCT])
+    initial_eprice_ema_dist = (
+        params[0, P_INITIAL_EPRICE_EMA_DIST],
+        params[1, P_INITIAL_EPRICE_EMA_DIST],
+    )
+    eqty_exp_base = (params[0, P_EQTY_EXP_BASE], params[1, P_EQTY_EXP_BASE])
+    eprice_exp_base = (params[0, P_EPRICE_EXP_BASE], params[1, P_EPRICE_EXP_BASE])
+    grid_template = (params[0, P_GRID_TEMPLATE] != 0.0, params[1, P_GRID_TEMPLATE] != 0.0)
+    min_markup = (params[0, P_MIN_MARKUP], params[1, P_MIN_MARKUP])
+    markup_range = (params[0, P_MARKUP_RANGE], params[1, P_MARKUP_RANGE])
+    n_close_orders = (
+        int(round(params[0, P_N_CLOSE_ORDERS])),
+        int(round(params[1, P_N_CLOSE_ORDERS])),
+    )
+    auto_unstuck_wallet_exposure_threshold = (
+        params[0, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+        params[1, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+    )
+    auto_unstuck_ema_dist = (params[0, P_AUTO_UNSTUCK_EMA_DIST], params[1, P_AUTO_UNSTUCK_EMA_DIST])
+
+    do_long, do_short = state[ST_DO_LONG] != 0.0, state[ST_DO_SHORT] != 0.0
+    balance_long, balance_short = state[ST_BALANCE_LONG], state[ST_BALANCE_SHORT]
+    equity_long, equity_short = state[ST_EQUITY_LONG], state[ST_EQUITY_SHORT]
+    psize_long, pprice_long = state[ST_PSIZE_LONG], state[ST_PPRICE_LONG]
+    psize_short, pprice_short = state[ST_PSIZE_SHORT], state[ST_PPRICE_SHORT]
+    bkr_price_long, bkr_price_short = state[ST_BKR_PRICE_LONG], state[ST_BKR_PRICE_SHORT]
+    closest_bkr_long, closest_bkr_short = state[ST_CLOSEST_BKR_LONG], state[ST_CLOSEST_BKR_SHORT]
+
+    next_entry_grid_update_ts_long = state[ST_NEXT_ENTRY_UPDATE_TS_LONG]
+    next_entry_grid_update_ts_short = state[ST_NEXT_ENTRY_UPDATE_TS_SHORT]
+    next_close_grid_update_ts_long = state[ST_NEXT_CLOSE_UPDATE_TS_LONG]
+    next_close_grid_update_ts_short = state[ST_NEXT_CLOSE_UPDATE_TS_SHORT]
+    next_stats_update = state[ST_NEXT_STATS_UPDATE]
+
+    max_span_long = int(state[ST_MAX_SPAN_LONG])
+    max_span_short = int(state[ST_MAX_SPAN_SHORT])
+    emas_long = state[ST_EMAS_LONG : ST_EMAS_LONG + 3].copy()
+    emas_short = state[ST_EMAS_SHORT : ST_EMAS_SHORT + 3].copy()
+    alphas_long = state[ST_ALPHAS_LONG : ST_ALPHAS_LONG + 3].copy()
+    alphas__long = 1.0 - alphas_long
+    alphas_short = state[ST_ALPHAS_SHORT : ST_ALPHAS_SHORT + 3].copy()
+    alphas__short = 1.0 - alphas_short
+
+    long_wallet_exposure = state[ST_WALLET_EXPOSURE_LONG]
+    short_wallet_exposure = state[ST_WALLET_EXPOSURE_SHORT]
+    long_wallet_exposure_auto_unstuck_threshold = (
+        (wallet_exposure_limit[0] * (1 - auto_unstuck_wallet_exposure_threshold[0]))
+        if auto_unstuck_wallet_exposure_threshold[0] != 0.0
+        else wallet_exposure_limit[0] * 10
     )
     short_wallet_exposure_auto_unstuck_threshold = (
         (wallet_exposure_limit[1] * (1 - auto_unstuck_wallet_exposure_threshold[1]))
@@ -936,65 +1501,170 @@ def backtest_neat_grid(
         else wallet_exposure_limit[1] * 10
     )
 
-    for k in range(1, len(closes)):
+    n_fills_long = int(state[ST_N_FILLS_LONG])
+    n_fills_short = int(state[ST_N_FILLS_SHORT])
+    n_stats = int(state[ST_N_STATS])
+    done, k_next = False, k_end
+
+    k_skip = k_start
+    for k in range(k_start, k_end):
+        if k < k_skip:
+            continue
+        if len(block_highs) > 0:
+            # jump over ticks which can only update emas, closest bankruptcy distances and stats
+            entry_price_long = (
+                entries_long[0][1] if entries_long and entries_long[0][0] > 0.0 else -np.inf
+            )
+            close_price_long = (
+                closes_long[0][1]
+                if psize_long > 0.0 and closes_long and closes_long[0][0] < 0.0
+                else np.inf
+            )
+            entry_price_short = (
+                entries_short[0][1] if entries_short and entries_short[0][0] < 0.0 else np.inf
+            )
+            close_price_short = (
+                closes_short[0][1]
+                if psize_short < 0.0 and closes_short and closes_short[0][0] > 0.0
+                else -np.inf
+            )
+            k_skip = find_skip_target(
+                k,
+                k_end,
+                ticks,
+                block_highs,
+                block_lows,
+                latency_simulation_ms,
+                do_long,
+                max_span_long,
+                psize_long,
+                pprice_long,
+                bkr_price_long,
+                long_wallet_exposure,
+                long_wallet_exposure_auto_unstuck_threshold,
+                next_entry_grid_update_ts_long,
+                next_close_grid_update_ts_long,
+                entry_price_long,
+                close_price_long,
+                do_short,
+                max_span_short,
+                psize_short,
+                pprice_short,
+                bkr_price_short,
+                short_wallet_exposure,
+                short_wallet_exposure_auto_unstuck_threshold,
+                next_entry_grid_update_ts_short,
+                next_close_grid_update_ts_short,
+                entry_price_short,
+                close_price_short,
+                False,
+            )
+            if k_skip > k:
+                (
+                    emas_long,
+                    emas_short,
+                    closest_bkr_long,
+                    closest_bkr_short,
+                    equity_long,
+                    equity_short,
+                    stats,
+                    n_stats,
+                    next_stats_update,
+                ) = skip_ticks(
+                    k,
+                    k_skip,
+                    ticks,
+                    do_long,
+                    do_short,
+                    max_span_long,
+                    max_span_short,
+                    emas_long,
+                    emas_short,
+                    alphas_long,
+                    alphas__long,
+                    alphas_short,
+                    alphas__short,
+                    bkr_price_long,
+                    bkr_price_short,
+                    closest_bkr_long,
+                    closest_bkr_short,
+                    balance_long,
+                    balance_short,
+                    equity_long,
+                    equity_short,
+                    psize_long,
+                    pprice_long,
+                    psize_short,
+                    pprice_short,
+                    stats,
+                    n_stats,
+                    next_stats_update,
+                    inverse,
+                    c_mult,
+                )
+                continue
+        timestamp = tick_timestamp(ticks, k)
+        close, prev_close = tick_close(ticks, k), tick_close(ticks, k - 1)
+        high, low = tick_high(ticks, k), tick_low(ticks, k)
         if do_long:
-            emas_long = calc_ema(alphas_long, alphas__long, emas_long, closes[k - 1])
+            emas_long = calc_ema(alphas_long, alphas__long, emas_long, prev_close)
             if k >= max_span_long:
                 # check bankruptcy
-                bkr_diff_long = calc_diff(bkr_price_long, closes[k])
+                bkr_diff_long = calc_diff(bkr_price_long, close)
                 closest_bkr_long = min(closest_bkr_long, bkr_diff_long)
                 if closest_bkr_long < 0.06:
                     # consider bankruptcy within 6% as liquidation
                     if psize_long != 0.0:
                         fee_paid = -qty_to_cost(psize_long, pprice_long, inverse, c_mult) * maker_fee
-                        pnl = calc_pnl_long(pprice_long, closes[k], -psize_long, inverse, c_mult)
+                        pnl = calc_pnl_long(pprice_long, close, -psize_long, inverse, c_mult)
                         balance_long = starting_balance * 1e-6
                         equity_long = 0.0
                         psize_long, pprice_long = 0.0, 0.0
-                        fills_long.append(
-                            (
-                                k,
-                                timestamps[k],
-                                pnl,
-                                fee_paid,
-                                balance_long,
-                                equity_long,
-                                -psize_long,
-                                closes[k],
-                                0.0,
-                                0.0,
-                                "long_bankruptcy",
-                            )
+                        fills_long, n_fills_long = append_fill(
+                            fills_long,
+                            n_fills_long,
+                            k,
+                            timestamp,
+                            pnl,
+                            fee_paid,
+                            balance_long,
+                            equity_long,
+                            -psize_long,
+                            close,
+                            0.0,
+                            0.0,
+                            "long_bankruptcy",
                         )
                     do_long = False
                     if not do_short:
-                        stats.append(
-                            (
-                                next_stats_update,
-                                bkr_price_long,
-                                bkr_price_short,
-                                psize_long,
-                                pprice_long,
-                                psize_short,
-                                pprice_short,
-                                closes[k],
-                                closest_bkr_long,
-                                closest_bkr_short,
-                                balance_long,
-                                balance_short,
-                                equity_long,
-                                equity_short,
-                            )
+                        stats, n_stats = append_stats(
+                            stats,
+                            n_stats,
+                            next_stats_update,
+                            bkr_price_long,
+                            bkr_price_short,
+                            psize_long,
+                            pprice_long,
+                            psize_short,
+                            pprice_short,
+                            close,
+                            closest_bkr_long,
+                            closest_bkr_short,
+                            balance_long,
+                            balance_short,
+                            equity_long,
+                            equity_short,
                         )
-                        return fills_long, fills_short, stats
+                        done, k_next = True, k + 1
+                        break
 
                 # check if long entry grid should be updated
-                if timestamps[k] >= next_entry_grid_update_ts_long:
+                if timestamp >= next_entry_grid_update_ts_long:
                     entries_long = calc_neat_grid_long(
                         balance_long,
                         psize_long,
                         pprice_long,
-                        closes[k - 1],
+                        prev_close,
                         min(emas_long),
                         inverse,
                         do_long,
@@ -1012,17 +1682,19 @@ def backtest_neat_grid(
                         eprice_exp_base[0],
                         auto_unstuck_wallet_exposure_threshold[0],
                         auto_unstuck_ema_dist[0],
+                        grid_memo_long,
+                        grid_template[0],
                     )
 
-                    next_entry_grid_update_ts_long = timestamps[k] + 1000 * 60 * 5
+                    next_entry_grid_update_ts_long = timestamp + 1000 * 60 * 5
                 # check if close grid should be updated
-                if timestamps[k] >= next_close_grid_update_ts_long:
+                if timestamp >= next_close_grid_update_ts_long:
                     closes_long = calc_close_grid_long(
                         backwards_tp[0],
                         balance_long,
                         psize_long,
                         pprice_long,
-                        closes[k - 1],
+                        prev_close,
                         max(emas_long),
                         inverse,
                         qty_step,
@@ -1037,15 +1709,15 @@ def backtest_neat_grid(
                         auto_unstuck_wallet_exposure_threshold[0],
                         auto_unstuck_ema_dist[0],
                     )
-                    next_close_grid_update_ts_long = timestamps[k] + 1000 * 60 * 5
+                    next_close_grid_update_ts_long = timestamp + 1000 * 60 * 5
 
                 # check for long entry fills
-                while entries_long and entries_long[0][0] > 0.0 and lows[k] < entries_long[0][1]:
+                while entries_long and entries_long[0][0] > 0.0 and low < entries_long[0][1]:
                     next_entry_grid_update_ts_long = min(
-                        next_entry_grid_update_ts_long, timestamps[k] + latency_simulation_ms
+                        next_entry_grid_update_ts_long, timestamp + latency_simulation_ms
                     )
                     next_close_grid_update_ts_long = min(
-                        next_close_grid_update_ts_long, timestamps[k] + latency_simulation_ms
+                        next_close_grid_update_ts_long, timestamp + latency_simulation_ms
                     )
                     psize_long, pprice_long = calc_new_psize_pprice(
                         psize_long,
@@ -1061,22 +1733,22 @@ def backtest_neat_grid(
                     balance_long = max(starting_balance * 1e-6, balance_long + fee_paid)
 
                     equity_long = balance_long + calc_pnl_long(
-                        pprice_long, closes[k], psize_long, inverse, c_mult
+                        pprice_long, close, psize_long, inverse, c_mult
                     )
-                    fills_long.append(
-                        (
-                            k,
-                            timestamps[k],
-                            0.0,
-                            fee_paid,
-                            balance_long,
-                            equity_long,
-                            entries_long[0][0],
-                            entries_long[0][1],
-                            psize_long,
-                            pprice_long,
-                            entries_long[0][2],
-                        )
+                    fills_long, n_fills_long = append_fill(
+                        fills_long,
+                        n_fills_long,
+                        k,
+                        timestamp,
+                        0.0,
+                        fee_paid,
+                        balance_long,
+                        equity_long,
+                        entries_long[0][0],
+                        entries_long[0][1],
+                        psize_long,
+                        pprice_long,
+                        entries_long[0][2],
                     )
                     entries_long = entries_long[1:]
                     bkr_price_long = calc_bankruptcy_price(
@@ -1097,13 +1769,13 @@ def backtest_neat_grid(
                     psize_long > 0.0
                     and closes_long
                     and closes_long[0][0] < 0.0
-                    and highs[k] > closes_long[0][1]
+                    and high > closes_long[0][1]
                 ):
                     next_entry_grid_update_ts_long = min(
-                        next_entry_grid_update_ts_long, timestamps[k] + latency_simulation_ms
+                        next_entry_grid_update_ts_long, timestamp + latency_simulation_ms
                     )
                     next_close_grid_update_ts_long = min(
-                        next_close_grid_update_ts_long, timestamps[k] + latency_simulation_ms
+                        next_close_grid_update_ts_long, timestamp + latency_simulation_ms
                     )
                     close_qty_long = closes_long[0][0]
                     new_psize_long = round_(psize_long + close_qty_long, qty_step)
@@ -1124,22 +1796,22 @@ def backtest_neat_grid(
                     balance_long = max(starting_balance * 1e-6, balance_long + fee_paid + pnl)
 
                     equity_long = balance_long + calc_pnl_long(
-                        pprice_long, closes[k], psize_long, inverse, c_mult
+                        pprice_long, close, psize_long, inverse, c_mult
                     )
-                    fills_long.append(
-                        (
-                            k,
-                            timestamps[k],
-                            pnl,
-                            fee_paid,
-                            balance_long,
-                            equity_long,
-                            close_qty_long,
-                            closes_long[0][1],
-                            psize_long,
-                            pprice_long,
-                            closes_long[0][2],
-                        )
+                    fills_long, n_fills_long = append_fill(
+                        fills_long,
+                        n_fills_long,
+                        k,
+                        timestamp,
+                        pnl,
+                        fee_paid,
+                        balance_long,
+                        equity_long,
+                        close_qty_long,
+                        closes_long[0][1],
+                        psize_long,
+                        pprice_long,
+                        closes_long[0][2],
                     )
                     closes_long = closes_long[1:]
                     bkr_price_long = calc_bankruptcy_price(
@@ -1158,31 +1830,31 @@ def backtest_neat_grid(
                     # update entry order
                     next_entry_grid_update_ts_long = min(
                         next_entry_grid_update_ts_long,
-                        timestamps[k] + latency_simulation_ms,
+                        timestamp + latency_simulation_ms,
                     )
                 else:
-                    if closes[k] > pprice_long:
+                    if close > pprice_long:
                         # update closes after 2.5 sec
                         next_close_grid_update_ts_long = min(
                             next_close_grid_update_ts_long,
-                            timestamps[k] + latency_simulation_ms + 2500,
+                            timestamp + latency_simulation_ms + 2500,
                         )
                     elif long_wallet_exposure >= long_wallet_exposure_auto_unstuck_threshold:
                         # update both entry grid and closes after 15 secs
                         next_close_grid_update_ts_long = min(
                             next_close_grid_update_ts_long,
-                            timestamps[k] + latency_simulation_ms + 15000,
+                            timestamp + latency_simulation_ms + 15000,
                         )
                         next_entry_grid_update_ts_long = min(
                             next_entry_grid_update_ts_long,
-                            timestamps[k] + latency_simulation_ms + 15000,
+                            timestamp + latency_simulation_ms + 15000,
                         )
 
         if do_short:
-            emas_short = calc_ema(alphas_short, alphas__short, emas_short, closes[k - 1])
+            emas_short = calc_ema(alphas_short, alphas__short, emas_short, prev_close)
             if k >= max_span_short:
                 # check bankruptcy
-                bkr_diff_short = calc_diff(bkr_price_short, closes[k])
+                bkr_diff_short = calc_diff(bkr_price_short, close)
                 closest_bkr_short = min(closest_bkr_short, bkr_diff_short)
 
                 if closest_bkr_short < 0.06:
@@ -1191,54 +1863,55 @@ def backtest_neat_grid(
                         fee_paid = (
                             -qty_to_cost(psize_short, pprice_short, inverse, c_mult) * maker_fee
                         )
-                        pnl = calc_pnl_short(pprice_short, closes[k], -psize_short, inverse, c_mult)
+                        pnl = calc_pnl_short(pprice_short, close, -psize_short, inverse, c_mult)
                         balance_short = starting_balance * 1e-6
                         equity_short = 0.0
                         psize_short, pprice_short = 0.0, 0.0
-                        fills_short.append(
-                            (
-                                k,
-                                timestamps[k],
-                                pnl,
-                                fee_paid,
-                                balance_short,
-                                equity_short,
-                                -psize_short,
-                                closes[k],
-                                0.0,
-                                0.0,
-                                "short_bankruptcy",
-                            )
+                        fills_short, n_fills_short = append_fill(
+                            fills_short,
+                            n_fills_short,
+                            k,
+                            timestamp,
+                            pnl,
+                            fee_paid,
+                            balance_short,
+                            equity_short,
+                            -psize_short,
+                            close,
+                            0.0,
+                            0.0,
+                            "short_bankruptcy",
                         )
                     do_short = False
                     if not do_long:
-                        stats.append(
-                            (
-                                next_stats_update,
-                                bkr_price_long,
-                                bkr_price_short,
-                                psize_long,
-                                pprice_long,
-                                psize_short,
-                                pprice_short,
-                                closes[k],
-                                closest_bkr_long,
-                                closest_bkr_short,
-                                balance_long,
-                                balance_short,
-                                equity_long,
-                                equity_short,
-                            )
+                        stats, n_stats = append_stats(
+                            stats,
+                            n_stats,
+                            next_stats_update,
+                            bkr_price_long,
+                            bkr_price_short,
+                            psize_long,
+                            pprice_long,
+                            psize_short,
+                            pprice_short,
+                            close,
+                            closest_bkr_long,
+                            closest_bkr_short,
+                            balance_long,
+                            balance_short,
+                            equity_long,
+                            equity_short,
                         )
-                        return fills_long, fills_short, stats
+                        done, k_next = True, k + 1
+                        break
 
                 # check if short entry grid should be updated
-                if timestamps[k] >= next_entry_grid_update_ts_short:
+                if timestamp >= next_entry_grid_update_ts_short:
                     entries_short = calc_neat_grid_short(
                         balance_short,
                         psize_short,
                         pprice_short,
-                        closes[k - 1],
+                        prev_close,
                         max(emas_short),
                         inverse,
                         do_short,
@@ -1256,17 +1929,19 @@ def backtest_neat_grid(
                         eprice_exp_base[1],
                         auto_unstuck_wallet_exposure_threshold[1],
                         auto_unstuck_ema_dist[1],
+                        grid_memo_short,
+                        grid_template[1],
                     )
 
-                    next_entry_grid_update_ts_short = timestamps[k] + 1000 * 60 * 5
+                    next_entry_grid_update_ts_short = timestamp + 1000 * 60 * 5
                 # check if close grid should be updated
-                if timestamps[k] >= next_close_grid_update_ts_short:
+                if timestamp >= next_close_grid_update_ts_short:
                     closes_short = calc_close_grid_short(
                         backwards_tp[1],
                         balance_short,
                         psize_short,
                         pprice_short,
-                        closes[k - 1],
+                        prev_close,
                         min(emas_short),
                         inverse,
                         qty_step,
@@ -1281,14 +1956,14 @@ def backtest_neat_grid(
                         auto_unstuck_wallet_exposure_threshold[1],
                         auto_unstuck_ema_dist[1],
                     )
-                    next_close_grid_update_ts_short = timestamps[k] + 1000 * 60 * 5
+                    next_close_grid_update_ts_short = timestamp + 1000 * 60 * 5
 
-                while entries_short and entries_short[0][0] < 0.0 and highs[k] > entries_short[0][1]:
+                while entries_short and entries_short[0][0] < 0.0 and high > entries_short[0][1]:
                     next_entry_grid_update_ts_short = min(
-                        next_entry_grid_update_ts_short, timestamps[k] + latency_simulation_ms
+                        next_entry_grid_update_ts_short, timestamp + latency_simulation_ms
                     )
                     next_close_grid_update_ts_short = min(
-                        next_close_grid_update_ts_short, timestamps[k] + latency_simulation_ms
+                        next_close_grid_update_ts_short, timestamp + latency_simulation_ms
                     )
                     psize_short, pprice_short = calc_new_psize_pprice(
                         psize_short,
@@ -1303,22 +1978,22 @@ def backtest_neat_grid(
                     )
                     balance_short = max(starting_balance * 1e-6, balance_short + fee_paid)
                     equity_short = balance_short + calc_pnl_short(
-                        pprice_short, closes[k], psize_short, inverse, c_mult
+                        pprice_short, close, psize_short, inverse, c_mult
                     )
-                    fills_short.append(
-                        (
-                            k,
-                            timestamps[k],
-                            0.0,
-                            fee_paid,
-                            balance_short,
-                            equity_short,
-                            entries_short[0][0],
-                            entries_short[0][1],
-                            psize_short,
-                            pprice_short,
-                            entries_short[0][2],
-                        )
+                    fills_short, n_fills_short = append_fill(
+                        fills_short,
+                        n_fills_short,
+                        k,
+                        timestamp,
+                        0.0,
+                        fee_paid,
+                        balance_short,
+                        equity_short,
+                        entries_short[0][0],
+                        entries_short[0][1],
+                        psize_short,
+                        pprice_short,
+                        entries_short[0][2],
                     )
                     entries_short = entries_short[1:]
                     bkr_price_short = calc_bankruptcy_price(
@@ -1339,13 +2014,13 @@ def backtest_neat_grid(
                     psize_short < 0.0
                     and closes_short
                     and closes_short[0][0] > 0.0
-                    and lows[k] < closes_short[0][1]
+                    and low < closes_short[0][1]
                 ):
                     next_entry_grid_update_ts_short = min(
-                        next_entry_grid_update_ts_short, timestamps[k] + latency_simulation_ms
+                        next_entry_grid_update_ts_short, timestamp + latency_simulation_ms
                     )
                     next_close_grid_update_ts_short = min(
-                        next_close_grid_update_ts_short, timestamps[k] + latency_simulation_ms
+                        next_close_grid_update_ts_short, timestamp + latency_simulation_ms
                     )
                     close_qty_short = closes_short[0][0]
                     new_psize_short = round_(psize_short + close_qty_short, qty_step)
@@ -1365,22 +2040,22 @@ def backtest_neat_grid(
                     )
                     balance_short = max(starting_balance * 1e-6, balance_short + fee_paid + pnl)
                     equity_short = balance_short + calc_pnl_short(
-                        pprice_short, closes[k], psize_short, inverse, c_mult
+                        pprice_short, close, psize_short, inverse, c_mult
                     )
-                    fills_short.append(
-                        (
-                            k,
-                            timestamps[k],
-                            pnl,
-                            fee_paid,
-                            balance_short,
-                            equity_short,
-                            close_qty_short,
-                            closes_short[0][1],
-                            psize_short,
-                            pprice_short,
-                            closes_short[0][2],
-                        )
+                    fills_short, n_fills_short = append_fill(
+                        fills_short,
+                        n_fills_short,
+                        k,
+                        timestamp,
+                        pnl,
+                        fee_paid,
+                        balance_short,
+                        equity_short,
+                        close_qty_short,
+                        closes_short[0][1],
+                        psize_short,
+                        pprice_short,
+                        closes_short[0][2],
                     )
                     closes_short = closes_short[1:]
                     bkr_price_short = calc_bankruptcy_price(
@@ -1398,67 +2073,495 @@ def backtest_neat_grid(
                 if psize_short == 0.0:
                     next_entry_grid_update_ts_short = min(
                         next_entry_grid_update_ts_short,
-                        timestamps[k] + latency_simulation_ms,
+                        timestamp + latency_simulation_ms,
                     )
                 else:
-                    if closes[k] < pprice_short:
+                    if close < pprice_short:
                         next_close_grid_update_ts_short = min(
                             next_close_grid_update_ts_short,
-                            timestamps[k] + latency_simulation_ms + 2500,
+                            timestamp + latency_simulation_ms + 2500,
                         )
                     elif short_wallet_exposure >= short_wallet_exposure_auto_unstuck_threshold:
                         next_close_grid_update_ts_short = min(
                             next_close_grid_update_ts_short,
-                            timestamps[k] + latency_simulation_ms + 15000,
+                            timestamp + latency_simulation_ms + 15000,
                         )
                         next_entry_grid_update_ts_short = min(
                             next_entry_grid_update_ts_short,
-                            timestamps[k] + latency_simulation_ms + 15000,
+                            timestamp + latency_simulation_ms + 15000,
                         )
         # process stats
-        if timestamps[k] >= next_stats_update:
+        if timestamp >= next_stats_update:
             equity_long = balance_long + calc_pnl_long(
-                pprice_long, closes[k], psize_long, inverse, c_mult
+                pprice_long, close, psize_long, inverse, c_mult
             )
             equity_short = balance_short + calc_pnl_short(
-                pprice_short, closes[k], psize_short, inverse, c_mult
+                pprice_short, close, psize_short, inverse, c_mult
             )
-            stats.append(
-                (
-                    timestamps[k],
-                    bkr_price_long,
-                    bkr_price_short,
-                    psize_long,
-                    pprice_long,
-                    psize_short,
-                    pprice_short,
-                    closes[k],
-                    closest_bkr_long,
-                    closest_bkr_short,
-                    balance_long,
-                    balance_short,
-                    equity_long,
-                    equity_short,
-                )
+            stats, n_stats = append_stats(
+                stats,
+                n_stats,
+                timestamp,
+                bkr_price_long,
+                bkr_price_short,
+                psize_long,
+                pprice_long,
+                psize_short,
+                pprice_short,
+                close,
+                closest_bkr_long,
+                closest_bkr_short,
+                balance_long,
+                balance_short,
+                equity_long,
+                equity_short,
+            )
+            next_stats_update = round(timestamp + 60 * 1000)
+
+    state[ST_DO_LONG], state[ST_DO_SHORT] = do_long, do_short
+    state[ST_BALANCE_LONG], state[ST_BALANCE_SHORT] = balance_long, balance_short
+    state[ST_EQUITY_LONG], state[ST_EQUITY_SHORT] = equity_long, equity_short
+    state[ST_PSIZE_LONG], state[ST_PPRICE_LONG] = psize_long, pprice_long
+    state[ST_PSIZE_SHORT], state[ST_PPRICE_SHORT] = psize_short, pprice_short
+    state[ST_BKR_PRICE_LONG], state[ST_BKR_PRICE_SHORT] = bkr_price_long, bkr_price_short
+    state[ST_CLOSEST_BKR_LONG], state[ST_CLOSEST_BKR_SHORT] = closest_bkr_long, closest_bkr_short
+    state[ST_WALLET_EXPOSURE_LONG] = long_wallet_exposure
+    state[ST_WALLET_EXPOSURE_SHORT] = short_wallet_exposure
+    state[ST_NEXT_ENTRY_UPDATE_TS_LONG] = next_entry_grid_update_ts_long
+    state[ST_NEXT_ENTRY_UPDATE_TS_SHORT] = next_entry_grid_update_ts_short
+    state[ST_NEXT_CLOSE_UPDATE_TS_LONG] = next_close_grid_update_ts_long
+    state[ST_NEXT_CLOSE_UPDATE_TS_SHORT] = next_close_grid_update_ts_short
+    state[ST_NEXT_STATS_UPDATE] = next_stats_update
+    state[ST_EMAS_LONG : ST_EMAS_LONG + 3] = emas_long
+    state[ST_EMAS_SHORT : ST_EMAS_SHORT + 3] = emas_short
+    state[ST_DONE] = done
+    state[ST_N_FILLS_LONG] = n_fills_long
+    state[ST_N_FILLS_SHORT] = n_fills_short
+    state[ST_N_STATS] = n_stats
+    state[ST_K] = k_next
+    state[ST_GRID_MEMO_HITS] = grid_memo_long[1, 0] + grid_memo_short[1, 0]
+    state[ST_GRID_MEMO_MISSES] = grid_memo_long[1, 1] + grid_memo_short[1, 1]
+    return entries_long, closes_long, entries_short, closes_short, fills_long, fills_short, stats
+
+
+@njit
+def backtest_neat_grid_packed(
+    ticks,
+    params,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    state_out=None,
+):
+    # same as backtest_neat_grid(), with config parameters packed by pack_neat_grid_params()
+    # state_out: optional N_STATE array, set to the final backtest state
+    block_highs, block_lows = calc_ticks_extrema_index(ticks)
+    state = init_backtest_state(ticks, starting_balance, params)
+    fills_long, fills_short, stats = init_backtest_buffers(ticks)
+    _, _, _, _, fills_long, fills_short, stats = backtest_neat_grid_range(
+        ticks,
+        block_highs,
+        block_lows,
+        1,
+        n_ticks(ticks),
+        state,
+        params,
+        empty_orders(),
+        empty_orders(),
+        empty_orders(),
+        empty_orders(),
+        init_grid_memo(int(round(params[0, P_MAX_N_ENTRY_ORDERS]))),
+        init_grid_memo(int(round(params[1, P_MAX_N_ENTRY_ORDERS]))),
+        fills_long,
+        fills_short,
+        stats,
+        starting_balance,
+        latency_simulation_ms,
+        maker_fee,
+        inverse,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+    )
+    if not state[ST_DONE]:
+        stats = append_state_stats(stats, state, state[ST_NEXT_STATS_UPDATE], last_close(ticks))
+    if state_out is not None:
+        state_out[:] = state
+    return trim_backtest_buffers(fills_long, fills_short, stats, state)
+
+
+@njit
+def backtest_neat_grid(
+    ticks,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    do_long,
+    do_short,
+    backwards_tp,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    ema_span_0,
+    ema_span_1,
+    eqty_exp_base,
+    eprice_exp_base,
+    grid_span,
+    initial_eprice_ema_dist,
+    initial_qty_pct,
+    markup_range,
+    max_n_entry_orders,
+    min_markup,
+    n_close_orders,
+    wallet_exposure_limit,
+    auto_unstuck_ema_dist,
+    auto_unstuck_wallet_exposure_threshold,
+    grid_template=False,
+    state_out=None,
+):
+    # ticks: ticks view, see unpack_ticks()
+    # grid_template: opt in to entry grids built from template, see calc_neat_grid_long()
+    # state_out: optional N_STATE array, set to the final backtest state
+    params = pack_neat_grid_params(
+        inverse,
+        do_long,
+        do_short,
+        backwards_tp,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+        grid_span,
+        wallet_exposure_limit,
+        max_n_entry_orders,
+        initial_qty_pct,
+        eqty_exp_base,
+        eprice_exp_base,
+        min_markup,
+        markup_range,
+        n_close_orders,
+        ema_span_0,
+        ema_span_1,
+        initial_eprice_ema_dist,
+        auto_unstuck_wallet_exposure_threshold,
+        auto_unstuck_ema_dist,
+        grid_template,
+    )
+    return backtest_neat_grid_packed(
+        ticks,
+        params,
+        starting_balance,
+        latency_simulation_ms,
+        maker_fee,
+        inverse,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+        state_out,
+    )
+
+
+@njit
+def backtest_neat_grid_resume(
+    ticks,
+    params,
+    state,
+    entries_long,
+    closes_long,
+    entries_short,
+    closes_short,
+    grid_memo_long,
+    grid_memo_short,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+):
+    # runs ticks [state[ST_K], n_ticks(ticks)) from an explicit state, e.g. one saved by an earlier run
+    # open orders are given and returned as orders_to_array() arrays
+    # state and grid memos are updated in place; fills and stats counts restart at zero
+    # returns (fills_long, fills_short, stats, entries_long, closes_long, entries_short, closes_short)
+    # without the final stats row, so results of consecutive runs can be concatenated
+    block_highs, block_lows = calc_ticks_extrema_index(ticks)
+    state[ST_N_FILLS_LONG] = state[ST_N_FILLS_SHORT] = state[ST_N_STATS] = 0.0
+    fills_long, fills_short, stats = init_backtest_buffers(ticks)
+    (
+        entries_long_,
+        closes_long_,
+        entries_short_,
+        closes_short_,
+        fills_long,
+        fills_short,
+        stats,
+    ) = backtest_neat_grid_range(
+        ticks,
+        block_highs,
+        block_lows,
+        int(state[ST_K]),
+        n_ticks(ticks),
+        state,
+        params,
+        array_to_orders(entries_long),
+        array_to_orders(closes_long),
+        array_to_orders(entries_short),
+        array_to_orders(closes_short),
+        grid_memo_long,
+        grid_memo_short,
+        fills_long,
+        fills_short,
+        stats,
+        starting_balance,
+        latency_simulation_ms,
+        maker_fee,
+        inverse,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+    )
+    fills_long, fills_short, stats = trim_backtest_buffers(fills_long, fills_short, stats, state)
+    return (
+        fills_long,
+        fills_short,
+        stats,
+        orders_to_array(entries_long_),
+        orders_to_array(closes_long_),
+        orders_to_array(entries_short_),
+        orders_to_array(closes_short_),
+    )
+
+
+@njit(parallel=True)
+def backtest_neat_grid_symbols(
+    ticks_list, params, market_settings, starting_balance, latency_simulation_ms
+):
+    # backtests one config on many symbols in parallel threads, one symbol per thread at a time
+    # ticks_list: numba.typed.List of ticks views, one per symbol, may differ in length
+    # params shape (2, N_NEAT_GRID_PARAMS), see pack_neat_grid_params()
+    # market_settings shape (n_symbols, N_MARKET_SETTINGS), see MS_* indices
+    # returns analysis metrics shape (n_symbols, N_ANALYSIS_METRICS), see calc_analysis_metrics()
+    metrics = np.zeros((len(ticks_list), N_ANALYSIS_METRICS))
+    for i in prange(len(ticks_list)):
+        inverse = market_settings[i, MS_INVERSE] != 0.0
+        fills_long, fills_short, stats = backtest_neat_grid_packed(
+            ticks_list[np.int64(i)],
+            params,
+            starting_balance,
+            latency_simulation_ms,
+            market_settings[i, MS_MAKER_FEE],
+            inverse,
+            market_settings[i, MS_QTY_STEP],
+            market_settings[i, MS_PRICE_STEP],
+            market_settings[i, MS_MIN_QTY],
+            market_settings[i, MS_MIN_COST],
+            market_settings[i, MS_C_MULT],
+        )
+        metrics[i] = calc_analysis_metrics(
+            fills_long, fills_short, stats, inverse, market_settings[i, MS_C_MULT]
+        )
+    return metrics
+
+
+@njit
+def backtest_neat_grid_batch(
+    ticks,
+    params,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    block_size=16384,
+):
+    # params shape (n_configs, 2, N_NEAT_GRID_PARAMS), see pack_neat_grid_params()
+    # ticks are walked once in blocks; every config is advanced through a block before the next
+    # block is touched, so tick data is streamed from memory once per batch instead of per config
+    # returns ([fills_long], [fills_short], [stats]), one item per config
+    block_highs, block_lows = calc_ticks_extrema_index(ticks)
+    n_configs = len(params)
+    states = np.zeros((n_configs, N_STATE))
+    for i in range(n_configs):
+        states[i] = init_backtest_state(ticks, starting_balance, params[i])
+    entries_longs = [empty_orders() for _ in range(n_configs)]
+    closes_longs = [empty_orders() for _ in range(n_configs)]
+    entries_shorts = [empty_orders() for _ in range(n_configs)]
+    closes_shorts = [empty_orders() for _ in range(n_configs)]
+    grid_memos_long = [
+        init_grid_memo(int(round(params[i, 0, P_MAX_N_ENTRY_ORDERS]))) for i in range(n_configs)
+    ]
+    grid_memos_short = [
+        init_grid_memo(int(round(params[i, 1, P_MAX_N_ENTRY_ORDERS]))) for i in range(n_configs)
+    ]
+    buffers = [init_backtest_buffers(ticks) for _ in range(n_configs)]
+    fills_longs = [buffer[0] for buffer in buffers]
+    fills_shorts = [buffer[1] for buffer in buffers]
+    statss = [buffer[2] for buffer in buffers]
+    for k_start in range(1, n_ticks(ticks), block_size):
+        k_end = min(k_start + block_size, n_ticks(ticks))
+        for i in range(n_configs):
+            if states[i, ST_DONE]:
+                continue
+            (
+                entries_longs[i],
+                closes_longs[i],
+                entries_shorts[i],
+                closes_shorts[i],
+                fills_longs[i],
+                fills_shorts[i],
+                statss[i],
+            ) = backtest_neat_grid_range(
+                ticks,
+                block_highs,
+                block_lows,
+                k_start,
+                k_end,
+                states[i],
+                params[i],
+                entries_longs[i],
+                closes_longs[i],
+                entries_shorts[i],
+                closes_shorts[i],
+                grid_memos_long[i],
+                grid_memos_short[i],
+                fills_longs[i],
+                fills_shorts[i],
+                statss[i],
+                starting_balance,
+                latency_simulation_ms,
+                maker_fee,
+                inverse,
+                qty_step,
+                price_step,
+                min_qty,
+                min_cost,
+                c_mult,
             )
-            next_stats_update = round(timestamps[k] + 60 * 1000)
-
-    stats.append(
-        (
-            next_stats_update,
-            bkr_price_long,
-            bkr_price_short,
-            psize_long,
-            pprice_long,
-            psize_short,
-            pprice_short,
-            closes[k],
-            closest_bkr_long,
-            closest_bkr_short,
-            balance_long,
-            balance_short,
-            equity_long,
-            equity_short,
+    for i in range(n_configs):
+        if not states[i, ST_DONE]:
+            statss[i] = append_state_stats(
+                statss[i], states[i], states[i, ST_NEXT_STATS_UPDATE], last_close(ticks)
+            )
+        fills_longs[i], fills_shorts[i], statss[i] = trim_backtest_buffers(
+            fills_longs[i], fills_shorts[i], statss[i], states[i]
         )
+    return fills_longs, fills_shorts, statss
+
+
+@njit
+def backtest_neat_grid_windows(
+    ticks,
+    windows,
+    params,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    block_size=16384,
+):
+    # windows shape (n_windows, 2), [start, end) tick indices; windows may overlap
+    # each window is backtested from scratch as if its ticks were the whole data, starting at its
+    # first tick.  ticks are walked once in blocks; every window covering a block is advanced
+    # through it before the next block is touched
+    # params shape (2, N_NEAT_GRID_PARAMS), see pack_neat_grid_params()
+    # returns ([fills_long], [fills_short], [stats]), one item per window
+    n_windows = len(windows)
+    tickss = [slice_ticks(ticks, windows[i, 0], windows[i, 1]) for i in range(n_windows)]
+    indices = [calc_ticks_extrema_index(tickss[i]) for i in range(n_windows)]
+    states = np.zeros((n_windows, N_STATE))
+    for i in range(n_windows):
+        states[i] = init_backtest_state(tickss[i], starting_balance, params)
+    entries_longs = [empty_orders() for _ in range(n_windows)]
+    closes_longs = [empty_orders() for _ in range(n_windows)]
+    entries_shorts = [empty_orders() for _ in range(n_windows)]
+    closes_shorts = [empty_orders() for _ in range(n_windows)]
+    max_n_entry_orders = (
+        int(round(params[0, P_MAX_N_ENTRY_ORDERS])),
+        int(round(params[1, P_MAX_N_ENTRY_ORDERS])),
     )
-    return fills_long, fills_short, stats
+    grid_memos_long = [init_grid_memo(max_n_entry_orders[0]) for _ in range(n_windows)]
+    grid_memos_short = [init_grid_memo(max_n_entry_orders[1]) for _ in range(n_windows)]
+    buffers = [init_backtest_buffers(tickss[i]) for i in range(n_windows)]
+    fills_longs = [buffer[0] for buffer in buffers]
+    fills_shorts = [buffer[1] for buffer in buffers]
+    statss = [buffer[2] for buffer in buffers]
+    for k_start in range(windows[:, 0].min() + 1, windows[:, 1].max(), block_size):
+        k_end = min(k_start + block_size, windows[:, 1].max())
+        for i in range(n_windows):
+            # block bounds in window's own tick indices; window's first tick only seeds its state
+            w_start = max(k_start, windows[i, 0] + 1) - windows[i, 0]
+            w_end = min(k_end, windows[i, 1]) - windows[i, 0]
+            if w_start >= w_end or states[i, ST_DONE]:
+                continue
+            (
+                entries_longs[i],
+                closes_longs[i],
+                entries_shorts[i],
+                closes_shorts[i],
+                fills_longs[i],
+                fills_shorts[i],
+                statss[i],
+            ) = backtest_neat_grid_range(
+                tickss[i],
+                indices[i][0],
+                indices[i][1],
+                w_start,
+                w_end,
+                states[i],
+                params,
+                entries_longs[i],
+                closes_longs[i],
+                entries_shorts[i],
+                closes_shorts[i],
+                grid_memos_long[i],
+                grid_memos_short[i],
+                fills_longs[i],
+                fills_shorts[i],
+                statss[i],
+                starting_balance,
+                latency_simulation_ms,
+                maker_fee,
+                inverse,
+                qty_step,
+                price_step,
+                min_qty,
+                min_cost,
+                c_mult,
+            )
+    for i in range(n_windows):
+        if not states[i, ST_DONE]:
+            statss[i] = append_state_stats(
+                statss[i], states[i], states[i, ST_NEXT_STATS_UPDATE], last_close(tickss[i])
+            )
+        fills_longs[i], fills_shorts[i], statss[i] = trim_backtest_buffers(
+            fills_longs[i], fills_shorts[i], statss[i], states[i]
+        )
+    return fills_longs, fills_shorts, statss
@@ -1,4 +1,3 @@
-import os
 import numpy as np
 
 from njit_funcs import (
@@ -12,6 +11,9 @@ from njit_funcs import (
     calc_bankruptcy_price,
     calc_ema,
     calc_diff,
+    calc_ticks_extrema_index,
+    find_skip_target,
+    skip_ticks,
     calc_pnl_long,
     calc_pnl_short,
     calc_upnl,
@@ -21,24 +23,75 @@ from njit_funcs import (
     find_entry_qty_bringing_wallet_exposure_to_target,
     calc_close_grid_long,
     calc_close_grid_short,
+    pack_common_params,
+    P_BACKWARDS_TP,
+    P_INITIAL_QTY_PCT,
+    P_INITIAL_EPRICE_EMA_DIST,
+    P_WALLET_EXPOSURE_LIMIT,
+    P_MIN_MARKUP,
+    P_MARKUP_RANGE,
+    P_N_CLOSE_ORDERS,
+    P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD,
+    P_AUTO_UNSTUCK_EMA_DIST,
+    ST_DO_LONG,
+    ST_DO_SHORT,
+    ST_BALANCE_LONG,
+    ST_BALANCE_SHORT,
+    ST_EQUITY_LONG,
+    ST_EQUITY_SHORT,
+    ST_PSIZE_LONG,
+    ST_PPRICE_LONG,
+    ST_PSIZE_SHORT,
+    ST_PPRICE_SHORT,
+    ST_BKR_PRICE_LONG,
+    ST_BKR_PRICE_SHORT,
+    ST_CLOSEST_BKR_LONG,
+    ST_CLOSEST_BKR_SHORT,
+    ST_NEXT_ENTRY_UPDATE_TS_LONG,
+    ST_NEXT_ENTRY_UPDATE_TS_SHORT,
+    ST_NEXT_CLOSE_UPDATE_TS_LONG,
+    ST_NEXT_CLOSE_UPDATE_TS_SHORT,
+    ST_NEXT_STATS_UPDATE,
+    ST_MAX_SPAN_LONG,
+    ST_MAX_SPAN_SHORT,
+    ST_EMAS_LONG,
+    ST_EMAS_SHORT,
+    ST_ALPHAS_LONG,
+    ST_ALPHAS_SHORT,
+    ST_WALLET_EXPOSURE_LONG,
+    ST_WALLET_EXPOSURE_SHORT,
+    ST_DONE,
+    ST_K,
+    ST_N_FILLS_LONG,
+    ST_N_FILLS_SHORT,
+    ST_N_STATS,
+    tick_timestamp,
+    tick_high,
+    tick_low,
+    tick_close,
+    n_ticks,
+    slice_ticks,
+    init_backtest_state,
+    init_backtest_buffers,
+    append_fill,
+    append_stats,
+    append_state_stats,
+    trim_backtest_buffers,
+    empty_orders,
+    orders_to_array,
+    array_to_orders,
+    calc_analysis_metrics,
+    MS_INVERSE,
+    MS_QTY_STEP,
+    MS_PRICE_STEP,
+    MS_MIN_QTY,
+    MS_MIN_COST,
+    MS_C_MULT,
+    MS_MAKER_FEE,
+    N_ANALYSIS_METRICS,
+    N_STATE,
 )
-
-
-if "NOJIT" in os.environ and os.environ["NOJIT"] == "true":
-    print("not using numba")
-
-    def njit(pyfunc=None, **kwargs):
-        def wrap(func):
-            return func
-
-        if pyfunc is not None:
-            return wrap(pyfunc)
-        else:
-            return wrap
-
-else:
-    print("using numba")
-    from numba import njit
+from njit_funcs_jit import njit, prange
 
 
 @njit
@@ -379,12 +432,15 @@ def calc_recursive_entries_short(
     return entries
 
 
+# recursive grid params layout, shared indices are defined in njit_funcs
+P_DDOWN_FACTOR = 12
+P_RENTRY_PPRICE_DIST = 13
+P_RENTRY_PPRICE_DIST_WALLET_EXPOSURE_WEIGHTING = 14
+N_RECURSIVE_GRID_PARAMS = 15
+
+
 @njit
-def backtest_recursive_grid(
-    ticks,
-    starting_balance,
-    latency_simulation_ms,
-    maker_fee,
+def pack_recursive_grid_params(
     inverse,
     do_long,
     do_short,
@@ -408,54 +464,172 @@ def backtest_recursive_grid(
     auto_unstuck_wallet_exposure_threshold,
     auto_unstuck_ema_dist,
 ):
-    if len(ticks[0]) == 3:
-        timestamps = ticks[:, 0]
-        closes = ticks[:, 2]
-        lows = closes
-        highs = closes
-    else:
-        timestamps = ticks[:, 0]
-        highs = ticks[:, 1]
-        lows = ticks[:, 2]
-        closes = ticks[:, 3]
-
-    balance_long = balance_short = equity_long = equity_short = starting_balance
-    psize_long, pprice_long, psize_short, pprice_short = 0.0, 0.0, 0.0, 0.0
-
-    fills_long, fills_short, stats = [], [], []
-
-    entry_long, entry_short = (0.0, 0.0, ""), (0.0, 0.0, "")
-    closes_long, closes_short = [(0.0, 0.0, "")], [(0.0, 0.0, "")]
-    bkr_price_long = bkr_price_short = 0.0
-
-    next_entry_update_ts_long = 0
-    next_entry_update_ts_short = 0
-    next_close_grid_update_ts_long = 0
-    next_close_grid_update_ts_short = 0
-    next_stats_update = 0
-
-    closest_bkr_long = closest_bkr_short = 1.0
-
-    spans_multiplier = 60 / ((timestamps[1] - timestamps[0]) / 1000)
-
-    spans_long = [ema_span_0[0], (ema_span_0[0] * ema_span_1[0]) ** 0.5, ema_span_1[0]]
-    spans_long = np.array(sorted(spans_long)) * spans_multiplier if do_long else np.ones(3)
-    spans_short = [ema_span_0[1], (ema_span_0[1] * ema_span_1[1]) ** 0.5, ema_span_1[1]]
-    spans_short = np.array(sorted(spans_short)) * spans_multiplier if do_short else np.ones(3)
-    assert max(spans_long) < len(ticks), "ema_span_1 long larger than len(prices)"
-    assert max(spans_short) < len(ticks), "ema_span_1 short larger than len(prices)"
-    spans_long = np.where(spans_long < 1.0, 1.0, spans_long)
-    spans_short = np.where(spans_short < 1.0, 1.0, spans_short)
-    max_span_long = int(round(max(spans_long)))
-    max_span_short = int(round(max(spans_short)))
-    emas_long, emas_short = np.repeat(closes[0], 3), np.repeat(closes[0], 3)
-    alphas_long = 2.0 / (spans_long + 1.0)
+    # takes same args as create_xk() output; market specific settings are ignored
+    params = np.zeros((2, N_RECURSIVE_GRID_PARAMS))
+    pack_common_params(
+        params,
+        do_long,
+        do_short,
+        backwards_tp,
+        wallet_exposure_limit,
+        ema_span_0,
+        ema_span_1,
+        initial_qty_pct,
+        initial_eprice_ema_dist,
+        min_markup,
+        markup_range,
+        n_close_orders,
+        auto_unstuck_wallet_exposure_threshold,
+        auto_unstuck_ema_dist,
+    )
+    params[0, P_DDOWN_FACTOR], params[1, P_DDOWN_FACTOR] = ddown_factor
+    params[0, P_RENTRY_PPRICE_DIST], params[1, P_RENTRY_PPRICE_DIST] = rentry_pprice_dist
+    (
+        params[0, P_RENTRY_PPRICE_DIST_WALLET_EXPOSURE_WEIGHTING],
+        params[1, P_RENTRY_PPRICE_DIST_WALLET_EXPOSURE_WEIGHTING],
+    ) = rentry_pprice_dist_wallet_exposure_weighting
+    return params
+
+
+@njit
+def calc_recursive_entries_long_packed(
+    balance, psize, pprice, highest_bid, ema_band_lower, market, params, whole_grid=False
+):
+    # calc_recursive_entries_long() with market settings from pack_market_settings() and params
+    # packed by pack_recursive_grid_params()
+    return calc_recursive_entries_long(
+        balance,
+        psize,
+        pprice,
+        highest_bid,
+        ema_band_lower,
+        market[MS_INVERSE] != 0.0,
+        market[MS_QTY_STEP],
+        market[MS_PRICE_STEP],
+        market[MS_MIN_QTY],
+        market[MS_MIN_COST],
+        market[MS_C_MULT],
+        params[0, P_INITIAL_QTY_PCT],
+        params[0, P_INITIAL_EPRICE_EMA_DIST],
+        params[0, P_DDOWN_FACTOR],
+        params[0, P_RENTRY_PPRICE_DIST],
+        params[0, P_RENTRY_PPRICE_DIST_WALLET_EXPOSURE_WEIGHTING],
+        params[0, P_WALLET_EXPOSURE_LIMIT],
+        params[0, P_AUTO_UNSTUCK_EMA_DIST],
+        params[0, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+        whole_grid,
+    )
+
+
+@njit
+def calc_recursive_entries_short_packed(
+    balance, psize, pprice, lowest_ask, ema_band_upper, market, params, whole_grid=False
+):
+    # calc_recursive_entries_short() with market settings from pack_market_settings() and params
+    # packed by pack_recursive_grid_params()
+    return calc_recursive_entries_short(
+        balance,
+        psize,
+        pprice,
+        lowest_ask,
+        ema_band_upper,
+        market[MS_INVERSE] != 0.0,
+        market[MS_QTY_STEP],
+        market[MS_PRICE_STEP],
+        market[MS_MIN_QTY],
+        market[MS_MIN_COST],
+        market[MS_C_MULT],
+        params[1, P_INITIAL_QTY_PCT],
+        params[1, P_INITIAL_EPRICE_EMA_DIST],
+        params[1, P_DDOWN_FACTOR],
+        params[1, P_RENTRY_PPRICE_DIST],
+        params[1, P_RENTRY_PPRICE_DIST_WALLET_EXPOSURE_WEIGHTING],
+        params[1, P_WALLET_EXPOSURE_LIMIT],
+        params[1, P_AUTO_UNSTUCK_EMA_DIST],
+        params[1, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+        whole_grid,
+    )
+
+
+@njit
+def backtest_recursive_grid_range(
+    ticks,
+    block_highs,
+    block_lows,
+    k_start,
+    k_end,
+    state,
+    params,
+    entry_long,
+    closes_long,
+    entry_short,
+    closes_short,
+    fills_long,
+    fills_short,
+    stats,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+):
+    # runs ticks [k_start, k_end), resuming from state and updating it in place
+    # ticks: ticks view from unpack_ticks() or unpack_compact_ticks()
+    # fills and stats are appended to given lists; returns open orders
+    backwards_tp = (params[0, P_BACKWARDS_TP] != 0.0, params[1, P_BACKWARDS_TP] != 0.0)
+    initial_qty_pct = (params[0, P_INITIAL_QTY_PCT], params[1, P_INITIAL_QTY_PCT])
+    initial_eprice_ema_dist = (
+        params[0, P_INITIAL_EPRICE_EMA_DIST],
+        params[1, P_INITIAL_EPRICE_EMA_DIST],
+    )
+    wallet_exposure_limit = (params[0, P_WALLET_EXPOSURE_LIMIT], params[1, P_WALLET_EXPOSURE_LIMIT])
+    ddown_factor = (params[0, P_DDOWN_FACTOR], params[1, P_DDOWN_FACTOR])
+    rentry_pprice_dist = (params[0, P_RENTRY_PPRICE_DIST], params[1, P_RENTRY_PPRICE_DIST])
+    rentry_pprice_dist_wallet_exposure_weighting = (
+        params[0, P_RENTRY_PPRICE_DIST_WALLET_EXPOSURE_WEIGHTING],
+        params[1, P_RENTRY_PPRICE_DIST_WALLET_EXPOSURE_WEIGHTING],
+    )
+    min_markup = (params[0, P_MIN_MARKUP], params[1, P_MIN_MARKUP])
+    markup_range = (params[0, P_MARKUP_RANGE], params[1, P_MARKUP_RANGE])
+    n_close_orders = (
+        int(round(params[0, P_N_CLOSE_ORDERS])),
+        int(round(params[1, P_N_CLOSE_ORDERS])),
+    )
+    auto_unstuck_wallet_exposure_threshold = (
+        params[0, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+        params[1, P_AUTO_UNSTUCK_WALLET_EXPOSURE_THRESHOLD],
+    )
+    auto_unstuck_ema_dist = (params[0, P_AUTO_UNSTUCK_EMA_DIST], params[1, P_AUTO_UNSTUCK_EMA_DIST])
+
+    do_long, do_short = state[ST_DO_LONG] != 0.0, state[ST_DO_SHORT] != 0.0
+    balance_long, balance_short = state[ST_BALANCE_LONG], state[ST_BALANCE_SHORT]
+    equity_long, equity_short = state[ST_EQUITY_LONG], state[ST_EQUITY_SHORT]
+    psize_long, pprice_long = state[ST_PSIZE_LONG], state[ST_PPRICE_LONG]
+    psize_short, pprice_short = state[ST_PSIZE_SHORT], state[ST_PPRICE_SHORT]
+    bkr_price_long, bkr_price_short = state[ST_BKR_PRICE_LONG], state[ST_BKR_PRICE_SHORT]
+    closest_bkr_long, closest_bkr_short = state[ST_CLOSEST_BKR_LONG], state[ST_CLOSEST_BKR_SHORT]
+
+    next_entry_update_ts_long = state[ST_NEXT_ENTRY_UPDATE_TS_LONG]
+    next_entry_update_ts_short = state[ST_NEXT_ENTRY_UPDATE_TS_SHORT]
+    next_close_grid_update_ts_long = state[ST_NEXT_CLOSE_UPDATE_TS_LONG]
+    next_close_grid_update_ts_short = state[ST_NEXT_CLOSE_UPDATE_TS_SHORT]
+    next_stats_update = state[ST_NEXT_STATS_UPDATE]
+
+    max_span_long = int(state[ST_MAX_SPAN_LONG])
+    max_span_short = int(state[ST_MAX_SPAN_SHORT])
+    emas_long = state[ST_EMAS_LONG : ST_EMAS_LONG + 3].copy()
+    emas_short = state[ST_EMAS_SHORT : ST_EMAS_SHORT + 3].copy()
+    alphas_long = state[ST_ALPHAS_LONG : ST_ALPHAS_LONG + 3].copy()
     alphas__long = 1.0 - alphas_long
-    alphas_short = 2.0 / (spans_short + 1.0)
+    alphas_short = state[ST_ALPHAS_SHORT : ST_ALPHAS_SHORT + 3].copy()
     alphas__short = 1.0 - alphas_short
 
-    long_wallet_exposure = 0.0
-    short_wallet_exposure = 0.0
+    long_wallet_exposure = state[ST_WALLET_EXPOSURE_LONG]
+    short_wallet_exposure = state[ST_WALLET_EXPOSURE_SHORT]
     long_wallet_exposure_auto_unstuck_threshold = (
         (wallet_exposure_limit[0] * (1 - auto_unstuck_wallet_exposure_threshold[0]))
         if auto_unstuck_wallet_exposure_threshold[0] != 0.0
@@ -466,47 +640,149 @@ def backtest_recursive_grid(
         if auto_unstuck_wallet_exposure_threshold[1] != 0.0
         else wallet_exposure_limit[1] * 10
     )
-    for k in range(1, len(ticks)):
+
+    n_fills_long = int(state[ST_N_FILLS_LONG])
+    n_fills_short = int(state[ST_N_FILLS_SHORT])
+    n_stats = int(state[ST_N_STATS])
+    done, k_next = False, k_end
+
+    k_skip = k_start
+    for k in range(k_start, k_end):
+        if k < k_skip:
+            continue
+        if len(block_highs) > 0:
+            # jump over ticks which can only update emas, closest bankruptcy distances and stats
+            entry_price_long = entry_long[1] if entry_long[0] != 0.0 else -np.inf
+            close_price_long = (
+                closes_long[0][1]
+                if psize_long > 0.0 and closes_long and closes_long[0][0] < 0.0
+                else np.inf
+            )
+            entry_price_short = entry_short[1] if entry_short[0] != 0.0 else np.inf
+            close_price_short = (
+                closes_short[0][1]
+                if psize_short < 0.0 and closes_short and closes_short[0][0] > 0.0
+                else -np.inf
+            )
+            k_skip = find_skip_target(
+                k,
+                k_end,
+                ticks,
+                block_highs,
+                block_lows,
+                latency_simulation_ms,
+                do_long,
+                max_span_long,
+                psize_long,
+                pprice_long,
+                bkr_price_long,
+                long_wallet_exposure,
+                long_wallet_exposure_auto_unstuck_threshold,
+                next_entry_update_ts_long,
+                next_close_grid_update_ts_long,
+                entry_price_long,
+                close_price_long,
+                do_short,
+                max_span_short,
+                psize_short,
+                pprice_short,
+                bkr_price_short,
+                short_wallet_exposure,
+                short_wallet_exposure_auto_unstuck_threshold,
+                next_entry_update_ts_short,
+                next_close_grid_update_ts_short,
+                entry_price_short,
+                close_price_short,
+                True,
+            )
+            if k_skip > k:
+                (
+                    emas_long,
+                    emas_short,
+                    closest_bkr_long,
+                    closest_bkr_short,
+                    equity_long,
+                    equity_short,
+                    stats,
+                    n_stats,
+                    next_stats_update,
+                ) = skip_ticks(
+                    k,
+                    k_skip,
+                    ticks,
+                    do_long,
+                    do_short,
+                    max_span_long,
+                    max_span_short,
+                    emas_long,
+                    emas_short,
+                    alphas_long,
+                    alphas__long,
+                    alphas_short,
+                    alphas__short,
+                    bkr_price_long,
+                    bkr_price_short,
+                    closest_bkr_long,
+                    closest_bkr_short,
+                    balance_long,
+                    balance_short,
+                    equity_long,
+                    equity_short,
+                    psize_long,
+                    pprice_long,
+                    psize_short,
+                    pprice_short,
+                    stats,
+                    n_stats,
+                    next_stats_update,
+                    inverse,
+                    c_mult,
+                )
+                continue
+        timestamp = tick_timestamp(ticks, k)
+        close, prev_close = tick_close(ticks, k), tick_close(ticks, k - 1)
+        high, low = tick_high(ticks, k), tick_low(ticks, k)
         if do_long:
-            emas_long = calc_ema(alphas_long, alphas__long, emas_long, closes[k - 1])
+            emas_long = calc_ema(alphas_long, alphas__long, emas_long, prev_close)
             if k >= max_span_long:
                 # check bankruptcy
-                bkr_diff_long = calc_diff(bkr_price_long, closes[k])
+                bkr_diff_long = calc_diff(bkr_price_long, close)
                 closest_bkr_long = min(closest_bkr_long, bkr_diff_long)
                 if closest_bkr_long < 0.06:
                     # consider bankruptcy within 6% as liquidation
                     if psize_long != 0.0:
                         fee_paid = -qty_to_cost(psize_long, pprice_long, inverse, c_mult) * maker_fee
-                        pnl = calc_pnl_long(pprice_long, closes[k], -psize_long, inverse, c_mult)
+                        pnl = calc_pnl_long(pprice_long, close, -psize_long, inverse, c_mult)
                         balance_long = starting_balance * 1e-6
                         equity_long = 0.0
                         psize_long, pprice_long = 0.0, 0.0
-                        fills_long.append(
-                            (
-                                k,
-                                timestamps[k],
-                                pnl,
-                                fee_paid,
-                                balance_long,
-                                equity_long,
-                                -psize_long,
-                                closes[k],
-                                0.0,
-                                0.0,
-                                "long_bankruptcy",
-                            )
+                        fills_long, n_fills_long = append_fill(
+                            fills_long,
+                            n_fills_long,
+                            k,
+                            timestamp,
+                            pnl,
+                            fee_paid,
+                            balance_long,
+                            equity_long,
+                            -psize_long,
+                            close,
+                            0.0,
+                            0.0,
+                            "long_bankruptcy",
                         )
                     do_long = False
                     if not do_short:
-                        return fills_long, fills_short, stats
+                        done, k_next = True, k + 1
+                        break
 
                 # check if long entry order should be updated
-                if timestamps[k] >= next_entry_update_ts_long:
+                if timestamp >= next_entry_update_ts_long:
                     entry_long = calc_recursive_entry_long(
                         balance_long,
                         psize_long,
                         pprice_long,
-                        closes[k - 1],
+                        prev_close,
                         min(emas_long),
                         inverse,
                         qty_step,
@@ -523,16 +799,16 @@ def backtest_recursive_grid(
                         auto_unstuck_ema_dist[0],
                         auto_unstuck_wallet_exposure_threshold[0],
                     )
-                    next_entry_update_ts_long = timestamps[k] + 1000 * 60 * 5  # five mins delay
+                    next_entry_update_ts_long = timestamp + 1000 * 60 * 5  # five mins delay
 
                 # check if close grid should be updated
-                if timestamps[k] >= next_close_grid_update_ts_long:
+                if timestamp >= next_close_grid_update_ts_long:
                     closes_long = calc_close_grid_long(
                         backwards_tp[0],
                         balance_long,
                         psize_long,
                         pprice_long,
-                        closes[k - 1],
+                        prev_close,
                         max(emas_long),
                         inverse,
                         qty_step,
@@ -547,15 +823,15 @@ def backtest_recursive_grid(
                         auto_unstuck_wallet_exposure_threshold[0],
                         auto_unstuck_ema_dist[0],
                     )
-                    next_close_grid_update_ts_long = timestamps[k] + 1000 * 60 * 5  # five mins delay
+                    next_close_grid_update_ts_long = timestamp + 1000 * 60 * 5  # five mins delay
 
                 # check if long entry filled
-                while entry_long[0] != 0.0 and lows[k] < entry_long[1]:
+                while entry_long[0] != 0.0 and low < entry_long[1]:
                     next_entry_update_ts_long = min(
-                        next_entry_update_ts_long, timestamps[k] + latency_simulation_ms
+                        next_entry_update_ts_long, timestamp + latency_simulation_ms
                     )
                     next_close_grid_update_ts_long = min(
-                        next_close_grid_update_ts_long, timestamps[k] + latency_simulation_ms
+                        next_close_grid_update_ts_long, timestamp + latency_simulation_ms
                     )
                     psize_long, pprice_long = calc_new_psize_pprice(
                         psize_long,
@@ -567,22 +843,22 @@ def backtest_recursive_grid(
                     fee_paid = -qty_to_cost(entry_long[0], entry_long[1], inverse, c_mult) * maker_fee
                     balance_long = max(starting_balance * 1e-6, balance_long + fee_paid)
                     equity_long = balance_long + calc_pnl_long(
-                        pprice_long, closes[k], psize_long, inverse, c_mult
+                        pprice_long, close, psize_long, inverse, c_mult
                     )
-                    fills_long.append(
-                        (
-                            k,
-                            timestamps[k],
-                            0.0,
-                            fee_paid,
-                            balance_long,
-                            equity_long,
-                            entry_long[0],
-                            entry_long[1],
-                            psize_long,
-                            pprice_long,
-                            entry_long[2],
-                        )
+                    fills_long, n_fills_long = append_fill(
+                        fills_long,
+                        n_fills_long,
+                        k,
+                        timestamp,
+                        0.0,
+                        fee_paid,
+                        balance_long,
+                        equity_long,
+                        entry_long[0],
+                        entry_long[1],
+                        psize_long,
+                        pprice_long,
+                        entry_long[2],
                     )
                     bkr_price_long = calc_bankruptcy_price(
                         balance_long,
@@ -600,7 +876,7 @@ def backtest_recursive_grid(
                         balance_long,
                         psize_long,
                         pprice_long,
-                        closes[k - 1],
+                        prev_close,
                         min(emas_long),
                         inverse,
                         qty_step,
@@ -623,13 +899,13 @@ def backtest_recursive_grid(
                     psize_long > 0.0
                     and closes_long
                     and closes_long[0][0] < 0.0
-                    and highs[k] > closes_long[0][1]
+                    and high > closes_long[0][1]
                 ):
                     next_entry_update_ts_long = min(
-                        next_entry_update_ts_long, timestamps[k] + latency_simulation_ms
+                        next_entry_update_ts_long, timestamp + latency_simulation_ms
                     )
                     next_close_grid_update_ts_long = min(
-                        next_close_grid_update_ts_long, timestamps[k] + latency_simulation_ms
+                        next_close_grid_update_ts_long, timestamp + latency_simulation_ms
                     )
                     close_qty_long = closes_long[0][0]
                     new_psize_long = round_(psize_long + close_qty_long, qty_step)
@@ -649,22 +925,22 @@ def backtest_recursive_grid(
                     )
                     balance_long = max(starting_balance * 1e-6, balance_long + fee_paid + pnl)
                     equity_long = balance_long + calc_pnl_long(
-                        pprice_long, closes[k], psize_long, inverse, c_mult
+                        pprice_long, close, psize_long, inverse, c_mult
                     )
-                    fills_long.append(
-                        (
-                            k,
-                            timestamps[k],
-                            pnl,
-                            fee_paid,
-                            balance_long,
-                            equity_long,
-                            close_qty_long,
-                            closes_long[0][1],
-                            psize_long,
-                            pprice_long,
-                            closes_long[0][2],
-                        )
+                    fills_long, n_fills_long = append_fill(
+                        fills_long,
+                        n_fills_long,
+                        k,
+                        timestamp,
+                        pnl,
+                        fee_paid,
+                        balance_long,
+                        equity_long,
+                        close_qty_long,
+                        closes_long[0][1],
+                        psize_long,
+                        pprice_long,
+                        closes_long[0][2],
                     )
                     closes_long = closes_long[1:]
                     bkr_price_long = calc_bankruptcy_price(
@@ -684,31 +960,31 @@ def backtest_recursive_grid(
                     # update entry order
                     next_entry_update_ts_long = min(
                         next_entry_update_ts_long,
-                        timestamps[k] + latency_simulation_ms,
+                        timestamp + latency_simulation_ms,
                     )
                 else:
-                    if closes[k] > pprice_long:
+                    if close > pprice_long:
                         # update closes after 2.5 secs
                         next_close_grid_update_ts_long = min(
                             next_close_grid_update_ts_long,
-                            timestamps[k] + latency_simulation_ms + 2500,
+                            timestamp + latency_simulation_ms + 2500,
                         )
                     elif long_wallet_exposure >= long_wallet_exposure_auto_unstuck_threshold:
                         # update both entry and closes after 15 secs
                         next_close_grid_update_ts_long = min(
                             next_close_grid_update_ts_long,
-                            timestamps[k] + latency_simulation_ms + 15000,
+                            timestamp + latency_simulation_ms + 15000,
                         )
                         next_entry_update_ts_long = min(
                             next_entry_update_ts_long,
-                            timestamps[k] + latency_simulation_ms + 15000,
+                            timestamp + latency_simulation_ms + 15000,
                         )
 
         if do_short:
-            emas_short = calc_ema(alphas_short, alphas__short, emas_short, closes[k - 1])
+            emas_short = calc_ema(alphas_short, alphas__short, emas_short, prev_close)
             if k >= max_span_short:
                 # check bankruptcy
-                bkr_diff_short = calc_diff(bkr_price_short, closes[k])
+                bkr_diff_short = calc_diff(bkr_price_short, close)
                 closest_bkr_short = min(closest_bkr_short, bkr_diff_short)
 
                 if closest_bkr_short < 0.06:
@@ -717,36 +993,37 @@ def backtest_recursive_grid(
                         fee_paid = (
                             -qty_to_cost(psize_short, pprice_short, inverse, c_mult) * maker_fee
                         )
-                        pnl = calc_pnl_short(pprice_short, closes[k], -psize_short, inverse, c_mult)
+                        pnl = calc_pnl_short(pprice_short, close, -psize_short, inverse, c_mult)
                         balance_short = starting_balance * 1e-6
                         equity_short = 0.0
                         psize_short, pprice_short = 0.0, 0.0
-                        fills_short.append(
-                            (
-                                k,
-                                timestamps[k],
-                                pnl,
-                                fee_paid,
-                                balance_short,
-                                equity_short,
-                                -psize_short,
-                                closes[k],
-                                0.0,
-                                0.0,
-                                "short_bankruptcy",
-                            )
+                        fills_short, n_fills_short = append_fill(
+                            fills_short,
+                            n_fills_short,
+                            k,
+                            timestamp,
+                            pnl,
+                            fee_paid,
+                            balance_short,
+                            equity_short,
+                            -psize_short,
+                            close,
+                            0.0,
+                            0.0,
+                            "short_bankruptcy",
                         )
                     do_short = False
                     if not do_long:
-                        return fills_long, fills_short, stats
+                        done, k_next = True, k + 1
+                        break
 
                 # check if entry order should be updated
-                if timestamps[k] >= next_entry_update_ts_short:
+                if timestamp >= next_entry_update_ts_short:
                     entry_short = calc_recursive_entry_short(
                         balance_short,
                         psize_short,
                         pprice_short,
-                        closes[k - 1],
+                        prev_close,
                         max(emas_short),
                         inverse,
                         qty_step,
@@ -763,15 +1040,15 @@ def backtest_recursive_grid(
                         auto_unstuck_ema_dist[1],
                         auto_unstuck_wallet_exposure_threshold[1],
                     )
-                    next_entry_update_ts_short = timestamps[k] + 1000 * 60 * 5  # five mins delay
+                    next_entry_update_ts_short = timestamp + 1000 * 60 * 5  # five mins delay
                 # check if close grid should be updated
-                if timestamps[k] >= next_close_grid_update_ts_short:
+                if timestamp >= next_close_grid_update_ts_short:
                     closes_short = calc_close_grid_short(
                         backwards_tp[1],
                         balance_short,
                         psize_short,
                         pprice_short,
-                        closes[k - 1],
+                        prev_close,
                         min(emas_short),
                         inverse,
                         qty_step,
@@ -786,15 +1063,15 @@ def backtest_recursive_grid(
                         auto_unstuck_wallet_exposure_threshold[1],
                         auto_unstuck_ema_dist[1],
                     )
-                    next_close_grid_update_ts_short = timestamps[k] + 1000 * 60 * 5  # five mins delay
+                    next_close_grid_update_ts_short = timestamp + 1000 * 60 * 5  # five mins delay
 
                 # check if short entry filled
-                while entry_short[0] != 0.0 and highs[k] > entry_short[1]:
+                while entry_short[0] != 0.0 and high > entry_short[1]:
                     next_entry_update_ts_short = min(
-                        next_entry_update_ts_short, timestamps[k] + latency_simulation_ms
+                        next_entry_update_ts_short, timestamp + latency_simulation_ms
                     )
                     next_close_grid_update_ts_short = min(
-                        next_close_grid_update_ts_short, timestamps[k] + latency_simulation_ms
+                        next_close_grid_update_ts_short, timestamp + latency_simulation_ms
                     )
                     psize_short, pprice_short = calc_new_psize_pprice(
                         psize_short,
@@ -808,22 +1085,22 @@ def backtest_recursive_grid(
                     )
                     balance_short = max(starting_balance * 1e-6, balance_short + fee_paid)
                     equity_short = balance_short + calc_pnl_short(
-                        pprice_short, closes[k], psize_short, inverse, c_mult
+                        pprice_short, close, psize_short, inverse, c_mult
                     )
-                    fills_short.append(
-                        (
-                            k,
-                            timestamps[k],
-                            0.0,
-                            fee_paid,
-                            balance_short,
-                            equity_short,
-                            entry_short[0],
-                            entry_short[1],
-                            psize_short,
-                            pprice_short,
-                            entry_short[2],
-                        )
+                    fills_short, n_fills_short = append_fill(
+                        fills_short,
+                        n_fills_short,
+                        k,
+                        timestamp,
+                        0.0,
+                        fee_paid,
+                        balance_short,
+                        equity_short,
+                        entry_short[0],
+                        entry_short[1],
+                        psize_short,
+                        pprice_short,
+                        entry_short[2],
                     )
                     bkr_price_short = calc_bankruptcy_price(
                         balance_short,
@@ -841,7 +1118,7 @@ def backtest_recursive_grid(
                         balance_short,
                         psize_short,
                         pprice_short,
-                        closes[k - 1],
+                        prev_close,
                         max(emas_short),
                         inverse,
                         qty_step,
@@ -863,13 +1140,13 @@ def backtest_recursive_grid(
                     psize_short < 0.0
                     and closes_short
                     and closes_short[0][0] > 0.0
-                    and lows[k] < closes_short[0][1]
+                    and low < closes_short[0][1]
                 ):
                     next_entry_update_ts_short = min(
-                        next_entry_update_ts_short, timestamps[k] + latency_simulation_ms
+                        next_entry_update_ts_short, timestamp + latency_simulation_ms
                     )
                     next_close_grid_update_ts_short = min(
-                        next_close_grid_update_ts_short, timestamps[k] + latency_simulation_ms
+                        next_close_grid_update_ts_short, timestamp + latency_simulation_ms
                     )
                     close_qty_short = closes_short[0][0]
                     new_psize_short = round_(psize_short + close_qty_short, qty_step)
@@ -889,22 +1166,22 @@ def backtest_recursive_grid(
                     )
                     balance_short = max(starting_balance * 1e-6, balance_short + fee_paid + pnl)
                     equity_short = balance_short + calc_pnl_short(
-                        pprice_short, closes[k], psize_short, inverse, c_mult
+                        pprice_short, close, psize_short, inverse, c_mult
                     )
-                    fills_short.append(
-                        (
-                            k,
-                            timestamps[k],
-                            pnl,
-                            fee_paid,
-                            balance_short,
-                            equity_short,
-                            close_qty_short,
-                            closes_short[0][1],
-                            psize_short,
-                            pprice_short,
-                            closes_short[0][2],
-                        )
+                    fills_short, n_fills_short = append_fill(
+                        fills_short,
+                        n_fills_short,
+                        k,
+                        timestamp,
+                        pnl,
+                        fee_paid,
+                        balance_short,
+                        equity_short,
+                        close_qty_short,
+                        closes_short[0][1],
+                        psize_short,
+                        pprice_short,
+                        closes_short[0][2],
                     )
                     closes_short = closes_short[1:]
                     bkr_price_short = calc_bankruptcy_price(
@@ -924,52 +1201,459 @@ def backtest_recursive_grid(
                     # update entry order now
                     next_entry_update_ts_short = min(
                         next_entry_update_ts_short,
-                        timestamps[k] + latency_simulation_ms,
+                        timestamp + latency_simulation_ms,
                     )
                 else:
-                    if closes[k] > pprice_short:
+                    if close > pprice_short:
                         # update closes after 2.5 secs
                         next_close_grid_update_ts_short = min(
                             next_close_grid_update_ts_short,
-                            timestamps[k] + latency_simulation_ms + 2500,
+                            timestamp + latency_simulation_ms + 2500,
                         )
                     elif short_wallet_exposure >= short_wallet_exposure_auto_unstuck_threshold:
                         # update both entry and closes after 15 secs
                         next_close_grid_update_ts_short = min(
                             next_close_grid_update_ts_short,
-                            timestamps[k] + latency_simulation_ms + 15000,
+                            timestamp + latency_simulation_ms + 15000,
                         )
                         next_entry_update_ts_short = min(
                             next_entry_update_ts_short,
-                            timestamps[k] + latency_simulation_ms + 15000,
+                            timestamp + latency_simulation_ms + 15000,
                         )
 
         # process stats
-        if timestamps[k] >= next_stats_update:
+        if timestamp >= next_stats_update:
             equity_long = balance_long + calc_pnl_long(
-                pprice_long, closes[k], psize_long, inverse, c_mult
+                pprice_long, close, psize_long, inverse, c_mult
             )
             equity_short = balance_short + calc_pnl_short(
-                pprice_short, closes[k], psize_short, inverse, c_mult
+                pprice_short, close, psize_short, inverse, c_mult
             )
-            stats.append(
-                (
-                    timestamps[k],
-                    bkr_price_long,
-                    bkr_price_short,
-                    psize_long,
-                    pprice_long,
-                    psize_short,
-                    pprice_short,
-                    closes[k],
-                    closest_bkr_long,
-                    closest_bkr_short,
-                    balance_long,
-                    balance_short,
-                    equity_long,
-                    equity_short,
-                )
+            stats, n_stats = append_stats(
+                stats,
+                n_stats,
+                timestamp,
+                bkr_price_long,
+                bkr_price_short,
+                psize_long,
+                pprice_long,
+                psize_short,
+                pprice_short,
+                close,
+                closest_bkr_long,
+                closest_bkr_short,
+                balance_long,
+                balance_short,
+                equity_long,
+                equity_short,
             )
-            next_stats_update = timestamps[k] + 60 * 1000
+            next_stats_update = timestamp + 60 * 1000
+
+    state[ST_DO_LONG], state[ST_DO_SHORT] = do_long, do_short
+    state[ST_BALANCE_LONG], state[ST_BALANCE_SHORT] = balance_long, balance_short
+    state[ST_EQUITY_LONG], state[ST_EQUITY_SHORT] = equity_long, equity_short
+    state[ST_PSIZE_LONG], state[ST_PPRICE_LONG] = psize_long, pprice_long
+    state[ST_PSIZE_SHORT], state[ST_PPRICE_SHORT] = psize_short, pprice_short
+    state[ST_BKR_PRICE_LONG], state[ST_BKR_PRICE_SHORT] = bkr_price_long, bkr_price_short
+    state[ST_CLOSEST_BKR_LONG], state[ST_CLOSEST_BKR_SHORT] = closest_bkr_long, closest_bkr_short
+    state[ST_WALLET_EXPOSURE_LONG] = long_wallet_exposure
+    state[ST_WALLET_EXPOSURE_SHORT] = short_wallet_exposure
+    state[ST_NEXT_ENTRY_UPDATE_TS_LONG] = next_entry_update_ts_long
+    state[ST_NEXT_ENTRY_UPDATE_TS_SHORT] = next_entry_update_ts_short
+    state[ST_NEXT_CLOSE_UPDATE_TS_LONG] = next_close_grid_update_ts_long
+    state[ST_NEXT_CLOSE_UPDATE_TS_SHORT] = next_close_grid_update_ts_short
+    state[ST_NEXT_STATS_UPDATE] = next_stats_update
+    state[ST_EMAS_LONG : ST_EMAS_LONG + 3] = emas_long
+    state[ST_EMAS_SHORT : ST_EMAS_SHORT + 3] = emas_short
+    state[ST_DONE] = done
+    state[ST_N_FILLS_LONG] = n_fills_long
+    state[ST_N_FILLS_SHORT] = n_fills_short
+    state[ST_N_STATS] = n_stats
+    state[ST_K] = k_next
+    return entry_long, closes_long, entry_short, closes_short, fills_long, fills_short, stats
+
+
+@njit
+def backtest_recursive_grid_packed(
+    ticks,
+    params,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    state_out=None,
+):
+    # same as backtest_recursive_grid(), with config parameters packed by pack_recursive_grid_params()
+    # state_out: optional N_STATE array, set to the final backtest state
+    block_highs, block_lows = calc_ticks_extrema_index(ticks)
+    state = init_backtest_state(ticks, starting_balance, params)
+    fills_long, fills_short, stats = init_backtest_buffers(ticks)
+    _, _, _, _, fills_long, fills_short, stats = backtest_recursive_grid_range(
+        ticks,
+        block_highs,
+        block_lows,
+        1,
+        n_ticks(ticks),
+        state,
+        params,
+        (0.0, 0.0, ""),
+        empty_orders(),
+        (0.0, 0.0, ""),
+        empty_orders(),
+        fills_long,
+        fills_short,
+        stats,
+        starting_balance,
+        latency_simulation_ms,
+        maker_fee,
+        inverse,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+    )
+    if state_out is not None:
+        state_out[:] = state
+    return trim_backtest_buffers(fills_long, fills_short, stats, state)
 
-    return fills_long, fills_short, stats
+
+@njit
+def backtest_recursive_grid(
+    ticks,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    do_long,
+    do_short,
+    backwards_tp,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    ema_span_0,
+    ema_span_1,
+    initial_qty_pct,
+    initial_eprice_ema_dist,
+    wallet_exposure_limit,
+    ddown_factor,
+    rentry_pprice_dist,
+    rentry_pprice_dist_wallet_exposure_weighting,
+    min_markup,
+    markup_range,
+    n_close_orders,
+    auto_unstuck_wallet_exposure_threshold,
+    auto_unstuck_ema_dist,
+    state_out=None,
+):
+    # ticks: ticks view, see unpack_ticks()
+    # state_out: optional N_STATE array, set to the final backtest state
+    params = pack_recursive_grid_params(
+        inverse,
+        do_long,
+        do_short,
+        backwards_tp,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+        ema_span_0,
+        ema_span_1,
+        initial_qty_pct,
+        initial_eprice_ema_dist,
+        wallet_exposure_limit,
+        ddown_factor,
+        rentry_pprice_dist,
+        rentry_pprice_dist_wallet_exposure_weighting,
+        min_markup,
+        markup_range,
+        n_close_orders,
+        auto_unstuck_wallet_exposure_threshold,
+        auto_unstuck_ema_dist,
+    )
+    return backtest_recursive_grid_packed(
+        ticks,
+        params,
+        starting_balance,
+        latency_simulation_ms,
+        maker_fee,
+        inverse,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+        state_out,
+    )
+
+
+@njit
+def backtest_recursive_grid_resume(
+    ticks,
+    params,
+    state,
+    entry_long,
+    closes_long,
+    entry_short,
+    closes_short,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+):
+    # runs ticks [state[ST_K], n_ticks(ticks)) from an explicit state, e.g. one saved by an earlier run
+    # open orders are given and returned as orders_to_array() arrays, entries as single rows
+    # state is updated in place; fills and stats counts restart at zero
+    # returns (fills_long, fills_short, stats, entry_long, closes_long, entry_short, closes_short)
+    # without the final stats row, so results of consecutive runs can be concatenated
+    block_highs, block_lows = calc_ticks_extrema_index(ticks)
+    state[ST_N_FILLS_LONG] = state[ST_N_FILLS_SHORT] = state[ST_N_STATS] = 0.0
+    fills_long, fills_short, stats = init_backtest_buffers(ticks)
+    (
+        entry_long_,
+        closes_long_,
+        entry_short_,
+        closes_short_,
+        fills_long,
+        fills_short,
+        stats,
+    ) = backtest_recursive_grid_range(
+        ticks,
+        block_highs,
+        block_lows,
+        int(state[ST_K]),
+        n_ticks(ticks),
+        state,
+        params,
+        array_to_orders(entry_long)[0],
+        array_to_orders(closes_long),
+        array_to_orders(entry_short)[0],
+        array_to_orders(closes_short),
+        fills_long,
+        fills_short,
+        stats,
+        starting_balance,
+        latency_simulation_ms,
+        maker_fee,
+        inverse,
+        qty_step,
+        price_step,
+        min_qty,
+        min_cost,
+        c_mult,
+    )
+    fills_long, fills_short, stats = trim_backtest_buffers(fills_long, fills_short, stats, state)
+    return (
+        fills_long,
+        fills_short,
+        stats,
+        orders_to_array([entry_long_]),
+        orders_to_array(closes_long_),
+        orders_to_array([entry_short_]),
+        orders_to_array(closes_short_),
+    )
+
+
+@njit(parallel=True)
+def backtest_recursive_grid_symbols(
+    ticks_list, params, market_settings, starting_balance, latency_simulation_ms
+):
+    # backtests one config on many symbols in parallel threads, one symbol per thread at a time
+    # ticks_list: numba.typed.List of ticks views, one per symbol, may differ in length
+    # params shape (2, N_RECURSIVE_GRID_PARAMS), see pack_recursive_grid_params()
+    # market_settings shape (n_symbols, N_MARKET_SETTINGS), see MS_* indices
+    # returns analysis metrics shape (n_symbols, N_ANALYSIS_METRICS), see calc_analysis_metrics()
+    metrics = np.zeros((len(ticks_list), N_ANALYSIS_METRICS))
+    for i in prange(len(ticks_list)):
+        inverse = market_settings[i, MS_INVERSE] != 0.0
+        fills_long, fills_short, stats = backtest_recursive_grid_packed(
+            ticks_list[np.int64(i)],
+            params,
+            starting_balance,
+            latency_simulation_ms,
+            market_settings[i, MS_MAKER_FEE],
+            inverse,
+            market_settings[i, MS_QTY_STEP],
+            market_settings[i, MS_PRICE_STEP],
+            market_settings[i, MS_MIN_QTY],
+            market_settings[i, MS_MIN_COST],
+            market_settings[i, MS_C_MULT],
+        )
+        metrics[i] = calc_analysis_metrics(
+            fills_long, fills_short, stats, inverse, market_settings[i, MS_C_MULT]
+        )
+    return metrics
+
+
+@njit
+def backtest_recursive_grid_batch(
+    ticks,
+    params,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    block_size=16384,
+):
+    # params shape (n_configs, 2, N_RECURSIVE_GRID_PARAMS), see pack_recursive_grid_params()
+    # ticks are walked once in blocks; every config is advanced through a block before the next
+    # block is touched, so tick data is streamed from memory once per batch instead of per config
+    # returns ([fills_long], [fills_short], [stats]), one item per config
+    block_highs, block_lows = calc_ticks_extrema_index(ticks)
+    n_configs = len(params)
+    states = np.zeros((n_configs, N_STATE))
+    for i in range(n_configs):
+        states[i] = init_backtest_state(ticks, starting_balance, params[i])
+    entry_longs = [(0.0, 0.0, "") for _ in range(n_configs)]
+    closes_longs = [empty_orders() for _ in range(n_configs)]
+    entry_shorts = [(0.0, 0.0, "") for _ in range(n_configs)]
+    closes_shorts = [empty_orders() for _ in range(n_configs)]
+    buffers = [init_backtest_buffers(ticks) for _ in range(n_configs)]
+    fills_longs = [buffer[0] for buffer in buffers]
+    fills_shorts = [buffer[1] for buffer in buffers]
+    statss = [buffer[2] for buffer in buffers]
+    for k_start in range(1, n_ticks(ticks), block_size):
+        k_end = min(k_start + block_size, n_ticks(ticks))
+        for i in range(n_configs):
+            if states[i, ST_DONE]:
+                continue
+            (
+                entry_longs[i],
+                closes_longs[i],
+                entry_shorts[i],
+                closes_shorts[i],
+                fills_longs[i],
+                fills_shorts[i],
+                statss[i],
+            ) = backtest_recursive_grid_range(
+                ticks,
+                block_highs,
+                block_lows,
+                k_start,
+                k_end,
+                states[i],
+                params[i],
+                entry_longs[i],
+                closes_longs[i],
+                entry_shorts[i],
+                closes_shorts[i],
+                fills_longs[i],
+                fills_shorts[i],
+                statss[i],
+                starting_balance,
+                latency_simulation_ms,
+                maker_fee,
+                inverse,
+                qty_step,
+                price_step,
+                min_qty,
+                min_cost,
+                c_mult,
+            )
+    for i in range(n_configs):
+        fills_longs[i], fills_shorts[i], statss[i] = trim_backtest_buffers(
+            fills_longs[i], fills_shorts[i], statss[i], states[i]
+        )
+    return fills_longs, fills_shorts, statss
+
+
+@njit
+def backtest_recursive_grid_windows(
+    ticks,
+    windows,
+    params,
+    starting_balance,
+    latency_simulation_ms,
+    maker_fee,
+    inverse,
+    qty_step,
+    price_step,
+    min_qty,
+    min_cost,
+    c_mult,
+    block_size=16384,
+):
+    # windows shape (n_windows, 2), [start, end) tick indices; windows may overlap
+    # each window is backtested from scratch as if its ticks were the whole data, starting at its
+    # first tick.  ticks are walked once in blocks; every window covering a block is advanced
+    # through it before the next block is touched
+    # params shape (2, N_RECURSIVE_GRID_PARAMS), see pack_recursive_grid_params()
+    # returns ([fills_long], [fills_short], [stats]), one item per window
+    n_windows = len(windows)
+    tickss = [slice_ticks(ticks, windows[i, 0], windows[i, 1]) for i in range(n_windows)]
+    indices = [calc_ticks_extrema_index(tickss[i]) for i in range(n_windows)]
+    states = np.zeros((n_windows, N_STATE))
+    for i in range(n_windows):
+        states[i] = init_backtest_state(tickss[i], starting_balance, params)
+    entry_longs = [(0.0, 0.0, "") for _ in range(n_windows)]
+    closes_longs = [empty_orders() for _ in range(n_windows)]
+    entry_shorts = [(0.0, 0.0, "") for _ in range(n_windows)]
+    closes_shorts = [empty_orders() for _ in range(n_windows)]
+    buffers = [init_backtest_buffers(tickss[i]) for i in range(n_windows)]
+    fills_longs = [buffer[0] for buffer in buffers]
+    fills_shorts = [buffer[1] for buffer in buffers]
+    statss = [buffer[2] for buffer in buffers]
+    for k_start in range(windows[:, 0].min() + 1, windows[:, 1].max(), block_size):
+        k_end = min(k_start + block_size, windows[:, 1].max())
+        for i in range(n_windows):
+            # block bounds in window's own tick indices; window's first tick only seeds its state
+            w_start = max(k_start, windows[i, 0] + 1) - windows[i, 0]
+            w_end = min(k_end, windows[i, 1]) - windows[i, 0]
+            if w_start >= w_end or states[i, ST_DONE]:
+                continue
+            (
+                entry_longs[i],
+                closes_longs[i],
+                entry_shorts[i],
+                closes_shorts[i],
+                fills_longs[i],
+                fills_shorts[i],
+                statss[i],
+            ) = backtest_recursive_grid_range(
+                tickss[i],
+                indices[i][0],
+                indices[i][1],
+                w_start,
+                w_end,
+                states[i],
+                params,
+                entry_longs[i],
+                closes_longs[i],
+                entry_shorts[i],
+                closes_shorts[i],
+                fills_longs[i],
+                fills_shorts[i],
+                statss[i],
+                starting_balance,
+                latency_simulation_ms,
+                maker_fee,
+                inverse,
+                qty_step,
+                price_step,
+                min_qty,
+                min_cost,
+                c_mult,
+            )
+    for i in range(n_windows):
+        fills_longs[i], fills_shorts[i], statss[i] = trim_backtest_buffers(
+            fills_longs[i], fills_shorts[i], statss[i], states[i]
+        )
+    return fills_longs, fills_shorts, statss
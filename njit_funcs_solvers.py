@@ -0,0 +1,95 @@
+import numpy as np
+
+from njit_funcs_jit import njit
+
+
+# root finding for the qtys bringing wallet exposure to a target
+# after closing or adding qty, wallet exposure is a linear fractional function of qty, except
+# for entries on inverse contracts, where it is quadratic; both have closed form solutions
+# functions without closed form are solved with a bracketed secant (illinois) method, run by the
+# caller: the bracket is an array updated in place, so no lists, sorting or closures are needed
+
+
+@njit
+def solve_linear_fractional(c0, c1, d0, d1, target) -> float:
+    # returns x such that (c0 + c1 * x) / (d0 + d1 * x) == target, or nan if there is none
+    denominator = c1 - target * d1
+    if denominator == 0.0:
+        return np.nan
+    return (target * d0 - c0) / denominator
+
+
+@njit
+def solve_quadratic_positive_root(a, b, c) -> float:
+    # returns largest root of a * x**2 + b * x + c, or nan if there is none
+    # caller ensures a > 0 and c < 0, so there is exactly one positive root
+    discriminant = b * b - 4.0 * a * c
+    if discriminant < 0.0 or a == 0.0:
+        return np.nan
+    sqrt_discriminant = np.sqrt(discriminant)
+    if b > 0.0:
+        # avoids cancellation in -b + sqrt_discriminant
+        return (2.0 * c) / (-b - sqrt_discriminant)
+    return (-b + sqrt_discriminant) / (2.0 * a)
+
+
+# bracket layout
+BR_X_LO = 0
+BR_RES_LO = 1
+BR_X_HI = 2
+BR_RES_HI = 3
+BR_LAST_SIDE = 4
+BR_X_BEST = 5
+BR_ABS_RES_BEST = 6
+BR_N_EVALS = 7
+N_BRACKET = 8
+
+
+@njit
+def init_bracket(x_lo, res_lo, x_hi, res_hi):
+    # res is residual val - target at x; root is bracketed if residuals differ in sign
+    bracket = np.zeros(N_BRACKET)
+    bracket[BR_X_LO], bracket[BR_RES_LO] = x_lo, res_lo
+    bracket[BR_X_HI], bracket[BR_RES_HI] = x_hi, res_hi
+    if abs(res_lo) <= abs(res_hi):
+        bracket[BR_X_BEST], bracket[BR_ABS_RES_BEST] = x_lo, abs(res_lo)
+    else:
+        bracket[BR_X_BEST], bracket[BR_ABS_RES_BEST] = x_hi, abs(res_hi)
+    bracket[BR_N_EVALS] = 2.0
+    return bracket
+
+
+@njit
+def bracket_next_guess(bracket) -> float:
+    x_lo, res_lo = bracket[BR_X_LO], bracket[BR_RES_LO]
+    x_hi, res_hi = bracket[BR_X_HI], bracket[BR_RES_HI]
+    if res_lo == res_hi:
+        return (x_lo + x_hi) / 2
+    guess = x_hi - res_hi * (x_hi - x_lo) / (res_hi - res_lo)
+    if not (min(x_lo, x_hi) < guess < max(x_lo, x_hi)):
+        return (x_lo + x_hi) / 2
+    return guess
+
+
+@njit
+def update_bracket(bracket, x, res):
+    # replaces the bracket end whose residual has the same sign as res; if the same end is replaced
+    # twice in a row, the other end's residual is halved, which keeps the secant from stalling
+    bracket[BR_N_EVALS] += 1.0
+    if abs(res) < bracket[BR_ABS_RES_BEST]:
+        bracket[BR_X_BEST], bracket[BR_ABS_RES_BEST] = x, abs(res)
+    if (res < 0.0) == (bracket[BR_RES_HI] < 0.0):
+        bracket[BR_X_HI], bracket[BR_RES_HI] = x, res
+        if bracket[BR_LAST_SIDE] == 1.0:
+            bracket[BR_RES_LO] *= 0.5
+        bracket[BR_LAST_SIDE] = 1.0
+    else:
+        bracket[BR_X_LO], bracket[BR_RES_LO] = x, res
+        if bracket[BR_LAST_SIDE] == -1.0:
+            bracket[BR_RES_HI] *= 0.5
+        bracket[BR_LAST_SIDE] = -1.0
+
+
+@njit
+def bracket_width(bracket) -> float:
+    return abs(bracket[BR_X_HI] - bracket[BR_X_LO])
@@ -27,25 +27,30 @@ from pure_funcs import (
     config_pretty_str,
 )
 from njit_funcs import (
+    clear_stale_numba_cache,
     qty_to_cost,
     calc_diff,
     round_,
-    calc_close_grid_long,
-    calc_close_grid_short,
+    calc_close_grid_long_packed,
+    calc_close_grid_short_packed,
     calc_upnl,
-    calc_entry_grid_long,
-    calc_entry_grid_short,
+    calc_entry_grid_long_packed,
+    calc_entry_grid_short_packed,
     calc_samples,
     calc_emas_last,
     calc_ema,
+    pack_market_settings,
+    pack_static_grid_params,
 )
 from njit_funcs_neat_grid import (
-    calc_neat_grid_long,
-    calc_neat_grid_short,
+    calc_neat_grid_long_packed,
+    calc_neat_grid_short_packed,
+    pack_neat_grid_params,
 )
 from njit_funcs_recursive_grid import (
-    calc_recursive_entries_long,
-    calc_recursive_entries_short,
+    calc_recursive_entries_long_packed,
+    calc_recursive_entries_short_packed,
+    pack_recursive_grid_params,
 )
 from typing import Union, Dict, List
 
@@ -148,6 +153,9 @@ class Bot:
             setattr(self, key, config[key])
             if key in self.xk:
                 self.xk[key] = config[key]
+        # config params and market settings packed for the grid functions; repacked on next calc_orders
+        self.params = None
+        self.market = None
 
     def set_config_value(self, key, value):
         self.config[key] = value
@@ -155,6 +163,7 @@ class Bot:
 
     async def _init(self):
         self.xk = create_xk(self.config)
+        self.params = None
         await self.init_fills()
 
     def dump_log(self, data) -> None:
@@ -410,6 +419,19 @@ class Bot:
     def resume(self) -> None:
         self.process_websocket_ticks = True
 
+    def pack_params(self):
+        # packs config params and market settings, see pack_*_grid_params() and pack_market_settings()
+        if self.passivbot_mode == "recursive_grid":
+            self.params = pack_recursive_grid_params(**self.xk)
+        elif self.passivbot_mode == "neat_grid":
+            self.params = pack_neat_grid_params(**self.xk)
+        elif self.passivbot_mode == "static_grid":
+            self.params = pack_static_grid_params(**self.xk)
+        else:
+            raise Exception(f"unknown passivbot mode {self.passivbot_mode}")
+        market_keys = ["inverse", "qty_step", "price_step", "min_qty", "min_cost", "c_mult"]
+        self.market = pack_market_settings(*[self.xk[k] for k in market_keys])
+
     def calc_orders(self):
         balance = self.position["wallet_balance"]
         psize_long = self.position["long"]["size"]
@@ -426,6 +448,8 @@ class Bot:
             do_short = (no_pos and self.do_short) or psize_short != 0.0
         self.xk["do_long"] = do_long
         self.xk["do_short"] = do_short
+        if self.params is None:
+            self.pack_params()
 
         orders = []
 
@@ -445,76 +469,36 @@ class Bot:
         else:
             if do_long:
                 if self.passivbot_mode == "recursive_grid":
-                    entries_long = calc_recursive_entries_long(
+                    entries_long = calc_recursive_entries_long_packed(
                         balance,
                         psize_long,
                         pprice_long,
                         self.ob[0],
                         min(self.emas_long),
-                        self.xk["inverse"],
-                        self.xk["qty_step"],
-                        self.xk["price_step"],
-                        self.xk["min_qty"],
-                        self.xk["min_cost"],
-                        self.xk["c_mult"],
-                        self.xk["initial_qty_pct"][0],
-                        self.xk["initial_eprice_ema_dist"][0],
-                        self.xk["ddown_factor"][0],
-                        self.xk["rentry_pprice_dist"][0],
-                        self.xk["rentry_pprice_dist_wallet_exposure_weighting"][0],
-                        self.xk["wallet_exposure_limit"][0],
-                        self.xk["auto_unstuck_ema_dist"][0],
-                        self.xk["auto_unstuck_wallet_exposure_threshold"][0],
+                        self.market,
+                        self.params,
                     )
                 elif self.passivbot_mode == "static_grid":
-                    entries_long = calc_entry_grid_long(
+                    entries_long = calc_entry_grid_long_packed(
                         balance,
                         psize_long,
                         pprice_long,
                         self.ob[0],
                         min(self.emas_long),
-                        self.xk["inverse"],
-                        self.xk["do_long"],
-                        self.xk["qty_step"],
-                        self.xk["price_step"],
-                        self.xk["min_qty"],
-                        self.xk["min_cost"],
-                        self.xk["c_mult"],
-                        self.xk["grid_span"][0],
-                        self.xk["wallet_exposure_limit"][0],
-                        self.xk["max_n_entry_orders"][0],
-                        self.xk["initial_qty_pct"][0],
-                        self.xk["initial_eprice_ema_dist"][0],
-                        self.xk["eprice_pprice_diff"][0],
-                        self.xk["secondary_allocation"][0],
-                        self.xk["secondary_pprice_diff"][0],
-                        self.xk["eprice_exp_base"][0],
-                        self.xk["auto_unstuck_wallet_exposure_threshold"][0],
-                        self.xk["auto_unstuck_ema_dist"][0],
+                        do_long,
+                        self.market,
+                        self.params,
                     )
                 elif self.passivbot_mode == "neat_grid":
-                    entries_long = calc_neat_grid_long(
+                    entries_long = calc_neat_grid_long_packed(
                         balance,
                         psize_long,
                         pprice_long,
                         self.ob[0],
                         min(self.emas_long),
-                        self.xk["inverse"],
-                        self.xk["do_long"],
-                        self.xk["qty_step"],
-                        self.xk["price_step"],
-                        self.xk["min_qty"],
-                        self.xk["min_cost"],
-                        self.xk["c_mult"],
-                        self.xk["grid_span"][0],
-                        self.xk["wallet_exposure_limit"][0],
-                        self.xk["max_n_entry_orders"][0],
-                        self.xk["initial_qty_pct"][0],
-                        self.xk["initial_eprice_ema_dist"][0],
-                        self.xk["eqty_exp_base"][0],
-                        self.xk["eprice_exp_base"][0],
-                        self.xk["auto_unstuck_wallet_exposure_threshold"][0],
-                        self.xk["auto_unstuck_ema_dist"][0],
+                        do_long,
+                        self.market,
+                        self.params,
                     )
                 else:
                     raise Exception(f"unknown passivbot mode {self.passivbot_mode}")
@@ -532,25 +516,14 @@ class Bot:
                     if o[0] > 0.0
                 ]
             if do_long or self.long_mode == "tp_only":
-                closes_long = calc_close_grid_long(
-                    self.xk["backwards_tp"][0],
+                closes_long = calc_close_grid_long_packed(
                     balance,
                     psize_long,
                     pprice_long,
                     self.ob[1],
                     max(self.emas_long),
-                    self.xk["inverse"],
-                    self.xk["qty_step"],
-                    self.xk["price_step"],
-                    self.xk["min_qty"],
-                    self.xk["min_cost"],
-                    self.xk["c_mult"],
-                    self.xk["wallet_exposure_limit"][0],
-                    self.xk["min_markup"][0],
-                    self.xk["markup_range"][0],
-                    self.xk["n_close_orders"][0],
-                    self.xk["auto_unstuck_wallet_exposure_threshold"][0],
-                    self.xk["auto_unstuck_ema_dist"][0],
+                    self.market,
+                    self.params,
                 )
                 orders += [
                     {
@@ -581,76 +554,36 @@ class Bot:
         else:
             if do_short:
                 if self.passivbot_mode == "recursive_grid":
-                    entries_short = calc_recursive_entries_short(
+                    entries_short = calc_recursive_entries_short_packed(
                         balance,
                         psize_short,
                         pprice_short,
                         self.ob[1],
                         max(self.emas_short),
-                        self.xk["inverse"],
-                        self.xk["qty_step"],
-                        self.xk["price_step"],
-                        self.xk["min_qty"],
-                        self.xk["min_cost"],
-                        self.xk["c_mult"],
-                        self.xk["initial_qty_pct"][1],
-                        self.xk["initial_eprice_ema_dist"][1],
-                        self.xk["ddown_factor"][1],
-                        self.xk["rentry_pprice_dist"][1],
-                        self.xk["rentry_pprice_dist_wallet_exposure_weighting"][1],
-                        self.xk["wallet_exposure_limit"][1],
-                        self.xk["auto_unstuck_ema_dist"][1],
-                        self.xk["auto_unstuck_wallet_exposure_threshold"][1],
+                        self.market,
+                        self.params,
                     )
                 elif self.passivbot_mode == "neat_grid":
-                    entries_short = calc_neat_grid_short(
+                    entries_short = calc_neat_grid_short_packed(
                         balance,
                         psize_short,
                         pprice_short,
                         self.ob[1],
                         max(self.emas_short),
-                        self.xk["inverse"],
-                        self.xk["do_short"],
-                        self.xk["qty_step"],
-                        self.xk["price_step"],
-                        self.xk["min_qty"],
-                        self.xk["min_cost"],
-                        self.xk["c_mult"],
-                        self.xk["grid_span"][1],
-                        self.xk["wallet_exposure_limit"][1],
-                        self.xk["max_n_entry_orders"][1],
-                        self.xk["initial_qty_pct"][1],
-                        self.xk["initial_eprice_ema_dist"][1],
-                        self.xk["eqty_exp_base"][1],
-                        self.xk["eprice_exp_base"][1],
-                        self.xk["auto_unstuck_wallet_exposure_threshold"][1],
-                        self.xk["auto_unstuck_ema_dist"][1],
+                        do_short,
+                        self.market,
+                        self.params,
                     )
                 elif self.passivbot_mode == "static_grid":
-                    entries_short = calc_entry_grid_short(
+                    entries_short = calc_entry_grid_short_packed(
                         balance,
                         psize_short,
                         pprice_short,
                         self.ob[1],
                         max(self.emas_short),
-                        self.xk["inverse"],
-                        self.xk["do_short"],
-                        self.xk["qty_step"],
-                        self.xk["price_step"],
-                        self.xk["min_qty"],
-                        self.xk["min_cost"],
-                        self.xk["c_mult"],
-                        self.xk["grid_span"][1],
-                        self.xk["wallet_exposure_limit"][1],
-                        self.xk["max_n_entry_orders"][1],
-                        self.xk["initial_qty_pct"][1],
-                        self.xk["initial_eprice_ema_dist"][1],
-                        self.xk["eprice_pprice_diff"][1],
-                        self.xk["secondary_allocation"][1],
-                        self.xk["secondary_pprice_diff"][1],
-                        self.xk["eprice_exp_base"][1],
-                        self.xk["auto_unstuck_wallet_exposure_threshold"][1],
-                        self.xk["auto_unstuck_ema_dist"][1],
+                        do_short,
+                        self.market,
+                        self.params,
                     )
                 else:
                     raise Exception(f"unknown passivbot mode {self.passivbot_mode}")
@@ -668,25 +601,14 @@ class Bot:
                     if o[0] < 0.0
                 ]
             if do_short or self.short_mode == "tp_only":
-                closes_short = calc_close_grid_short(
-                    self.xk["backwards_tp"][1],
+                closes_short = calc_close_grid_short_packed(
                     balance,
                     psize_short,
                     pprice_short,
                     self.ob[0],
                     min(self.emas_short),
-                    self.xk["inverse"],
-                    self.xk["qty_step"],
-                    self.xk["price_step"],
-                    self.xk["min_qty"],
-                    self.xk["min_cost"],
-                    self.xk["c_mult"],
-                    self.xk["wallet_exposure_limit"][1],
-                    self.xk["min_markup"][1],
-                    self.xk["markup_range"][1],
-                    self.xk["n_close_orders"][1],
-                    self.xk["auto_unstuck_wallet_exposure_threshold"][1],
-                    self.xk["auto_unstuck_ema_dist"][1],
+                    self.market,
+                    self.params,
                 )
                 orders += [
                     {
@@ -1041,6 +963,7 @@ async def main() -> None:
         level=logging.INFO,
         datefmt="%Y-%m-%dT%H:%M:%S",
     )
+    clear_stale_numba_cache()
     parser = argparse.ArgumentParser(prog="passivbot", description="run passivbot")
     parser.add_argument("user", type=str, help="user/account_name defined in api-keys.json")
     parser.add_argument("symbol", type=str, help="symbol to trade")
@@ -1,4 +1,5 @@
 import glob
+import hashlib
 import json
 import os
 import traceback
@@ -17,7 +18,7 @@ except:
     print("pandas not found, trying without...")
     pass
 
-from njit_funcs import calc_samples
+from njit_funcs import calc_samples_streaming
 from pure_funcs import (
     numpyize,
     candidate_to_live_config,
@@ -29,6 +30,7 @@ from pure_funcs import (
     get_template_live_config,
     sort_dict_keys,
     make_compatible,
+    denumpyize,
 )
 
 
@@ -345,6 +347,69 @@ def add_argparse_args(parser):
     return parser
 
 
+# agg trades chunks are stored as uncompressed .npz files, one array per column,
+# named {first_trade_id}_{last_trade_id}_{first_timestamp}_{last_timestamp}[_verified].npz
+# legacy chunks are .csv files with the same names and columns
+AGG_TRADES_DTYPES = {
+    "trade_id": np.int64,
+    "price": np.float64,
+    "qty": np.float64,
+    "timestamp": np.int64,
+    "is_buyer_maker": np.int8,
+}
+AGG_TRADES_CHUNK_EXTENSIONS = (".npz", ".csv")
+
+
+def write_agg_trades_chunk(df, filepath: str) -> str:
+    """
+    writes agg trades DataFrame as columnar .npz chunk; returns path written
+    """
+    filepath = os.path.splitext(filepath)[0] + ".npz"
+    np.savez(filepath, **{k: df[k].values.astype(v) for k, v in AGG_TRADES_DTYPES.items()})
+    return filepath
+
+
+def read_agg_trades_chunk(filepath: str, columns: [str] = None):
+    """
+    reads agg trades chunk, .npz or legacy .csv, as DataFrame
+    with .npz only the given columns are read from disk
+    """
+    columns = list(AGG_TRADES_DTYPES) if columns is None else columns
+    if filepath.endswith(".npz"):
+        with np.load(filepath) as data:
+            return pd.DataFrame({k: data[k] for k in columns})
+    return pd.read_csv(
+        filepath, usecols=columns, dtype={k: AGG_TRADES_DTYPES[k] for k in columns}
+    )[columns]
+
+
+def migrate_agg_trades_chunks(dirpath: str) -> int:
+    """
+    converts all legacy .csv agg trades chunks in dirpath and its subdirs to .npz
+    each .csv is removed after its .npz is read back and verified; returns n converted
+    """
+    n_converted = 0
+    for root, _, filenames in os.walk(dirpath):
+        for f in sorted(filenames):
+            if not f.endswith(".csv") or len(f.split("_")) < 4:
+                continue
+            csv_path = os.path.join(root, f)
+            try:
+                df = read_agg_trades_chunk(csv_path)
+                npz_path = write_agg_trades_chunk(df, csv_path)
+                if not read_agg_trades_chunk(npz_path).equals(df):
+                    os.remove(npz_path)
+                    raise Exception("verification failed")
+            except Exception as e:
+                print(f"\nerror converting {csv_path}: {e}")
+                continue
+            os.remove(csv_path)
+            n_converted += 1
+            print(f"\rconverted {n_converted} chunks, last {csv_path}", end="  ")
+    print()
+    return n_converted
+
+
 def make_tick_samples(config: dict, sec_span: int = 1):
 
     """
@@ -370,26 +435,176 @@ def make_tick_samples(config: dict, sec_span: int = 1):
     )
     if not os.path.exists(ticks_filepath):
         return
-    ticks_filenames = sorted([f for f in os.listdir(ticks_filepath) if f.endswith(".csv")])
-    ticks = np.empty((0, 3))
+    ticks_filenames = sorted(
+        [f for f in os.listdir(ticks_filepath) if f.endswith(AGG_TRADES_CHUNK_EXTENSIONS)],
+        key=lambda f: int(f.split("_")[2]),
+    )
+    samples = [np.empty((0, 3))]
+    carry = np.array([-1.0, 0.0, 0.0])
+    n_ticks = 0
     sts = time()
     for f in ticks_filenames:
-        _, _, first_ts, last_ts = map(int, f.replace(".csv", "").split("_"))
+        first_ts, last_ts = map(int, f.split(".")[0].split("_")[2:4])
         if first_ts > end_ts or last_ts < start_ts:
             continue
         print(f"\rloading chunk {ts_to_date(first_ts / 1000)}", end="  ")
-        tdf = pd.read_csv(ticks_filepath + f)
+        tdf = read_agg_trades_chunk(ticks_filepath + f, ["timestamp", "qty", "price"])
         tdf = tdf[(tdf.timestamp >= start_ts) & (tdf.timestamp <= end_ts)]
-        ticks = np.concatenate((ticks, tdf[["timestamp", "qty", "price"]].values))
+        if not tdf.timestamp.is_monotonic_increasing:
+            tdf = tdf.sort_values("timestamp", kind="stable")
+        chunk_samples, carry = calc_samples_streaming(
+            tdf[["timestamp", "qty", "price"]].values.astype(np.float64), sec_span * 1000, carry
+        )
+        samples.append(chunk_samples)
+        n_ticks += len(tdf)
         del tdf
-    samples = calc_samples(ticks[ticks[:, 0].argsort()], sec_span * 1000)
+    if carry[0] >= 0.0:
+        samples.append(carry.reshape(1, 3))
+    samples = np.concatenate(samples)
     print(
-        f"took {time() - sts:.2f} seconds to load {len(ticks)} ticks, creating {len(samples)} samples"
+        f"took {time() - sts:.2f} seconds to load {n_ticks} ticks, creating {len(samples)} samples"
     )
-    del ticks
     return samples
 
 
+def calc_ticks_hash(ticks: np.ndarray) -> str:
+    """
+    fingerprint of a ticks array from its shape and all of its rows, hashed in chunks so that
+    memory mapped ticks are not read into memory at once; meant to be computed once per symbol
+    compact ticks are fingerprinted by their arrays and layout
+    """
+    if type(ticks) == dict:
+        meta = {k: v for k, v in ticks.items() if k not in ["prices", "qtys"]}
+        h = hashlib.sha256(json.dumps(meta, sort_keys=True).encode())
+        h.update(calc_ticks_hash(ticks["prices"]).encode())
+        if ticks["qtys"] is not None:
+            h.update(calc_ticks_hash(ticks["qtys"]).encode())
+        return h.hexdigest()[:32]
+    h = hashlib.sha256(f"{ticks.shape} {ticks.dtype}".encode())
+    chunk_size = 1000000
+    for i in range(0, len(ticks), chunk_size):
+        h.update(np.ascontiguousarray(ticks[i : i + chunk_size]).tobytes())
+    return h.hexdigest()[:32]
+
+
+# sources turning ticks and backtest settings into an analysis
+ENGINE_SOURCES = ["njit_funcs*.py", "backtest.py", "pure_funcs.py"]
+_engine_version = None
+
+
+def calc_engine_version() -> str:
+    """
+    fingerprint of the backtest engine sources, so that cached results of an older engine are
+    not reused after an upgrade; computed once per process
+    """
+    global _engine_version
+    if _engine_version is None:
+        dirpath = os.path.dirname(os.path.abspath(__file__))
+        h = hashlib.sha256()
+        for pattern in ENGINE_SOURCES:
+            for fpath in sorted(glob.glob(os.path.join(dirpath, pattern))):
+                with open(fpath, "rb") as f:
+                    h.update(f.read())
+        _engine_version = h.hexdigest()[:32]
+    return _engine_version
+
+
+def calc_result_cache_key(config: dict, ticks_hash: str) -> str:
+    """
+    content address of a backtest result
+    made from all backtest settings except config_no, with floats rounded to 12 significant digits,
+    the fingerprint of the ticks backtested and the backtest engine version
+    the rounding only absorbs float noise, e.g. from json round trips; configs differing in any
+    setting get different keys, so the cache matches exact repeats only, such as starting configs,
+    resumed or repeated sessions and harmonies copied whole from memory
+    """
+
+    def round_floats(x):
+        if isinstance(x, float):
+            return float(f"{x:.12g}")
+        if isinstance(x, dict):
+            return {k: round_floats(v) for k, v in x.items()}
+        if isinstance(x, list):
+            return [round_floats(v) for v in x]
+        return x
+
+    content = {k: v for k, v in denumpyize(config).items() if k != "config_no"}
+    return hashlib.sha256(
+        json.dumps(
+            [round_floats(content), ticks_hash, calc_engine_version()], sort_keys=True
+        ).encode()
+    ).hexdigest()
+
+
+def load_cached_result(cache_dirpath: str, key: str) -> dict:
+    """
+    returns cached result, None if missing; marks it as recently used
+    """
+    filepath = os.path.join(cache_dirpath, key[:2], key + ".json")
+    try:
+        result = json.load(open(filepath))
+        os.utime(filepath)
+        return result
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def dump_cached_result(cache_dirpath: str, key: str, result: dict):
+    filepath = make_get_filepath(os.path.join(cache_dirpath, key[:2], key + ".json"))
+    tmp_filepath = f"{filepath}.{os.getpid()}.tmp"
+    with open(tmp_filepath, "w") as f:
+        json.dump(denumpyize(result), f)
+    os.replace(tmp_filepath, filepath)
+
+
+def evict_result_cache(cache_dirpath: str, max_bytes: int) -> int:
+    """
+    deletes least recently used results until the cache is at most max_bytes
+    returns number of results deleted
+    """
+    entries = []
+    for filepath in glob.glob(os.path.join(cache_dirpath, "*", "*.json")):
+        try:
+            stat = os.stat(filepath)
+            entries.append((stat.st_mtime, stat.st_size, filepath))
+        except FileNotFoundError:
+            pass
+    total_bytes = sum(e[1] for e in entries)
+    n_deleted = 0
+    for _, size, filepath in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+        n_deleted += 1
+    return n_deleted
+
+
+def dump_backtest_snapshot(filepath: str, snapshot: dict):
+    """
+    saves snapshot from backtest.backtest_resumable() as .npz; written to tmp file first,
+    so an interrupted dump leaves the previous snapshot intact
+    """
+    filepath = make_get_filepath(os.path.splitext(filepath)[0] + ".npz")
+    tmp_filepath = f"{filepath[:-4]}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_filepath, **snapshot)
+    os.replace(tmp_filepath, filepath)
+
+
+def load_backtest_snapshot(filepath: str) -> dict:
+    """
+    returns snapshot saved by dump_backtest_snapshot(), None if missing
+    """
+    filepath = os.path.splitext(filepath)[0] + ".npz"
+    if not os.path.exists(filepath):
+        return None
+    with np.load(filepath) as data:
+        return {k: data[k] for k in data.files}
+
+
 def get_starting_configs(config) -> [dict]:
     starting_configs = []
     if config["starting_configs"] is not None:
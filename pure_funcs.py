@@ -5,7 +5,15 @@ from collections import OrderedDict
 import json
 import numpy as np
 from dateutil import parser
-from njit_funcs import round_dynamic, qty_to_cost
+from njit_funcs import (
+    round_dynamic,
+    qty_to_cost,
+    calc_analysis_metrics,
+    FILL_COLUMNS,
+    STATS_COLUMNS,
+    FILL_TYPES,
+    ANALYSIS_METRICS,
+)
 
 try:
     import pandas as pd
@@ -235,6 +243,25 @@ def date_to_ts(d):
     return int(parser.parse(d).replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
 
 
+def make_walk_forward_windows(
+    start_ts: float, end_ts: float, window_days: float, step_days: float = None
+) -> [tuple]:
+    """
+    returns [(window_start_ts, window_end_ts)], windows of window_days starting every step_days
+    step_days defaults to window_days; windows shorter than window_days at the end are dropped
+    """
+    window_ms = window_days * 1000 * 60 * 60 * 24
+    step_ms = (window_days if step_days is None else step_days) * 1000 * 60 * 60 * 24
+    if window_ms <= 0 or step_ms <= 0:
+        raise Exception("walk forward window and step must be positive")
+    windows = []
+    window_start_ts = start_ts
+    while window_start_ts + window_ms <= end_ts:
+        windows.append((window_start_ts, window_start_ts + window_ms))
+        window_start_ts += step_ms
+    return windows
+
+
 def get_utc_now_timestamp() -> int:
     """
     Creates a millisecond based timestamp of UTC now.
@@ -548,61 +575,29 @@ def get_template_live_config(passivbot_mode="static_grid"):
     )
 
 
+def fills_to_df(fills: np.ndarray) -> pd.DataFrame:
+    """
+    decodes backtest fills array into DataFrame with trade_id as int and type as str
+    """
+    fdf = pd.DataFrame(fills, columns=FILL_COLUMNS)
+    fdf["trade_id"] = fdf.trade_id.astype(int)
+    fdf["type"] = np.array(FILL_TYPES + ("unknown",), dtype=object)[
+        fills[:, FILL_COLUMNS.index("type")].astype(int)
+    ]
+    return fdf
+
+
+def stats_to_df(stats: np.ndarray) -> pd.DataFrame:
+    return pd.DataFrame(stats, columns=STATS_COLUMNS)
+
+
 def analyze_fills(
-    fills_long: list, fills_short: list, stats: list, config: dict
+    fills_long: np.ndarray, fills_short: np.ndarray, stats: np.ndarray, config: dict
 ) -> (pd.DataFrame, pd.DataFrame, dict):
-    sdf = pd.DataFrame(
-        stats,
-        columns=[
-            "timestamp",
-            "bkr_price_long",
-            "bkr_price_short",
-            "psize_long",
-            "pprice_long",
-            "psize_short",
-            "pprice_short",
-            "price",
-            "closest_bkr_long",
-            "closest_bkr_short",
-            "balance_long",
-            "balance_short",
-            "equity_long",
-            "equity_short",
-        ],
-    )
-    longs = pd.DataFrame(
-        fills_long,
-        columns=[
-            "trade_id",
-            "timestamp",
-            "pnl",
-            "fee_paid",
-            "balance",
-            "equity",
-            "qty",
-            "price",
-            "psize",
-            "pprice",
-            "type",
-        ],
-    )
+    sdf = stats_to_df(stats)
+    longs = fills_to_df(fills_long)
     longs.index = longs.timestamp
-    shorts = pd.DataFrame(
-        fills_short,
-        columns=[
-            "trade_id",
-            "timestamp",
-            "pnl",
-            "fee_paid",
-            "balance",
-            "equity",
-            "qty",
-            "price",
-            "psize",
-            "pprice",
-            "type",
-        ],
-    )
+    shorts = fills_to_df(fills_short)
     shorts.index = shorts.timestamp
     longs.loc[:, "wallet_exposure"] = [
         qty_to_cost(x.psize, x.pprice, config["inverse"], config["c_mult"]) / x.balance
@@ -820,6 +815,39 @@ def analyze_fills(
     return longs, shorts, sdf, sort_dict_keys(analysis)
 
 
+def analyze_fills_fast(
+    fills_long: np.ndarray, fills_short: np.ndarray, stats: np.ndarray, config: dict
+) -> dict:
+    """
+    same analysis as analyze_fills(), computed directly from backtest arrays without DataFrames
+    """
+    metrics = calc_analysis_metrics(
+        fills_long, fills_short, stats, config["inverse"], config["c_mult"]
+    )
+    return metrics_to_analysis(metrics, config)
+
+
+def metrics_to_analysis(metrics: np.ndarray, config: dict) -> dict:
+    """
+    analysis dict from calc_analysis_metrics() output, with config dependent metrics added
+    """
+    analysis = dict(zip(ANALYSIS_METRICS, metrics.tolist()))
+    analysis["exchange"] = config["exchange"] if "exchange" in config else "unknown"
+    analysis["symbol"] = config["symbol"] if "symbol" in config else "unknown"
+    for side in ["long", "short"]:
+        if config[side]["enabled"] and config[side]["wallet_exposure_limit"] > 0.0:
+            analysis[f"adg_per_exposure_{side}"] = (
+                analysis[f"adg_{side}"] / config[side]["wallet_exposure_limit"]
+            )
+            analysis[f"adg_realized_per_exposure_{side}"] = (
+                analysis[f"adg_realized_{side}"] / config[side]["wallet_exposure_limit"]
+            )
+        else:
+            analysis[f"adg_per_exposure_{side}"] = 0.0
+            analysis[f"adg_realized_per_exposure_{side}"] = 0.0
+    return sort_dict_keys(analysis)
+
+
 def get_empty_analysis():
     return {
         "exchange": "unknown",
@@ -843,6 +871,10 @@ def get_empty_analysis():
         "adg_realized_short": 0.0,
         "adg_realized_per_exposure_long": 0.0,
         "adg_realized_per_exposure_short": 0.0,
+        "adg_realized_per_exposure_wf_min_long": 0.0,
+        "adg_realized_per_exposure_wf_min_short": 0.0,
+        "adg_realized_per_exposure_wf_mean_long": 0.0,
+        "adg_realized_per_exposure_wf_mean_short": 0.0,
         "DGstd_long": 0.0,
         "DGstd_short": 0.0,
         "n_days": 0.0,
@@ -0,0 +1,112 @@
+import os
+import sys
+
+os.environ["NOJIT"] = "false"
+
+# repo root, for running as python3 scripts/analysis_parity.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+
+import numpy as np
+
+from backtest import backtest
+from njit_funcs import clear_stale_numba_cache
+from pure_funcs import analyze_fills, analyze_fills_fast, get_template_live_config
+
+MODES = ["recursive_grid", "neat_grid", "static_grid"]
+
+# (name, long enabled, short enabled, wallet exposure limit, price drift per tick)
+CASES = [
+    ("both sides", True, True, 1.0, 0.0),
+    ("long only", True, False, 1.0, 0.0),
+    ("short only", False, True, 1.0, 0.0),
+    ("bankruptcy", True, True, 10.0, -0.00002),
+]
+
+
+def make_ticks(n_days: float, drift: float, seed: int) -> np.ndarray:
+    # 1s ticks [timestamp, qty, price] of a random walk
+    rng = np.random.default_rng(seed)
+    n = int(n_days * 86400)
+    prices = np.round(2500 * np.exp(np.cumsum(rng.normal(drift, 0.0004, n))), 2)
+    return np.stack([1.6e12 + np.arange(n) * 1000.0, np.ones(n), prices], axis=1)
+
+
+def make_config(mode: str, do_long: bool, do_short: bool, wallet_exposure_limit: float) -> dict:
+    config = get_template_live_config(mode)
+    config.update(
+        {
+            "starting_balance": 1000.0,
+            "latency_simulation_ms": 1000,
+            "market_type": "futures",
+            "exchange": "binance",
+            "symbol": "BTCUSDT",
+            "inverse": False,
+            "qty_step": 0.001,
+            "price_step": 0.01,
+            "min_qty": 0.001,
+            "min_cost": 5.0,
+            "c_mult": 1.0,
+            "maker_fee": 0.0002,
+        }
+    )
+    for side, enabled in [("long", do_long), ("short", do_short)]:
+        config[side]["enabled"] = enabled
+        config[side]["wallet_exposure_limit"] = wallet_exposure_limit
+        config[side]["ema_span_0"] = 60.0
+        config[side]["ema_span_1"] = 600.0
+    return config
+
+
+def compare(slow: dict, fast: dict, rtol: float) -> [str]:
+    """
+    returns keys whose values differ, or which are missing in one of the analyses
+    strings must be equal; floats equal within rtol, nan only where the other is nan too
+    """
+    wrong = sorted(set(slow) ^ set(fast))
+    for key in sorted(set(slow) & set(fast)):
+        a, b = slow[key], fast[key]
+        if isinstance(a, str) or isinstance(b, str):
+            if a != b:
+                wrong.append(key)
+        elif not (np.isnan(a) and np.isnan(b)) and abs(a - b) > rtol * max(abs(a), abs(b), 1e-12):
+            wrong.append(key)
+    return wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="analysis_parity",
+        description="check that analyze_fills_fast() returns the same analysis as analyze_fills(), "
+        + "key by key, on backtests of synthetic ticks",
+    )
+    parser.add_argument("-d", "--n_days", type=float, default=3.0, help="days of 1s ticks")
+    parser.add_argument("--rtol", type=float, default=1e-9, help="max relative difference")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    clear_stale_numba_cache()
+    print(f"{'mode':<16}{'case':<12}{'keys':>6}{'max rel diff':>14}  differing keys")
+    n_wrong_total = 0
+    for mode in MODES:
+        for name, do_long, do_short, wallet_exposure_limit, drift in CASES:
+            config = make_config(mode, do_long, do_short, wallet_exposure_limit)
+            ticks = make_ticks(args.n_days, drift, args.seed)
+            fills_long, fills_short, stats = backtest(config, ticks)
+            slow = analyze_fills(fills_long, fills_short, stats, config)[3]
+            fast = analyze_fills_fast(fills_long, fills_short, stats, config)
+            wrong = compare(slow, fast, args.rtol)
+            max_rel_diff = max(
+                [
+                    abs(slow[k] - fast[k]) / max(abs(slow[k]), abs(fast[k]), 1e-12)
+                    for k in set(slow) & set(fast)
+                    if not isinstance(slow[k], str) and not np.isnan(slow[k] - fast[k])
+                ]
+            )
+            n_wrong_total += len(wrong)
+            print(f"{mode:<16}{name:<12}{len(slow):>6}{max_rel_diff:>14.2e}  {' '.join(wrong)}")
+    assert n_wrong_total == 0, f"{n_wrong_total} analysis values differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+import threading
+import zipfile
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# repo root, for running as python3 scripts/download_check.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import downloader
+from downloader import download_ohlcvs, fetch_file
+from pure_funcs import date_to_ts
+
+KLINE_HEADER = [
+    "open_time",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "close_time",
+    "quote_volume",
+    "count",
+    "taker_buy_volume",
+    "taker_buy_quote_volume",
+    "ignore",
+]
+
+# responses served in turn for a path, the last one repeating; paths not listed are served "ok"
+# "ok": whole file or requested range; "truncate": half of what is asked, then the connection is
+# closed; "500"/"503": server errors; "404": not found
+FAILURE_PLANS = {
+    "monthly/klines/XUSDT/1m/XUSDT-1m-2021-01.zip": ["truncate", "503", "truncate", "ok"],
+    "monthly/klines/XUSDT/1m/XUSDT-1m-2021-02.zip": ["404"],
+    "daily/klines/XUSDT/1m/XUSDT-1m-2021-02-02.zip": ["500", "500", "ok"],
+    "daily/klines/XUSDT/1m/XUSDT-1m-2021-02-04.zip": ["truncate", "ok"],
+    "daily/klines/XUSDT/1m/XUSDT-1m-2021-02-05.zip": ["503", "truncate", "truncate", "ok"],
+    "daily/klines/XUSDT/1m/always-failing.zip": ["500"],
+}
+
+
+def make_kline_zip(name: str, start_ts: int, n_minutes: int, rng: np.random.Generator) -> bytes:
+    # binance style zip with one csv of 1m klines, header included
+    closes = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.001, n_minutes))), 4)
+    rows = io.StringIO()
+    writer = csv.writer(rows)
+    writer.writerow(KLINE_HEADER)
+    for i, close in enumerate(closes):
+        ts = start_ts + i * 60000
+        high, low = close * 1.001, close * 0.999
+        writer.writerow([ts, close, high, low, close, 1.0, ts + 59999, close, 1, 0.5, close / 2, 0])
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(name[: -len(".zip")] + ".csv", rows.getvalue())
+    return buf.getvalue()
+
+
+def make_files(symbol: str, months: [str], days: [str], seed: int) -> dict:
+    # {path: zip bytes} for monthly and daily klines
+    rng = np.random.default_rng(seed)
+    files = {}
+    for month in months:
+        start_ts = date_to_ts(month + "-01")
+        next_month = f"{int(month[:4]) + int(month[5:]) // 12}-{int(month[5:]) % 12 + 1:02}-01"
+        n_minutes = (date_to_ts(next_month) - start_ts) // 60000
+        name = f"{symbol}-1m-{month}.zip"
+        files[f"monthly/klines/{symbol}/1m/{name}"] = make_kline_zip(name, start_ts, n_minutes, rng)
+    for day in days:
+        name = f"{symbol}-1m-{day}.zip"
+        files[f"daily/klines/{symbol}/1m/{name}"] = make_kline_zip(name, date_to_ts(day), 1440, rng)
+    return files
+
+
+class KlinesServer(ThreadingHTTPServer):
+    """
+    local stand-in for data.binance.vision; serves files with keep alive and range requests,
+    injects failures by FAILURE_PLANS and logs every request as (path, range start, action)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, files: dict):
+        self.files = files
+        self.log = []
+        self.n_requests = Counter()
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), KlinesHandler)
+
+
+class KlinesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.lstrip("/")
+        range_start = 0
+        if "Range" in self.headers:
+            range_start = int(self.headers["Range"][len("bytes=") :].split("-")[0])
+        with self.server.lock:
+            plan = FAILURE_PLANS.get(path, ["ok"])
+            action = plan[min(self.server.n_requests[path], len(plan) - 1)]
+            self.server.n_requests[path] += 1
+            self.server.log.append((path, range_start, action))
+        if action == "404" or path not in self.server.files:
+            self.send_error(404)
+            return
+        if action in ["500", "503"]:
+            self.send_error(int(action))
+            return
+        content = self.server.files[path]
+        if range_start >= len(content):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(content)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = content[range_start:]
+        if range_start:
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {range_start}-{len(content) - 1}/{len(content)}"
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if action == "truncate":
+            self.wfile.write(body[: len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+def check_resumes(log: [tuple], files: dict) -> int:
+    """
+    every request after a truncated response must resume where the truncated body ended, so no
+    byte is fetched twice. returns number of resumed requests
+    """
+    n_resumed = 0
+    for path in set(p for p, _, _ in log):
+        n_bytes = 0
+        for _, range_start, action in [x for x in log if x[0] == path]:
+            assert range_start == n_bytes, f"{path} requested from {range_start}, had {n_bytes}"
+            n_resumed += range_start > 0
+            if action == "truncate":
+                n_bytes += (len(files[path]) - n_bytes) // 2
+    return n_resumed
+
+
+def expected_sleeps(backoff_seconds: float) -> Counter:
+    # fetch_file sleeps backoff_seconds * 2 ** k after the k-th failed try of a file
+    sleeps = Counter()
+    for path, plan in FAILURE_PLANS.items():
+        if plan == ["404"] or path.endswith("always-failing.zip"):
+            continue
+        n_failures = next(i for i, action in enumerate(plan) if action == "ok")
+        sleeps.update(backoff_seconds * 2**k for k in range(n_failures))
+    return sleeps
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="download_check",
+        description="check retries with backoff and resumed downloads of klines, against a local "
+        + "server which fails and truncates responses",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    symbol = "XUSDT"
+    months = ["2021-01", "2021-02"]
+    days = [f"2021-02-{d:02}" for d in range(1, 11)]
+    files = make_files(symbol, months, days, args.seed)
+    files[f"daily/klines/{symbol}/1m/always-failing.zip"] = b""
+    server = KlinesServer(files)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    # record backoff sleeps instead of sleeping
+    sleeps = Counter()
+    sleeps_lock = threading.Lock()
+
+    def record_sleep(seconds: float):
+        with sleeps_lock:
+            sleeps[seconds] += 1
+
+    downloader.sleep = record_sleep
+
+    with tempfile.TemporaryDirectory() as dirpath:
+        cwd = os.getcwd()
+        os.chdir(dirpath)
+        try:
+            df = download_ohlcvs(symbol, "2021-01-01", "2021-02-10", base_url=base_url)
+            leftovers = [
+                f
+                for _, _, fnames in os.walk("historical_data")
+                for f in fnames
+                if not f.endswith(".csv")
+            ]
+            try:
+                fetch_file(base_url + f"daily/klines/{symbol}/1m/always-failing.zip", "x.zip", 3)
+                raised = False
+            except Exception:
+                raised = True
+        finally:
+            os.chdir(cwd)
+    server.shutdown()
+
+    # klines served for january as month and for february as days, no minute missing
+    expected = []
+    for path in [f"monthly/klines/{symbol}/1m/{symbol}-1m-2021-01.zip"] + [
+        f"daily/klines/{symbol}/1m/{symbol}-1m-{day}.zip" for day in days[:-1]
+    ]:
+        with zipfile.ZipFile(io.BytesIO(files[path])) as zf:
+            rows = list(csv.reader(io.StringIO(zf.read(zf.namelist()[0]).decode())))[1:]
+        expected += [[float(x) for x in row[:6]] for row in rows]
+    expected = np.array(expected)
+    assert len(df) == len(expected), f"{len(df)} klines, expected {len(expected)}"
+    assert np.allclose(df[["timestamp", "open", "high", "low", "close", "volume"]].values, expected)
+    assert not leftovers, f"files left behind: {leftovers}"
+
+    n_resumed = check_resumes(
+        [x for x in server.log if not x[0].endswith("always-failing.zip")], files
+    )
+    assert raised, "always failing download did not raise"
+    failing_sleeps = Counter({1.0: 1, 2.0: 1})
+    assert sleeps == expected_sleeps(1.0) + failing_sleeps, f"backoff sleeps {dict(sleeps)}"
+
+    n_actions = Counter(action for _, _, action in server.log)
+    print(f"{'requests':<12}{len(server.log):>6}")
+    for action in ["ok", "truncate", "500", "503", "404"]:
+        print(f"{action:<12}{n_actions[action]:>6}")
+    print(f"{'resumed':<12}{n_resumed:>6}")
+    print(
+        f"{'sleeps':<12}{sum(sleeps.values()):>6}  "
+        + " ".join(f"{k:g}s x{v}" for k, v in sorted(sleeps.items()))
+    )
+    print(f"{'klines':<12}{len(df):>6}")
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
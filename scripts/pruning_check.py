@@ -0,0 +1,173 @@
+import os
+import sys
+
+os.environ["NOJIT"] = "true"
+
+# repo root, for running as python3 scripts/pruning_check.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+
+import numpy as np
+
+from harmony_search import HarmonyMemory, HarmonySearch
+
+SCORE_FORMULAS = [
+    "adg_PAD_mean",
+    "adg_PAD_std",
+    "adg_DGstd_ratio",
+    "adg_mean",
+    "adg_min",
+    "adg_PAD_std_min",
+    "adg_realized_PAD_mean",
+    "adg_realized_PAD_std",
+    "adg_realized_wf_min",
+]
+
+
+def make_search(score_formula: str, symbols: [str], n_harmonies: int) -> HarmonySearch:
+    # only the state is_hopeless() and calc_scores() use; no tick caches or workers
+    hs = object.__new__(HarmonySearch)
+    hs.config = {
+        "score_formula": score_formula,
+        **{
+            f"maximum_{k}_{side}": v
+            for k, v in [
+                ("pa_distance_std", 0.015),
+                ("pa_distance_mean", 0.015),
+                ("loss_profit_ratio", 0.5),
+            ]
+            for side in ["long", "short"]
+        },
+    }
+    hs.do_long = hs.do_short = True
+    hs.symbols = symbols
+    hs.n_harmonies = n_harmonies
+    hs.hm = HarmonyMemory([], n_harmonies, [{}, {}])
+    hs.best_single_results = {}
+    hs.higher_is_better = [
+        f"{k}_{side}"
+        for k in [
+            "adg",
+            "adg_DGstd_ratio",
+            "adg_realized_per_exposure",
+            "adg_realized_per_exposure_wf_min",
+        ]
+        for side in ["long", "short"]
+    ]
+    hs.lower_is_better = [
+        f"{k}_{side}"
+        for k in [
+            "pa_distance_mean",
+            "pa_distance_std",
+            "loss_profit_ratio",
+            "equity_balance_ratio_std",
+        ]
+        for side in ["long", "short"]
+    ]
+    return hs
+
+
+def random_analysis(rng: np.random.Generator, adg_mean: float, adg_std: float = 0.002) -> dict:
+    # adgs of either sign, so losing and winning evals are both covered
+    analysis = {}
+    for side in ["long", "short"]:
+        for k in [
+            "adg",
+            "adg_DGstd_ratio",
+            "adg_realized_per_exposure",
+            "adg_realized_per_exposure_wf_min",
+        ]:
+            analysis[f"{k}_{side}"] = rng.normal(adg_mean, adg_std)
+        analysis[f"pa_distance_mean_{side}"] = rng.uniform(0.001, 0.05)
+        analysis[f"pa_distance_std_{side}"] = rng.uniform(0.001, 0.05)
+        analysis[f"loss_profit_ratio_{side}"] = rng.uniform(0.0, 2.0)
+        analysis[f"equity_balance_ratio_std_{side}"] = rng.uniform(0.0, 0.01)
+    return analysis
+
+
+def within_seen_bests(hs: HarmonySearch, symbol: str, result: dict) -> bool:
+    # whether the result is no better than the best values seen for the symbol in every metric
+    best = hs.best_single_results[symbol]
+    return all(result[k] <= best[k] for k in hs.higher_is_better) and all(
+        result[k] >= best[k] for k in hs.lower_is_better
+    )
+
+
+def check(score_formula: str, n_trials: int, rng: np.random.Generator) -> (int, int, int, int):
+    """
+    prunes random evals symbol by symbol and counts pruned evals which would have replaced the
+    worst harmony on all symbols. half the evals are drawn from the results seen so far, the other
+    half fresh and more spread out, so some set new bests on the remaining symbols, which pruning
+    doesn't foresee
+    returns (n pruned, n pruned wrongly, n pruned beyond seen bests, n pruned wrongly beyond)
+    """
+    n_pruned = n_wrong = n_pruned_beyond = n_wrong_beyond = 0
+    for _ in range(n_trials):
+        symbols = [f"S{i}" for i in range(rng.integers(2, 6))]
+        hs = make_search(score_formula, symbols, 4)
+        adg_mean = rng.choice([-0.002, 0.0, 0.002])
+        # harmonies better than most evals, so that pruning happens often
+        for row in range(hs.n_harmonies):
+            scores = hs.calc_scores({s: random_analysis(rng, adg_mean + 0.002) for s in symbols})
+            hs.hm.set_score(0, row, scores["score_long"])
+            hs.hm.set_score(1, row, scores["score_short"])
+        seen = {s: [random_analysis(rng, adg_mean) for _ in range(8)] for s in symbols}
+        for s in symbols:
+            for result in seen[s]:
+                hs.update_best_single_results(s, result)
+        if rng.random() < 0.5:
+            results = {s: seen[s][rng.integers(len(seen[s]))] for s in symbols}
+        else:
+            results = {s: random_analysis(rng, adg_mean, 0.006) for s in symbols}
+        scores = hs.calc_scores(results)
+        accepted = any(
+            scores[f"score_{side}"] < hs.hm.scores[i, hs.hm.worst(i)]
+            for i, side in enumerate(["long", "short"])
+        )
+        for n_done in range(1, len(symbols)):
+            if hs.is_hopeless({s: results[s] for s in symbols[:n_done]}):
+                if all(within_seen_bests(hs, s, results[s]) for s in symbols[n_done:]):
+                    n_pruned += 1
+                    n_wrong += accepted
+                else:
+                    n_pruned_beyond += 1
+                    n_wrong_beyond += accepted
+                break
+    return n_pruned, n_wrong, n_pruned_beyond, n_wrong_beyond
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="pruning_check",
+        description="count evals which harmony search pruning drops although they would have "
+        + "replaced the worst harmony, for each score formula. pruning never drops such an eval "
+        + "while the remaining symbols stay within the best results seen for them; evals setting "
+        + "new bests can be dropped, which is reported",
+    )
+    parser.add_argument("-n", "--n_trials", type=int, default=500, help="random evals per formula")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    print(f"{'':<26}{'within seen bests':>18}{'beyond seen bests':>18}")
+    print(f"{'score formula':<26}{'pruned':>9}{'wrong':>9}{'pruned':>9}{'wrong':>9}")
+    n_wrong_total = n_pruned_beyond_total = n_wrong_beyond_total = 0
+    for score_formula in SCORE_FORMULAS:
+        n_pruned, n_wrong, n_pruned_beyond, n_wrong_beyond = check(
+            score_formula, args.n_trials, rng
+        )
+        n_wrong_total += n_wrong
+        n_pruned_beyond_total += n_pruned_beyond
+        n_wrong_beyond_total += n_wrong_beyond
+        print(
+            f"{score_formula:<26}{n_pruned:>9}{n_wrong:>9}{n_pruned_beyond:>9}{n_wrong_beyond:>9}"
+        )
+    print(
+        f"{n_wrong_beyond_total} of {n_pruned_beyond_total} evals pruned beyond seen bests would "
+        + "have been accepted"
+    )
+    assert n_wrong_total == 0, f"{n_wrong_total} evals within seen bests pruned wrongly"
+
+
+if __name__ == "__main__":
+    main()
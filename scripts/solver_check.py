@@ -0,0 +1,109 @@
+import os
+import sys
+
+os.environ["NOJIT"] = "false"
+
+# repo root, for running as python3 scripts/solver_check.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+
+import numpy as np
+
+from njit_funcs import (
+    round_,
+    qty_to_cost,
+    cost_to_qty,
+    calc_pnl_long,
+    calc_pnl_short,
+    calc_wallet_exposure_if_filled,
+    find_close_qty_long_bringing_wallet_exposure_to_target,
+    find_close_qty_short_bringing_wallet_exposure_to_target,
+    find_entry_qty_bringing_wallet_exposure_to_target,
+)
+
+SOLVERS = {
+    "close_long": find_close_qty_long_bringing_wallet_exposure_to_target,
+    "close_short": find_close_qty_short_bringing_wallet_exposure_to_target,
+    "entry": find_entry_qty_bringing_wallet_exposure_to_target,
+}
+
+
+def make_case(kind: str, inverse: bool, rng) -> tuple:
+    # returns (balance, psize, pprice, wallet_exposure_target, price, qty_step, c_mult)
+    pprice = float(np.exp(rng.uniform(np.log(0.1), np.log(50000.0))))
+    if inverse:
+        c_mult, qty_step = 100.0, 1.0
+        balance = float(rng.uniform(0.5, 50.0)) * 10000.0 / pprice
+    else:
+        # one qty step is worth roughly 0.1 to 10 quote
+        c_mult = 1.0
+        qty_step = float(10.0 ** np.round(np.log10(rng.uniform(0.1, 10.0) / pprice)))
+        balance = float(rng.uniform(100.0, 100000.0))
+    wallet_exposure_target = float(rng.uniform(0.1, 3.0))
+    if kind == "entry":
+        wallet_exposure = wallet_exposure_target * rng.uniform(0.05, 0.95)
+        price = pprice * rng.uniform(0.8, 1.0)
+    else:
+        wallet_exposure = wallet_exposure_target * rng.uniform(1.05, 2.0)
+        price = pprice * rng.uniform(0.9, 1.1)
+    psize = round_(cost_to_qty(balance * wallet_exposure, pprice, inverse, c_mult), qty_step)
+    return balance, psize, pprice, wallet_exposure_target, price, qty_step, c_mult
+
+
+def calc_wallet_exposure_after(kind: str, case: tuple, qty: float, inverse: bool) -> float:
+    balance, psize, pprice, _, price, qty_step, c_mult = case
+    if kind == "entry":
+        return calc_wallet_exposure_if_filled(
+            balance, psize, pprice, qty, price, inverse, c_mult, qty_step
+        )
+    pnl = (calc_pnl_long if kind == "close_long" else calc_pnl_short)(
+        pprice, price, qty, inverse, c_mult
+    )
+    return qty_to_cost(psize - qty, pprice, inverse, c_mult) / (balance + pnl)
+
+
+def is_nearest_qty(kind: str, case: tuple, qty: float, inverse: bool) -> bool:
+    # wallet exposure is monotonic in qty; target must lie between the wallet exposures one qty step
+    # below and above qty, unless qty is clamped to 0 or, for closes, to psize
+    psize, wallet_exposure_target, qty_step = case[1], case[3], case[5]
+    lower, upper = max(0.0, qty - qty_step), qty + qty_step
+    if kind != "entry":
+        upper = min(psize, upper)
+    vals = [calc_wallet_exposure_after(kind, case, q, inverse) for q in [lower, upper]]
+    if min(vals) * 0.999999 <= wallet_exposure_target <= max(vals) * 1.000001:
+        return True
+    return qty == 0.0 or (kind != "entry" and qty == psize)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="solver_check",
+        description="check that the closed form wallet exposure solvers return the qty step nearest "
+        + "to the target, evaluated with the wallet exposure routines they replace",
+    )
+    parser.add_argument(
+        "-n", "--n_cases", "--n-cases", type=int, default=10000, dest="n_cases", help="n cases"
+    )
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    n_failed = 0
+    for kind, solver in SOLVERS.items():
+        for inverse in [False, True]:
+            wrong = 0
+            for _ in range(args.n_cases):
+                case = make_case(kind, inverse, rng)
+                balance, psize, pprice, wallet_exposure_target, price, qty_step, c_mult = case
+                qty = solver(
+                    balance, psize, pprice, wallet_exposure_target, price, inverse, qty_step, c_mult
+                )
+                if not is_nearest_qty(kind, case, qty, inverse):
+                    wrong += 1
+            n_failed += wrong
+            label = f"{kind} {'inverse' if inverse else 'linear'}"
+            print(f"{label:<22}{wrong:>6} of {args.n_cases} off by more than one qty step")
+    sys.exit(1 if n_failed else 0)
+
+
+if __name__ == "__main__":
+    main()
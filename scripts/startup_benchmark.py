@@ -0,0 +1,115 @@
+import os
+import sys
+
+os.environ["NOJIT"] = "false"
+
+import argparse
+import glob
+import json
+import subprocess
+from time import time
+
+MODES = ["recursive_grid", "neat_grid", "static_grid"]
+
+# run in a fresh interpreter; prints {"import": seconds, "first_call": seconds, "second_call": seconds}
+CHILD_SCRIPT = """
+import os, json, sys
+from time import time
+os.environ["NOJIT"] = "false"
+sts = time()
+from backtest import warmup_backtest
+from pure_funcs import get_template_live_config
+import_time = time() - sts
+config = get_template_live_config(sys.argv[1])
+config.update(
+    {
+        "starting_balance": 1000.0,
+        "latency_simulation_ms": 1000,
+        "market_type": "futures",
+        "symbol": "BTCUSDT",
+        "inverse": False,
+        "qty_step": 0.001,
+        "price_step": 0.01,
+        "min_qty": 0.001,
+        "min_cost": 5.0,
+        "c_mult": 1.0,
+        "maker_fee": 0.0002,
+    }
+)
+for side in ["long", "short"]:
+    config[side]["enabled"] = True
+first_call = warmup_backtest(config, batch_size=2)
+second_call = warmup_backtest(config, batch_size=2)
+print(json.dumps({"import": import_time, "first_call": first_call, "second_call": second_call}))
+"""
+
+
+def clear_numba_cache(dirpath: str) -> int:
+    fpaths = [
+        fpath
+        for ext in ["nbi", "nbc"]
+        for fpath in glob.glob(os.path.join(dirpath, "__pycache__", f"njit_funcs*.{ext}"))
+    ]
+    for fpath in fpaths:
+        os.remove(fpath)
+    return len(fpaths)
+
+
+def time_startup(mode: str, dirpath: str) -> dict:
+    sts = time()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT, mode],
+        cwd=dirpath,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["total"] = time() - sts
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="startup_benchmark",
+        description="time imports and first backtest calls in fresh processes, "
+        + "without and with numba's on-disk compilation cache",
+    )
+    parser.add_argument(
+        "-m",
+        "--mode",
+        type=str,
+        required=False,
+        dest="mode",
+        default=None,
+        choices=MODES,
+        help="passivbot mode to benchmark; default is all",
+    )
+    parser.add_argument(
+        "-k",
+        "--keep_cache",
+        "--keep-cache",
+        action="store_true",
+        dest="keep_cache",
+        help="don't clear compilation cache first; only time startups with cache",
+    )
+    args = parser.parse_args()
+    dirpath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    modes = MODES if args.mode is None else [args.mode]
+    runs = ["warm"] if args.keep_cache else ["cold", "warm"]
+    print(f"{'mode':<16}{'cache':<8}{'import':>10}{'1st call':>10}{'2nd call':>10}{'total':>10}")
+    for mode in modes:
+        for run in runs:
+            if run == "cold":
+                clear_numba_cache(dirpath)
+            timings = time_startup(mode, dirpath)
+            print(
+                f"{mode:<16}{run:<8}"
+                + "".join(
+                    f"{timings[k]:>9.2f}s" for k in ["import", "first_call", "second_call", "total"]
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()